@@ -0,0 +1,671 @@
+# -*- coding: utf-8 -*-
+"""
+共享的 ACC HTTP 客户端（developer.api.autodesk.com）
+
+所有同步管理器共用：
+- 按 API 分组（data / reviews / admin / docs / oss）的进程级令牌桶限流，
+  429 时整个分组按 Retry-After 暂停并降低速率，成功后逐步恢复到配置上限
+- 429 / 5xx / 网络错误按带抖动的指数退避重试
+- aiohttp keep-alive 连接池 + DNS 缓存（同一事件循环内共享会话）
+- 同步调用（requests.Session）共享同一套限流、重试和指标
+- 按端点统计延迟、重试和限流次数
+
+用法:
+    client = get_acc_client()
+
+    async with client.session_scope():          # 整个同步任务共用一个连接池
+        data = await client.get_json(url, headers=headers)
+
+    async with client.limited_session() as session:   # 兼容既有的 aiohttp 写法
+        async with session.get(url, headers=headers) as response:
+            data = await response.json()
+
+    response = client.request_sync('GET', url, headers=headers)   # 阻塞调用方
+"""
+
+import os
+import re
+import json as json_lib
+import time
+import random
+import asyncio
+import logging
+import threading
+from collections import deque
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional
+
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+except ImportError:
+    requests = None
+    HTTPAdapter = None
+
+logger = logging.getLogger(__name__)
+
+ACC_API_BASE = "https://developer.api.autodesk.com"
+
+# URL 路径前缀 -> API 分组（按顺序匹配）
+API_FAMILY_PREFIXES = (
+    ('/data/v1/', 'data'),
+    ('/project/v1/', 'data'),
+    ('/construction/reviews/', 'reviews'),
+    ('/hq/', 'admin'),
+    ('/construction/admin/', 'admin'),
+    ('/bim360/admin/', 'admin'),
+    ('/bim360/docs/', 'docs'),
+    ('/oss/', 'oss'),
+)
+
+# 各分组的默认速率（每秒请求数, 突发容量），可用环境变量 ACC_RATE_LIMIT_<FAMILY>=rate[:burst] 覆盖
+DEFAULT_RATE_LIMITS = {
+    'data': (20.0, 40),
+    'reviews': (10.0, 20),
+    'admin': (10.0, 20),
+    'docs': (10.0, 20),
+    'oss': (20.0, 40),
+    'default': (10.0, 20),
+}
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class AccHttpError(Exception):
+    """ACC API 返回非 2xx（重试耗尽后）"""
+
+    def __init__(self, status: int, url: str, body: str = ''):
+        super().__init__(f"HTTP {status} - {url} - {body[:200]}")
+        self.status = status
+        self.url = url
+        self.body = body
+
+
+class AccResponse:
+    """已读取完的响应（异步请求返回）"""
+
+    __slots__ = ('status', 'headers', 'data', 'text', 'url', 'attempts', 'elapsed')
+
+    def __init__(self, status: int, headers: Dict[str, str], data: Any, text: str,
+                 url: str, attempts: int, elapsed: float):
+        self.status = status
+        self.headers = headers
+        self.data = data
+        self.text = text
+        self.url = url
+        self.attempts = attempts
+        self.elapsed = elapsed
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status < 300
+
+    def json(self) -> Any:
+        return self.data
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise AccHttpError(self.status, self.url, self.text)
+
+
+class _BufferedResponse:
+    """aiohttp 风格的响应包装（正文已读取），兼容 `async with session.get(...) as response` 写法"""
+
+    def __init__(self, result: AccResponse):
+        self._result = result
+        self.status = result.status
+        self.headers = result.headers
+        self.url = result.url
+
+    async def json(self, **kwargs) -> Any:
+        if self._result.data is not None:
+            return self._result.data
+        return json_lib.loads(self._result.text) if self._result.text else None
+
+    async def text(self, **kwargs) -> str:
+        return self._result.text
+
+    def raise_for_status(self):
+        self._result.raise_for_status()
+
+    def release(self):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+
+class _RequestContext:
+    """既可 await 也可 async with 的请求"""
+
+    def __init__(self, coro):
+        self._coro = coro
+
+    def __await__(self):
+        return self._coro.__await__()
+
+    async def __aenter__(self) -> _BufferedResponse:
+        return await self._coro
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+
+class LimitedSession:
+    """
+    aiohttp.ClientSession 的替身：get/post/... 经共享客户端发出（限流、重试、指标），
+    既有代码只需替换会话的创建方式
+    """
+
+    def __init__(self, client: 'AccHttpClient', session):
+        self._client = client
+        self._session = session
+
+    @property
+    def closed(self) -> bool:
+        return self._session.closed
+
+    async def _send(self, method: str, url: str, headers=None, params=None, json=None, data=None,
+                    timeout=None, **kwargs) -> _BufferedResponse:
+        result = await self._client.request(method, url, headers=headers, params=params, json=json,
+                                            data=data, timeout=timeout, session=self._session)
+        return _BufferedResponse(result)
+
+    def request(self, method: str, url: str, **kwargs) -> _RequestContext:
+        return _RequestContext(self._send(method, url, **kwargs))
+
+    def get(self, url: str, **kwargs) -> _RequestContext:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> _RequestContext:
+        return self.request('POST', url, **kwargs)
+
+    def put(self, url: str, **kwargs) -> _RequestContext:
+        return self.request('PUT', url, **kwargs)
+
+    def patch(self, url: str, **kwargs) -> _RequestContext:
+        return self.request('PATCH', url, **kwargs)
+
+    def delete(self, url: str, **kwargs) -> _RequestContext:
+        return self.request('DELETE', url, **kwargs)
+
+
+def api_family(url: str) -> str:
+    """按 URL 路径确定限流分组"""
+    path = url.split('://', 1)[-1]
+    path = path[path.find('/'):] if '/' in path else '/'
+    for prefix, family in API_FAMILY_PREFIXES:
+        if path.startswith(prefix):
+            return family
+    return 'default'
+
+
+_ID_SEGMENT = re.compile(r'^(urn:|b\.)|^[0-9a-fA-F-]{16,}$|^\d+$|[.:%]|^[A-Za-z0-9_-]{20,}$')
+
+
+def endpoint_key(method: str, url: str) -> str:
+    """把 URL 中的 ID 段替换为 {id}，用于按端点聚合指标"""
+    path = url.split('://', 1)[-1]
+    path = path[path.find('/'):] if '/' in path else '/'
+    path = path.split('?', 1)[0]
+    segments = ['{id}' if segment and _ID_SEGMENT.search(segment) else segment
+                for segment in path.split('/')]
+    return f"{method.upper()} {'/'.join(segments)}"
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析 Retry-After（秒数或 HTTP 日期）"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    线程安全的令牌桶（预约式）
+
+    reserve() 立即扣除一个令牌并返回需要等待的秒数，异步调用方 asyncio.sleep，
+    同步调用方 time.sleep，因此多个线程 / 事件循环共享同一个限额。
+    被 429 限流时 pause() 暂停整个分组并把速率减半，之后每次成功逐步恢复。
+    """
+
+    def __init__(self, rate: float, capacity: int, min_rate: float = 0.5):
+        self.max_rate = float(rate)
+        self.rate = float(rate)
+        self.min_rate = min(min_rate, self.max_rate)
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        # 令牌计算的起点；暂停期间位于未来
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def reserve(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= 1
+            return max(0.0, self.updated - now) + max(0.0, -self.tokens) / self.rate
+
+    def pause(self, seconds: float):
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            resume_at = now + seconds
+            if resume_at > self.updated:
+                self.updated = resume_at
+                self.tokens = min(self.tokens, 0.0)
+            self.rate = max(self.min_rate, self.rate / 2)
+
+    def on_success(self):
+        if self.rate < self.max_rate:
+            with self._lock:
+                self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD 并发窗口（单个事件循环内使用）
+
+    每个请求前 acquire()，结束后 release(congested)：请求顺利时窗口缓慢增大，
+    遇到 429 或需要重试时减半，从而在令牌桶之外再限制同时在途的请求数。
+    """
+
+    def __init__(self, initial: int, minimum: int = 1, maximum: Optional[int] = None):
+        self.maximum = max(1, maximum or initial)
+        self.minimum = max(1, min(minimum, self.maximum))
+        self.limit = float(max(self.minimum, min(initial, self.maximum)))
+        self.in_flight = 0
+        self._condition: Optional[asyncio.Condition] = None
+
+    def _cond(self) -> asyncio.Condition:
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    async def acquire(self):
+        cond = self._cond()
+        async with cond:
+            await cond.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self, congested: bool = False):
+        cond = self._cond()
+        async with cond:
+            self.in_flight -= 1
+            if congested:
+                self.limit = max(float(self.minimum), self.limit / 2)
+            else:
+                self.limit = min(float(self.maximum), self.limit + 1 / self.limit)
+            cond.notify_all()
+
+
+class _EndpointMetrics:
+    __slots__ = ('calls', 'errors', 'retries', 'throttled', 'total_seconds', 'max_seconds', 'recent')
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.throttled = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.recent = deque(maxlen=500)
+
+
+class AccHttpClient:
+    """限流 + 重试 + 连接池的 ACC API 客户端（异步为主，附带同步接口）"""
+
+    def __init__(self, max_retries: int = 5, backoff_base: float = 0.5, backoff_max: float = 30.0,
+                 request_timeout: float = 60.0, connector_limit: int = 64, limit_per_host: int = 32,
+                 keepalive_timeout: float = 30.0, dns_ttl: int = 300):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.request_timeout = request_timeout
+        self.connector_limit = connector_limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_ttl = dns_ttl
+
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._metrics: Dict[str, _EndpointMetrics] = {}
+        self._lock = threading.Lock()
+
+        # 事件循环 -> [aiohttp 会话, 引用计数]
+        self._sessions: Dict[Any, list] = {}
+        self._sync_session = None
+
+    # ------------------------------------------------------------------
+    # 限流
+    # ------------------------------------------------------------------
+
+    def bucket(self, family: str) -> TokenBucket:
+        bucket = self._buckets.get(family)
+        if bucket is None:
+            with self._lock:
+                bucket = self._buckets.get(family)
+                if bucket is None:
+                    rate, burst = DEFAULT_RATE_LIMITS.get(family, DEFAULT_RATE_LIMITS['default'])
+                    override = os.getenv(f"ACC_RATE_LIMIT_{family.upper()}")
+                    if override:
+                        rate_text, _, burst_text = override.partition(':')
+                        rate = float(rate_text)
+                        burst = int(burst_text) if burst_text else max(1, int(rate * 2))
+                    bucket = self._buckets[family] = TokenBucket(rate, burst)
+        return bucket
+
+    def _backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+        """Retry-After 优先，否则指数退避 + 抖动"""
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max) + random.uniform(0, self.backoff_base)
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def _on_throttled(self, family: str, retry_after: Optional[float], attempt: int) -> float:
+        delay = self._backoff(attempt, retry_after)
+        self.bucket(family).pause(delay)
+        logger.warning(f"ACC API throttled ({family}), backing off {delay:.1f}s")
+        return delay
+
+    # ------------------------------------------------------------------
+    # 指标
+    # ------------------------------------------------------------------
+
+    def _record(self, key: str, elapsed: float, attempts: int, throttled: int, failed: bool):
+        with self._lock:
+            metrics = self._metrics.get(key)
+            if metrics is None:
+                metrics = self._metrics[key] = _EndpointMetrics()
+            metrics.calls += 1
+            metrics.retries += attempts - 1
+            metrics.throttled += throttled
+            metrics.errors += 1 if failed else 0
+            metrics.total_seconds += elapsed
+            metrics.max_seconds = max(metrics.max_seconds, elapsed)
+            metrics.recent.append(elapsed)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """按端点的调用次数、错误、重试、限流次数与延迟分位数，以及各分组当前速率"""
+        with self._lock:
+            endpoints = {}
+            for key, metrics in self._metrics.items():
+                recent = sorted(metrics.recent)
+
+                def percentile(p: float) -> float:
+                    return round(recent[min(len(recent) - 1, int(len(recent) * p))] * 1000, 1) if recent else 0.0
+
+                endpoints[key] = {
+                    'calls': metrics.calls,
+                    'errors': metrics.errors,
+                    'retries': metrics.retries,
+                    'throttled': metrics.throttled,
+                    'avg_ms': round(metrics.total_seconds / metrics.calls * 1000, 1) if metrics.calls else 0.0,
+                    'p50_ms': percentile(0.50),
+                    'p95_ms': percentile(0.95),
+                    'max_ms': round(metrics.max_seconds * 1000, 1)
+                }
+            families = {
+                family: {'rate': round(bucket.rate, 2), 'max_rate': bucket.max_rate, 'capacity': bucket.capacity}
+                for family, bucket in self._buckets.items()
+            }
+        return {'endpoints': endpoints, 'families': families}
+
+    def reset_metrics(self):
+        with self._lock:
+            self._metrics.clear()
+
+    # ------------------------------------------------------------------
+    # 异步会话
+    # ------------------------------------------------------------------
+
+    def _new_session(self):
+        import aiohttp
+
+        connector = aiohttp.TCPConnector(
+            limit=self.connector_limit,
+            limit_per_host=self.limit_per_host,
+            keepalive_timeout=self.keepalive_timeout,
+            ttl_dns_cache=self.dns_ttl
+        )
+        return aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.request_timeout)
+        )
+
+    @asynccontextmanager
+    async def session_scope(self):
+        """
+        当前事件循环共享的 keep-alive 会话
+
+        同一事件循环内嵌套或并发的 scope 共用一个会话，最后一个 scope 退出时关闭。
+        """
+        loop = asyncio.get_running_loop()
+        entry = self._sessions.get(loop)
+        if entry is None or entry[0].closed:
+            entry = self._sessions[loop] = [self._new_session(), 0]
+        entry[1] += 1
+        try:
+            yield entry[0]
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and self._sessions.get(loop) is entry:
+                del self._sessions[loop]
+                await entry[0].close()
+
+    @asynccontextmanager
+    async def limited_session(self):
+        """session_scope 的 LimitedSession 版本，替换 `aiohttp.ClientSession()` 即可接入"""
+        async with self.session_scope() as session:
+            yield LimitedSession(self, session)
+
+    def _current_session(self):
+        try:
+            entry = self._sessions.get(asyncio.get_running_loop())
+        except RuntimeError:
+            return None
+        return entry[0] if entry and not entry[0].closed else None
+
+    # ------------------------------------------------------------------
+    # 异步请求
+    # ------------------------------------------------------------------
+
+    async def request(self, method: str, url: str, *, headers: Optional[Dict[str, str]] = None,
+                      params: Optional[Dict[str, Any]] = None, json: Any = None, data: Any = None,
+                      family: Optional[str] = None, session=None, timeout=None,
+                      max_retries: Optional[int] = None) -> AccResponse:
+        """
+        发送请求：先经令牌桶限流，429/5xx/网络错误自动重试
+
+        Args:
+            session: 指定 aiohttp 会话；默认使用当前 session_scope 的会话，没有时临时创建
+            family: 限流分组，默认按 URL 判断
+
+        Returns:
+            AccResponse（重试耗尽后仍为非 2xx 时原样返回，由调用方决定如何处理）
+        """
+        import aiohttp
+
+        if url.startswith('/'):
+            url = ACC_API_BASE + url
+        family = family or api_family(url)
+        bucket = self.bucket(family)
+        retries = self.max_retries if max_retries is None else max_retries
+        key = endpoint_key(method, url)
+
+        session = session or self._current_session()
+        if session is None:
+            async with self.session_scope() as scoped:
+                return await self.request(method, url, headers=headers, params=params, json=json, data=data,
+                                          family=family, session=scoped, timeout=timeout,
+                                          max_retries=max_retries)
+
+        start = time.monotonic()
+        throttled = 0
+        attempt = 0
+        while True:
+            wait = bucket.reserve()
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+            try:
+                extra = {'timeout': timeout} if timeout is not None else {}
+                async with session.request(method, url, headers=headers, params=params,
+                                           json=json, data=data, **extra) as response:
+                    body = await response.read()
+                    status = response.status
+                    response_headers = dict(response.headers)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt >= retries:
+                    self._record(key, time.monotonic() - start, attempt + 1, throttled, True)
+                    raise
+                delay = self._backoff(attempt, None)
+                logger.warning(f"ACC API request error ({key}): {e}, retrying in {delay:.1f}s")
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+
+            if status in RETRY_STATUSES and attempt < retries:
+                if status == 429:
+                    throttled += 1
+                    delay = self._on_throttled(family, parse_retry_after(response_headers.get('Retry-After')), attempt)
+                else:
+                    delay = self._backoff(attempt, parse_retry_after(response_headers.get('Retry-After')))
+                    logger.warning(f"ACC API {status} ({key}), retrying in {delay:.1f}s")
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+
+            if status == 429:
+                throttled += 1
+                self._on_throttled(family, parse_retry_after(response_headers.get('Retry-After')), attempt)
+            elif status < 500:
+                bucket.on_success()
+
+            text = body.decode('utf-8', errors='replace')
+            parsed = None
+            if text and 'json' in response_headers.get('Content-Type', ''):
+                try:
+                    parsed = json_lib.loads(text)
+                except ValueError:
+                    parsed = None
+
+            elapsed = time.monotonic() - start
+            self._record(key, elapsed, attempt + 1, throttled, not 200 <= status < 300)
+            return AccResponse(status, response_headers, parsed, text, url, attempt + 1, elapsed)
+
+    async def get_json(self, url: str, *, headers: Optional[Dict[str, str]] = None,
+                       params: Optional[Dict[str, Any]] = None, **kwargs) -> Any:
+        """GET 并返回 JSON，非 2xx 抛出 AccHttpError"""
+        response = await self.request('GET', url, headers=headers, params=params, **kwargs)
+        response.raise_for_status()
+        return response.data
+
+    # ------------------------------------------------------------------
+    # 同步请求（阻塞调用方：下载管理器、权限查询等）
+    # ------------------------------------------------------------------
+
+    def _get_sync_session(self):
+        if self._sync_session is None:
+            with self._lock:
+                if self._sync_session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=8, pool_maxsize=self.limit_per_host)
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    self._sync_session = session
+        return self._sync_session
+
+    def request_sync(self, method: str, url: str, *, headers: Optional[Dict[str, str]] = None,
+                     params: Optional[Dict[str, Any]] = None, json: Any = None, data: Any = None,
+                     family: Optional[str] = None, timeout: Any = None, stream: bool = False,
+                     max_retries: Optional[int] = None):
+        """
+        同步版本的 request，返回 requests.Response
+
+        与异步请求共享限流分组和指标，适用于不在事件循环中的调用方。
+        """
+        if url.startswith('/'):
+            url = ACC_API_BASE + url
+        family = family or api_family(url)
+        bucket = self.bucket(family)
+        retries = self.max_retries if max_retries is None else max_retries
+        key = endpoint_key(method, url)
+        session = self._get_sync_session()
+
+        start = time.monotonic()
+        throttled = 0
+        attempt = 0
+        while True:
+            wait = bucket.reserve()
+            if wait > 0:
+                time.sleep(wait)
+
+            try:
+                response = session.request(method, url, headers=headers, params=params, json=json,
+                                           data=data, timeout=timeout or self.request_timeout, stream=stream)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if attempt >= retries:
+                    self._record(key, time.monotonic() - start, attempt + 1, throttled, True)
+                    raise
+                delay = self._backoff(attempt, None)
+                logger.warning(f"ACC API request error ({key}): {e}, retrying in {delay:.1f}s")
+                attempt += 1
+                time.sleep(delay)
+                continue
+
+            status = response.status_code
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            if status in RETRY_STATUSES and attempt < retries:
+                response.close()
+                if status == 429:
+                    throttled += 1
+                    delay = self._on_throttled(family, retry_after, attempt)
+                else:
+                    delay = self._backoff(attempt, retry_after)
+                    logger.warning(f"ACC API {status} ({key}), retrying in {delay:.1f}s")
+                attempt += 1
+                time.sleep(delay)
+                continue
+
+            if status == 429:
+                throttled += 1
+                self._on_throttled(family, retry_after, attempt)
+            elif status < 500:
+                bucket.on_success()
+
+            self._record(key, time.monotonic() - start, attempt + 1, throttled, not 200 <= status < 300)
+            return response
+
+
+_acc_client: Optional[AccHttpClient] = None
+_acc_client_lock = threading.Lock()
+
+
+def get_acc_client() -> AccHttpClient:
+    """获取进程内共享的 ACC HTTP 客户端"""
+    global _acc_client
+
+    if _acc_client is None:
+        with _acc_client_lock:
+            if _acc_client is None:
+                _acc_client = AccHttpClient(
+                    max_retries=int(os.getenv('ACC_HTTP_MAX_RETRIES', 5)),
+                    request_timeout=float(os.getenv('ACC_HTTP_TIMEOUT', 60))
+                )
+    return _acc_client
@@ -18,6 +18,7 @@ import os
 # 添加项目根目录到路径
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 from database_sql.neon_config import NeonConfig
+from database_sql.pg_pool import get_pooled_connection, REQUEST_STATEMENT_TIMEOUT_MS
 
 # 创建Blueprint - 使用唯一的名称避免与原有account_bp冲突
 account_bp = Blueprint('account_cde', __name__)
@@ -32,8 +33,8 @@ class AccountManager:
         self.db_params = self.neon_config.get_db_params()
 
     def get_connection(self):
-        """获取数据库连接 - Get database connection"""
-        return psycopg2.connect(**self.db_params)
+        """获取数据库连接（共享连接池，close() 归还） - Get pooled database connection"""
+        return get_pooled_connection(self.db_params, REQUEST_STATEMENT_TIMEOUT_MS)
 
     def _parse_json_fields(self, record: Dict[str, Any], json_fields: List[str]) -> Dict[str, Any]:
         """
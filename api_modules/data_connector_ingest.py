@@ -0,0 +1,441 @@
+# -*- coding: utf-8 -*-
+"""
+Data Connector CSV 批量导入引擎
+================================
+按 autodesk_data_extract/schemas 中的表结构，把 Data Connector 导出的全部 CSV 导入 PostgreSQL。
+
+用法:
+    python api_modules/data_connector_ingest.py [--folder 导出目录] [--parallel 4] [--tables issues_issues ...]
+
+流程（每张表一个事务、一个连接池连接）:
+    1. 建临时暂存表（全部 text 列，ON COMMIT DROP）
+    2. COPY ... FROM STDIN 直接把文件流式送入暂存表，内存占用与文件大小无关
+    3. 在数据库内按 schema 类型转换，替换目标表中本次导出涉及项目的数据
+    4. 提交；任何一步失败整表回滚，目标表保持原状
+
+表之间按外键列（如 issue_type_id、workflow_transmittal_id）推断依赖，父表先于子表导入，
+同一层内互不依赖的表并行导入。报告每张表的行数、耗时和 rows/sec。
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import logging
+import argparse
+from pathlib import Path
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# 添加项目根目录到路径
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EXTRACT_FOLDER = PROJECT_ROOT / 'autodesk_data_extract'
+DEFAULT_TARGET_SCHEMA = os.getenv('DATA_CONNECTOR_SCHEMA', 'acc_data_schema')
+DEFAULT_PARALLEL_TABLES = int(os.getenv('DATA_CONNECTOR_PARALLEL_TABLES', 4))
+
+# schemas/*.json 中的 data_type -> PostgreSQL 类型（与 schema_create_postgres.sql 一致），其余为 varchar
+PG_TYPES = {
+    'string: UUID': 'uuid',
+    'number': 'numeric',
+    'boolean': 'boolean',
+    'timestamp: SQL': 'timestamp without time zone',
+    'date: string': 'date',
+}
+TEXT_TYPE = 'varchar'
+
+PROJECT_COLUMN = 'bim360_project_id'
+
+
+@dataclass
+class TableSpec:
+    """一个 CSV 文件对应的目标表"""
+    name: str
+    domain: str
+    csv_path: Path
+    columns: List[Tuple[str, str]]
+    csv_columns: List[str]
+    provides: List[str] = field(default_factory=list)
+    depends_on: List[str] = field(default_factory=list)
+
+    @property
+    def load_columns(self) -> List[Tuple[str, str]]:
+        """CSV 和 schema 都有的列（按 schema 顺序）"""
+        present = set(self.csv_columns)
+        return [(name, pg_type) for name, pg_type in self.columns if name in present]
+
+    @property
+    def ignored_columns(self) -> List[str]:
+        known = {name for name, _ in self.columns}
+        return [name for name in self.csv_columns if name not in known]
+
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def _singular(word: str) -> str:
+    if word.endswith('ies'):
+        return word[:-3] + 'y'
+    if word.endswith('s') and not word.endswith('ss'):
+        return word[:-1]
+    return word
+
+
+def load_schema(schema_dir: Path) -> Dict[str, Dict[str, List[Tuple[str, str]]]]:
+    """
+    读取导出附带的表结构
+
+    Returns:
+        {domain: {table: [(column, pg_type), ...]}}，列按 ordinal_position 排序
+    """
+    combined = schema_dir / 'schema.json'
+    if combined.exists():
+        with open(combined, encoding='utf-8') as f:
+            raw = json.load(f)
+    else:
+        raw = {}
+        for path in sorted(schema_dir.glob('*.json')):
+            with open(path, encoding='utf-8') as f:
+                raw[path.stem] = json.load(f)
+
+    schema = {}
+    for domain, tables in raw.items():
+        schema[domain] = {}
+        for table, columns in tables.items():
+            ordered = sorted(columns.items(), key=lambda item: item[1].get('ordinal_position', 0))
+            schema[domain][table] = [(name, PG_TYPES.get(meta.get('data_type'), TEXT_TYPE))
+                                     for name, meta in ordered]
+    return schema
+
+
+def read_csv_header(csv_path: Path) -> List[str]:
+    """读取 CSV 表头（导出文件带 UTF-8 BOM）"""
+    with open(csv_path, encoding='utf-8-sig', newline='') as f:
+        return next(csv.reader(f), [])
+
+
+def discover_tables(folder: Path, schema: Dict[str, Dict[str, List[Tuple[str, str]]]]
+                    ) -> Tuple[List[TableSpec], List[str]]:
+    """
+    把导出目录中的 CSV 对应到 schema 中的表（文件名为 <domain>_<table>.csv）
+
+    Returns:
+        (表列表, 没有 schema 而跳过的文件名)
+    """
+    specs, skipped = [], []
+    for csv_path in sorted(folder.glob('*.csv')):
+        stem = csv_path.stem
+        match = None
+        # 最长的 domain 前缀优先（如 activities 与 activities_xxx）
+        for domain in sorted(schema, key=len, reverse=True):
+            table = stem[len(domain) + 1:]
+            if stem.startswith(domain + '_') and table in schema[domain]:
+                match = (domain, table)
+                break
+        if match is None:
+            skipped.append(csv_path.name)
+            continue
+
+        domain, table = match
+        specs.append(TableSpec(name=stem, domain=domain, csv_path=csv_path,
+                               columns=schema[domain][table], csv_columns=read_csv_header(csv_path)))
+
+    _infer_dependencies(specs)
+    return specs, skipped
+
+
+def _infer_dependencies(specs: List[TableSpec]):
+    """
+    按列名推断同一 domain 内的父子关系
+
+    表 issue_types 有 issue_type_id（或 id/uid）列 -> 提供 issue_type_id；
+    同 domain 中其他表出现该列即依赖它。
+    """
+    for spec in specs:
+        table = spec.name[len(spec.domain) + 1:]
+        base = _singular(table)
+        columns = set(spec.csv_columns)
+        spec.provides = [f"{base}_{suffix}" for suffix in ('id', 'uid')
+                         if suffix in columns or f"{base}_{suffix}" in columns]
+
+    for spec in specs:
+        columns = set(spec.csv_columns)
+        spec.depends_on = sorted(
+            parent.name for parent in specs
+            if parent is not spec and parent.domain == spec.domain
+            and columns.intersection(parent.provides) - set(spec.provides)
+        )
+
+
+def plan_levels(specs: List[TableSpec]) -> List[List[TableSpec]]:
+    """
+    按依赖分层：每层只依赖前面的层，层内可并行
+
+    循环依赖的表放在最后一层一起导入。
+    """
+    remaining = {spec.name: spec for spec in specs}
+    done = set()
+    levels = []
+    while remaining:
+        ready = [spec for spec in remaining.values() if set(spec.depends_on) <= done]
+        if not ready:
+            logger.warning(f"Circular dependencies among: {sorted(remaining)}")
+            ready = list(remaining.values())
+        ready.sort(key=lambda spec: spec.name)
+        levels.append(ready)
+        for spec in ready:
+            done.add(spec.name)
+            del remaining[spec.name]
+    return levels
+
+
+class DataConnectorIngest:
+    """Data Connector 导出目录 -> PostgreSQL 的批量导入"""
+
+    def __init__(self, folder: Path = None, target_schema: str = DEFAULT_TARGET_SCHEMA,
+                 parallel: int = DEFAULT_PARALLEL_TABLES,
+                 connection_factory: Optional[Callable[[], Any]] = None):
+        """
+        Args:
+            folder: 导出目录（包含 *.csv 和 schemas/）
+            target_schema: 目标表所在的 PostgreSQL schema
+            parallel: 同一层内同时导入的表数（每张表占用一个连接池连接）
+            connection_factory: 返回 psycopg2 连接的函数，默认使用共享连接池
+        """
+        self.folder = Path(folder or DEFAULT_EXTRACT_FOLDER)
+        self.target_schema = target_schema
+        self.parallel = max(1, parallel)
+        self._connection_factory = connection_factory
+
+    def _connect(self):
+        if self._connection_factory is None:
+            from database_sql.pg_pool import get_pooled_connection
+            from database_sql.neon_config import NeonConfig
+            db_params = NeonConfig().get_db_params()
+            self._connection_factory = lambda: get_pooled_connection(db_params)
+        return self._connection_factory()
+
+    def _target(self, spec: TableSpec) -> str:
+        return f"{_quote(self.target_schema)}.{_quote(spec.name)}"
+
+    # ------------------------------------------------------------------
+    # SQL
+    # ------------------------------------------------------------------
+
+    def build_ddl(self, spec: TableSpec) -> List[str]:
+        """目标表（不存在时按 schema 创建）及项目索引"""
+        columns = ',\n    '.join(f"{_quote(name)} {pg_type}" for name, pg_type in spec.columns)
+        statements = [f"CREATE TABLE IF NOT EXISTS {self._target(spec)} (\n    {columns}\n)"]
+        if PROJECT_COLUMN in dict(spec.columns):
+            statements.append(
+                f"CREATE INDEX IF NOT EXISTS {_quote('idx_' + spec.name + '_project')} "
+                f"ON {self._target(spec)} ({_quote(PROJECT_COLUMN)})"
+            )
+        return statements
+
+    def build_load_statements(self, spec: TableSpec, stage: str) -> Dict[str, str]:
+        """
+        单表导入语句
+
+        Returns:
+            {'stage', 'copy', 'delete', 'insert'}
+        """
+        stage_columns = ', '.join(f"{_quote(name)} text" for name in spec.csv_columns)
+        copy_columns = ', '.join(_quote(name) for name in spec.csv_columns)
+        load_columns = spec.load_columns
+        target = self._target(spec)
+
+        def cast(name: str, pg_type: str) -> str:
+            if pg_type == TEXT_TYPE:
+                return _quote(name)
+            return f"NULLIF({_quote(name)}, '')::{pg_type}"
+
+        if PROJECT_COLUMN in spec.csv_columns and PROJECT_COLUMN in dict(spec.columns):
+            # 只替换本次导出涉及的项目，其他项目的数据保留
+            delete = (f"DELETE FROM {target} WHERE {_quote(PROJECT_COLUMN)} IN "
+                      f"(SELECT DISTINCT {cast(PROJECT_COLUMN, dict(spec.columns)[PROJECT_COLUMN])} FROM {stage})")
+        else:
+            delete = f"DELETE FROM {target}"
+
+        return {
+            'stage': f"CREATE TEMP TABLE {stage} ({stage_columns}) ON COMMIT DROP",
+            'copy': f"COPY {stage} ({copy_columns}) FROM STDIN WITH (FORMAT csv, HEADER true)",
+            'delete': delete,
+            'insert': (
+                f"INSERT INTO {target} ({', '.join(_quote(name) for name, _ in load_columns)}) "
+                f"SELECT {', '.join(cast(name, pg_type) for name, pg_type in load_columns)} FROM {stage}"
+            ),
+        }
+
+    # ------------------------------------------------------------------
+    # 导入
+    # ------------------------------------------------------------------
+
+    def plan(self, tables: Optional[List[str]] = None) -> Dict[str, Any]:
+        """发现 CSV、匹配 schema 并分层"""
+        schema = load_schema(self.folder / 'schemas')
+        specs, skipped = discover_tables(self.folder, schema)
+        if tables:
+            wanted = set(tables)
+            skipped.extend(spec.csv_path.name for spec in specs if spec.name not in wanted)
+            specs = [spec for spec in specs if spec.name in wanted]
+            # 只导入部分表时，不等待未选中的父表
+            for spec in specs:
+                spec.depends_on = [name for name in spec.depends_on if name in wanted]
+        return {'levels': plan_levels(specs), 'skipped': skipped}
+
+    def prepare(self, specs: List[TableSpec]):
+        """串行创建 schema 和目标表，避免并行事务中 IF NOT EXISTS 的竞争"""
+        conn = self._connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {_quote(self.target_schema)}")
+            for spec in specs:
+                for statement in self.build_ddl(spec):
+                    cursor.execute(statement)
+            conn.commit()
+            cursor.close()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def ingest_table(self, spec: TableSpec) -> Dict[str, Any]:
+        """在一个事务中导入一张表"""
+        result = {'table': spec.name, 'status': 'success', 'rows': 0, 'staged_rows': 0, 'replaced_rows': 0,
+                  'bytes': spec.csv_path.stat().st_size, 'seconds': 0.0, 'rows_per_sec': 0.0,
+                  'ignored_columns': spec.ignored_columns, 'error': None}
+        start = time.perf_counter()
+
+        # 连接失败也记为该表的错误结果，ingest 据此跳过依赖它的子表
+        conn = None
+        try:
+            statements = self.build_load_statements(spec, _quote(f"stage_{spec.name}"))
+            conn = self._connect()
+            cursor = conn.cursor()
+            # 大文件的 COPY/INSERT 不受连接池默认 statement_timeout 限制
+            cursor.execute("SET LOCAL statement_timeout = 0")
+            cursor.execute(statements['stage'])
+            with open(spec.csv_path, encoding='utf-8-sig', newline='') as f:
+                cursor.copy_expert(statements['copy'], f)
+            result['staged_rows'] = max(cursor.rowcount, 0)
+            cursor.execute(statements['delete'])
+            result['replaced_rows'] = max(cursor.rowcount, 0)
+            cursor.execute(statements['insert'])
+            result['rows'] = max(cursor.rowcount, 0)
+            conn.commit()
+            cursor.close()
+        except Exception as e:
+            if conn is not None:
+                conn.rollback()
+            result['status'] = 'error'
+            result['error'] = str(e)
+            logger.error(f"Data Connector ingest failed for {spec.name}: {e}")
+        finally:
+            if conn is not None:
+                conn.close()
+
+        seconds = time.perf_counter() - start
+        result['seconds'] = round(seconds, 3)
+        result['rows_per_sec'] = round(result['rows'] / seconds, 1) if seconds > 0 else 0.0
+        return result
+
+    def ingest(self, tables: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        导入导出目录中的全部（或指定）表
+
+        Returns:
+            {'success', 'tables': {name: 表结果}, 'levels', 'skipped_files', 'total_rows', 'seconds', 'rows_per_sec'}
+        """
+        start = time.perf_counter()
+        plan = self.plan(tables)
+        levels = plan['levels']
+        report = {'success': True, 'tables': {}, 'levels': [[spec.name for spec in level] for level in levels],
+                  'skipped_files': plan['skipped'], 'total_rows': 0, 'error': None}
+
+        try:
+            self.prepare([spec for level in levels for spec in level])
+        except Exception as e:
+            report.update(success=False, error=f"Failed to prepare target tables: {e}")
+            return report
+
+        failed = set()
+        with ThreadPoolExecutor(max_workers=self.parallel, thread_name_prefix='dc-ingest') as executor:
+            for level in levels:
+                runnable = []
+                for spec in level:
+                    blocked = [name for name in spec.depends_on if name in failed]
+                    if blocked:
+                        # 父表导入失败时不导入子表，避免子表引用不存在的父记录
+                        failed.add(spec.name)
+                        report['tables'][spec.name] = {'table': spec.name, 'status': 'skipped', 'rows': 0,
+                                                       'error': f"Parent tables failed: {', '.join(blocked)}"}
+                    else:
+                        runnable.append(spec)
+
+                for result in executor.map(self.ingest_table, runnable):
+                    report['tables'][result['table']] = result
+                    if result['status'] != 'success':
+                        failed.add(result['table'])
+
+        seconds = time.perf_counter() - start
+        report['total_rows'] = sum(result['rows'] for result in report['tables'].values())
+        report['seconds'] = round(seconds, 3)
+        report['rows_per_sec'] = round(report['total_rows'] / seconds, 1) if seconds > 0 else 0.0
+        report['success'] = not failed
+        if failed:
+            report['error'] = f"{len(failed)} tables failed: {', '.join(sorted(failed))}"
+        return report
+
+
+def print_report(report: Dict[str, Any]):
+    """打印导入报告"""
+    print("=" * 80)
+    print("Data Connector Ingest Report")
+    print("=" * 80)
+    for index, level in enumerate(report['levels']):
+        print(f"\n[Level {index}]")
+        for name in level:
+            result = report['tables'].get(name, {})
+            status = result.get('status', 'pending')
+            tag = 'OK' if status == 'success' else status.upper()
+            line = (f"  [{tag}] {name:<50} {result.get('rows', 0):>10,} rows  "
+                    f"{result.get('seconds', 0):>8.2f}s  {result.get('rows_per_sec', 0):>12,.1f} rows/s")
+            print(line)
+            if result.get('error'):
+                print(f"         {result['error']}")
+            if result.get('ignored_columns'):
+                print(f"         ignored columns: {', '.join(result['ignored_columns'])}")
+
+    if report['skipped_files']:
+        print(f"\n[SKIP] {', '.join(report['skipped_files'])}")
+    print(f"\nTotal: {report['total_rows']:,} rows in {report.get('seconds', 0):.2f}s "
+          f"({report.get('rows_per_sec', 0):,.1f} rows/s)")
+    if report.get('error'):
+        print(f"[ERROR] {report['error']}")
+    print("=" * 80)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load Data Connector CSV extracts into PostgreSQL')
+    parser.add_argument('--folder', type=Path, default=DEFAULT_EXTRACT_FOLDER, help='Extract folder')
+    parser.add_argument('--schema', default=DEFAULT_TARGET_SCHEMA, help='Target PostgreSQL schema')
+    parser.add_argument('--parallel', type=int, default=DEFAULT_PARALLEL_TABLES, help='Tables loaded in parallel')
+    parser.add_argument('--tables', nargs='*', help='Only load these tables (e.g. issues_issues)')
+    args = parser.parse_args()
+
+    ingest = DataConnectorIngest(args.folder, target_schema=args.schema, parallel=args.parallel)
+    report = ingest.ingest(args.tables)
+    print_report(report)
+    sys.exit(0 if report['success'] else 1)
+
+
+if __name__ == "__main__":
+    main()
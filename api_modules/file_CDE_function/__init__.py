@@ -7,7 +7,8 @@
 - forge_viewer_api: Forge Viewer URL 生成 API
 """
 
-from .file_tree_builder import FileTreeBuilder, get_file_tree, invalidate_file_tree_cache
+from .file_tree_builder import (FileTreeBuilder, get_file_tree, invalidate_file_tree_cache, apply_file_tree_delta,
+                                get_file_tree_children)
 from .file_tree_api import file_tree_bp, create_app
 from .forge_viewer_api import forge_viewer_bp
 
@@ -15,6 +16,8 @@ __all__ = [
     'FileTreeBuilder',
     'get_file_tree',
     'invalidate_file_tree_cache',
+    'apply_file_tree_delta',
+    'get_file_tree_children',
     'file_tree_bp',
     'forge_viewer_bp',
     'create_app'
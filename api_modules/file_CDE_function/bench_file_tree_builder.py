@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文件树构建器 - 性能基准
+
+使用合成的文件夹/文件数据（不访问数据库）测量 build_tree_from_paths 的
+构建耗时和峰值内存，用于在上线前发现性能回退。
+
+用法:
+    python bench_file_tree_builder.py                       # 默认 10k 文件夹 / 200k 文件
+    python bench_file_tree_builder.py --folders 2000 --files 20000
+    python bench_file_tree_builder.py --max-seconds 5 --max-peak-mb 1500   # 超出阈值时退出码为1
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Dict, List, Tuple
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from api_modules.file_CDE_function.file_tree_builder import FileTreeBuilder
+
+
+def generate_synthetic_tree(num_folders: int, num_files: int, max_children: int = 8,
+                            with_parent_ids: bool = True, seed: int = 42) -> Tuple[List[Dict], List[Dict]]:
+    """
+    生成合成的文件夹和文件数据，字段与 query_folders / query_files 一致
+
+    Args:
+        num_folders: 文件夹数量
+        num_files: 文件数量
+        max_children: 每个文件夹最多的子文件夹数
+        with_parent_ids: 文件是否带 parent_folder_id（False 时只能走路径索引）
+        seed: 随机种子
+
+    Returns:
+        (folders, files)
+    """
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+
+    folders = []
+    child_counts = []
+    for i in range(num_folders):
+        if i == 0:
+            parent_index = None
+            path = 'Project Files'
+            depth = 0
+        else:
+            # 在已有文件夹中随机挑选未满的父文件夹
+            parent_index = rng.randrange(i)
+            while child_counts[parent_index] >= max_children:
+                parent_index = (parent_index + 1) % i
+            child_counts[parent_index] += 1
+            path = f"{folders[parent_index]['path']}/Folder {i}"
+            depth = folders[parent_index]['depth'] + 1
+
+        child_counts.append(0)
+        folders.append({
+            'id': f"urn:adsk.wipprod:fs.folder:co.{i}",
+            'project_id': 'b.synthetic',
+            'name': f"Folder {i}",
+            'display_name': f"Folder {i}",
+            'parent_id': folders[parent_index]['id'] if parent_index is not None else None,
+            'path': path,
+            'depth': depth,
+            'create_time': now,
+            'create_user_name': 'bench',
+            'last_modified_time': now,
+            'last_modified_user_name': 'bench',
+            'hidden': False
+        })
+
+    files = []
+    for i in range(num_files):
+        folder = folders[rng.randrange(num_folders)]
+        files.append({
+            'id': f"urn:adsk.wipprod:dm.lineage:{i}",
+            'name': f"Drawing-{i}.pdf",
+            'parent_folder_id': folder['id'] if with_parent_ids else None,
+            'folder_path': folder['path'],
+            'file_type': 'pdf',
+            'create_time': now,
+            'create_user_name': 'bench',
+            'last_modified_user_name': 'bench',
+            'last_modified_time': now,
+            'version_number': 1,
+            'size': 1024,
+            'urn': f"urn:adsk.wipprod:fs.file:vf.{i}?version=1",
+            'reviewState': 'NotInReview'
+        })
+
+    return folders, files
+
+
+def run_benchmark(num_folders: int, num_files: int, with_parent_ids: bool = True) -> Dict:
+    """运行一次基准测试，返回耗时与峰值内存"""
+    folders, files = generate_synthetic_tree(num_folders, num_files, with_parent_ids=with_parent_ids)
+    builder = FileTreeBuilder(db_params={})
+
+    # 计时与内存追踪分开运行：tracemalloc 会显著拖慢分配密集的代码
+    start = time.perf_counter()
+    tree = builder.build_tree_from_paths(folders, files)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    builder.build_tree_from_paths(folders, files)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert tree['metadata']['total_folders'] == num_folders
+    assert len(tree['root']) == 1, "合成数据只应有一个根节点（不应有孤立文件）"
+
+    return {
+        'folders': num_folders,
+        'files': num_files,
+        'parent_id_fast_path': with_parent_ids,
+        'build_seconds': round(elapsed, 3),
+        'peak_memory_mb': round(peak / (1024 * 1024), 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='文件树构建性能基准')
+    parser.add_argument('--folders', type=int, default=10000)
+    parser.add_argument('--files', type=int, default=200000)
+    parser.add_argument('--max-seconds', type=float, default=None, help='构建耗时阈值（秒）')
+    parser.add_argument('--max-peak-mb', type=float, default=None, help='峰值内存阈值（MB）')
+    args = parser.parse_args()
+
+    results = [
+        run_benchmark(args.folders, args.files, with_parent_ids=True),
+        run_benchmark(args.folders, args.files, with_parent_ids=False),
+    ]
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+
+    failed = False
+    for result in results:
+        if args.max_seconds is not None and result['build_seconds'] > args.max_seconds:
+            print(f"❌ 构建耗时超出阈值: {result['build_seconds']}s > {args.max_seconds}s")
+            failed = True
+        if args.max_peak_mb is not None and result['peak_memory_mb'] > args.max_peak_mb:
+            print(f"❌ 峰值内存超出阈值: {result['peak_memory_mb']}MB > {args.max_peak_mb}MB")
+            failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,342 @@
+# -*- coding: utf-8 -*-
+"""
+本地內容尋址文件緩存（ACC 文檔下載）
+
+版本 URN / storage URN 對應的文件內容不會改變，下載一次後保存在本地磁盤：
+- blobs/<sha256前兩位>/<sha256>  按內容哈希存放，相同內容只存一份
+- index.sqlite3                   鍵（version/storage URN）-> 內容哈希，以及 LRU 訪問時間
+
+寫入先落到 tmp/ 再 os.replace，進程崩潰不會留下半個文件；
+超過容量上限時按最近訪問時間淘汰。多個 worker 進程可共享同一目錄。
+"""
+
+import os
+import time
+import uuid
+import sqlite3
+import hashlib
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+
+class BlobCacheWriter:
+    """單個文件的寫入句柄：邊寫邊計算 sha256，commit 時原子發布"""
+
+    def __init__(self, cache: 'BlobCache', keys: Iterable[str], name: Optional[str] = None):
+        self.cache = cache
+        self.keys = [key for key in keys if key]
+        self.name = name
+        self.tmp_path = os.path.join(cache.tmp_dir, f"{uuid.uuid4().hex}.part")
+        self._file = open(self.tmp_path, 'wb')
+        self._hash = hashlib.sha256()
+        self.size = 0
+        self.closed = False
+
+    def write(self, data: bytes) -> int:
+        self._file.write(data)
+        self._hash.update(data)
+        self.size += len(data)
+        return len(data)
+
+    def commit(self) -> Optional[Dict[str, Any]]:
+        """落盤並登記索引，返回緩存條目"""
+        if self.closed:
+            return None
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        self.closed = True
+        return self.cache._publish(self.tmp_path, self._hash.hexdigest(), self.size, self.keys, self.name)
+
+    def abort(self):
+        """放棄寫入（下載中斷或上游出錯）"""
+        if self.closed:
+            return
+        self._file.close()
+        self.closed = True
+        try:
+            os.remove(self.tmp_path)
+        except OSError:
+            pass
+
+
+class BlobCache:
+    """
+    帶容量上限的 LRU 文件緩存
+
+    用法:
+        entry = blob_cache.lookup(version_urn, storage_urn)
+        if entry:
+            send_file(entry['path'], conditional=True)   # sendfile + Range
+        else:
+            with blob_cache.writer([version_urn, storage_urn]) as writer:
+                for chunk in upstream.iter_content(...):
+                    writer.write(chunk)
+    """
+
+    def __init__(self, root_dir: str, max_bytes: int = 10 * 1024 ** 3):
+        self.root_dir = root_dir
+        self.max_bytes = max_bytes
+        self.blob_dir = os.path.join(root_dir, 'blobs')
+        self.tmp_dir = os.path.join(root_dir, 'tmp')
+        self.index_path = os.path.join(root_dir, 'index.sqlite3')
+
+        os.makedirs(self.blob_dir, exist_ok=True)
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        self._remove_stale_parts()
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'bytes_saved': 0,
+            'bytes_stored': 0,
+            'evictions': 0,
+            'bytes_evicted': 0
+        }
+
+        with self._connect() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS blobs (
+                    digest TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_blobs_last_access ON blobs (last_access);
+                CREATE TABLE IF NOT EXISTS aliases (
+                    key TEXT PRIMARY KEY,
+                    digest TEXT NOT NULL REFERENCES blobs(digest) ON DELETE CASCADE,
+                    name TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_aliases_digest ON aliases (digest);
+            """)
+
+    # ------------------------------------------------------------------
+    # 索引
+    # ------------------------------------------------------------------
+
+    def _connect(self) -> sqlite3.Connection:
+        """每個線程一個連接；WAL 允許多進程併發讀寫"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.index_path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA foreign_keys=ON')
+            self._local.conn = conn
+        return conn
+
+    def _remove_stale_parts(self, max_age_seconds: int = 24 * 3600):
+        """清理上次運行遺留的未完成寫入"""
+        cutoff = time.time() - max_age_seconds
+        for entry in os.scandir(self.tmp_dir):
+            try:
+                if entry.name.endswith('.part') and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except OSError:
+                pass
+
+    def blob_path(self, digest: str) -> str:
+        return os.path.join(self.blob_dir, digest[:2], digest)
+
+    def _bump(self, name: str, value: int = 1):
+        with self._lock:
+            self.stats[name] += value
+
+    # ------------------------------------------------------------------
+    # 讀取
+    # ------------------------------------------------------------------
+
+    def lookup(self, *keys: str, record: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        按任意一個鍵查找緩存
+
+        Args:
+            keys: version URN / storage URN 等
+            record: 是否計入命中/未命中統計
+
+        Returns:
+            {'path', 'digest', 'size', 'name'}，未命中返回 None
+        """
+        keys = [key for key in keys if key]
+        if not keys:
+            return None
+
+        conn = self._connect()
+        placeholders = ','.join('?' * len(keys))
+        row = conn.execute(
+            f"SELECT b.digest, b.size, a.name FROM aliases a JOIN blobs b ON a.digest = b.digest "
+            f"WHERE a.key IN ({placeholders}) ORDER BY a.name IS NULL LIMIT 1",
+            keys
+        ).fetchone()
+
+        if row:
+            digest, size, name = row
+            path = self.blob_path(digest)
+            if os.path.exists(path):
+                conn.execute("UPDATE blobs SET last_access = ? WHERE digest = ?", (time.time(), digest))
+                # 補登記新的鍵（例如先按 storage URN 命中，再記下 version URN）
+                conn.executemany("INSERT OR IGNORE INTO aliases (key, digest, name) VALUES (?, ?, ?)",
+                                 [(key, digest, name) for key in keys])
+                if record:
+                    self._bump('hits')
+                    self._bump('bytes_saved', size)
+                return {'path': path, 'digest': digest, 'size': size, 'name': name}
+
+            # 文件被外部刪除：清理索引
+            conn.execute("DELETE FROM blobs WHERE digest = ?", (digest,))
+
+        if record:
+            self._bump('misses')
+        return None
+
+    def record_hit(self, size: int):
+        """調用方繞過 lookup 直接使用緩存時補記統計"""
+        self._bump('hits')
+        self._bump('bytes_saved', size)
+
+    # ------------------------------------------------------------------
+    # 寫入
+    # ------------------------------------------------------------------
+
+    def open_writer(self, keys: Iterable[str], name: Optional[str] = None) -> BlobCacheWriter:
+        """打開寫入句柄，調用方負責 commit() 或 abort()；name 為文件顯示名"""
+        return BlobCacheWriter(self, keys, name)
+
+    @contextmanager
+    def writer(self, keys: Iterable[str], name: Optional[str] = None) -> Iterator[BlobCacheWriter]:
+        """寫入上下文：正常退出時 commit，異常時 abort"""
+        handle = self.open_writer(keys, name)
+        try:
+            yield handle
+        except BaseException:
+            handle.abort()
+            raise
+        handle.commit()
+
+    def _publish(self, tmp_path: str, digest: str, size: int, keys: Iterable[str],
+                 name: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """把臨時文件發布為 blob 並登記鍵；單個文件超過容量上限時不緩存"""
+        if size > self.max_bytes:
+            os.remove(tmp_path)
+            return None
+
+        path = self.blob_path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        if os.path.exists(path):
+            # 內容相同的文件已存在（不同版本 URN 指向同一內容）
+            os.remove(tmp_path)
+        else:
+            os.replace(tmp_path, path)
+            self._bump('bytes_stored', size)
+
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT INTO blobs (digest, size, created_at, last_access) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(digest) DO UPDATE SET last_access = excluded.last_access",
+                (digest, size, now, now)
+            )
+            conn.executemany(
+                "INSERT INTO aliases (key, digest, name) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET digest = excluded.digest, "
+                "name = COALESCE(excluded.name, aliases.name)",
+                [(key, digest, name) for key in keys]
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+        self.evict()
+        return {'path': path, 'digest': digest, 'size': size, 'name': name}
+
+    # ------------------------------------------------------------------
+    # 淘汰
+    # ------------------------------------------------------------------
+
+    def total_bytes(self) -> int:
+        row = self._connect().execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()
+        return row[0]
+
+    def evict(self, max_bytes: int = None) -> int:
+        """按最近訪問時間淘汰，直到總大小不超過上限；返回淘汰的文件數"""
+        limit = self.max_bytes if max_bytes is None else max_bytes
+        total = self.total_bytes()
+        if total <= limit:
+            return 0
+
+        conn = self._connect()
+        evicted = 0
+        for digest, size in conn.execute("SELECT digest, size FROM blobs ORDER BY last_access ASC").fetchall():
+            if total <= limit:
+                break
+            conn.execute("DELETE FROM blobs WHERE digest = ?", (digest,))
+            try:
+                os.remove(self.blob_path(digest))
+            except OSError:
+                pass
+            total -= size
+            evicted += 1
+            self._bump('evictions')
+            self._bump('bytes_evicted', size)
+
+        if evicted:
+            print(f"[BlobCache] Evicted {evicted} blobs, {total} bytes remain")
+        return evicted
+
+    def get_stats(self) -> Dict[str, Any]:
+        """命中率、節省的流量與當前佔用"""
+        with self._lock:
+            stats = dict(self.stats)
+        lookups = stats['hits'] + stats['misses']
+        row = self._connect().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs").fetchone()
+        return {
+            **stats,
+            'hit_rate': round(stats['hits'] / lookups, 4) if lookups else 0.0,
+            'blob_count': row[0],
+            'total_bytes': row[1],
+            'max_bytes': self.max_bytes,
+            'root_dir': self.root_dir
+        }
+
+
+_blob_cache: Optional[BlobCache] = None
+_blob_cache_lock = threading.Lock()
+
+
+def get_blob_cache() -> Optional[BlobCache]:
+    """
+    獲取進程內共享的緩存實例（由 config 中的 BLOB_CACHE_* 配置），禁用時返回 None
+    """
+    global _blob_cache
+
+    if _blob_cache is None:
+        with _blob_cache_lock:
+            if _blob_cache is None:
+                try:
+                    import config
+                    enabled = getattr(config, 'BLOB_CACHE_ENABLED', True)
+                    root_dir = getattr(config, 'BLOB_CACHE_DIR', None)
+                    max_bytes = getattr(config, 'BLOB_CACHE_MAX_BYTES', 10 * 1024 ** 3)
+                except ImportError:
+                    enabled, root_dir, max_bytes = True, None, 10 * 1024 ** 3
+
+                if not enabled:
+                    return None
+
+                root_dir = root_dir or os.path.join(tempfile.gettempdir(), 'acc_blob_cache')
+                try:
+                    _blob_cache = BlobCache(root_dir, max_bytes)
+                    print(f"[BlobCache] Using {root_dir} (max {max_bytes} bytes)")
+                except Exception as e:
+                    print(f"[BlobCache] Disabled, failed to initialise {root_dir}: {e}")
+                    return None
+
+    return _blob_cache
@@ -4,26 +4,39 @@ File Download API
 提供單文件下載的後端 API 接口
 
 API:
-POST /api/files/download - 下載單個文件
+POST /api/files/download - 下載單個文件（默認直接流式轉發 S3 響應，支持 Range 斷點續傳）
+GET  /api/files/download?urn=&project_id=&file_name= - 同上，便於瀏覽器直接下載與續傳
+GET  /api/files/download/cache-stats - 本地文件緩存統計（命中率、節省流量）
 """
 
 import sys
 import os
 import re
+import time
 import tempfile
+import threading
 import requests
 from functools import wraps
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Iterator, Optional
 
 # Windows 環境 UTF-8 編碼設置
 if sys.platform.startswith('win'):
     os.environ['PYTHONIOENCODING'] = 'utf-8'
 
-from flask import Blueprint, jsonify, request, send_file
+from flask import Blueprint, Response, jsonify, request, send_file
 
 # 導入認證工具
 import utils
 
+# 共享的 ACC HTTP 客戶端（分組限流、429/5xx 重試）
+from api_modules.acc_http_client import get_acc_client
+
+# 本地內容緩存：重複下載同一版本時不再訪問 S3
+try:
+    from .blob_cache import BlobCache, get_blob_cache
+except ImportError:
+    from blob_cache import BlobCache, get_blob_cache
+
 # 創建 Blueprint
 file_download_bp = Blueprint('file_download', __name__, url_prefix='/api/files')
 
@@ -60,8 +73,22 @@ def handle_exceptions(f):
 class FileDownloadManager:
     """文件下載管理器 - 封裝單文件下載邏輯"""
 
-    def __init__(self):
-        pass
+    # 流式轉發的讀取塊大小
+    STREAM_CHUNK_SIZE = 1024 * 1024
+    # 簽名 URL 有效期（分鐘，OSS 允許 1-60），緩存在到期前提前失效
+    SIGNED_URL_MINUTES = 30
+    SIGNED_URL_SAFETY_SECONDS = 60
+    # 透傳給客戶端的上游響應頭
+    PASSTHROUGH_HEADERS = ('Content-Length', 'Content-Range', 'Accept-Ranges', 'ETag', 'Last-Modified')
+
+    def __init__(self, blob_cache: Optional[BlobCache] = None):
+        # (project_id, lineage_urn) -> {'download_url', 'file_name', 'file_size', 'expires_at', ...}
+        self._url_cache: Dict[tuple, Dict[str, Any]] = {}
+        self._url_cache_lock = threading.Lock()
+        # 復用與 S3 之間的 keep-alive 連接
+        self._session = requests.Session()
+        # 本地文件緩存（配置禁用時為 None）
+        self.blob_cache = blob_cache if blob_cache is not None else get_blob_cache()
 
     def normalize_urn_to_lineage(self, urn: str) -> str:
         """
@@ -132,125 +159,331 @@ class FileDownloadManager:
 
         return safe_name
 
-    def download_file(self, urn: str, project_id: str, file_name: Optional[str] = None) -> Dict[str, Any]:
+    def _get_cached_resolution(self, cache_key: tuple) -> Optional[Dict[str, Any]]:
+        """讀取未過期的簽名 URL 解析結果"""
+        with self._url_cache_lock:
+            entry = self._url_cache.get(cache_key)
+            if entry and entry['expires_at'] > time.time():
+                return entry
+            self._url_cache.pop(cache_key, None)
+            return None
+
+    def invalidate_resolution(self, urn: str, project_id: str):
+        """丟棄緩存的簽名 URL（例如 S3 返回 403 時）"""
+        clean_project_id = project_id[2:] if project_id.startswith('b.') else project_id
+        with self._url_cache_lock:
+            self._url_cache.pop((clean_project_id, self.normalize_urn_to_lineage(urn)), None)
+
+    def resolve_download(self, urn: str, project_id: str) -> Dict[str, Any]:
         """
-        下載單個文件
+        解析 item -> storage URN -> S3 簽名下載 URL，結果在 URL 有效期內緩存
 
         Args:
             urn: 文件 URN（支持多種格式）
             project_id: 項目 ID（支持 b.xxx 格式）
-            file_name: 可選的文件名（用於下載時的文件名）
 
         Returns:
             {
                 'success': bool,
-                'file_path': str,       # 臨時文件路徑
-                'file_name': str,       # 文件名
-                'file_size': int,       # 文件大小（字節）
-                'error': str (optional) # 錯誤信息
+                'download_url': str,    # S3 簽名 URL
+                'file_name': str,       # item 的 displayName
+                'file_size': int,       # 對象大小（OSS 返回時）
+                'cached': bool,         # 是否命中緩存
+                'error': str (optional)
             }
         """
-        temp_file_path = None
+        # 1. 清理 project_id（移除 b. 前綴如果存在）
+        clean_project_id = project_id[2:] if project_id.startswith('b.') else project_id
 
-        try:
-            # 1. 清理 project_id（移除 b. 前綴如果存在）
-            clean_project_id = project_id[2:] if project_id.startswith('b.') else project_id
-
-            # 2. 獲取 access token
-            access_token = utils.get_access_token()
-            if not access_token:
-                return {
-                    'success': False,
-                    'error': 'Access token not found',
-                    'error_type': 'unauthorized'
-                }
-
-            # 3. Normalize URN to lineage format
-            full_lineage_urn = self.normalize_urn_to_lineage(urn)
-
-            print(f"[FileDownload] Original URN: {urn}")
-            print(f"[FileDownload] Normalized lineage URN: {full_lineage_urn}")
-
-            # 4. 使用 Data Management API 獲取 item 信息（包含 storage location）
-            item_url = f"https://developer.api.autodesk.com/data/v1/projects/b.{clean_project_id}/items/{full_lineage_urn}"
-            headers = {
-                "Authorization": f"Bearer {access_token}",
-                "Content-Type": "application/json"
+        # 2. Normalize URN to lineage format
+        full_lineage_urn = self.normalize_urn_to_lineage(urn)
+        cache_key = (clean_project_id, full_lineage_urn)
+
+        cached = self._get_cached_resolution(cache_key)
+        if cached:
+            return {'success': True, 'cached': True, **cached}
+
+        # 3. 獲取 access token
+        access_token = utils.get_access_token()
+        if not access_token:
+            return {
+                'success': False,
+                'error': 'Access token not found',
+                'error_type': 'unauthorized'
             }
 
-            item_response = requests.get(item_url, headers=headers, timeout=30)
+        print(f"[FileDownload] Original URN: {urn}")
+        print(f"[FileDownload] Normalized lineage URN: {full_lineage_urn}")
 
-            if item_response.status_code != 200:
-                raise Exception(f"Failed to get item info: {item_response.status_code} - {item_response.text}")
+        # 4. 使用 Data Management API 獲取 item 信息（包含 storage location）
+        item_url = f"https://developer.api.autodesk.com/data/v1/projects/b.{clean_project_id}/items/{full_lineage_urn}"
+        headers = {
+            "Authorization": f"Bearer {access_token}",
+            "Content-Type": "application/json"
+        }
 
-            item_data = item_response.json()
+        item_response = get_acc_client().request_sync('GET', item_url, headers=headers, timeout=30)
 
-            # 5. 從響應中提取 storage location
-            storage_data = None
-            if 'included' in item_data:
-                for included_item in item_data['included']:
-                    if included_item.get('type') == 'versions':
-                        storage_rel = included_item.get('relationships', {}).get('storage', {})
-                        storage_data = storage_rel.get('data', {})
-                        break
+        if item_response.status_code != 200:
+            raise Exception(f"Failed to get item info: {item_response.status_code} - {item_response.text}")
+
+        item_data = item_response.json()
+
+        # 5. 從響應中提取 storage location
+        storage_data = None
+        version_urn = None
+        if 'included' in item_data:
+            for included_item in item_data['included']:
+                if included_item.get('type') == 'versions':
+                    version_urn = included_item.get('id')
+                    storage_rel = included_item.get('relationships', {}).get('storage', {})
+                    storage_data = storage_rel.get('data', {})
+                    break
+
+        if not storage_data or not storage_data.get('id'):
+            raise Exception("Storage location not found in item response")
+
+        storage_id = storage_data['id']
+        print(f"[FileDownload] Storage ID: {storage_id}")
+
+        # 6. 解析 storage URN 以獲取 bucket 和 object key
+        # Format: urn:adsk.objects:os.object:BUCKET/OBJECT_KEY
+        if not storage_id.startswith('urn:adsk.objects:os.object:'):
+            raise Exception(f"Invalid storage URN format: {storage_id}")
 
-            if not storage_data or not storage_data.get('id'):
-                raise Exception("Storage location not found in item response")
+        storage_path = storage_id.replace('urn:adsk.objects:os.object:', '')
+        if '/' not in storage_path:
+            raise Exception(f"Invalid storage path format: {storage_path}")
 
-            storage_id = storage_data['id']
-            print(f"[FileDownload] Storage ID: {storage_id}")
+        bucket_key, object_key = storage_path.split('/', 1)
+        print(f"[FileDownload] Bucket: {bucket_key}, Object: {object_key}")
 
-            # 6. 解析 storage URN 以獲取 bucket 和 object key
-            # Format: urn:adsk.objects:os.object:BUCKET/OBJECT_KEY
-            if not storage_id.startswith('urn:adsk.objects:os.object:'):
-                raise Exception(f"Invalid storage URN format: {storage_id}")
+        # 7. 獲取 S3 簽名下載 URL（指定有效期，以便在有效期內復用）
+        s3_url = (f"https://developer.api.autodesk.com/oss/v2/buckets/{bucket_key}/objects/{object_key}"
+                  f"/signeds3download?minutesExpiration={self.SIGNED_URL_MINUTES}")
+        requested_at = time.time()
+        s3_response = get_acc_client().request_sync('GET', s3_url, headers=headers, timeout=30)
 
-            storage_path = storage_id.replace('urn:adsk.objects:os.object:', '')
-            if '/' not in storage_path:
-                raise Exception(f"Invalid storage path format: {storage_path}")
+        if s3_response.status_code != 200:
+            raise Exception(f"Failed to get S3 signed URL: {s3_response.status_code} - {s3_response.text}")
 
-            bucket_key, object_key = storage_path.split('/', 1)
-            print(f"[FileDownload] Bucket: {bucket_key}, Object: {object_key}")
+        s3_data = s3_response.json()
+        download_url = s3_data.get('url')
 
-            # 7. 獲取 S3 簽名下載 URL
-            s3_url = f"https://developer.api.autodesk.com/oss/v2/buckets/{bucket_key}/objects/{object_key}/signeds3download"
-            s3_response = requests.get(s3_url, headers=headers, timeout=30)
+        if not download_url:
+            raise Exception("No download URL in S3 response")
 
-            if s3_response.status_code != 200:
-                raise Exception(f"Failed to get S3 signed URL: {s3_response.status_code} - {s3_response.text}")
+        print(f"[FileDownload] Got S3 signed URL")
+
+        entry = {
+            'download_url': download_url,
+            'file_name': item_data.get('data', {}).get('attributes', {}).get('displayName') or 'download',
+            'file_size': s3_data.get('size'),
+            'version_urn': version_urn,
+            'storage_urn': storage_id,
+            'expires_at': requested_at + self.SIGNED_URL_MINUTES * 60 - self.SIGNED_URL_SAFETY_SECONDS
+        }
+        with self._url_cache_lock:
+            self._url_cache[cache_key] = entry
+
+        return {'success': True, 'cached': False, **entry}
+
+    def _blob_result(self, blob: Dict[str, Any], file_name: Optional[str]) -> Dict[str, Any]:
+        """本地緩存命中時 open_stream 的返回值"""
+        safe_filename = self.sanitize_filename(file_name or blob.get('name') or 'download')
+        print(f"[FileDownload] Cache hit: {safe_filename} ({blob['size']} bytes)")
+        return {
+            'success': True,
+            'blob': blob,
+            'status_code': 200,
+            'headers': {'Content-Length': str(blob['size']), 'Accept-Ranges': 'bytes'},
+            'file_name': safe_filename,
+            'file_size': blob['size']
+        }
+
+    def open_stream(self, urn: str, project_id: str, file_name: Optional[str] = None,
+                    range_header: Optional[str] = None) -> Dict[str, Any]:
+        """
+        打開下載流：優先使用本地緩存，否則打開到 S3 的流式下載（不落盤）
+
+        Args:
+            urn: 文件 URN（支持多種格式）
+            project_id: 項目 ID（支持 b.xxx 格式）
+            file_name: 可選的文件名（用於下載時的文件名）
+            range_header: 客戶端的 Range 請求頭（斷點續傳）
 
-            s3_data = s3_response.json()
-            download_url = s3_data.get('url')
+        Returns:
+            {
+                'success': bool,
+                'blob': dict,                   # 命中本地緩存時: {'path', 'size', ...}
+                'upstream': requests.Response,  # 未命中時: 未讀取的上游響應，用 iter_stream 讀取
+                'cache_writer': BlobCacheWriter,# 未命中且為完整下載時: 邊轉發邊寫入緩存
+                'status_code': int,             # 200 / 206 / 416
+                'headers': dict,                # 需透傳的響應頭
+                'file_name': str,
+                'error': str (optional)
+            }
+        """
+        try:
+            # 版本 URN 對應的內容不可變：命中緩存時無需任何網絡請求
+            if self.blob_cache and '?version=' in urn:
+                blob = self.blob_cache.lookup(urn, record=False)
+                if blob:
+                    self.blob_cache.record_hit(blob['size'])
+                    return self._blob_result(blob, file_name)
+
+            upstream_headers = {'Range': range_header} if range_header else {}
+
+            # 緩存的簽名 URL 可能已被提前吊銷，403 時重新解析一次
+            for attempt in range(2):
+                resolved = self.resolve_download(urn, project_id)
+                if not resolved.get('success'):
+                    return resolved
+
+                cache_keys = [resolved.get('version_urn'), resolved.get('storage_urn')]
+                if self.blob_cache and attempt == 0:
+                    blob = self.blob_cache.lookup(*cache_keys)
+                    if blob:
+                        return self._blob_result(blob, file_name or resolved['file_name'])
+
+                upstream = self._session.get(resolved['download_url'], headers=upstream_headers,
+                                             timeout=300, stream=True)
+                if upstream.status_code == 403 and resolved.get('cached') and attempt == 0:
+                    upstream.close()
+                    self.invalidate_resolution(urn, project_id)
+                    continue
+                break
+
+            if upstream.status_code not in (200, 206, 416):
+                upstream.close()
+                raise Exception(f"Download failed: HTTP {upstream.status_code}")
 
-            if not download_url:
-                raise Exception("No download URL in S3 response")
+            headers = {
+                name: upstream.headers[name]
+                for name in self.PASSTHROUGH_HEADERS
+                if name in upstream.headers
+            }
+            headers.setdefault('Accept-Ranges', 'bytes')
 
-            print(f"[FileDownload] Got S3 signed URL")
+            safe_filename = self.sanitize_filename(file_name or resolved['file_name'])
+            print(f"[FileDownload] Streaming: {safe_filename} (HTTP {upstream.status_code}, "
+                  f"{headers.get('Content-Length', 'unknown')} bytes)")
 
-            # 8. 如果沒有提供文件名，嘗試從 item_data 中提取
-            if not file_name:
+            # 只有完整下載才寫入緩存
+            cache_writer = None
+            if self.blob_cache and upstream.status_code == 200:
                 try:
-                    file_name = item_data.get('data', {}).get('attributes', {}).get('displayName', 'download')
-                except:
-                    file_name = 'download'
+                    cache_writer = self.blob_cache.open_writer(cache_keys, name=resolved['file_name'])
+                except Exception as e:
+                    print(f"[FileDownload] Cache write disabled for this download: {e}")
+
+            return {
+                'success': True,
+                'upstream': upstream,
+                'cache_writer': cache_writer,
+                'status_code': upstream.status_code,
+                'headers': headers,
+                'file_name': safe_filename,
+                'file_size': resolved.get('file_size')
+            }
+
+        except Exception as e:
+            print(f"[FileDownload] Error: {e}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+
+    def iter_stream(self, result: Dict[str, Any]) -> Iterator[bytes]:
+        """
+        逐塊讀取 open_stream 的結果
+
+        命中緩存時讀本地文件；否則轉發上游響應，並在完整讀完後把內容提交到緩存
+        （客戶端中斷或長度不符時丟棄）
+        """
+        if result.get('blob'):
+            with open(result['blob']['path'], 'rb') as f:
+                while True:
+                    chunk = f.read(self.STREAM_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    yield chunk
+            return
 
-            # 清理文件名
-            safe_filename = self.sanitize_filename(file_name)
+        upstream = result['upstream']
+        writer = result.get('cache_writer')
+        completed = False
+
+        try:
+            for chunk in upstream.iter_content(chunk_size=self.STREAM_CHUNK_SIZE):
+                if chunk:
+                    if writer:
+                        try:
+                            writer.write(chunk)
+                        except Exception as e:
+                            # 緩存只是附帶效果：磁盤寫滿/IO錯誤時放棄本次緩存，繼續轉發給客戶端
+                            print(f"[FileDownload] Cache write failed, continuing without cache: {e}")
+                            self._abort_cache_writer(writer)
+                            writer = None
+                    yield chunk
+            completed = True
+        finally:
+            upstream.close()
+            if writer:
+                expected = result['headers'].get('Content-Length')
+                if completed and (expected is None or int(expected) == writer.size):
+                    try:
+                        writer.commit()
+                    except Exception as e:
+                        print(f"[FileDownload] Failed to store in cache: {e}")
+                        self._abort_cache_writer(writer)
+                else:
+                    self._abort_cache_writer(writer)
+
+    @staticmethod
+    def _abort_cache_writer(writer):
+        """丟棄未完成的緩存寫入，失敗只記錄"""
+        try:
+            writer.abort()
+        except Exception as e:
+            print(f"[FileDownload] Failed to discard cache write: {e}")
+
+    def download_file(self, urn: str, project_id: str, file_name: Optional[str] = None) -> Dict[str, Any]:
+        """
+        下載單個文件到臨時文件（staged 模式；默認的流式模式見 open_stream）
+
+        Args:
+            urn: 文件 URN（支持多種格式）
+            project_id: 項目 ID（支持 b.xxx 格式）
+            file_name: 可選的文件名（用於下載時的文件名）
+
+        Returns:
+            {
+                'success': bool,
+                'file_path': str,       # 臨時文件路徑
+                'file_name': str,       # 文件名
+                'file_size': int,       # 文件大小（字節）
+                'error': str (optional) # 錯誤信息
+            }
+        """
+        temp_file_path = None
+
+        try:
+            # 1-8. 解析 item -> storage -> S3 簽名 URL，命中本地緩存時不訪問 S3
+            result = self.open_stream(urn, project_id, file_name)
+            if not result.get('success'):
+                return result
+
+            safe_filename = result['file_name']
 
             # 9. 下載文件到臨時目錄（不需要 Authorization header，因為 URL 已經簽名）
             temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=f"_{safe_filename}")
             temp_file_path = temp_file.name
             temp_file.close()
 
-            download_response = requests.get(download_url, timeout=300, stream=True)
-
-            if download_response.status_code != 200:
-                raise Exception(f"Download failed: HTTP {download_response.status_code}")
-
             with open(temp_file_path, 'wb') as f:
-                for chunk in download_response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
+                for chunk in self.iter_stream(result):
+                    f.write(chunk)
 
             file_size = os.path.getsize(temp_file_path)
             print(f"[FileDownload] Downloaded: {safe_filename} ({file_size} bytes)")
@@ -285,23 +518,70 @@ class FileDownloadManager:
 file_download_manager = FileDownloadManager()
 
 
-@file_download_bp.route('/download', methods=['POST', 'OPTIONS'])
+def _stream_download(urn: str, project_id: str, file_name: Optional[str]):
+    """將 S3 響應直接以生成器轉發給客戶端，不經過臨時文件"""
+    print(f"[API] Starting streaming download for URN: {urn}")
+    result = file_download_manager.open_stream(urn, project_id, file_name,
+                                               range_header=request.headers.get('Range'))
+
+    if not result.get('success'):
+        return jsonify({
+            'success': False,
+            'error': result.get('error', 'Failed to download file'),
+            'error_type': result.get('error_type', 'download_failed')
+        }), 401 if result.get('error_type') == 'unauthorized' else 500
+
+    if result.get('blob'):
+        # 本地緩存命中：send_file 使用 wsgi.file_wrapper（sendfile），並處理 Range/條件請求
+        response = send_file(
+            result['blob']['path'],
+            mimetype='application/octet-stream',
+            as_attachment=True,
+            download_name=result['file_name'],
+            conditional=True
+        )
+        response.headers['X-File-Size'] = str(result['file_size'])
+        response.headers['X-Cache'] = 'HIT'
+        return response
+
+    headers = dict(result['headers'])
+    headers['Content-Disposition'] = f'attachment; filename="{result["file_name"]}"'
+    headers['X-Cache'] = 'MISS'
+    if result.get('file_size') is not None:
+        headers['X-File-Size'] = str(result['file_size'])
+
+    # 客戶端中斷或傳輸完成時 iter_stream 都會釋放上游連接
+    return Response(
+        file_download_manager.iter_stream(result),
+        status=result['status_code'],
+        headers=headers,
+        mimetype='application/octet-stream',
+        direct_passthrough=True
+    )
+
+
+@file_download_bp.route('/download', methods=['GET', 'POST', 'OPTIONS'])
 @handle_exceptions
 def download_file():
     """
     API: 下載單個文件
 
     POST /api/files/download
+    GET  /api/files/download?urn=&project_id=&file_name=
 
-    Request Body:
+    Request Body (POST) / Query (GET):
         {
             "urn": "string (required)",           # 文件 URN（支持多種格式）
             "project_id": "string (required)",    # 項目 ID（支持 b.xxx 格式）
-            "file_name": "string (optional)"      # 文件名（用於下載時的文件名）
+            "file_name": "string (optional)",     # 文件名（用於下載時的文件名）
+            "stream": true                        # 可選，false 時使用舊的臨時文件模式
         }
 
+    Headers:
+        Range (optional): 斷點續傳，原樣轉發給 S3，返回 206 Partial Content
+
     Returns:
-        - 成功: 返回文件流 (application/octet-stream)
+        - 成功: 返回文件流 (application/octet-stream)，透傳 Content-Length / Content-Range
         - 失敗: 返回 JSON 錯誤信息
 
     Example:
@@ -315,7 +595,10 @@ def download_file():
     if request.method == 'OPTIONS':
         return jsonify({'status': 'ok'}), 200
 
-    data = request.get_json()
+    if request.method == 'GET':
+        data = request.args.to_dict()
+    else:
+        data = request.get_json(silent=True)
 
     # 驗證必填參數
     if not data:
@@ -340,8 +623,12 @@ def download_file():
         }), 400
 
     file_name = data.get('file_name')
+    stream = str(data.get('stream', True)).lower() not in ('false', '0', 'no')
+
+    if stream:
+        return _stream_download(urn, project_id, file_name)
 
-    # 執行下載
+    # 執行下載（staged 模式：先寫臨時文件再發送）
     print(f"[API] Starting file download for URN: {urn}")
     result = file_download_manager.download_file(urn, project_id, file_name)
 
@@ -399,6 +686,33 @@ def download_file():
         }), 500
 
 
+@file_download_bp.route('/download/cache-stats', methods=['GET'])
+@handle_exceptions
+def get_download_cache_stats():
+    """
+    API: 本地文件緩存統計
+
+    GET /api/files/download/cache-stats
+
+    Returns:
+        {
+            "success": true,
+            "data": {
+                "enabled": true,
+                "hits": 10, "misses": 3, "hit_rate": 0.7692,
+                "bytes_saved": 104857600,   # 命中緩存而未從 S3 下載的字節數
+                "bytes_stored": 31457280,
+                "evictions": 0, "blob_count": 3, "total_bytes": 31457280, "max_bytes": 10737418240
+            }
+        }
+    """
+    blob_cache = file_download_manager.blob_cache
+    if blob_cache is None:
+        return jsonify({'success': True, 'data': {'enabled': False}}), 200
+
+    return jsonify({'success': True, 'data': {'enabled': True, **blob_cache.get_stats()}}), 200
+
+
 # ========================================
 # Blueprint 註冊說明
 # ========================================
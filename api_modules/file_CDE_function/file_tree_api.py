@@ -3,12 +3,13 @@
 """
 文件树 API - Flask 端点
 
-提供两个核心接口：
+提供三个核心接口：
 1. GET /api/file-tree - 获取文件树（优先使用缓存）
-2. POST /api/file-tree/invalidate - 清空缓存
+2. GET /api/file-tree/children - 按层分页获取子节点（懒加载，支持 ETag/304）
+3. POST /api/file-tree/invalidate - 清空缓存（带变更集时增量补丁）
 """
 
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify, request, make_response
 from datetime import datetime, timezone
 from typing import Dict, Tuple
 import logging
@@ -18,9 +19,11 @@ import os
 
 # 为了支持相对导入和直接导入，使用 try-except
 try:
-    from .file_tree_builder import get_file_tree, invalidate_file_tree_cache
+    from .file_tree_builder import (get_file_tree, invalidate_file_tree_cache, apply_file_tree_delta,
+                                    get_file_tree_children, FileTreeBuilder)
 except ImportError:
-    from file_tree_builder import get_file_tree, invalidate_file_tree_cache
+    from file_tree_builder import (get_file_tree, invalidate_file_tree_cache, apply_file_tree_delta,
+                                   get_file_tree_children, FileTreeBuilder)
 
 # 配置日志
 logging.basicConfig(
@@ -125,6 +128,111 @@ def get_file_tree_api():
         }), 500
 
 
+@file_tree_bp.route('/file-tree/children', methods=['GET'])
+def get_file_tree_children_api():
+    """
+    按层分页获取子节点 API（懒加载，首屏耗时与项目规模无关）
+
+    查询参数:
+        - project_id (必需): 项目ID
+        - folder_id (可选): 父文件夹ID，不传时返回项目根层级
+        - cursor (可选): 上一页返回的 next_cursor
+        - limit (可选): 每页条数，默认 200，最大 1000
+        - depth (可选): 预取深度，默认 0，最大 3
+
+    请求头:
+        - If-None-Match (可选): 上次返回的 ETag，数据未变化时返回 304
+
+    返回:
+        {
+            "success": true/false,
+            "data": {
+                "folder_id": "...",
+                "items": [ folder/file nodes, 文件夹节点带 has_children / children_loaded ],
+                "next_cursor": "..." or null,
+                "limit": 200,
+                "depth": 0,
+                "cache_version": 12
+            },
+            "metadata": {"project_id": "...", "etag": "W/\"...\""},
+            "error": "error message" (if success=false)
+        }
+    """
+    try:
+        project_id = request.args.get('project_id')
+        folder_id = request.args.get('folder_id') or None
+        cursor = request.args.get('cursor') or None
+
+        if not project_id:
+            return jsonify({
+                "success": False,
+                "error": "Missing required parameter: project_id"
+            }), 400
+
+        try:
+            limit = int(request.args.get('limit', FileTreeBuilder.CHILDREN_DEFAULT_LIMIT))
+            depth = int(request.args.get('depth', 0))
+        except ValueError:
+            return jsonify({
+                "success": False,
+                "error": "Invalid parameter: limit and depth must be integers"
+            }), 400
+
+        logger.info(f"获取子节点请求: project_id={project_id}, folder_id={folder_id}, "
+                    f"limit={limit}, depth={depth}, has_cursor={cursor is not None}")
+
+        # 获取数据库连接参数
+        db_params = get_db_params()
+
+        try:
+            page, etag, not_modified = get_file_tree_children(
+                project_id, db_params, folder_id=folder_id, cursor=cursor, limit=limit, depth=depth,
+                if_none_match=request.headers.get('If-None-Match')
+            )
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e)
+            }), 400
+
+        if not_modified:
+            response = make_response('', 304)
+            response.headers['ETag'] = etag
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+
+        if page is None:
+            return jsonify({
+                "success": False,
+                "error": "Failed to load folder children",
+                "metadata": {
+                    "project_id": project_id,
+                    "folder_id": folder_id
+                }
+            }), 500
+
+        response = make_response(jsonify({
+            "success": True,
+            "data": page,
+            "metadata": {
+                "project_id": project_id,
+                "etag": etag
+            }
+        }), 200)
+        if etag:
+            response.headers['ETag'] = etag
+            response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+
+    except Exception as e:
+        logger.error(f"获取子节点失败: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({
+            "success": False,
+            "error": f"Internal server error: {str(e)}"
+        }), 500
+
+
 @file_tree_bp.route('/file-tree/invalidate', methods=['POST'])
 def invalidate_file_tree_cache_api():
     """
@@ -132,7 +240,12 @@ def invalidate_file_tree_cache_api():
 
     请求体:
         {
-            "project_id": "project-id-xxx"
+            "project_id": "project-id-xxx",
+            // 以下为可选的变更集；提供任意一项时对缓存做增量补丁，而不是整棵清空
+            "changed_folder_ids": [...],
+            "changed_file_ids": [...],
+            "deleted_folder_ids": [...],
+            "deleted_file_ids": [...]
         }
 
     返回:
@@ -140,7 +253,9 @@ def invalidate_file_tree_cache_api():
             "success": true/false,
             "data": {
                 "project_id": "...",
-                "invalidated_at": "2025-11-16T10:00:00Z"
+                "invalidated_at": "2025-11-16T10:00:00Z",
+                "mode": "invalidated" | "patched" | "rebuilt" | "no_cache" | "noop",
+                "cache_version": 12 (仅 patched)
             },
             "error": "error message" (if success=false)
         }
@@ -156,11 +271,37 @@ def invalidate_file_tree_cache_api():
                 "error": "Missing required parameter: project_id"
             }), 400
 
-        logger.info(f"清空文件树缓存请求: project_id={project_id}")
-
         # 获取数据库连接参数
         db_params = get_db_params()
 
+        delta = FileTreeBuilder.normalize_delta(data)
+        if any(delta.values()):
+            logger.info(f"文件树缓存增量补丁请求: project_id={project_id}, "
+                        f"{ {key: len(ids) for key, ids in delta.items()} }")
+
+            patch_result = apply_file_tree_delta(project_id, delta, db_params)
+
+            if patch_result.get('mode') == 'failed':
+                return jsonify({
+                    "success": False,
+                    "error": "Failed to patch cache",
+                    "data": {
+                        "project_id": project_id,
+                        **patch_result
+                    }
+                }), 500
+
+            return jsonify({
+                "success": True,
+                "data": {
+                    "project_id": project_id,
+                    "invalidated_at": datetime.now(timezone.utc).isoformat(),
+                    **patch_result
+                }
+            }), 200
+
+        logger.info(f"清空文件树缓存请求: project_id={project_id}")
+
         # 调用业务逻辑
         success = invalidate_file_tree_cache(project_id, db_params)
 
@@ -178,7 +319,8 @@ def invalidate_file_tree_cache_api():
             "success": True,
             "data": {
                 "project_id": project_id,
-                "invalidated_at": datetime.now(timezone.utc).isoformat()
+                "invalidated_at": datetime.now(timezone.utc).isoformat(),
+                "mode": "invalidated"
             }
         }), 200
 
@@ -12,6 +12,8 @@
 
 import json
 import time
+import base64
+import hashlib
 from typing import Dict, List, Tuple, Optional, Any
 from datetime import datetime, timezone
 import psycopg2
@@ -54,10 +56,16 @@ class FileTreeBuilder:
             self.conn.close()
         logger.info("数据库连接已关闭")
 
-    def query_folders(self, project_id: str) -> List[Dict[str, Any]]:
+    def query_folders(self, project_id: str, folder_ids: List[str] = None,
+                      include_descendants: bool = False) -> List[Dict[str, Any]]:
         """
         查询项目下的所有文件夹
 
+        Args:
+            project_id: 项目ID
+            folder_ids: 只查询这些文件夹（None 表示全部）
+            include_descendants: 与 folder_ids 一起使用，同时返回它们的所有子孙文件夹
+
         Returns:
             文件夹列表，包含: id, project_id, name, display_name, parent_id, path,
                            depth, create_time, create_user_name, last_modified_time, hidden
@@ -77,12 +85,31 @@ class FileTreeBuilder:
             last_modified_user_name,
             hidden
         FROM folders
-        WHERE project_id = %s
+        WHERE project_id = %s AND deleted_at IS NULL{filter}
         ORDER BY path ASC;
         """
+        params = [project_id]
+
+        if folder_ids is not None and include_descendants:
+            sql = sql.format(filter="""
+          AND id IN (
+            WITH RECURSIVE subtree AS (
+                SELECT id FROM folders WHERE project_id = %s AND id = ANY(%s)
+                UNION ALL
+                SELECT f.id FROM folders f JOIN subtree s ON f.parent_id = s.id
+                WHERE f.project_id = %s AND f.deleted_at IS NULL
+            )
+            SELECT id FROM subtree
+          )""")
+            params += [project_id, list(folder_ids), project_id]
+        elif folder_ids is not None:
+            sql = sql.format(filter=" AND id = ANY(%s)")
+            params.append(list(folder_ids))
+        else:
+            sql = sql.format(filter="")
 
         try:
-            self.cur.execute(sql, (project_id,))
+            self.cur.execute(sql, params)
             folders = self.cur.fetchall()
             logger.info(f"查询到 {len(folders)} 个文件夹")
             return [dict(row) for row in folders]
@@ -90,12 +117,18 @@ class FileTreeBuilder:
             logger.error(f"查询文件夹失败: {str(e)}")
             return []
 
-    def query_files(self, project_id: str) -> List[Dict[str, Any]]:
+    def query_files(self, project_id: str, folder_ids: List[str] = None,
+                    file_ids: List[str] = None) -> List[Dict[str, Any]]:
         """
         查询项目下的所有文件（使用最新版本的数据）
 
+        Args:
+            project_id: 项目ID
+            folder_ids: 只查询这些文件夹下的文件（None 表示不限）
+            file_ids: 只查询这些文件（None 表示不限）
+
         Returns:
-            文件列表，包含: id, name, folder_path, file_type, create_time,
+            文件列表，包含: id, name, parent_folder_id, folder_path, file_type, create_time,
                            create_user_name, last_modified_user_name, last_modified_time,
                            version_number, size (file_size), urn, reviewState
         """
@@ -103,6 +136,7 @@ class FileTreeBuilder:
         SELECT
             f.id,
             f.name,
+            f.parent_folder_id,
             COALESCE(f.folder_path, '') as folder_path,
             f.file_type,
             f.create_time,
@@ -115,12 +149,21 @@ class FileTreeBuilder:
             fv.review_state AS "reviewState"
         FROM files f
         LEFT JOIN file_versions fv ON f.id = fv.file_id AND fv.is_current_version = true
-        WHERE f.project_id = %s
+        WHERE f.project_id = %s AND f.deleted_at IS NULL{filter}
         ORDER BY f.name ASC;
         """
+        conditions = []
+        params = [project_id]
+        if folder_ids is not None:
+            conditions.append(" AND f.parent_folder_id = ANY(%s)")
+            params.append(list(folder_ids))
+        if file_ids is not None:
+            conditions.append(" AND f.id = ANY(%s)")
+            params.append(list(file_ids))
+        sql = sql.format(filter=''.join(conditions))
 
         try:
-            self.cur.execute(sql, (project_id,))
+            self.cur.execute(sql, params)
             files = self.cur.fetchall()
             logger.info(f"查询到 {len(files)} 个文件")
             return [dict(row) for row in files]
@@ -128,10 +171,14 @@ class FileTreeBuilder:
             logger.error(f"查询文件失败: {str(e)}")
             return []
 
-    def query_custom_attributes(self, project_id: str) -> Dict[str, List[Dict]]:
+    def query_custom_attributes(self, project_id: str, file_ids: List[str] = None) -> Dict[str, List[Dict]]:
         """
         查询文件的自定义属性值
 
+        Args:
+            project_id: 项目ID
+            file_ids: 只查询这些文件（None 表示全部）
+
         Returns:
             字典，key为file_id，value为属性列表
         """
@@ -147,11 +194,17 @@ class FileTreeBuilder:
             cav.value_array
         FROM custom_attribute_values cav
         JOIN custom_attribute_definitions cad ON cav.attr_definition_id = cad.id
-        WHERE cav.project_id = %s;
+        WHERE cav.project_id = %s{filter};
         """
+        params = [project_id]
+        if file_ids is not None:
+            sql = sql.format(filter=" AND cav.file_id = ANY(%s)")
+            params.append(list(file_ids))
+        else:
+            sql = sql.format(filter="")
 
         try:
-            self.cur.execute(sql, (project_id,))
+            self.cur.execute(sql, params)
             rows = self.cur.fetchall()
 
             # 按file_id分组
@@ -182,10 +235,14 @@ class FileTreeBuilder:
             logger.error(f"查询自定义属性失败: {str(e)}")
             return {}
 
-    def query_folder_custom_attributes(self, project_id: str) -> Dict[str, List[Dict]]:
+    def query_folder_custom_attributes(self, project_id: str, folder_ids: List[str] = None) -> Dict[str, List[Dict]]:
         """
         查询文件夹的自定义属性设置（scope_type='folder'）
 
+        Args:
+            project_id: 项目ID
+            folder_ids: 只查询这些文件夹（None 表示全部）
+
         Returns:
             字典，key为folder_id，value为属性定义列表
         """
@@ -201,11 +258,17 @@ class FileTreeBuilder:
             default_value,
             inherit_to_subfolders
         FROM custom_attribute_definitions
-        WHERE project_id = %s AND scope_type = 'folder' AND scope_folder_id IS NOT NULL;
+        WHERE project_id = %s AND scope_type = 'folder' AND scope_folder_id IS NOT NULL{filter};
         """
+        params = [project_id]
+        if folder_ids is not None:
+            sql = sql.format(filter=" AND scope_folder_id = ANY(%s)")
+            params.append(list(folder_ids))
+        else:
+            sql = sql.format(filter="")
 
         try:
-            self.cur.execute(sql, (project_id,))
+            self.cur.execute(sql, params)
             rows = self.cur.fetchall()
 
             # 按folder_id分组
@@ -232,6 +295,43 @@ class FileTreeBuilder:
             logger.error(f"查询文件夹自定义属性失败: {str(e)}")
             return {}
 
+    def _format_folder_node(self, folder: Dict[str, Any], folder_attrs: Dict[str, List[Dict]]) -> Dict:
+        """将文件夹行格式化为树节点（children 为空）"""
+        folder_id = folder['id']
+        return {
+            'type': 'folder',
+            'id': folder_id,
+            'name': folder['display_name'],
+            'path': folder['path'],
+            'create_time': folder['create_time'].isoformat() if folder['create_time'] else None,
+            'create_user_name': folder['create_user_name'],
+            'last_modified_time': folder['last_modified_time'].isoformat() if folder['last_modified_time'] else None,
+            'hidden': folder['hidden'],
+            'last_modified_user_name': folder.get('last_modified_user_name'),
+            'customAttributes': folder_attrs.get(folder_id, []),  # 添加文件夹的自定义属性设置
+            'children': []  # 先设置为空数组，后面添加子项
+        }
+
+    def _format_file_node(self, file_info: Dict[str, Any], file_attrs: Dict[str, List[Dict]]) -> Dict:
+        """将文件行格式化为树节点"""
+        file_id = file_info['id']
+        return {
+            'type': 'file',
+            'id': file_id,
+            'name': file_info['name'],
+            'folder_path': file_info['folder_path'],
+            'file_type': file_info['file_type'],
+            'create_time': file_info['create_time'].isoformat() if file_info['create_time'] else None,
+            'create_user_name': file_info['create_user_name'],
+            'last_modified_user_name': file_info['last_modified_user_name'],
+            'last_modified_time': file_info['last_modified_time'].isoformat() if file_info['last_modified_time'] else None,
+            'version_number': file_info['version_number'],
+            'size': file_info['size'],
+            'urn': file_info['urn'],
+            'reviewState': file_info.get('reviewState', 'NotInReview'),  # 使用 get 方法，如果不存在则默认为 NotInReview
+            'customAttributeValues': file_attrs.get(file_id, [])  # 添加文件的自定义属性值
+        }
+
     def build_tree_from_paths(self, folders: List[Dict], files: List[Dict],
                                folder_attrs: Dict[str, List[Dict]] = None,
                                file_attrs: Dict[str, List[Dict]] = None) -> Dict:
@@ -259,20 +359,7 @@ class FileTreeBuilder:
         folder_tree = {}  # key: folder_id, value: folder_info
 
         for folder in folders:
-            folder_id = folder['id']
-            folder_tree[folder_id] = {
-                'type': 'folder',
-                'id': folder_id,
-                'name': folder['display_name'],
-                'path': folder['path'],
-                'create_time': folder['create_time'].isoformat() if folder['create_time'] else None,
-                'create_user_name': folder['create_user_name'],
-                'last_modified_time': folder['last_modified_time'].isoformat() if folder['last_modified_time'] else None,
-                'hidden': folder['hidden'],
-                'last_modified_user_name': folder.get('last_modified_user_name'),
-                'customAttributes': folder_attrs.get(folder_id, []),  # 添加文件夹的自定义属性设置
-                'children': []  # 先设置为空数组，后面添加子项
-            }
+            folder_tree[folder['id']] = self._format_folder_node(folder, folder_attrs)
 
         # 步骤2: 构建树的层级关系
         root_folders = []  # 根文件夹
@@ -296,35 +383,20 @@ class FileTreeBuilder:
                     root_folders.append(folder_tree[folder_id])  # 当父文件夹缺失时，将其视为根文件夹
 
         # 步骤3: 添加文件到对应的文件夹
+        # 路径索引只构建一次，避免每个文件都扫描全部文件夹（同路径时保留第一个）
+        folder_by_path = {}
+        for folder_id, folder_node in folder_tree.items():
+            folder_by_path.setdefault(folder_node['path'], folder_id)
+
         for file_info in files:
-            file_id = file_info['id']
-            file_dict = {
-                'type': 'file',
-                'id': file_id,
-                'name': file_info['name'],
-                'folder_path': file_info['folder_path'],
-                'file_type': file_info['file_type'],
-                'create_time': file_info['create_time'].isoformat() if file_info['create_time'] else None,
-                'create_user_name': file_info['create_user_name'],
-                'last_modified_user_name': file_info['last_modified_user_name'],
-                'last_modified_time': file_info['last_modified_time'].isoformat() if file_info['last_modified_time'] else None,
-                'version_number': file_info['version_number'],
-                'size': file_info['size'],
-                'urn': file_info['urn'],
-                'reviewState': file_info.get('reviewState', 'NotInReview'),  # 使用 get 方法，如果不存在则默认为 NotInReview
-                'customAttributeValues': file_attrs.get(file_id, [])  # 添加文件的自定义属性值
-            }
+            file_dict = self._format_file_node(file_info, file_attrs)
 
-            # 找到文件所在的文件夹
-            parent_folder_id = None
-            for folder_id, folder_node in folder_tree.items():
-                if folder_node['path'] == file_info['folder_path']:
-                    parent_folder_id = folder_id
-                    break
+            # 找到文件所在的文件夹：优先使用已知的父文件夹ID，否则按路径查索引
+            parent_folder_id = file_info.get('parent_folder_id')
+            if parent_folder_id not in folder_tree:
+                parent_folder_id = folder_by_path.get(file_info['folder_path'])
 
-            if parent_folder_id and parent_folder_id in folder_tree:
-                if 'children' not in folder_tree[parent_folder_id]:
-                    folder_tree[parent_folder_id]['children'] = []
+            if parent_folder_id is not None:
                 folder_tree[parent_folder_id]['children'].append(file_dict)
             else:
                 # 如果找不到父文件夹，添加到根文件夹
@@ -435,9 +507,10 @@ class FileTreeBuilder:
             是否成功清空
         """
         try:
+            # 同时递增版本号，使懒加载接口的 ETag 失效
             sql = """
             UPDATE file_tree_cache
-            SET cached_tree = NULL, updated_at = %s
+            SET cached_tree = NULL, updated_at = %s, cache_version = cache_version + 1
             WHERE project_id = %s
             """
             self.cur.execute(sql, (datetime.now(timezone.utc), project_id))
@@ -449,6 +522,619 @@ class FileTreeBuilder:
             logger.error(f"清空缓存失败: {str(e)}")
             return False
 
+    # ------------------------------------------------------------------
+    # 懒加载：按层分页返回子节点，不物化整棵树
+    # ------------------------------------------------------------------
+
+    CHILDREN_DEFAULT_LIMIT = 200
+    CHILDREN_MAX_LIMIT = 1000
+    # 预取深度上限，以及预取层级中每个文件夹最多返回的子节点数
+    CHILDREN_MAX_PREFETCH_DEPTH = 3
+    CHILDREN_PREFETCH_LIMIT = 50
+
+    @staticmethod
+    def encode_children_cursor(kind: str, name: str, item_id: str) -> str:
+        """编码分页游标（排序键：先文件夹后文件，各自按 name, id）"""
+        raw = json.dumps({'k': kind, 'n': name, 'i': item_id}, ensure_ascii=False, separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+    @staticmethod
+    def decode_children_cursor(cursor: str) -> Tuple[str, str, str]:
+        """解码分页游标，格式错误时抛出 ValueError"""
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            data = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+            kind, name, item_id = data['k'], data['n'], data['i']
+        except Exception:
+            raise ValueError(f"Invalid cursor: {cursor}")
+
+        if kind not in ('folder', 'file') or not isinstance(name, str) or not isinstance(item_id, str):
+            raise ValueError(f"Invalid cursor: {cursor}")
+        return kind, name, item_id
+
+    @staticmethod
+    def make_children_etag(project_id: str, version: Dict[str, Any], folder_id: Optional[str],
+                           cursor: Optional[str], limit: int, depth: int) -> str:
+        """根据缓存版本和项目同步时间生成弱 ETag"""
+        key = json.dumps([project_id, version.get('cache_version'), version.get('last_sync_time'),
+                          folder_id, cursor, limit, depth], ensure_ascii=False)
+        return 'W/"' + hashlib.sha1(key.encode('utf-8')).hexdigest() + '"'
+
+    @staticmethod
+    def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+        """判断 If-None-Match 请求头是否命中（弱比较）"""
+        if not if_none_match or not etag:
+            return False
+        if if_none_match.strip() == '*':
+            return True
+
+        def strip_weak(tag: str) -> str:
+            tag = tag.strip()
+            return tag[2:] if tag.startswith('W/') else tag
+
+        return strip_weak(etag) in {strip_weak(tag) for tag in if_none_match.split(',')}
+
+    def get_tree_version(self, project_id: str) -> Optional[Dict[str, Any]]:
+        """
+        获取文件树数据版本（缓存版本号 + 项目最近同步时间）
+
+        增量补丁、重建、失效都会递增 cache_version；同步完成会更新 last_sync_time
+        """
+        sql = """
+        SELECT
+            COALESCE(c.cache_version, 0) AS cache_version,
+            p.last_sync_time
+        FROM projects p
+        LEFT JOIN file_tree_cache c ON c.project_id = p.id
+        WHERE p.id = %s
+        """
+        try:
+            self.cur.execute(sql, (project_id,))
+            row = self.cur.fetchone()
+            if not row:
+                return {'cache_version': 0, 'last_sync_time': None}
+            return {
+                'cache_version': row['cache_version'],
+                'last_sync_time': row['last_sync_time'].isoformat() if row['last_sync_time'] else None
+            }
+        except Exception as e:
+            self.conn.rollback()
+            logger.error(f"查询文件树版本失败: {str(e)}")
+            return None
+
+    def _query_child_rows(self, project_id: str, kind: str, parent_ids: List[Optional[str]],
+                          per_parent: int, after: Tuple[str, str] = None) -> Dict[Optional[str], List[Dict]]:
+        """
+        批量查询若干父文件夹的直接子文件夹或文件，每个父节点最多 per_parent 条
+
+        Args:
+            kind: 'folder' 或 'file'
+            parent_ids: 父文件夹ID列表；[None] 表示项目根层级
+            per_parent: 每个父节点返回的最大条数
+            after: 键集分页起点 (name, id)，仅用于单个父节点
+
+        Returns:
+            字典，key为父文件夹ID，value为按 (name, id) 排序的行
+        """
+        if kind == 'folder':
+            parent_column = 'parent_id'
+            inner = """
+            SELECT
+                fo.id,
+                fo.project_id,
+                fo.name,
+                COALESCE(fo.display_name, fo.name) as display_name,
+                fo.parent_id,
+                fo.path,
+                fo.depth,
+                fo.create_time,
+                fo.create_user_name,
+                fo.last_modified_time,
+                fo.last_modified_user_name,
+                fo.hidden,
+                ROW_NUMBER() OVER ({partition}ORDER BY fo.name, fo.id) AS rn
+            FROM folders fo
+            WHERE fo.project_id = %s AND fo.deleted_at IS NULL{filter}
+            """
+            sql = """
+            SELECT
+                r.*,
+                (EXISTS (SELECT 1 FROM folders c WHERE c.project_id = r.project_id AND c.parent_id = r.id
+                         AND c.deleted_at IS NULL)
+                 OR EXISTS (SELECT 1 FROM files c WHERE c.project_id = r.project_id AND c.parent_folder_id = r.id
+                            AND c.deleted_at IS NULL)
+                ) AS has_children
+            FROM ({inner}) r
+            WHERE r.rn <= %s
+            ORDER BY r.parent_id, r.name, r.id;
+            """
+            alias = 'fo'
+        else:
+            parent_column = 'parent_folder_id'
+            inner = """
+            SELECT
+                f.id,
+                f.name,
+                f.parent_folder_id,
+                COALESCE(f.folder_path, '') as folder_path,
+                f.file_type,
+                f.create_time,
+                f.create_user_name,
+                f.last_modified_user_name,
+                f.last_modified_time,
+                ROW_NUMBER() OVER ({partition}ORDER BY f.name, f.id) AS rn
+            FROM files f
+            WHERE f.project_id = %s AND f.deleted_at IS NULL{filter}
+            """
+            sql = """
+            SELECT
+                r.id,
+                r.name,
+                r.parent_folder_id,
+                r.folder_path,
+                r.file_type,
+                r.create_time,
+                r.create_user_name,
+                COALESCE(fv.create_user_name, r.last_modified_user_name) as last_modified_user_name,
+                COALESCE(fv.create_time, r.last_modified_time) as last_modified_time,
+                fv.version_number,
+                fv.file_size as size,
+                fv.urn,
+                fv.review_state AS "reviewState"
+            FROM ({inner}) r
+            LEFT JOIN file_versions fv ON r.id = fv.file_id AND fv.is_current_version = true
+            WHERE r.rn <= %s
+            ORDER BY r.parent_folder_id, r.name, r.id;
+            """
+            alias = 'f'
+
+        # 顶层文件夹的 parent_id 指向项目根文件夹（不为空），根层级按 depth = 0 选取
+        root_level = parent_ids == [None]
+        params = [project_id]
+        if root_level:
+            conditions = [f" AND {alias}.depth = 0"]
+            partition = ''
+        else:
+            conditions = [f" AND {alias}.{parent_column} = ANY(%s)"]
+            params.append(list(parent_ids))
+            partition = f"PARTITION BY {alias}.{parent_column} "
+        if after is not None:
+            conditions.append(f" AND ({alias}.name, {alias}.id) > (%s, %s)")
+            params += list(after)
+        params.append(per_parent)
+
+        sql = sql.format(inner=inner.format(filter=''.join(conditions), partition=partition))
+        self.cur.execute(sql, params)
+
+        rows_by_parent = {parent_id: [] for parent_id in parent_ids}
+        for row in self.cur.fetchall():
+            row = dict(row)
+            row.pop('rn', None)
+            rows_by_parent.setdefault(None if root_level else row[parent_column], []).append(row)
+        return rows_by_parent
+
+    def _query_children_pages(self, project_id: str, parent_ids: List[Optional[str]], limit: int,
+                              cursor_key: Tuple[str, str, str] = None) -> Dict[Optional[str], Dict]:
+        """
+        查询若干父文件夹的第一页子节点（文件夹在前，文件在后）
+
+        Args:
+            parent_ids: 父文件夹ID列表；[None] 表示项目根层级
+            limit: 每页条数
+            cursor_key: 解码后的游标 (kind, name, id)，仅用于单个父节点
+
+        Returns:
+            字典，key为父文件夹ID，value为 {items, next_cursor}
+        """
+        kind, name, item_id = cursor_key or (None, None, None)
+        entries = {parent_id: [] for parent_id in parent_ids}
+
+        # 多取一条用于判断是否还有下一页
+        if kind != 'file':
+            after = (name, item_id) if kind == 'folder' else None
+            folder_rows = self._query_child_rows(project_id, 'folder', parent_ids, limit + 1, after)
+            for parent_id, rows in folder_rows.items():
+                entries[parent_id].extend(('folder', row) for row in rows)
+
+        need_files = [parent_id for parent_id in parent_ids if len(entries[parent_id]) <= limit]
+        if need_files:
+            after = (name, item_id) if kind == 'file' else None
+            file_rows = self._query_child_rows(project_id, 'file', need_files, limit + 1, after)
+            for parent_id, rows in file_rows.items():
+                entries[parent_id].extend(('file', row) for row in rows[:limit + 1 - len(entries[parent_id])])
+
+        folder_ids = [row['id'] for items in entries.values() for item_kind, row in items[:limit] if item_kind == 'folder']
+        file_ids = [row['id'] for items in entries.values() for item_kind, row in items[:limit] if item_kind == 'file']
+        folder_attrs = self.query_folder_custom_attributes(project_id, folder_ids) if folder_ids else {}
+        file_attrs = self.query_custom_attributes(project_id, file_ids) if file_ids else {}
+
+        pages = {}
+        for parent_id, items in entries.items():
+            nodes = []
+            for item_kind, row in items[:limit]:
+                if item_kind == 'folder':
+                    node = self._format_folder_node(row, folder_attrs)
+                    node['has_children'] = bool(row['has_children'])
+                    node['children_loaded'] = False
+                else:
+                    node = self._format_file_node(row, file_attrs)
+                nodes.append(node)
+
+            next_cursor = None
+            if len(items) > limit:
+                last_kind, last_row = items[limit - 1]
+                next_cursor = self.encode_children_cursor(last_kind, last_row['name'], last_row['id'])
+
+            pages[parent_id] = {'items': nodes, 'next_cursor': next_cursor}
+        return pages
+
+    def list_children(self, project_id: str, folder_id: Optional[str] = None, cursor: Optional[str] = None,
+                      limit: int = None, depth: int = 0) -> Dict[str, Any]:
+        """
+        分页获取某个文件夹的直接子节点，可选预取下几层
+
+        Args:
+            project_id: 项目ID
+            folder_id: 父文件夹ID（None 表示项目根层级）
+            cursor: 上一页返回的 next_cursor
+            limit: 每页条数
+            depth: 预取深度（0 只返回当前层）；预取的文件夹节点 children_loaded 为 True，
+                   并带有自己的 next_cursor
+
+        Returns:
+            {folder_id, items, next_cursor, limit, depth}
+
+        Raises:
+            ValueError: 游标格式错误
+        """
+        limit = max(1, min(int(limit or self.CHILDREN_DEFAULT_LIMIT), self.CHILDREN_MAX_LIMIT))
+        depth = max(0, min(int(depth or 0), self.CHILDREN_MAX_PREFETCH_DEPTH))
+        cursor_key = self.decode_children_cursor(cursor) if cursor else None
+
+        page = self._query_children_pages(project_id, [folder_id], limit, cursor_key)[folder_id]
+
+        # 按层批量预取：每层只发两条查询（子文件夹 + 文件）
+        frontier = [node for node in page['items'] if node['type'] == 'folder' and node['has_children']]
+        for _ in range(depth):
+            if not frontier:
+                break
+
+            prefetch_limit = min(limit, self.CHILDREN_PREFETCH_LIMIT)
+            sub_pages = self._query_children_pages(project_id, [node['id'] for node in frontier], prefetch_limit)
+
+            next_frontier = []
+            for node in frontier:
+                sub_page = sub_pages[node['id']]
+                node['children'] = sub_page['items']
+                node['next_cursor'] = sub_page['next_cursor']
+                node['children_loaded'] = True
+                next_frontier.extend(
+                    child for child in sub_page['items'] if child['type'] == 'folder' and child['has_children']
+                )
+            frontier = next_frontier
+
+        logger.info(f"懒加载子节点: folder_id={folder_id}, {len(page['items'])} 项, "
+                    f"has_more={page['next_cursor'] is not None}, depth={depth}")
+        return {
+            'folder_id': folder_id,
+            'items': page['items'],
+            'next_cursor': page['next_cursor'],
+            'limit': limit,
+            'depth': depth
+        }
+
+    # ------------------------------------------------------------------
+    # 增量补丁：按变更集局部替换缓存树，而不是整棵重建
+    # ------------------------------------------------------------------
+
+    # 变更数量超过此值时直接全量重建
+    PATCH_MAX_CHANGES = 5000
+
+    @staticmethod
+    def normalize_delta(delta: Optional[Dict[str, Any]]) -> Dict[str, List[str]]:
+        """规范化变更集，返回四个去重后的ID列表"""
+        delta = delta or {}
+        return {
+            key: list(dict.fromkeys(delta.get(key) or []))
+            for key in ('changed_folder_ids', 'changed_file_ids', 'deleted_folder_ids', 'deleted_file_ids')
+        }
+
+    def _index_tree(self, tree: Dict) -> Tuple[Dict[str, Dict], Dict[str, Optional[str]]]:
+        """
+        为缓存树建立索引
+
+        Returns:
+            (folder_nodes, parent_of) - 文件夹ID到节点的映射，以及任意节点ID到父文件夹ID的映射（根节点为None）
+        """
+        folder_nodes = {}
+        parent_of = {}
+        stack = [(node, None) for node in tree.get('root', [])]
+
+        while stack:
+            node, parent_id = stack.pop()
+            parent_of[node['id']] = parent_id
+            if node.get('type') == 'folder':
+                folder_nodes[node['id']] = node
+                stack.extend((child, node['id']) for child in node.get('children', []))
+
+        return folder_nodes, parent_of
+
+    def _assemble_subtrees(self, root_ids: List[str], folders: List[Dict], files: List[Dict],
+                           folder_attrs: Dict[str, List[Dict]], file_attrs: Dict[str, List[Dict]]) -> Dict[str, Dict]:
+        """把子树的扁平数据组装成节点，返回 root_id -> 子树根节点"""
+        nodes = {folder['id']: self._format_folder_node(folder, folder_attrs) for folder in folders}
+
+        for folder in folders:
+            if folder['id'] not in root_ids and folder['parent_id'] in nodes:
+                nodes[folder['parent_id']]['children'].append(nodes[folder['id']])
+
+        for file_info in files:
+            parent_node = nodes.get(file_info.get('parent_folder_id'))
+            if parent_node is not None:
+                parent_node['children'].append(self._format_file_node(file_info, file_attrs))
+
+        return {root_id: nodes[root_id] for root_id in root_ids if root_id in nodes}
+
+    def _children_of(self, tree: Dict, folder_nodes: Dict[str, Dict], parent_id: Optional[str]) -> Optional[List[Dict]]:
+        """获取父节点的 children 列表（parent_id 为 None 时为根列表）"""
+        if parent_id is None:
+            return tree['root']
+        node = folder_nodes.get(parent_id)
+        return node['children'] if node is not None else None
+
+    def patch_tree(self, tree: Dict, folder_rows: List[Dict], subtrees: Dict[str, Optional[Dict]],
+                   file_nodes: Dict[str, Tuple[Optional[str], Optional[Dict]]],
+                   folder_attrs: Dict[str, List[Dict]] = None) -> bool:
+        """
+        将变更应用到缓存树（原地修改，不访问数据库）
+
+        Args:
+            tree: 缓存的树结构
+            folder_rows: 只需原地刷新属性的文件夹行（路径和父级未变）
+            subtrees: 需要整体替换的子树 {folder_id: (parent_id, node)}，node 为 None 表示删除
+            file_nodes: 文件变更 {file_id: (parent_folder_id, node)}，node 为 None 表示删除
+            folder_attrs: 文件夹自定义属性设置
+
+        Returns:
+            是否全部应用成功；返回 False 时调用方应全量重建
+        """
+        folder_attrs = folder_attrs or {}
+        folder_nodes, parent_of = self._index_tree(tree)
+
+        # 1. 属性刷新：保留 children，只更新节点字段
+        for folder in folder_rows:
+            node = folder_nodes.get(folder['id'])
+            if node is None:
+                return False
+            refreshed = self._format_folder_node(folder, folder_attrs)
+            refreshed['children'] = node['children']
+            node.clear()
+            node.update(refreshed)
+
+        # 2. 子树替换（新增、移动、重命名或删除的文件夹）
+        for folder_id, (parent_id, node) in subtrees.items():
+            if folder_id in parent_of:
+                old_siblings = self._children_of(tree, folder_nodes, parent_of[folder_id])
+                old_siblings[:] = [child for child in old_siblings if child['id'] != folder_id]
+            if node is None:
+                continue
+
+            siblings = self._children_of(tree, folder_nodes, parent_id)
+            if siblings is None:
+                logger.info(f"子树 {folder_id} 的父文件夹 {parent_id} 不在缓存中")
+                return False
+            siblings.append(node)
+            folder_nodes[folder_id] = node
+
+        if subtrees:
+            folder_nodes, parent_of = self._index_tree(tree)
+
+        # 3. 文件增删改
+        for file_id, (parent_folder_id, node) in file_nodes.items():
+            if file_id in parent_of:
+                old_siblings = self._children_of(tree, folder_nodes, parent_of[file_id])
+                if old_siblings is not None:
+                    old_siblings[:] = [child for child in old_siblings if child['id'] != file_id]
+            if node is None:
+                continue
+
+            siblings = self._children_of(tree, folder_nodes, parent_folder_id)
+            if siblings is None or parent_folder_id is None:
+                logger.info(f"文件 {file_id} 的父文件夹 {parent_folder_id} 不在缓存中")
+                return False
+            siblings.append(node)
+
+        # 4. 重新统计
+        folder_nodes, parent_of = self._index_tree(tree)
+        tree.setdefault('metadata', {})
+        tree['metadata']['total_folders'] = len(folder_nodes)
+        tree['metadata']['total_files'] = len(parent_of) - len(folder_nodes)
+        tree['metadata']['patched_at'] = datetime.now(timezone.utc).isoformat()
+        return True
+
+    def _get_cached_tree_for_patch(self, project_id: str) -> Tuple[Optional[Dict], Optional[int]]:
+        """读取缓存树和版本号（用于乐观并发控制）"""
+        sql = "SELECT cached_tree, cache_version FROM file_tree_cache WHERE project_id = %s"
+        self.cur.execute(sql, (project_id,))
+        result = self.cur.fetchone()
+
+        if not result or not result['cached_tree']:
+            return None, None
+
+        cached_tree = result['cached_tree']
+        if not isinstance(cached_tree, dict):
+            cached_tree = json.loads(cached_tree)
+        return cached_tree, result['cache_version']
+
+    def _save_patched_tree(self, project_id: str, tree: Dict, expected_version: int) -> Optional[int]:
+        """
+        保存补丁后的树，仅当版本号未被其他写入者修改时生效
+
+        Returns:
+            新的 cache_version；版本冲突时返回 None
+        """
+        tree_json = json.dumps(tree, ensure_ascii=False)
+
+        sql = """
+        UPDATE file_tree_cache
+        SET cached_tree = %s,
+            cache_version = cache_version + 1,
+            last_updated = %s,
+            tree_size_bytes = %s,
+            total_folders = %s,
+            total_files = %s,
+            updated_at = %s
+        WHERE project_id = %s AND cache_version = %s
+        RETURNING cache_version
+        """
+        now = datetime.now(timezone.utc)
+        self.cur.execute(sql, (
+            tree_json,
+            now,
+            len(tree_json.encode('utf-8')),
+            tree['metadata']['total_folders'],
+            tree['metadata']['total_files'],
+            now,
+            project_id,
+            expected_version
+        ))
+        result = self.cur.fetchone()
+        self.conn.commit()
+        return result['cache_version'] if result else None
+
+    def apply_delta(self, project_id: str, delta: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        按变更集增量更新缓存树
+
+        Args:
+            project_id: 项目ID
+            delta: {changed_folder_ids, changed_file_ids, deleted_folder_ids, deleted_file_ids}
+
+        Returns:
+            {'mode': 'patched' | 'rebuilt' | 'no_cache' | 'noop' | 'invalidated', ...}
+        """
+        start_time = time.time()
+        delta = self.normalize_delta(delta)
+        total_changes = sum(len(ids) for ids in delta.values())
+
+        if total_changes == 0:
+            return {'mode': 'noop'}
+
+        try:
+            tree, cache_version = self._get_cached_tree_for_patch(project_id)
+            if tree is None:
+                # 没有缓存时无需补丁，下次读取会全量构建
+                return {'mode': 'no_cache'}
+
+            if total_changes > self.PATCH_MAX_CHANGES:
+                logger.info(f"变更数 {total_changes} 超过补丁上限，全量重建")
+                return self._rebuild_for_delta(project_id, 'too_many_changes')
+
+            folder_nodes, parent_of = self._index_tree(tree)
+
+            # 文件夹：路径和父级未变的只刷新属性，其余作为子树整体替换
+            deleted_folder_ids = set(delta['deleted_folder_ids'])
+            changed_rows = self.query_folders(project_id, delta['changed_folder_ids']) \
+                if delta['changed_folder_ids'] else []
+            rows_by_id = {row['id']: row for row in changed_rows}
+
+            refresh_rows = []
+            subtree_roots = set(deleted_folder_ids)
+            for folder_id in delta['changed_folder_ids']:
+                row = rows_by_id.get(folder_id)
+                node = folder_nodes.get(folder_id)
+                if row is None:
+                    subtree_roots.add(folder_id)  # 数据库中已不存在
+                elif node is not None and node['path'] == row['path'] and parent_of[folder_id] == row['parent_id']:
+                    refresh_rows.append(row)
+                else:
+                    subtree_roots.add(folder_id)
+
+            # 只保留最上层的子树根，避免重复替换
+            def has_root_ancestor(node_id: str) -> bool:
+                parent_id = parent_of.get(node_id)
+                while parent_id is not None:
+                    if parent_id in subtree_roots:
+                        return True
+                    parent_id = parent_of.get(parent_id)
+                return False
+
+            subtree_roots = {folder_id for folder_id in subtree_roots if not has_root_ancestor(folder_id)}
+            refresh_rows = [row for row in refresh_rows
+                            if row['id'] not in subtree_roots and not has_root_ancestor(row['id'])]
+
+            subtrees = {}
+            replaced_folder_ids = set()
+            live_roots = [folder_id for folder_id in subtree_roots if folder_id not in deleted_folder_ids]
+            if live_roots:
+                sub_folders = self.query_folders(project_id, live_roots, include_descendants=True)
+                sub_folder_ids = [folder['id'] for folder in sub_folders]
+                sub_files = self.query_files(project_id, folder_ids=sub_folder_ids) if sub_folder_ids else []
+                assembled = self._assemble_subtrees(
+                    live_roots, sub_folders, sub_files,
+                    self.query_folder_custom_attributes(project_id, sub_folder_ids),
+                    self.query_custom_attributes(project_id, [f['id'] for f in sub_files])
+                )
+                parent_by_id = {folder['id']: folder['parent_id'] for folder in sub_folders}
+                replaced_folder_ids.update(sub_folder_ids)
+                for folder_id in live_roots:
+                    subtrees[folder_id] = (parent_by_id.get(folder_id), assembled.get(folder_id))
+            for folder_id in subtree_roots - set(live_roots):
+                subtrees[folder_id] = (None, None)
+
+            # 文件：子树替换已覆盖的跳过，其余逐个替换
+            file_nodes = {}
+            deleted_file_ids = set(delta['deleted_file_ids'])
+            changed_file_ids = [file_id for file_id in delta['changed_file_ids'] if file_id not in deleted_file_ids]
+            if changed_file_ids:
+                file_rows = self.query_files(project_id, file_ids=changed_file_ids)
+                file_attrs = self.query_custom_attributes(project_id, changed_file_ids)
+                found = set()
+                for file_info in file_rows:
+                    found.add(file_info['id'])
+                    if file_info.get('parent_folder_id') in replaced_folder_ids:
+                        continue
+                    file_nodes[file_info['id']] = (
+                        file_info.get('parent_folder_id'), self._format_file_node(file_info, file_attrs)
+                    )
+                deleted_file_ids.update(set(changed_file_ids) - found)
+            for file_id in deleted_file_ids:
+                file_nodes[file_id] = (None, None)
+
+            folder_attrs = self.query_folder_custom_attributes(project_id, [row['id'] for row in refresh_rows]) \
+                if refresh_rows else {}
+
+            if not self.patch_tree(tree, refresh_rows, subtrees, file_nodes, folder_attrs):
+                return self._rebuild_for_delta(project_id, 'unresolved_parent')
+
+            new_version = self._save_patched_tree(project_id, tree, cache_version)
+            if new_version is None:
+                # 并发写入导致版本冲突：清空缓存，由下次读取全量构建
+                self.invalidate_cache(project_id)
+                return {'mode': 'invalidated', 'reason': 'version_conflict'}
+
+            patch_time_ms = (time.time() - start_time) * 1000
+            logger.info(f"缓存树补丁完成 (project_id: {project_id}, 变更: {total_changes}, "
+                        f"子树: {len(subtrees)}, 耗时: {patch_time_ms:.2f}ms)")
+            return {
+                'mode': 'patched',
+                'cache_version': new_version,
+                'subtrees_replaced': len(subtrees),
+                'folders_refreshed': len(refresh_rows),
+                'files_patched': len(file_nodes),
+                'patch_time_ms': round(patch_time_ms, 2)
+            }
+
+        except Exception as e:
+            self.conn.rollback()
+            logger.error(f"缓存树补丁失败，回退全量重建: {str(e)}")
+            return self._rebuild_for_delta(project_id, 'patch_failed')
+
+    def _rebuild_for_delta(self, project_id: str, reason: str) -> Dict[str, Any]:
+        """补丁无法应用时的兜底：全量重建"""
+        tree = self.build_and_cache_tree(project_id)
+        return {'mode': 'rebuilt' if tree is not None else 'failed', 'reason': reason}
+
     def build_and_cache_tree(self, project_id: str) -> Optional[Dict]:
         """
         构建树结构并保存到缓存（昂贵操作）
@@ -542,3 +1228,79 @@ def invalidate_file_tree_cache(project_id: str, db_params: Dict[str, str]) -> bo
         return builder.invalidate_cache(project_id)
     finally:
         builder.disconnect()
+
+
+def apply_file_tree_delta(project_id: str, delta: Dict[str, Any], db_params: Dict[str, str]) -> Dict[str, Any]:
+    """
+    按变更集增量更新文件树缓存（无法补丁时全量重建）
+
+    Args:
+        project_id: 项目ID
+        delta: {changed_folder_ids, changed_file_ids, deleted_folder_ids, deleted_file_ids}
+        db_params: 数据库连接参数
+
+    Returns:
+        补丁结果，包含 mode 字段
+    """
+    builder = FileTreeBuilder(db_params)
+
+    if not builder.connect():
+        return {'mode': 'failed', 'reason': 'db_connection_failed'}
+
+    try:
+        return builder.apply_delta(project_id, delta)
+    finally:
+        builder.disconnect()
+
+
+def get_file_tree_children(project_id: str, db_params: Dict[str, str], folder_id: Optional[str] = None,
+                           cursor: Optional[str] = None, limit: int = None, depth: int = 0,
+                           if_none_match: Optional[str] = None) -> Tuple[Optional[Dict], Optional[str], bool]:
+    """
+    分页获取文件夹的直接子节点（懒加载，不读取整棵缓存树）
+
+    Args:
+        project_id: 项目ID
+        db_params: 数据库连接参数
+        folder_id: 父文件夹ID（None 表示项目根层级）
+        cursor: 分页游标
+        limit: 每页条数
+        depth: 预取深度
+        if_none_match: 客户端的 If-None-Match 请求头
+
+    Returns:
+        (page, etag, not_modified) - 命中 ETag 时 page 为 None 且 not_modified 为 True
+
+    Raises:
+        ValueError: 游标格式错误
+    """
+    builder = FileTreeBuilder(db_params)
+
+    if not builder.connect():
+        return None, None, False
+
+    try:
+        limit = max(1, min(int(limit or builder.CHILDREN_DEFAULT_LIMIT), builder.CHILDREN_MAX_LIMIT))
+        depth = max(0, min(int(depth or 0), builder.CHILDREN_MAX_PREFETCH_DEPTH))
+        if cursor:
+            builder.decode_children_cursor(cursor)
+
+        # 先比较版本，命中时不查询子节点
+        etag = None
+        version = builder.get_tree_version(project_id)
+        if version is not None:
+            etag = builder.make_children_etag(project_id, version, folder_id, cursor, limit, depth)
+            if builder.etag_matches(if_none_match, etag):
+                return None, etag, True
+
+        try:
+            page = builder.list_children(project_id, folder_id, cursor, limit, depth)
+        except Exception as e:
+            logger.error(f"查询子节点失败: {str(e)}")
+            return None, None, False
+
+        if version is not None:
+            page['cache_version'] = version['cache_version']
+        return page, etag, False
+    finally:
+        builder.disconnect()
@@ -17,6 +17,7 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
 from database_sql.neon_config import NeonConfig
+from database_sql.pg_pool import get_pooled_connection, REQUEST_STATEMENT_TIMEOUT_MS
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -35,8 +36,8 @@ class FolderFileDataAccess:
         self.db_params = neon_config.get_db_params()
 
     def get_connection(self):
-        """Get database connection"""
-        return psycopg2.connect(**self.db_params)
+        """Get database connection (from the shared pool; close() returns it)"""
+        return get_pooled_connection(self.db_params, REQUEST_STATEMENT_TIMEOUT_MS)
 
     def get_folder_permissions(self, project_id: str, folder_id: str) -> Optional[Dict]:
         """
@@ -61,7 +62,7 @@ class FolderFileDataAccess:
                     permissions,
                     permissions_sync_time
                 FROM folders
-                WHERE id = %s AND project_id = %s
+                WHERE id = %s AND project_id = %s AND deleted_at IS NULL
             """
 
             cur.execute(query, (folder_id, project_id))
@@ -188,7 +189,7 @@ class FolderFileDataAccess:
                     fv.review_state
                 FROM files f
                 LEFT JOIN file_versions fv ON f.id = fv.file_id AND fv.is_current_version = true
-                WHERE f.id = %s AND f.project_id = %s
+                WHERE f.id = %s AND f.project_id = %s AND f.deleted_at IS NULL
             """
 
             cur.execute(file_query, (file_id, project_id))
@@ -294,7 +295,7 @@ class FolderFileDataAccess:
                     last_modified_time,
                     last_modified_user_name
                 FROM files
-                WHERE id = %s AND project_id = %s
+                WHERE id = %s AND project_id = %s AND deleted_at IS NULL
             """
 
             cur.execute(file_query, (file_id, project_id))
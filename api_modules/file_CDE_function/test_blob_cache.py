@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地內容尋址文件緩存 - 測試腳本（使用臨時目錄，不訪問網絡）
+
+功能：
+1. 寫入後按任意鍵命中，記錄顯示名
+2. 中斷寫入不留下文件
+3. 相同內容只存一份
+4. 超出容量按 LRU 淘汰
+"""
+
+import os
+import sys
+import time
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from blob_cache import BlobCache
+
+VERSION_URN = 'urn:adsk.wipprod:fs.file:vf.abc?version=2'
+STORAGE_URN = 'urn:adsk.objects:os.object:wip.dm.prod/abc.pdf'
+
+
+def _store(cache, keys, data, name=None):
+    with cache.writer(keys, name=name) as writer:
+        for start in range(0, len(data), 1000):
+            writer.write(data[start:start + 1000])
+
+
+def test_write_and_lookup():
+    """測試寫入後按任意鍵命中"""
+    with tempfile.TemporaryDirectory() as root:
+        cache = BlobCache(root, max_bytes=1024 * 1024)
+        assert cache.lookup(VERSION_URN) is None
+
+        _store(cache, [VERSION_URN, STORAGE_URN], b'x' * 5000, name='A-101.pdf')
+
+        entry = cache.lookup(STORAGE_URN)
+        assert entry and entry['size'] == 5000 and entry['name'] == 'A-101.pdf'
+        with open(entry['path'], 'rb') as f:
+            assert f.read() == b'x' * 5000
+
+        stats = cache.get_stats()
+        assert stats['hits'] == 1 and stats['misses'] == 1
+        assert stats['bytes_saved'] == 5000 and stats['blob_count'] == 1
+
+
+def test_abort_leaves_nothing():
+    """測試中斷寫入時不登記、不留臨時文件"""
+    with tempfile.TemporaryDirectory() as root:
+        cache = BlobCache(root)
+        try:
+            with cache.writer([VERSION_URN]) as writer:
+                writer.write(b'partial')
+                raise ConnectionError('client went away')
+        except ConnectionError:
+            pass
+
+        assert cache.lookup(VERSION_URN) is None
+        assert os.listdir(cache.tmp_dir) == []
+        assert cache.get_stats()['blob_count'] == 0
+
+
+def test_same_content_stored_once():
+    """測試不同鍵指向相同內容時只存一份"""
+    with tempfile.TemporaryDirectory() as root:
+        cache = BlobCache(root)
+        _store(cache, ['key-1'], b'same bytes')
+        _store(cache, ['key-2'], b'same bytes')
+
+        assert cache.lookup('key-1')['digest'] == cache.lookup('key-2')['digest']
+        assert cache.get_stats()['blob_count'] == 1
+
+
+def test_lru_eviction():
+    """測試超出容量時淘汰最久未訪問的文件"""
+    with tempfile.TemporaryDirectory() as root:
+        cache = BlobCache(root, max_bytes=2500)
+        _store(cache, ['a'], b'a' * 1000)
+        time.sleep(0.01)
+        _store(cache, ['b'], b'b' * 1000)
+        time.sleep(0.01)
+        cache.lookup('a')  # a 變為最近訪問
+        time.sleep(0.01)
+        _store(cache, ['c'], b'c' * 1000)
+
+        assert cache.lookup('b') is None, "最久未訪問的 b 應被淘汰"
+        assert cache.lookup('a') and cache.lookup('c')
+        assert cache.get_stats()['evictions'] == 1
+
+        # 單個文件超過上限時不緩存
+        _store(cache, ['huge'], b'h' * 3000)
+        assert cache.lookup('huge') is None
+        assert cache.total_bytes() <= 2500
+
+
+def run_all_tests():
+    """運行所有測試"""
+    tests = [
+        test_write_and_lookup,
+        test_abort_leaves_nothing,
+        test_same_content_stored_once,
+        test_lru_eviction,
+    ]
+
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    return failed == 0
+
+
+if __name__ == '__main__':
+    sys.exit(0 if run_all_tests() else 1)
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文件下載流式轉發 - 測試腳本（模擬上游響應和緩存寫入，不訪問網絡）
+
+功能：
+1. 完整讀完後提交緩存
+2. 緩存寫入中途失敗時放棄緩存，客戶端仍收到全部內容
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from api_modules.file_CDE_function.file_download import FileDownloadManager
+
+DATA = bytes(range(256)) * 40
+
+
+class FakeUpstream:
+    def __init__(self, data):
+        self.data = data
+        self.closed = False
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.data), chunk_size):
+            yield self.data[start:start + chunk_size]
+
+    def close(self):
+        self.closed = True
+
+
+class FakeWriter:
+    """記錄寫入；fail_on 指定第幾次 write 拋出 OSError"""
+
+    def __init__(self, fail_on=None):
+        self.fail_on = fail_on
+        self.writes = 0
+        self.size = 0
+        self.committed = False
+        self.aborted = False
+
+    def write(self, chunk):
+        self.writes += 1
+        if self.writes == self.fail_on:
+            raise OSError('No space left on device')
+        self.size += len(chunk)
+
+    def commit(self):
+        self.committed = True
+
+    def abort(self):
+        self.aborted = True
+
+
+def _manager():
+    manager = FileDownloadManager.__new__(FileDownloadManager)
+    manager.STREAM_CHUNK_SIZE = 1000
+    return manager
+
+
+def _stream(writer):
+    upstream = FakeUpstream(DATA)
+    result = {'upstream': upstream, 'cache_writer': writer,
+              'headers': {'Content-Length': str(len(DATA))}}
+    body = b''.join(_manager().iter_stream(result))
+    return body, upstream
+
+
+def test_complete_stream_commits_cache():
+    """測試完整讀完且長度一致時提交緩存"""
+    writer = FakeWriter()
+    body, upstream = _stream(writer)
+
+    assert body == DATA and upstream.closed
+    assert writer.committed and not writer.aborted
+    assert writer.size == len(DATA)
+
+
+def test_cache_write_failure_keeps_streaming():
+    """測試緩存寫入中途失敗：丟棄緩存，不再寫入，客戶端仍收到每個字節"""
+    writer = FakeWriter(fail_on=2)
+    body, upstream = _stream(writer)
+
+    assert body == DATA and upstream.closed
+    assert writer.aborted and not writer.committed
+    assert writer.writes == 2
+
+
+def run_all_tests():
+    """運行所有測試"""
+    tests = [
+        test_complete_stream_commits_cache,
+        test_cache_write_failure_keeps_streaming,
+    ]
+
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    return failed == 0
+
+
+if __name__ == '__main__':
+    sys.exit(0 if run_all_tests() else 1)
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文件树懒加载子节点 - 测试脚本（不访问数据库）
+
+功能：
+1. 游标编码/解码
+2. ETag 生成与 If-None-Match 比较
+3. 分页（文件夹在前、文件在后）与预取
+"""
+
+import os
+import sys
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from file_tree_builder import FileTreeBuilder
+
+NOW = datetime(2025, 11, 16, tzinfo=timezone.utc)
+
+
+def _folder_row(folder_id, parent_id, name, has_children=False):
+    return {
+        'id': folder_id, 'project_id': 'b.p', 'name': name, 'display_name': name,
+        'parent_id': parent_id, 'path': name, 'depth': 0, 'create_time': NOW,
+        'create_user_name': 'u', 'last_modified_time': NOW, 'last_modified_user_name': 'u',
+        'hidden': False, 'has_children': has_children
+    }
+
+
+def _file_row(file_id, parent_id, name):
+    return {
+        'id': file_id, 'name': name, 'parent_folder_id': parent_id, 'folder_path': '',
+        'file_type': 'pdf', 'create_time': NOW, 'create_user_name': 'u',
+        'last_modified_user_name': 'u', 'last_modified_time': NOW, 'version_number': 1,
+        'size': 1, 'urn': f"{file_id}?version=1", 'reviewState': 'NotInReview'
+    }
+
+
+# root(None) -> A(a), B(b), x.pdf, y.pdf ; a -> a1, one.pdf
+FOLDERS = [_folder_row('a', None, 'A', True), _folder_row('b', None, 'B'), _folder_row('a1', 'a', 'A1')]
+FILES = [_file_row('x', None, 'x.pdf'), _file_row('y', None, 'y.pdf'), _file_row('f1', 'a', 'one.pdf')]
+
+
+class FakeBuilder(FileTreeBuilder):
+    """用内存数据替代数据库查询的构建器"""
+
+    def __init__(self):
+        super().__init__({})
+        self.queries = 0
+
+    def _query_child_rows(self, project_id, kind, parent_ids, per_parent, after=None):
+        self.queries += 1
+        rows = FOLDERS if kind == 'folder' else FILES
+        parent_key = 'parent_id' if kind == 'folder' else 'parent_folder_id'
+        result = {parent_id: [] for parent_id in parent_ids}
+        for row in sorted(rows, key=lambda r: (r['name'], r['id'])):
+            if row[parent_key] in result and (after is None or (row['name'], row['id']) > after):
+                if len(result[row[parent_key]]) < per_parent:
+                    result[row[parent_key]].append(dict(row))
+        return result
+
+    def query_folder_custom_attributes(self, project_id, folder_ids=None):
+        return {}
+
+    def query_custom_attributes(self, project_id, file_ids=None):
+        return {}
+
+
+class RecordingCursor:
+    """记录执行的SQL和参数，返回预设的行"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.executed = []
+
+    def execute(self, sql, params=None):
+        self.executed.append((' '.join(sql.split()), params))
+
+    def fetchall(self):
+        return self.rows
+
+
+def test_child_rows_sql():
+    """测试根层级按 depth = 0 选取（顶层文件夹的 parent_id 指向项目根文件夹），其他层级按父ID分组"""
+    builder = FileTreeBuilder({})
+
+    builder.cur = RecordingCursor([dict(_folder_row('a', 'urn:root', 'A'), rn=1)])
+    rows = builder._query_child_rows('b.p', 'folder', [None], 11)
+    [(sql, params)] = builder.cur.executed
+    assert 'WHERE fo.project_id = %s AND fo.deleted_at IS NULL AND fo.depth = 0' in sql
+    assert 'parent_id IS NULL' not in sql and 'ROW_NUMBER() OVER (ORDER BY fo.name, fo.id)' in sql
+    assert params == ['b.p', 11]
+    assert [row['id'] for row in rows[None]] == ['a'] and 'rn' not in rows[None][0]
+
+    builder.cur = RecordingCursor([_file_row('f1', 'a', 'one.pdf')])
+    rows = builder._query_child_rows('b.p', 'file', ['a', 'b'], 6, after=('n', 'i'))
+    [(sql, params)] = builder.cur.executed
+    assert 'f.parent_folder_id = ANY(%s) AND (f.name, f.id) > (%s, %s)' in sql
+    assert 'PARTITION BY f.parent_folder_id ORDER BY f.name, f.id' in sql
+    assert params == ['b.p', ['a', 'b'], 'n', 'i', 6]
+    assert [row['id'] for row in rows['a']] == ['f1'] and rows['b'] == []
+
+
+def test_cursor_roundtrip():
+    """测试游标编码/解码"""
+    cursor = FileTreeBuilder.encode_children_cursor('file', '图纸 A.pdf', 'urn:x')
+    assert FileTreeBuilder.decode_children_cursor(cursor) == ('file', '图纸 A.pdf', 'urn:x')
+
+    for bad in ('not-a-cursor', FileTreeBuilder.encode_children_cursor('other', 'n', 'i')):
+        try:
+            FileTreeBuilder.decode_children_cursor(bad)
+            assert False, f"应拒绝非法游标: {bad}"
+        except ValueError:
+            pass
+
+
+def test_etag():
+    """测试 ETag 随版本变化并支持弱比较"""
+    version = {'cache_version': 3, 'last_sync_time': NOW.isoformat()}
+    etag = FileTreeBuilder.make_children_etag('b.p', version, None, None, 200, 0)
+    assert etag.startswith('W/"')
+    assert FileTreeBuilder.etag_matches(f'"other", {etag[2:]}', etag)
+    assert not FileTreeBuilder.etag_matches(None, etag)
+
+    bumped = FileTreeBuilder.make_children_etag('b.p', {**version, 'cache_version': 4}, None, None, 200, 0)
+    assert bumped != etag
+
+
+def test_pagination_folders_then_files():
+    """测试分页：文件夹在前，文件在后，游标可跨类型继续"""
+    builder = FakeBuilder()
+
+    page1 = builder.list_children('b.p', None, limit=3)
+    assert [item['id'] for item in page1['items']] == ['a', 'b', 'x']
+    assert page1['items'][0]['has_children'] is True
+    assert page1['next_cursor'] is not None
+
+    page2 = builder.list_children('b.p', None, cursor=page1['next_cursor'], limit=3)
+    assert [item['id'] for item in page2['items']] == ['y']
+    assert page2['next_cursor'] is None
+
+
+def test_prefetch_depth():
+    """测试预取：只展开有子节点的文件夹，每层批量查询"""
+    builder = FakeBuilder()
+
+    page = builder.list_children('b.p', None, limit=10, depth=1)
+    folder_a = page['items'][0]
+    assert folder_a['children_loaded'] is True
+    assert [child['id'] for child in folder_a['children']] == ['a1', 'f1']
+    assert page['items'][1]['children_loaded'] is False
+    assert builder.queries == 4, f"预取应按层批量查询，实际 {builder.queries} 次"
+
+
+def run_all_tests():
+    """运行所有测试"""
+    tests = [
+        test_child_rows_sql,
+        test_cursor_roundtrip,
+        test_etag,
+        test_pagination_folders_then_files,
+        test_prefetch_depth,
+    ]
+
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    return failed == 0
+
+
+if __name__ == '__main__':
+    sys.exit(0 if run_all_tests() else 1)
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文件树缓存增量补丁 - 测试脚本（不访问数据库）
+
+功能：
+1. 属性刷新保留子节点
+2. 子树替换（移动/新增/删除文件夹）
+3. 文件增删改与统计更新
+4. 父文件夹缺失时要求全量重建
+"""
+
+import os
+import sys
+import copy
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from file_tree_builder import FileTreeBuilder
+
+NOW = datetime(2025, 11, 16, tzinfo=timezone.utc)
+
+
+def _folder_row(folder_id, parent_id, path, name=None):
+    return {
+        'id': folder_id, 'project_id': 'b.p', 'name': name or path.split('/')[-1],
+        'display_name': name or path.split('/')[-1], 'parent_id': parent_id, 'path': path,
+        'depth': path.count('/'), 'create_time': NOW, 'create_user_name': 'u',
+        'last_modified_time': NOW, 'last_modified_user_name': 'u', 'hidden': False
+    }
+
+
+def _file_row(file_id, parent_id, folder_path, name):
+    return {
+        'id': file_id, 'name': name, 'parent_folder_id': parent_id, 'folder_path': folder_path,
+        'file_type': 'pdf', 'create_time': NOW, 'create_user_name': 'u',
+        'last_modified_user_name': 'u', 'last_modified_time': NOW, 'version_number': 1,
+        'size': 1, 'urn': f"{file_id}?version=1", 'reviewState': 'NotInReview'
+    }
+
+
+def _base_tree(builder):
+    folders = [
+        _folder_row('root', None, 'Project Files'),
+        _folder_row('a', 'root', 'Project Files/A'),
+        _folder_row('b', 'root', 'Project Files/B'),
+        _folder_row('a1', 'a', 'Project Files/A/A1'),
+    ]
+    files = [
+        _file_row('f1', 'a', 'Project Files/A', 'one.pdf'),
+        _file_row('f2', 'a1', 'Project Files/A/A1', 'two.pdf'),
+        _file_row('f3', 'b', 'Project Files/B', 'three.pdf'),
+    ]
+    return builder.build_tree_from_paths(folders, files)
+
+
+def _ids(node):
+    return sorted(child['id'] for child in node['children'])
+
+
+def test_refresh_keeps_children():
+    """测试属性刷新保留子节点"""
+    builder = FileTreeBuilder({})
+    tree = _base_tree(builder)
+
+    renamed = _folder_row('a', 'root', 'Project Files/A', name='A')
+    renamed['hidden'] = True
+    assert builder.patch_tree(tree, [renamed], {}, {})
+
+    folder_nodes, _ = builder._index_tree(tree)
+    assert folder_nodes['a']['hidden'] is True
+    assert _ids(folder_nodes['a']) == ['a1', 'f1']
+
+
+def test_subtree_move_and_delete():
+    """测试子树移动与删除"""
+    builder = FileTreeBuilder({})
+    tree = _base_tree(builder)
+
+    # a1 移动到 b 下
+    moved = builder._assemble_subtrees(
+        ['a1'],
+        [_folder_row('a1', 'b', 'Project Files/B/A1')],
+        [_file_row('f2', 'a1', 'Project Files/B/A1', 'two.pdf')],
+        {}, {}
+    )
+    subtrees = {'a1': ('b', moved['a1']), 'a': (None, None)}
+    assert builder.patch_tree(tree, [], subtrees, {})
+
+    folder_nodes, parent_of = builder._index_tree(tree)
+    assert 'a' not in folder_nodes and 'f1' not in parent_of, "删除的子树仍然存在"
+    assert parent_of['a1'] == 'b'
+    assert folder_nodes['a1']['path'] == 'Project Files/B/A1'
+    assert tree['metadata']['total_folders'] == 3
+    assert tree['metadata']['total_files'] == 2
+
+
+def test_file_changes():
+    """测试文件增删改"""
+    builder = FileTreeBuilder({})
+    tree = _base_tree(builder)
+
+    new_file = builder._format_file_node(_file_row('f4', 'b', 'Project Files/B', 'four.pdf'), {})
+    updated = builder._format_file_node(_file_row('f1', 'a', 'Project Files/A', 'one-v2.pdf'), {})
+    file_nodes = {'f4': ('b', new_file), 'f1': ('a', updated), 'f3': (None, None)}
+    assert builder.patch_tree(tree, [], {}, file_nodes)
+
+    folder_nodes, _ = builder._index_tree(tree)
+    assert _ids(folder_nodes['b']) == ['f4']
+    names = [child['name'] for child in folder_nodes['a']['children'] if child['type'] == 'file']
+    assert names == ['one-v2.pdf']
+    assert tree['metadata']['total_files'] == 3
+
+
+def test_missing_parent_requires_rebuild():
+    """测试父文件夹不在缓存中时返回 False"""
+    builder = FileTreeBuilder({})
+    tree = _base_tree(builder)
+    original = copy.deepcopy(tree['root'])
+
+    orphan = builder._format_file_node(_file_row('f9', 'zzz', 'Elsewhere', 'nine.pdf'), {})
+    assert builder.patch_tree(tree, [], {}, {'f9': ('zzz', orphan)}) is False
+    assert tree['root'] == original
+
+
+def test_normalize_delta():
+    """测试变更集规范化"""
+    delta = FileTreeBuilder.normalize_delta({'changed_file_ids': ['x', 'x', 'y'], 'project_id': 'p'})
+    assert delta['changed_file_ids'] == ['x', 'y']
+    assert delta['deleted_folder_ids'] == []
+
+
+def run_all_tests():
+    """运行所有测试"""
+    tests = [
+        test_refresh_keeps_children,
+        test_subtree_move_and_delete,
+        test_file_changes,
+        test_missing_parent_requires_rebuild,
+        test_normalize_delta,
+    ]
+
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    return failed == 0
+
+
+if __name__ == '__main__':
+    sys.exit(0 if run_all_tests() else 1)
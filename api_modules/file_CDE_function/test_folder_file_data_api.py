@@ -126,6 +126,7 @@ def test_get_file_custom_attributes():
             FROM files
             WHERE project_id = %s
               AND parent_folder_id = %s
+              AND deleted_at IS NULL
             LIMIT 1
         """, (PROJECT_ID, FOLDER_ID))
 
@@ -4,8 +4,10 @@
 专门处理文件数据的数据库同步功能，支持全量同步和增量同步
 """
 
+import os
 import time
 import logging
+import threading
 from datetime import datetime, timezone, timedelta
 import pytz
 from flask import Blueprint, jsonify, request
@@ -1648,6 +1650,67 @@ batch_sync_manager = BatchOptimizedSyncManager(batch_size=100, api_delay=0.2)
 incremental_sync_manager = IncrementalSyncManager(batch_size=100, api_delay=0.2)
 
 
+# ============================================================================
+# 后台同步执行器：限制同时执行的同步数，同一项目同时只保留一个同步
+# ============================================================================
+
+MONGO_SYNC_MAX_WORKERS = int(os.getenv('MONGO_SYNC_MAX_WORKERS', 2))
+_sync_executor = ThreadPoolExecutor(max_workers=MONGO_SYNC_MAX_WORKERS, thread_name_prefix='mongo-sync')
+_active_syncs: Dict[str, Dict[str, Any]] = {}
+_active_syncs_lock = threading.Lock()
+
+
+def _get_active_sync(project_id: str) -> dict:
+    """项目排队中或执行中的同步，没有时返回None"""
+    with _active_syncs_lock:
+        entry = _active_syncs.get(project_id)
+        if entry is not None and not entry['future'].done():
+            return entry
+        return None
+
+
+def _submit_project_sync(project_id: str, task_id: str, sync_type: str, target) -> Tuple[dict, bool]:
+    """
+    提交后台同步到执行器
+
+    Returns:
+        (任务信息, 是否合并到已有同步)
+    """
+    with _active_syncs_lock:
+        entry = _active_syncs.get(project_id)
+        if entry is not None and not entry['future'].done():
+            return entry, True
+        future = _sync_executor.submit(target)
+        entry = {'task_id': task_id, 'sync_type': sync_type, 'future': future}
+        _active_syncs[project_id] = entry
+
+    def release(done_future):
+        with _active_syncs_lock:
+            if _active_syncs.get(project_id, {}).get('future') is done_future:
+                _active_syncs.pop(project_id, None)
+
+    future.add_done_callback(release)
+    return entry, False
+
+
+def _sync_state(entry: dict) -> str:
+    return "running" if entry['future'].running() else "queued"
+
+
+def _coalesced_sync_response(entry: dict):
+    """项目已有同步在排队或执行时，返回已有任务"""
+    return jsonify({
+        "success": True,
+        "message": "该项目已有同步在进行中，请求已合并",
+        "data": {
+            "task_id": entry['task_id'],
+            "status": _sync_state(entry),
+            "sync_type": entry['sync_type'],
+            "coalesced": True
+        }
+    }), 202
+
+
 def _force_cleanup_running_tasks(project_id: str) -> dict:
     """
     强制清理项目的所有运行中任务
@@ -1867,6 +1930,11 @@ def unified_sync_project_api(project_id):
         
         logger.info(f"開始{sync_type}項目 {project_id}: maxDepth={max_depth}, batchSize={batch_size}")
         
+        # 该项目已有同步在排队或执行时直接合并，不再清理其任务记录
+        active_sync = _get_active_sync(project_id)
+        if active_sync is not None:
+            return _coalesced_sync_response(active_sync)
+        
         # 🧹 强制清理该项目的所有运行中任务
         cleanup_result = _force_cleanup_running_tasks(project_id)
         logger.info(f"强制清理运行中任务: {cleanup_result}")
@@ -1890,8 +1958,6 @@ def unified_sync_project_api(project_id):
 
 def _execute_full_sync(project_id, task_id, max_depth, include_custom_attributes, batch_size, api_delay):
     """執行全量同步"""
-    import threading
-    
     def run_full_sync():
         try:
             from datetime import datetime
@@ -1949,17 +2015,17 @@ def _execute_full_sync(project_id, task_id, max_depth, include_custom_attributes
             except ImportError:
                 pass
     
-    # 启动后台线程
-    sync_thread = threading.Thread(target=run_full_sync)
-    sync_thread.daemon = True
-    sync_thread.start()
+    # 提交到后台同步执行器
+    entry, coalesced = _submit_project_sync(project_id, task_id, "full_sync", run_full_sync)
+    if coalesced:
+        return _coalesced_sync_response(entry)
     
     return jsonify({
         "success": True,
         "message": "全量同步已启动",
         "data": {
             "task_id": task_id,
-            "status": "running",
+            "status": _sync_state(entry),
             "sync_type": "full_sync",
             "optimization_info": {
                 "batch_size": batch_size,
@@ -1970,8 +2036,6 @@ def _execute_full_sync(project_id, task_id, max_depth, include_custom_attributes
 
 def _execute_incremental_sync(project_id, task_id, max_depth, include_custom_attributes, batch_size, api_delay):
     """執行增量同步"""
-    import threading
-    
     def run_incremental_sync():
         try:
             from datetime import datetime
@@ -2026,17 +2090,17 @@ def _execute_incremental_sync(project_id, task_id, max_depth, include_custom_att
             except ImportError:
                 pass
     
-    # 启动后台线程
-    sync_thread = threading.Thread(target=run_incremental_sync)
-    sync_thread.daemon = True
-    sync_thread.start()
+    # 提交到后台同步执行器
+    entry, coalesced = _submit_project_sync(project_id, task_id, "incremental_sync", run_incremental_sync)
+    if coalesced:
+        return _coalesced_sync_response(entry)
     
     return jsonify({
         "success": True,
         "message": "增量同步已启动",
         "data": {
             "task_id": task_id,
-            "status": "running",
+            "status": _sync_state(entry),
             "sync_type": "incremental_sync",
             "optimization_info": {
                 "batch_size": batch_size,
@@ -2167,6 +2231,11 @@ def batch_sync_project_api(project_id):
         sync_mode = "全量同步" if is_full_sync else "增量同步"
         logger.info(f"开始批量优化{sync_mode}项目 {project_id}: maxDepth={max_depth}, batchSize={batch_size}, isFullSync={is_full_sync}")
         
+        # 该项目已有同步在排队或执行时直接合并
+        active_sync = _get_active_sync(project_id)
+        if active_sync is not None:
+            return _coalesced_sync_response(active_sync)
+        
         # 🧹 强制清理该项目的所有运行中任务
         cleanup_result = _force_cleanup_running_tasks(project_id)
         logger.info(f"强制清理运行中任务: {cleanup_result}")
@@ -2176,8 +2245,6 @@ def batch_sync_project_api(project_id):
         task_id = str(uuid.uuid4())
         
         # 立即返回任务ID，同步在后台执行
-        import threading
-        
         def run_batch_sync():
             try:
                 from datetime import datetime
@@ -2237,10 +2304,12 @@ def batch_sync_project_api(project_id):
                 except ImportError:
                     logger.warning("Task tracking system not available")
         
-        # 启动后台线程
-        sync_thread = threading.Thread(target=run_batch_sync)
-        sync_thread.daemon = True
-        sync_thread.start()
+        # 提交到后台同步执行器
+        entry, coalesced = _submit_project_sync(
+            project_id, task_id, "full_sync" if is_full_sync else "batch_optimized_sync", run_batch_sync
+        )
+        if coalesced:
+            return _coalesced_sync_response(entry)
         
         # 立即返回任务信息
         return jsonify({
@@ -2248,7 +2317,7 @@ def batch_sync_project_api(project_id):
             "message": f"批量优化{sync_mode}已启动",
             "data": {
                 "task_id": task_id,
-                "status": "running",
+                "status": _sync_state(entry),
                 "optimization_info": {
                     "batch_size": batch_size,
                     "api_delay": api_delay,
@@ -8,8 +8,7 @@ import asyncio
 import asyncpg
 import requests
 import json
-import time
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import List, Dict, Optional, Tuple
 import logging
 import sys
@@ -21,6 +20,7 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import config
 import utils
 from database_sql.neon_config import NeonConfig
+from api_modules.acc_http_client import AdaptiveConcurrency, get_acc_client
 
 # 设置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -29,6 +29,9 @@ logger = logging.getLogger(__name__)
 # 固定的项目 ID
 DEFAULT_PROJECT_ID = "b.1eea4119-3553-4167-b93d-3a3d5d07d33d"
 
+# 同时在途的权限请求上限（实际并发由 AdaptiveConcurrency 按限流情况调整）
+DEFAULT_MAX_IN_FLIGHT = 8
+
 
 class PermissionLevel:
     """权限级别定义"""
@@ -97,63 +100,102 @@ def determine_permission_level(actions: List[str]) -> Dict:
     }
 
 
+def _permissions_api_url(project_id: str, folder_id: str) -> str:
+    """构建文件夹权限 API URL"""
+    clean_proj_id = clean_project_id(project_id)
+    return f"{config.AUTODESK_API_BASE}/bim360/docs/v1/projects/{clean_proj_id}/folders/{folder_id}/permissions"
+
+
+def _permissions_result(status_code: int, data, text: str, api_url: str, retrieved_at: datetime) -> Dict:
+    """把权限 API 的响应转换为统一的结果字典（同步 / 异步版本共用）"""
+    if status_code == 200:
+        return {
+            "status": "success",
+            "data": data,
+            "api_url": api_url,
+            "retrieved_at": retrieved_at.isoformat()
+        }
+
+    elif status_code == 403:
+        return {
+            "status": "error",
+            "error": "权限不足，需要VIEW权限才能查看文件夹权限",
+            "error_code": "INSUFFICIENT_PERMISSIONS",
+            "http_status": 403
+        }
+
+    elif status_code == 404:
+        return {
+            "status": "error",
+            "error": "Project or folder does not exist",
+            "error_code": "NOT_FOUND",
+            "http_status": 404
+        }
+
+    elif status_code == 429:
+        return {
+            "status": "error",
+            "error": "请求过于频繁，请稍后重试",
+            "error_code": "RATE_LIMIT",
+            "http_status": 429
+        }
+
+    else:
+        return {
+            "status": "error",
+            "error": f"API调用失败: HTTP {status_code}",
+            "details": (text or "")[:500],
+            "error_code": "API_ERROR",
+            "http_status": status_code
+        }
+
+
 def get_folder_permissions_from_api(project_id: str, folder_id: str, headers: Dict) -> Dict:
     """
     从官方API获取文件夹权限信息
     """
     try:
-        # 清理项目ID
-        clean_proj_id = clean_project_id(project_id)
+        api_url = _permissions_api_url(project_id, folder_id)
+        retrieved_at = datetime.now(timezone.utc)
 
-        # 构建API URL
-        api_url = f"{config.AUTODESK_API_BASE}/bim360/docs/v1/projects/{clean_proj_id}/folders/{folder_id}/permissions"
+        response = get_acc_client().request_sync('GET', api_url, headers=headers, timeout=(10, 30))
+        data = response.json() if response.status_code == 200 else None
 
-        response = requests.get(api_url, headers=headers, timeout=(10, 30))
+        return _permissions_result(response.status_code, data, response.text, api_url, retrieved_at)
 
-        if response.status_code == 200:
-            permissions_data = response.json()
+    except requests.exceptions.Timeout:
+        return {
+            "status": "error",
+            "error": "API请求超时",
+            "error_code": "TIMEOUT"
+        }
+    except Exception as e:
+        return {
+            "status": "error",
+            "error": f"调用权限API时出错: {str(e)}",
+            "error_code": "EXCEPTION"
+        }
 
-            return {
-                "status": "success",
-                "data": permissions_data,
-                "api_url": api_url,
-                "retrieved_at": datetime.now().isoformat()
-            }
 
-        elif response.status_code == 403:
-            return {
-                "status": "error",
-                "error": "权限不足，需要VIEW权限才能查看文件夹权限",
-                "error_code": "INSUFFICIENT_PERMISSIONS",
-                "http_status": 403
-            }
+async def get_folder_permissions_async(project_id: str, folder_id: str, headers: Dict,
+                                       session=None) -> Dict:
+    """
+    异步获取文件夹权限信息（经共享 ACC 客户端限流、重试）
 
-        elif response.status_code == 404:
-            return {
-                "status": "error",
-                "error": "Project or folder does not exist",
-                "error_code": "NOT_FOUND",
-                "http_status": 404
-            }
+    返回与 get_folder_permissions_from_api 相同的结果字典，另带 "attempts"（请求次数），
+    供调用方判断是否发生了限流 / 重试。
+    """
+    try:
+        api_url = _permissions_api_url(project_id, folder_id)
+        retrieved_at = datetime.now(timezone.utc)
 
-        elif response.status_code == 429:
-            return {
-                "status": "error",
-                "error": "请求过于频繁，请稍后重试",
-                "error_code": "RATE_LIMIT",
-                "http_status": 429
-            }
+        response = await get_acc_client().request('GET', api_url, headers=headers, session=session)
 
-        else:
-            return {
-                "status": "error",
-                "error": f"API调用失败: HTTP {response.status_code}",
-                "details": response.text[:500],
-                "error_code": "API_ERROR",
-                "http_status": response.status_code
-            }
+        result = _permissions_result(response.status, response.data, response.text, api_url, retrieved_at)
+        result["attempts"] = response.attempts
+        return result
 
-    except requests.exceptions.Timeout:
+    except asyncio.TimeoutError:
         return {
             "status": "error",
             "error": "API请求超时",
@@ -287,18 +329,26 @@ class PermissionsDatabaseSync:
             await self.pool.close()
             logger.info("数据库连接池已关闭")
 
-    async def get_all_folder_ids(self) -> List[Tuple[str, str]]:
+    async def get_all_folder_ids(self, only_changed: bool = False) -> List[Tuple[str, str, str]]:
         """
-        从数据库获取所有文件夹的 ID 和名称
-        返回: [(folder_id, folder_name), ...]
+        从数据库获取文件夹的 ID、名称和路径
+        only_changed: 只返回从未同步过权限，或 last_modified_time_rollup 晚于上次权限同步时间的文件夹
+        返回: [(folder_id, folder_name, folder_path), ...]
         """
         async with self.pool.acquire() as conn:
             rows = await conn.fetch("""
                 SELECT id, name, path
                 FROM folders
                 WHERE project_id = $1
+                  AND deleted_at IS NULL
+                  AND (
+                      NOT $2
+                      OR permissions_sync_time IS NULL
+                      OR last_modified_time_rollup IS NULL
+                      OR last_modified_time_rollup > permissions_sync_time
+                  )
                 ORDER BY depth, name
-            """, self.project_id)
+            """, self.project_id, only_changed)
 
             return [(row['id'], row['name'], row['path']) for row in rows]
 
@@ -320,45 +370,94 @@ class PermissionsDatabaseSync:
             datetime.now(),
             folder_id)
 
-    async def batch_update_permissions(self, updates: List[Tuple[str, Dict]]):
+    async def batch_update_permissions(self, updates: List[Tuple]):
         """
         批量更新文件夹权限
-        updates: [(folder_id, permissions_json), ...]
+        updates: [(folder_id, permissions_json), ...] 或 [(folder_id, permissions_json, synced_at), ...]
+        synced_at 为获取权限的时间，省略时使用当前时间
         """
         if not updates:
             return
 
+        now = datetime.now(timezone.utc)
+        rows = [
+            (json.dumps(update[1], ensure_ascii=False),
+             update[2] if len(update) > 2 else now,
+             now,
+             update[0])
+            for update in updates
+        ]
+
         async with self.pool.acquire() as conn:
             # 使用事务进行批量更新
             async with conn.transaction():
-                for folder_id, permissions_json in updates:
-                    await conn.execute("""
-                        UPDATE folders
-                        SET
-                            permissions = $1::jsonb,
-                            permissions_sync_time = $2,
-                            updated_at = $3
-                        WHERE id = $4
-                    """,
-                    json.dumps(permissions_json, ensure_ascii=False),
-                    datetime.now(),
-                    datetime.now(),
-                    folder_id)
+                await conn.executemany("""
+                    UPDATE folders
+                    SET
+                        permissions = $1::jsonb,
+                        permissions_sync_time = $2,
+                        updated_at = $3
+                    WHERE id = $4
+                """, rows)
 
         logger.info(f"批量更新了 {len(updates)} 个文件夹的权限")
 
-    async def sync_all_permissions(self, batch_size: int = 50, delay: float = 0.2):
+    def _record_permissions_result(self, folder: Tuple[str, str, str], permissions_result: Dict,
+                                   updates: List[Tuple]):
+        """统计单个文件夹的结果，成功的加入待写入列表"""
+        folder_id, folder_name, folder_path = folder
+
+        if permissions_result["status"] == "success":
+            # 解析权限数据
+            parsed_permissions = parse_permissions_data(permissions_result["data"])
+
+            # 添加同步时间
+            parsed_permissions["sync_time"] = permissions_result["retrieved_at"]
+
+            # 以获取时间作为 permissions_sync_time，获取之后发生的变化下次增量同步仍会拉取
+            synced_at = datetime.fromisoformat(permissions_result["retrieved_at"])
+            updates.append((folder_id, parsed_permissions, synced_at))
+
+            # 更新统计
+            self.stats["successful_syncs"] += 1
+            self.stats["total_users"] += parsed_permissions["summary"]["users_count"]
+            self.stats["total_roles"] += parsed_permissions["summary"]["roles_count"]
+            self.stats["total_companies"] += parsed_permissions["summary"]["companies_count"]
+
+        else:
+            # 记录错误
+            error_info = {
+                "folder_id": folder_id,
+                "folder_name": folder_name,
+                "folder_path": folder_path,
+                "error": permissions_result.get("error"),
+                "error_code": permissions_result.get("error_code"),
+                "http_status": permissions_result.get("http_status")
+            }
+            self.stats["errors"].append(error_info)
+            self.stats["failed_syncs"] += 1
+
+            logger.warning(f"获取文件夹 {folder_name} 权限失败: {permissions_result.get('error')}")
+
+    async def sync_all_permissions(self, batch_size: int = 50, max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+                                   incremental: bool = False):
         """
         同步所有文件夹的权限到数据库
 
+        多个协程并发请求权限 API，同时在途的请求数由 AdaptiveConcurrency 控制：
+        遇到 429 / 重试时减半，顺利时逐步恢复到 max_in_flight；请求速率由共享 ACC 客户端的令牌桶限制。
+        获取到的权限每满 batch_size 个即写入数据库。
+
         参数:
             batch_size: 每批次更新的文件夹数量
-            delay: API 调用之间的延迟（秒），避免限流
+            max_in_flight: 同时在途的 API 请求上限
+            incremental: 只同步 last_modified_time_rollup 晚于上次权限同步时间的文件夹
         """
         self.stats["start_time"] = datetime.now()
+        self.stats["incremental"] = incremental
 
         # 获取 access token
-        access_token = utils.get_access_token()
+        access_token = await utils.get_token()
         if not access_token:
             raise Exception("未找到 Access Token，请先进行认证")
 
@@ -367,70 +466,64 @@ class PermissionsDatabaseSync:
             "Content-Type": "application/json"
         }
 
-        # 获取所有文件夹 ID
-        logger.info("正在从数据库获取所有文件夹...")
-        folders = await self.get_all_folder_ids()
+        # 获取需要同步的文件夹
+        logger.info(f"正在从数据库获取{'有变化的' if incremental else '所有'}文件夹...")
+        folders = await self.get_all_folder_ids(only_changed=incremental)
         self.stats["total_folders"] = len(folders)
 
         if not folders:
-            logger.warning("数据库中没有找到文件夹")
+            logger.warning("没有需要同步权限的文件夹")
             return self.stats
 
-        logger.info(f"找到 {len(folders)} 个文件夹，开始同步权限...")
-
-        # 准备批量更新
-        updates = []
-
-        for i, (folder_id, folder_name, folder_path) in enumerate(folders):
-            logger.info(f"同步文件夹权限 ({i+1}/{len(folders)}): {folder_name}")
-
-            # 调用 API 获取权限
-            permissions_result = get_folder_permissions_from_api(
-                self.project_id, folder_id, headers
-            )
-
-            if permissions_result["status"] == "success":
-                # 解析权限数据
-                parsed_permissions = parse_permissions_data(permissions_result["data"])
-
-                # 添加同步时间
-                parsed_permissions["sync_time"] = permissions_result["retrieved_at"]
-
-                # 添加到批量更新列表
-                updates.append((folder_id, parsed_permissions))
-
-                # 更新统计
-                self.stats["successful_syncs"] += 1
-                self.stats["total_users"] += parsed_permissions["summary"]["users_count"]
-                self.stats["total_roles"] += parsed_permissions["summary"]["roles_count"]
-                self.stats["total_companies"] += parsed_permissions["summary"]["companies_count"]
-
-            else:
-                # 记录错误
-                error_info = {
-                    "folder_id": folder_id,
-                    "folder_name": folder_name,
-                    "folder_path": folder_path,
-                    "error": permissions_result.get("error"),
-                    "error_code": permissions_result.get("error_code"),
-                    "http_status": permissions_result.get("http_status")
-                }
-                self.stats["errors"].append(error_info)
-                self.stats["failed_syncs"] += 1
-
-                logger.warning(f"获取文件夹 {folder_name} 权限失败: {permissions_result.get('error')}")
-
-            # 批量更新数据库
-            if len(updates) >= batch_size:
-                await self.batch_update_permissions(updates)
-                updates = []
-
-            # 添加延迟避免 API 限流
-            time.sleep(delay)
+        logger.info(f"找到 {len(folders)} 个文件夹，开始同步权限（最大并发 {max_in_flight}）...")
+
+        pending: asyncio.Queue = asyncio.Queue()
+        for folder in folders:
+            pending.put_nowait(folder)
+
+        limiter = AdaptiveConcurrency(max_in_flight)
+        updates: List[Tuple] = []
+        completed = 0
+
+        async def flush():
+            nonlocal updates
+            batch, updates = updates, []
+            await self.batch_update_permissions(batch)
+
+        async def worker(session):
+            nonlocal completed
+            while True:
+                try:
+                    folder = pending.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+
+                await limiter.acquire()
+                congested = True
+                try:
+                    permissions_result = await get_folder_permissions_async(
+                        self.project_id, folder[0], headers, session=session
+                    )
+                    congested = (permissions_result.get("attempts", 1) > 1
+                                 or permissions_result.get("http_status") == 429)
+                finally:
+                    await limiter.release(congested)
+
+                self._record_permissions_result(folder, permissions_result, updates)
+
+                completed += 1
+                if completed % 50 == 0 or completed == len(folders):
+                    logger.info(f"权限同步进度: {completed}/{len(folders)}（当前并发上限 {int(limiter.limit)}）")
+
+                # 批量更新数据库
+                if len(updates) >= batch_size:
+                    await flush()
+
+        async with get_acc_client().session_scope() as session:
+            await asyncio.gather(*(worker(session) for _ in range(min(max_in_flight, len(folders)))))
 
         # 处理剩余的更新
-        if updates:
-            await self.batch_update_permissions(updates)
+        await flush()
 
         self.stats["end_time"] = datetime.now()
         duration = (self.stats["end_time"] - self.stats["start_time"]).total_seconds()
@@ -450,7 +543,8 @@ class PermissionsDatabaseSync:
         return self.stats
 
 
-async def run_permissions_sync(project_id: str = DEFAULT_PROJECT_ID):
+async def run_permissions_sync(project_id: str = DEFAULT_PROJECT_ID, batch_size: int = 50,
+                               max_in_flight: int = DEFAULT_MAX_IN_FLIGHT, incremental: bool = False):
     """
     运行权限同步的主函数
     """
@@ -458,7 +552,8 @@ async def run_permissions_sync(project_id: str = DEFAULT_PROJECT_ID):
 
     try:
         await syncer.connect()
-        stats = await syncer.sync_all_permissions()
+        stats = await syncer.sync_all_permissions(batch_size=batch_size, max_in_flight=max_in_flight,
+                                                  incremental=incremental)
         return stats
 
     except Exception as e:
@@ -496,10 +591,15 @@ if __name__ == "__main__":
         help='Batch size for folder updates (default: 50)'
     )
     parser.add_argument(
-        '--delay',
-        type=float,
-        default=0.2,
-        help='Delay in seconds between API calls (default: 0.2)'
+        '--max-in-flight',
+        type=int,
+        default=DEFAULT_MAX_IN_FLIGHT,
+        help=f'Maximum concurrent permission requests (default: {DEFAULT_MAX_IN_FLIGHT})'
+    )
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help='Only sync folders whose last_modified_time_rollup changed since the last permissions sync'
     )
 
     args = parser.parse_args()
@@ -507,7 +607,12 @@ if __name__ == "__main__":
     print(f"Starting permissions sync for project {args.project_id}...")
 
     try:
-        stats = asyncio.run(run_permissions_sync(args.project_id))
+        stats = asyncio.run(run_permissions_sync(
+            args.project_id,
+            batch_size=args.batch_size,
+            max_in_flight=args.max_in_flight,
+            incremental=args.incremental
+        ))
 
         # Output final stats
         print("\nSync results:")
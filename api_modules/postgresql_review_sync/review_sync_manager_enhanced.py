@@ -17,7 +17,7 @@
 
 import sys
 import os
-from typing import Dict, List, Optional, Any, Tuple
+from typing import Dict, List, Optional, Any, Set, Tuple
 from datetime import datetime, timezone, timedelta
 import uuid
 import json
@@ -25,6 +25,7 @@ import time
 import asyncio
 import aiohttp
 import threading
+from concurrent.futures import ThreadPoolExecutor
 from functools import wraps, partial
 from dataclasses import dataclass, asdict
 from collections import defaultdict
@@ -56,6 +57,9 @@ except ImportError:
         NeonConfig = None
         psycopg2 = None
 
+# 共享的 ACC HTTP 客户端（分组限流、429/5xx 重试、keep-alive 连接池）
+from api_modules.acc_http_client import get_acc_client
+
 # cachetools 缓存
 try:
     from cachetools import TTLCache
@@ -64,6 +68,9 @@ except ImportError:
     CACHETOOLS_AVAILABLE = False
     print("Warning: cachetools not available, caching disabled. Install with: pip install cachetools")
 
+# 增量同步：按 updatedAt 倒序分页时，越过水位线再多看这段时间，容忍时钟偏差和同一时刻的多次更新
+REVIEW_WATERMARK_OVERLAP = timedelta(minutes=5)
+
 
 # ============================================================================
 # 性能监控数据结构
@@ -255,7 +262,9 @@ class EnhancedReviewSyncManager:
         enable_cache: bool = True,
         cache_ttl: int = 3600,
         cache_max_size: int = 1000,
-        batch_size: int = 100
+        batch_size: int = 100,
+        write_batch_size: int = 20,
+        pipeline_queue_size: int = 50
     ):
         """
         初始化增强同步管理器
@@ -267,10 +276,14 @@ class EnhancedReviewSyncManager:
             cache_ttl: 缓存过期时间（秒）
             cache_max_size: 缓存最大条目数（推荐：1000-10000）
             batch_size: 批量操作大小
+            write_batch_size: 写库阶段每批最多合并的评审数
+            pipeline_queue_size: 抓取与写库之间的队列长度（决定内存中最多保留多少评审详情）
         """
         self.da = data_access or ReviewDataAccess()
         self.max_concurrent = max_concurrent
         self.batch_size = batch_size
+        self.write_batch_size = write_batch_size
+        self.pipeline_queue_size = pipeline_queue_size
         
         # 账户同步功能已移除，现在使用独立的 account_sync.py
         
@@ -399,6 +412,7 @@ class EnhancedReviewSyncManager:
         method: str,
         url: str,
         headers: Optional[Dict] = None,
+        use_cache: bool = True,
         **kwargs
     ) -> Optional[Dict]:
         """
@@ -408,6 +422,7 @@ class EnhancedReviewSyncManager:
             session: aiohttp会话
             method: HTTP方法
             url: URL
+            use_cache: 是否读取内存缓存（增量同步列表页需要实时数据）
             **kwargs: 其他参数
             
         Returns:
@@ -417,12 +432,16 @@ class EnhancedReviewSyncManager:
         if not self.check_circuit_breaker():
             raise Exception("断路器已打开，API调用被阻止")
         
-        # 检查缓存
+        # 检查缓存（分页参数不同的请求不能共用缓存）
+        params = kwargs.get('params')
         cache_key = f"{method}:{url}"
-        cached = self.cache.get('api', cache_key)
-        if cached:
-            self.metrics.cache_hits += 1
-            return cached
+        if params:
+            cache_key += '?' + json.dumps(params, sort_keys=True)
+        if use_cache:
+            cached = self.cache.get('api', cache_key)
+            if cached:
+                self.metrics.cache_hits += 1
+                return cached
         
         self.metrics.cache_misses += 1
         
@@ -732,7 +751,11 @@ class EnhancedReviewSyncManager:
         show_progress: bool = True
     ) -> Dict[str, Any]:
         """
-        异步并行同步评审（使用asyncio）
+        异步并行同步评审（抓取与写库流水线）
+        
+        max_concurrent 个抓取协程把评审详情放入有界队列，写库协程按批取出，
+        在专用线程里执行 psycopg2 写入。抓取和写库同时进行，
+        内存中最多保留 pipeline_queue_size + max_concurrent 个评审详情。
         
         Args:
             api_client: API客户端
@@ -746,8 +769,9 @@ class EnhancedReviewSyncManager:
         total = len(reviews)
         
         if show_progress:
-            print(f"\n[ASYNC] Starting parallel async sync for {total} reviews...")
-            print(f"   Max concurrent: {self.max_concurrent}")
+            print(f"\n[ASYNC] Starting pipelined sync for {total} reviews...")
+            print(f"   Max concurrent: {self.max_concurrent}, queue: {self.pipeline_queue_size}, "
+                  f"write batch: {self.write_batch_size}")
             print("=" * 60)
         
         start_time = time.time()
@@ -755,8 +779,14 @@ class EnhancedReviewSyncManager:
         # 设置当前项目ID供其他方法使用
         self._current_project_id = project_id
         
+        loop = asyncio.get_running_loop()
+        
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.pipeline_queue_size)
+        progress = {'fetched': 0, 'written': 0, 'fetch_failed': 0, 'db_time': 0.0}
+        write_totals = {'inserted': 0, 'updated': 0, 'file_versions': 0, 'progress_steps': 0}
+        
         # 创建异步HTTP会话
-        async with aiohttp.ClientSession() as session:
+        async with get_acc_client().limited_session() as session:
             # Step 1: Pre-fetch all workflows and build cache
             if show_progress:
                 print(f"\n[OPTIMIZE] Pre-fetching workflow cache...")
@@ -786,110 +816,151 @@ class EnhancedReviewSyncManager:
                 if saved_calls > 0:
                     print(f"   [OPTIMIZE] Expected to save {saved_calls} workflow API calls (savings: {saved_calls/total_workflow_calls*100:.1f}%)")
             
-            # 创建信号量限制并发
             semaphore = asyncio.Semaphore(self.max_concurrent)
+            pending = iter(reviews)
+            
+            async def fetch_worker():
+                # 固定数量的抓取协程：队列满时阻塞，不会继续抓取新的评审
+                for review in pending:
+                    try:
+                        detail = await self._async_fetch_review_details(
+                            session, api_client, project_id, review, semaphore, workflow_cache
+                        )
+                    except Exception as e:
+                        progress['fetch_failed'] += 1
+                        error_msg = f"获取评审详情失败: {str(e)}"
+                        self.sync_stats['errors'].append(error_msg)
+                        if show_progress:
+                            print(f"   ✗ {error_msg}")
+                        continue
+                    progress['fetched'] += 1
+                    await queue.put(detail)
+            
+            async def db_writer():
+                finished = False
+                while not finished:
+                    batch = [await queue.get()]
+                    # 合并队列中已就绪的评审，凑成一批写入
+                    while len(batch) < self.write_batch_size and not queue.empty():
+                        batch.append(queue.get_nowait())
+                    if None in batch:
+                        finished = True
+                        batch = [review for review in batch if review is not None]
+                    if not batch:
+                        continue
+                    
+                    db_start = time.time()
+                    try:
+                        counts, synced_ids = await loop.run_in_executor(db_executor, self._write_review_batch, batch)
+                        for key, value in counts.items():
+                            write_totals[key] += value
+                        for review in batch:
+                            if review.get('id') in synced_ids:
+                                review['_synced'] = True
+                    except Exception as e:
+                        error_msg = f"写入评审批次失败: {str(e)}"
+                        self.sync_stats['errors'].append(error_msg)
+                        print(f"✗ {error_msg}")
+                    progress['db_time'] += time.time() - db_start
+                    progress['written'] += len(batch)
+                    
+                    if show_progress:
+                        print(f"   [PIPELINE] fetched {progress['fetched']}/{total}, "
+                              f"written {progress['written']}, queued {queue.qsize()}")
             
-            # 创建所有任务（传入 workflow_cache）
-            tasks = []
-            for review in reviews:
-                task = self._async_fetch_review_details(
-                    session,
-                    api_client,
-                    project_id,
-                    review,
-                    semaphore,
-                    workflow_cache  # Pass workflow cache
-                )
-                tasks.append(task)
-            
-            # 并行执行所有任务
             if show_progress:
-                print(f"\n[PHASE 1/2] Async API data fetching...")
+                print(f"\n[PIPELINE] Fetching review details and writing to database...")
             
-            review_details = await asyncio.gather(*tasks, return_exceptions=True)
-            
-            # 处理结果
-            successful_reviews = []
-            for idx, result in enumerate(review_details):
-                if isinstance(result, Exception):
-                    error_msg = f"获取评审详情失败: {str(result)}"
-                    self.sync_stats['errors'].append(error_msg)
-                    if show_progress:
-                        print(f"   ✗ {error_msg}")
-                else:
-                    successful_reviews.append(result)
+            # psycopg2 是阻塞调用，写库放在专用线程，避免卡住事件循环；写库结束后关闭线程
+            db_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='review-db-writer')
+            writer_task = asyncio.create_task(db_writer())
+            workers = [asyncio.create_task(fetch_worker()) for _ in range(min(self.max_concurrent, total))]
+            try:
+                await asyncio.gather(*workers)
+            finally:
+                await queue.put(None)
+                await writer_task
+                db_executor.shutdown(wait=True)
         
-        api_time = time.time() - start_time
-        self.metrics.api_time += api_time
+        self.sync_stats['reviews_synced'] += write_totals['inserted']
+        self.sync_stats['reviews_updated'] += write_totals['updated']
+        self.sync_stats['file_versions_total'] = write_totals['file_versions']
+        self.sync_stats['progress_steps_total'] = write_totals['progress_steps']
         
-        if show_progress:
-            print(f"\nSUCCESS: API data fetching completed")
-            print(f"   Total API calls: {self.metrics.api_calls} times")
-            print(f"   Duration: {api_time:.2f}s")
-            print(f"   Success: {len(successful_reviews)}/{total}")
+        total_time = time.time() - start_time
+        db_time = progress['db_time']
+        self.metrics.total_time = total_time
         
-        # Phase 2: Batch database writing
         if show_progress:
-            print(f"\n[PHASE 2/2] Batch database writing...")
-        
-        db_start = time.time()
-        
-        # Batch UPSERT reviews
-        inserted, updated = self.batch_upsert_reviews(successful_reviews)
-        self.sync_stats['reviews_synced'] += inserted
-        self.sync_stats['reviews_updated'] += updated
-        
-        # 🔧 修复：同步 file versions 和 progress steps
-        total_file_versions = 0
-        total_progress_steps = 0
+            print("\n" + "=" * 60)
+            print(f"[STATS] Performance statistics:")
+            print(f"   Total API calls: {self.metrics.api_calls} times")
+            print(f"   Success: {progress['fetched']}/{total}, failed: {progress['fetch_failed']}")
+            print(f"   同步文件版本: {write_totals['file_versions']} 个, 进度步骤: {write_totals['progress_steps']} 个")
+            print(f"   数据库写入（与抓取并行）: {db_time:.2f}秒")
+            print(f"   总耗时: {total_time:.2f}秒")
+            if total:
+                print(f"   平均每个评审: {total_time/total:.2f}秒")
         
-        for review in successful_reviews:
+        return self.sync_stats
+    
+    def _write_review_batch(self, reviews: List[Dict[str, Any]]) -> Tuple[Dict[str, int], Set[str]]:
+        """
+        在写库线程中写入一批评审：评审、文件审批状态、进度步骤，
+        全部写入成功的评审记录 ACC updatedAt 供增量同步跳过
+
+        Returns:
+            (写入计数, 已完整同步的评审 ACC ID 集合)
+        """
+        counts = {'inserted': 0, 'updated': 0, 'file_versions': 0, 'progress_steps': 0}
+        
+        counts['inserted'], counts['updated'] = self.batch_upsert_reviews(reviews)
+        local_ids = self.da.get_review_ids_by_acc_ids([r.get('id') for r in reviews if r.get('id')])
+        
+        # 文件审批状态跨评审合并成一次差异写入
+        file_rows = []
+        for review in reviews:
+            local_review_id = local_ids.get(review.get('id'))
+            if local_review_id:
+                file_rows.extend(self._prepare_review_file_rows(local_review_id, review.get('fileVersions')))
+        files_ok = self._write_review_file_rows(file_rows)
+        counts['file_versions'] = len(file_rows)
+        self.sync_stats['file_versions_synced'] += len(file_rows)
+        
+        # 进度步骤依赖各自的工作流模板，逐个评审写入
+        synced_ids = set()
+        synced_stamps = {}
+        for review in reviews:
             review_id = review.get('id')
-            if not review_id:
+            local_review_id = local_ids.get(review_id)
+            if not local_review_id:
                 continue
-                
-            # 获取数据库中的 review ID
-            db_review = self.da.get_review_by_acc_id(review_id)
-            if not db_review:
-                continue
-                
-            local_review_id = db_review['id']
-            
-            # 同步文件版本
-            file_versions = review.get('fileVersions', [])
-            if file_versions:
-                self._sync_review_file_versions(local_review_id, file_versions)
-                total_file_versions += len(file_versions)
-                self.sync_stats['file_versions_synced'] += len(file_versions)
-                
-            # 同步进度步骤
+            
+            progress_ok = True
             progress_steps = review.get('steps', [])
             if progress_steps:
-                self._sync_review_progress(local_review_id, progress_steps)
-                total_progress_steps += len(progress_steps)
+                progress_ok = self._sync_review_progress(local_review_id, progress_steps)
+                counts['progress_steps'] += len(progress_steps)
                 self.sync_stats['progress_steps_synced'] += len(progress_steps)
+            
+            if files_ok and progress_ok and not review.get('_fetch_errors'):
+                synced_ids.add(review_id)
+                if review.get('updatedAt'):
+                    synced_stamps[review_id] = review['updatedAt']
         
-        self.sync_stats['file_versions_total'] = total_file_versions
-        self.sync_stats['progress_steps_total'] = total_progress_steps
-        
-        if show_progress and (total_file_versions > 0 or total_progress_steps > 0):
-            print(f"  SUCCESS: 同步文件版本: {total_file_versions} 个")
-            print(f"  SUCCESS: 同步进度步骤: {total_progress_steps} 个")
-        
-        db_time = time.time() - db_start
-        total_time = time.time() - start_time
-        
-        self.metrics.total_time = total_time
+        if synced_stamps:
+            try:
+                self.da.mark_reviews_synced(synced_stamps)
+            except Exception as e:
+                print(f"[WARNING] Failed to record review sync stamps: {e}")
+                synced_ids = set()
         
-        if show_progress:
-            print("\n" + "=" * 60)
-            print(f"[STATS] Performance statistics:")
-            print(f"   API调用阶段: {api_time:.2f}秒 ({api_time/total_time*100:.1f}%)")
-            print(f"   数据库写入: {db_time:.2f}秒 ({db_time/total_time*100:.1f}%)")
-            print(f"   总耗时: {total_time:.2f}秒")
-            print(f"   平均每个评审: {total_time/total:.2f}秒")
+        # 详情已写入，释放内存（调用方只需要 id / updatedAt）
+        for review in reviews:
+            for key in ('fileVersions', 'steps', 'workflow'):
+                review.pop(key, None)
         
-        return self.sync_stats
+        return counts, synced_ids
     
     async def _async_fetch_review_details(
         self,
@@ -988,6 +1059,8 @@ class EnhancedReviewSyncManager:
             review['fileVersions'] = versions.get('results', []) if isinstance(versions, dict) else []
             review['steps'] = progress.get('results', []) if isinstance(progress, dict) else []
             review['workflow'] = workflow or {}
+            # 详情接口失败时数据不完整，增量同步不能记为已同步
+            review['_fetch_errors'] = sum(1 for r in results if isinstance(r, Exception))
             
             return review
     
@@ -1107,13 +1180,13 @@ class EnhancedReviewSyncManager:
         注意：此方法只同步审批状态，不存储文件信息
         文件信息应该已经在 file_versions 表中（由 postgresql_sync_manager 同步）
         """
-        if not file_versions:
-            return
-        
-        db_start = time.time()
+        self._write_review_file_rows(self._prepare_review_file_rows(review_id, file_versions))
+    
+    def _prepare_review_file_rows(self, review_id: int, file_versions: List[Dict]) -> List[Dict]:
+        """把 ACC 返回的文件版本转换为 review_file_versions 行"""
         batch_data = []
         
-        for fv_data in file_versions:
+        for fv_data in file_versions or []:
             try:
                 # 处理审批状态对象
                 approve_status = fv_data.get('approveStatus', {})
@@ -1159,22 +1232,31 @@ class EnhancedReviewSyncManager:
                 self.sync_stats['errors'].append(error_msg)
                 print(f"✗ {error_msg}")
         
-        # 批量插入
-        if batch_data:
-            try:
-                inserted_count = self.da.batch_insert_review_files(batch_data)
-                db_time = time.time() - db_start
-                self.metrics.db_time += db_time
-                self.metrics.db_queries += 1
-                print(f"  SUCCESS: Batch insert {inserted_count} file versions (duration: {db_time:.2f}s)")
-            except Exception as e:
-                error_msg = f"批量插入文件版本失败: {str(e)}"
-                self.sync_stats['errors'].append(error_msg)
-                self.metrics.db_errors += 1
-                print(f"✗ {error_msg}")
+        return batch_data
+    
+    def _write_review_file_rows(self, batch_data: List[Dict]) -> bool:
+        """差异写入：只插入新文件、只更新审批状态有变化的文件（可包含多个评审的行）"""
+        if not batch_data:
+            return True
+        
+        db_start = time.time()
+        try:
+            inserted, updated = self.da.upsert_changed_review_files(batch_data)
+            db_time = time.time() - db_start
+            self.metrics.db_time += db_time
+            self.metrics.db_queries += 1
+            print(f"  SUCCESS: File versions: {inserted} new, {updated} changed, "
+                  f"{len(batch_data) - inserted - updated} unchanged (duration: {db_time:.2f}s)")
+            return True
+        except Exception as e:
+            error_msg = f"批量插入文件版本失败: {str(e)}"
+            self.sync_stats['errors'].append(error_msg)
+            self.metrics.db_errors += 1
+            print(f"✗ {error_msg}")
+            return False
     
     @track_performance('sync_review_progress')
-    def _sync_review_progress(self, review_id: int, steps: List[Dict]) -> None:
+    def _sync_review_progress(self, review_id: int, steps: List[Dict]) -> bool:
         """
         同步评审进度（批量优化版）
         
@@ -1191,15 +1273,20 @@ class EnhancedReviewSyncManager:
         方案2實現：
         - 步驟1: 從 workflow template 創建完整的 review_step_candidates（所有步驟）
         - 步驟2: 同步 review_progress（只有已執行的步驟，自動關聯 template_step_id）
+
+        Returns:
+            是否全部寫入成功（沒有步驟或找不到模板時跳過，視為成功）
         """
         if not steps:
-            return
+            return True
 
         # 步驟 1: 獲取 workflow template 配置
         workflow_steps_config = self._get_workflow_steps_for_review(review_id)
         if not workflow_steps_config:
             print(f"  [WARNING] No workflow template found for review {review_id}, skipping sync")
-            return
+            return True
+
+        success = True
 
         # 步驟 2: 從 workflow template 創建完整的 step_candidates（所有步驟，包括未執行的）
         # ✅ 使用 template step_id，確保配置完整性
@@ -1209,15 +1296,19 @@ class EnhancedReviewSyncManager:
             error_msg = f"從模板創建候選人配置失敗: {str(e)}"
             self.sync_stats['errors'].append(error_msg)
             print(f"✗ {error_msg}")
+            success = False
 
         # 步驟 3: 同步 review_progress（只有已執行的步驟）
         # ✅ 自動關聯到 template_step_id（通過 step_order 匹配）
         try:
-            self._sync_progress_with_template_mapping(review_id, steps, workflow_steps_config)
+            success = self._sync_progress_with_template_mapping(review_id, steps, workflow_steps_config) and success
         except Exception as e:
             error_msg = f"同步進度並關聯模板失敗: {str(e)}"
             self.sync_stats['errors'].append(error_msg)
             print(f"✗ {error_msg}")
+            success = False
+
+        return success
     
     def _map_approval_status(self, acc_status: str) -> str:
         """映射审批状态"""
@@ -1505,6 +1596,184 @@ class EnhancedReviewSyncManager:
                 print(f"[WARNING] Failed to fetch review page (offset: {offset}): {e}")
                 return []
     
+    # ========================================================================
+    # 增量同步（按项目 updatedAt 水位线）
+    # ========================================================================
+    
+    def _review_updated_at(self, review: Dict[str, Any]) -> Optional[datetime]:
+        """评审的 ACC updatedAt（统一为 UTC 时区）"""
+        updated_at = self._parse_timestamp(review.get('updatedAt'))
+        if updated_at and updated_at.tzinfo is None:
+            updated_at = updated_at.replace(tzinfo=timezone.utc)
+        return updated_at
+    
+    def _select_changed_reviews(
+        self,
+        reviews: List[Dict[str, Any]],
+        stamps: Dict[str, Optional[datetime]]
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        按已同步的 updatedAt 区分需要拉取详情的评审
+        
+        Args:
+            reviews: 列表接口返回的评审
+            stamps: acc_review_id -> 上次完整同步时的 ACC updatedAt
+            
+        Returns:
+            (有变化的评审, 未变化的评审)
+        """
+        changed, unchanged = [], []
+        for review in reviews:
+            stamp = stamps.get(review.get('id'))
+            updated_at = self._review_updated_at(review)
+            if stamp is None or updated_at is None or updated_at > stamp:
+                changed.append(review)
+            else:
+                unchanged.append(review)
+        return changed, unchanged
+    
+    def _next_review_watermark(self, reviews: List[Dict[str, Any]]) -> Optional[datetime]:
+        """
+        计算新的水位线：已同步评审中最大的 updatedAt，但不越过任何未同步成功的评审
+        （失败的评审下次仍会落在水位线之后被重新拉取）
+        """
+        pending = [self._review_updated_at(r) for r in reviews if not r.get('_synced')]
+        pending = [t for t in pending if t]
+        cutoff = min(pending) if pending else None
+        
+        synced = [self._review_updated_at(r) for r in reviews if r.get('_synced')]
+        synced = [t for t in synced if t and (cutoff is None or t < cutoff)]
+        return max(synced) if synced else None
+    
+    async def async_fetch_reviews_updated_since(
+        self,
+        session: aiohttp.ClientSession,
+        project_id: str,
+        since: Optional[datetime],
+        limit_per_page: int = 50,
+        show_progress: bool = True
+    ) -> List[Dict]:
+        """
+        按 updatedAt 倒序分页获取评审，越过水位线（减去重叠时间）后停止
+        
+        接口若不支持排序（返回顺序不是倒序），则继续读完所有页，
+        是否有变化仍由每个评审的 updatedAt 判断，结果保持正确。
+        
+        Args:
+            session: aiohttp会话
+            project_id: 项目ID
+            since: 水位线，None 表示读取全部
+            limit_per_page: 每页数量
+            show_progress: 是否显示进度
+            
+        Returns:
+            评审列表（按接口返回顺序）
+        """
+        url = f'/projects/{project_id}/reviews'
+        stop_at = since - REVIEW_WATERMARK_OVERLAP if since else None
+        sort = 'updatedAt desc'
+        reviews = []
+        offset = 0
+        previous = None
+        descending = True
+        
+        while True:
+            params = {'limit': limit_per_page, 'offset': offset}
+            if sort:
+                params['sort'] = sort
+            try:
+                page = await self._async_api_call(session, 'GET', url, params=params, use_cache=False)
+            except Exception as e:
+                if not sort or offset:
+                    raise
+                # 接口不接受排序参数时退回默认顺序
+                print(f"[WARNING] Sorted review listing failed ({e}), falling back to default order")
+                sort = None
+                descending = False
+                continue
+            
+            results = page.get('results', [])
+            reviews.extend(results)
+            
+            for review in results:
+                updated_at = self._review_updated_at(review)
+                if updated_at and previous and updated_at > previous:
+                    descending = False
+                previous = updated_at or previous
+            
+            if show_progress:
+                print(f"   Retrieved {len(reviews)} reviews (offset: {offset})")
+            
+            offset += len(results)
+            total_results = page.get('pagination', {}).get('totalResults', 0)
+            if not results or offset >= total_results:
+                break
+            if stop_at and sort and descending and previous and previous <= stop_at:
+                break
+        
+        return reviews
+    
+    async def async_incremental_review_sync(
+        self,
+        session: aiohttp.ClientSession,
+        project_id: str,
+        show_progress: bool = True
+    ) -> Dict[str, Any]:
+        """
+        增量同步评审：只为 updatedAt 变化过的评审拉取 versions/progress 并差异写入
+        
+        首次运行（没有水位线）时读取全部评审，之后每次只翻到水位线附近的页。
+        
+        Args:
+            session: aiohttp会话
+            project_id: 项目ID
+            show_progress: 是否显示进度
+            
+        Returns:
+            增量同步结果
+        """
+        watermark = self.da.get_review_sync_watermark(project_id)
+        if show_progress:
+            print(f"\n[INCREMENTAL] Review watermark: {watermark.isoformat() if watermark else 'none (first run)'}")
+        
+        listed = await self.async_fetch_reviews_updated_since(
+            session, project_id, watermark, show_progress=show_progress
+        )
+        stamps = self.da.get_review_sync_stamps(project_id)
+        changed, unchanged = self._select_changed_reviews(listed, stamps)
+        
+        for review in unchanged:
+            review['_synced'] = True
+        self.sync_stats['reviews_skipped'] += len(unchanged)
+        
+        if show_progress:
+            print(f"   Listed: {len(listed)}, changed: {len(changed)}, unchanged: {len(unchanged)}")
+        
+        if changed:
+            # 内存缓存里可能还有这些评审变化前的详情
+            for review in changed:
+                self.cache.clear_pattern(f"/reviews/{review.get('id')}/")
+            await self.async_sync_reviews_parallel(None, project_id, changed, show_progress)
+        
+        failed = sum(1 for review in changed if not review.get('_synced'))
+        new_watermark = self._next_review_watermark(listed)
+        self.da.save_review_sync_state(project_id, new_watermark, len(listed), len(changed), failed)
+        
+        if show_progress:
+            print(f"   Watermark: {new_watermark.isoformat() if new_watermark else 'unchanged'}"
+                  f"{f' ({failed} failed, will retry)' if failed else ''}")
+        
+        return {
+            'mode': 'incremental',
+            'previous_watermark': watermark.isoformat() if watermark else None,
+            'watermark': new_watermark.isoformat() if new_watermark else None,
+            'reviews_listed': len(listed),
+            'reviews_changed': len(changed),
+            'reviews_unchanged': len(unchanged),
+            'reviews_failed': failed,
+            'sync_statistics': self.sync_stats
+        }
+    
     # ========================================================================
     # 性能报告
     # ========================================================================
@@ -2354,7 +2623,8 @@ class EnhancedReviewSyncManager:
         access_token: str,
         sync_templates: bool = True,
         fetch_detailed_template_data: bool = True,
-        show_progress: bool = True
+        show_progress: bool = True,
+        incremental: bool = False
     ) -> Dict[str, Any]:
         """
         完整的项目同步（包含模板和评审数据）
@@ -2366,6 +2636,7 @@ class EnhancedReviewSyncManager:
             sync_templates: 是否同步工作流模板
             fetch_detailed_template_data: 是否获取详细模板数据
             show_progress: 是否显示进度
+            incremental: 只同步 updatedAt 超过水位线的评审
             
         Returns:
             完整的同步结果
@@ -2389,7 +2660,7 @@ class EnhancedReviewSyncManager:
         
         try:
             # 创建异步HTTP会话
-            async with aiohttp.ClientSession() as session:
+            async with get_acc_client().limited_session() as session:
                 
                 # 阶段1: 同步工作流模板（如果启用）
                 if sync_templates:
@@ -2410,22 +2681,33 @@ class EnhancedReviewSyncManager:
                 if show_progress:
                     print(f"\nINFO: 开始同步评审数据...")
                 
-                # 获取评审列表
-                reviews = await self.async_fetch_all_reviews_with_pagination(
-                    session, None, project_id, show_progress=show_progress
-                )
-                
-                if reviews:
-                    # 异步并行同步评审
-                    review_result = await self.async_sync_reviews_parallel(
-                        None, project_id, reviews, show_progress
+                if incremental:
+                    results['review_sync'] = await self.async_incremental_review_sync(
+                        session, project_id, show_progress
                     )
-                    results['review_sync'] = review_result
                 else:
-                    results['review_sync'] = {
-                        'status': 'no_reviews',
-                        'message': '项目中没有找到评审数据'
-                    }
+                    # 获取评审列表
+                    reviews = await self.async_fetch_all_reviews_with_pagination(
+                        session, None, project_id, show_progress=show_progress
+                    )
+                    
+                    if reviews:
+                        # 异步并行同步评审
+                        review_result = await self.async_sync_reviews_parallel(
+                            None, project_id, reviews, show_progress
+                        )
+                        results['review_sync'] = review_result
+                        
+                        # 全量同步后记录水位线，之后可以直接增量同步
+                        self.da.save_review_sync_state(
+                            project_id, self._next_review_watermark(reviews), len(reviews), len(reviews),
+                            sum(1 for review in reviews if not review.get('_synced'))
+                        )
+                    else:
+                        results['review_sync'] = {
+                            'status': 'no_reviews',
+                            'message': '项目中没有找到评审数据'
+                        }
             
             total_time = time.time() - start_time
             
@@ -2435,6 +2717,7 @@ class EnhancedReviewSyncManager:
                 'sync_components': {
                     'workflow_templates': sync_templates,
                     'review_data': True,
+                    'incremental': incremental,
                     'account_data': False  # 账户数据同步已移除
                 },
                 'results': results,
@@ -2705,7 +2988,7 @@ class EnhancedReviewSyncManager:
             import traceback
             traceback.print_exc()
 
-    def _sync_progress_with_template_mapping(self, review_id: int, steps: List[Dict], workflow_steps_config: List[Dict]) -> None:
+    def _sync_progress_with_template_mapping(self, review_id: int, steps: List[Dict], workflow_steps_config: List[Dict]) -> bool:
         """
         同步 progress，並自動關聯到 template step_id
 
@@ -2718,6 +3001,9 @@ class EnhancedReviewSyncManager:
             review_id: 評審ID
             steps: ACC API 返回的步驟執行數據
             workflow_steps_config: 工作流步驟配置（用於查找 template_step_id）
+
+        Returns:
+            是否寫入成功（失敗已記錄到 sync_stats['errors']）
         """
         try:
             batch_data = []
@@ -2779,17 +3065,12 @@ class EnhancedReviewSyncManager:
 
                 batch_data.append(progress_data)
 
-            # 批量UPSERT
+            # 差異寫入：只插入新步驟、只更新有變化的步驟
             if batch_data:
                 try:
-                    # 檢查是否有增強版的 batch_upsert_review_steps 方法
-                    if hasattr(self.da, 'batch_upsert_review_steps'):
-                        inserted, updated = self.da.batch_upsert_review_steps(batch_data)
-                        print(f"  [PROGRESS] ✓ Batch UPSERT: {inserted} inserted, {updated} updated")
-                    else:
-                        # 回退到普通插入
-                        inserted_count = self.da.batch_insert_review_steps(batch_data)
-                        print(f"  [PROGRESS] ✓ Batch INSERT: {inserted_count} records")
+                    inserted, updated = self.da.upsert_changed_review_steps(batch_data)
+                    print(f"  [PROGRESS] ✓ Diff UPSERT: {inserted} inserted, {updated} updated, "
+                          f"{len(batch_data) - inserted - updated} unchanged")
                 except Exception as e:
                     print(f"✗ [ERROR] Failed to batch upsert progress: {e}")
                     raise
@@ -2797,11 +3078,14 @@ class EnhancedReviewSyncManager:
             # ✅ 新增：為當前活躍步驟創建 progress 記錄
             # ACC API 只返回已完成的步驟，需要為當前待處理步驟創建記錄
             self._create_current_step_progress(review_id, steps, workflow_steps_config)
+            return True
 
         except Exception as e:
+            self.sync_stats['errors'].append(f"同步進度失敗 (review_id={review_id}): {str(e)}")
             print(f"✗ [ERROR] Failed to sync progress with template mapping: {e}")
             import traceback
             traceback.print_exc()
+            return False
 
     def _create_current_step_progress(self, review_id: int, executed_steps: List[Dict], workflow_steps_config: List[Dict]) -> None:
         """
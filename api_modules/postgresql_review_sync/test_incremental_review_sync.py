@@ -0,0 +1,161 @@
+"""
+测试评审增量同步（水位线分页、变化判断、水位线推进），不访问 ACC 和数据库
+"""
+
+import sys
+import os
+import asyncio
+from datetime import datetime, timezone
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from api_modules.postgresql_review_sync.review_sync_manager_enhanced import EnhancedReviewSyncManager
+
+
+def _ts(day, hour=0):
+    return datetime(2025, 1, day, hour, tzinfo=timezone.utc)
+
+
+def _review(review_id, day, hour=0):
+    return {'id': review_id, 'updatedAt': _ts(day, hour).isoformat().replace('+00:00', 'Z')}
+
+
+class FakeDataAccess:
+    """只实现增量同步用到的方法"""
+
+    def __init__(self, watermark=None, stamps=None):
+        self.watermark = watermark
+        self.stamps = stamps or {}
+        self.saved = None
+
+    def get_review_sync_watermark(self, project_id):
+        return self.watermark
+
+    def get_review_sync_stamps(self, project_id):
+        return self.stamps
+
+    def save_review_sync_state(self, project_id, watermark, listed, changed, failed):
+        self.saved = (watermark, listed, changed, failed)
+
+
+def _manager(da, pages, sorted_ok=True):
+    """pages: 按 updatedAt 倒序排好的全部评审，按 limit/offset 切页"""
+    manager = EnhancedReviewSyncManager(data_access=da, enable_cache=False)
+    manager.calls = []
+
+    async def fake_api_call(session, method, url, headers=None, use_cache=True, **kwargs):
+        params = kwargs.get('params', {})
+        if 'sort' in params and not sorted_ok:
+            raise Exception('400 Bad Request')
+        manager.calls.append(params)
+        items = pages if 'sort' in params else list(reversed(pages))
+        offset, limit = params['offset'], params['limit']
+        return {'results': items[offset:offset + limit], 'pagination': {'totalResults': len(items)}}
+
+    manager._async_api_call = fake_api_call
+    return manager
+
+
+def test_select_changed_reviews():
+    """测试只有 updatedAt 前进或从未完整同步的评审需要拉取详情"""
+    manager = EnhancedReviewSyncManager(data_access=FakeDataAccess(), enable_cache=False)
+    reviews = [_review('a', 5), _review('b', 3), _review('c', 2), {'id': 'd'}]
+    stamps = {'a': _ts(4), 'b': _ts(3), 'c': None}
+
+    changed, unchanged = manager._select_changed_reviews(reviews, stamps)
+    assert [r['id'] for r in changed] == ['a', 'c', 'd']
+    assert [r['id'] for r in unchanged] == ['b']
+
+
+def test_watermark_does_not_pass_failed_review():
+    """测试水位线不越过同步失败的评审"""
+    manager = EnhancedReviewSyncManager(data_access=FakeDataAccess(), enable_cache=False)
+    reviews = [_review('a', 9), _review('b', 7), _review('c', 5), _review('d', 3)]
+    for review in reviews:
+        review['_synced'] = True
+    assert manager._next_review_watermark(reviews) == _ts(9)
+
+    reviews[1]['_synced'] = False
+    assert manager._next_review_watermark(reviews) == _ts(5)
+
+    assert manager._next_review_watermark([]) is None
+
+
+def test_paging_stops_at_watermark():
+    """测试按 updatedAt 倒序分页，越过水位线（含重叠时间）后停止"""
+    pages = [_review(f'r{i}', 28 - i) for i in range(20)]
+    manager = _manager(FakeDataAccess(), pages)
+
+    reviews = asyncio.run(manager.async_fetch_reviews_updated_since(
+        None, 'p', _ts(25), limit_per_page=2, show_progress=False))
+    # 第 3 页才出现早于 “水位线 - 重叠时间” 的评审
+    assert len(manager.calls) == 3 and len(reviews) == 6
+    assert all(call['sort'] == 'updatedAt desc' for call in manager.calls)
+
+    # 没有水位线时读取全部
+    manager.calls = []
+    reviews = asyncio.run(manager.async_fetch_reviews_updated_since(
+        None, 'p', None, limit_per_page=5, show_progress=False))
+    assert len(reviews) == 20 and len(manager.calls) == 4
+
+
+def test_paging_without_sort_support_reads_all():
+    """测试接口不支持排序时退回默认顺序并读完所有页"""
+    pages = [_review(f'r{i}', 28 - i) for i in range(6)]
+    manager = _manager(FakeDataAccess(), pages, sorted_ok=False)
+
+    reviews = asyncio.run(manager.async_fetch_reviews_updated_since(
+        None, 'p', _ts(27), limit_per_page=2, show_progress=False))
+    assert len(reviews) == 6
+    assert all('sort' not in call for call in manager.calls)
+
+
+def test_incremental_sync_fetches_only_changed():
+    """测试增量同步只为变化的评审拉取详情，并推进水位线"""
+    pages = [_review('new', 10), _review('edited', 9), _review('same', 8), _review('old', 1)]
+    da = FakeDataAccess(watermark=_ts(8), stamps={'edited': _ts(2), 'same': _ts(8), 'old': _ts(1)})
+    manager = _manager(da, pages)
+
+    synced = []
+
+    async def fake_parallel(api_client, project_id, reviews, show_progress=True):
+        for review in reviews:
+            synced.append(review['id'])
+            review['_synced'] = review['id'] != 'edited'
+        return manager.sync_stats
+
+    manager.async_sync_reviews_parallel = fake_parallel
+    result = asyncio.run(manager.async_incremental_review_sync(None, 'p', show_progress=False))
+
+    assert synced == ['new', 'edited']
+    assert result['reviews_changed'] == 2 and result['reviews_failed'] == 1
+    # 'edited' 失败：水位线停在它之前，下次仍会重新拉取
+    assert da.saved[0] == _ts(8) and da.saved[3] == 1
+
+
+def run_all_tests():
+    """运行所有测试"""
+    tests = [
+        test_select_changed_reviews,
+        test_watermark_does_not_pass_failed_review,
+        test_paging_stops_at_watermark,
+        test_paging_without_sort_support_reads_all,
+        test_incremental_sync_fetches_only_changed,
+    ]
+
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
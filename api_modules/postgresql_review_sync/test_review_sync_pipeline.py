@@ -0,0 +1,170 @@
+"""
+测试评审同步的抓取/写库流水线（不访问 ACC 和数据库）
+"""
+
+import sys
+import os
+import time
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from api_modules.postgresql_review_sync import review_sync_manager_enhanced
+from api_modules.postgresql_review_sync.review_sync_manager_enhanced import EnhancedReviewSyncManager
+
+
+class FakeClient:
+    @asynccontextmanager
+    async def limited_session(self):
+        yield None
+
+
+def _manager(write_delay=0.0, fail_ids=()):
+    review_sync_manager_enhanced.get_acc_client = lambda: FakeClient()
+    manager = EnhancedReviewSyncManager(data_access=object(), max_concurrent=4, enable_cache=False,
+                                        write_batch_size=5, pipeline_queue_size=3)
+    manager.events = []
+    manager.batches = []
+    manager.in_memory = 0
+    manager.max_in_memory = 0
+    manager.writer_threads = set()
+
+    async def fetch_all_workflows(session, project_id, show_progress=True):
+        return []
+
+    async def fetch_details(session, api_client, project_id, review, semaphore, workflow_cache=None):
+        async with semaphore:
+            await asyncio.sleep(0.005)
+            if review['id'] in fail_ids:
+                raise Exception('503 Service Unavailable')
+            manager.in_memory += 1
+            manager.max_in_memory = max(manager.max_in_memory, manager.in_memory)
+            manager.events.append(('fetched', review['id']))
+            review['steps'] = [{'id': 's'}]
+            return review
+
+    def write_batch(reviews):
+        manager.writer_threads.add(threading.current_thread().name)
+        time.sleep(write_delay)
+        manager.batches.append([r['id'] for r in reviews])
+        manager.events.append(('written', len(reviews)))
+        manager.in_memory -= len(reviews)
+        counts = {'inserted': len(reviews), 'updated': 0, 'file_versions': 0, 'progress_steps': len(reviews)}
+        return counts, {review['id'] for review in reviews}
+
+    manager.fetch_all_workflows = fetch_all_workflows
+    manager._async_fetch_review_details = fetch_details
+    manager._write_review_batch = write_batch
+    return manager
+
+
+def test_all_reviews_written_in_batches():
+    """测试所有评审都写入，写库在专用线程按批执行"""
+    reviews = [{'id': f'r{i}'} for i in range(23)]
+    manager = _manager()
+
+    stats = asyncio.run(manager.async_sync_reviews_parallel(None, 'p', reviews, show_progress=False))
+
+    assert sorted(sum(manager.batches, [])) == sorted(r['id'] for r in reviews)
+    assert all(len(batch) <= 5 for batch in manager.batches)
+    assert stats['reviews_synced'] == 23 and stats['progress_steps_total'] == 23
+    assert all(r.get('_synced') for r in reviews)
+    assert manager.writer_threads and all(name.startswith('review-db-writer') for name in manager.writer_threads)
+
+
+def test_fetch_and_write_overlap_with_bounded_memory():
+    """测试写库与抓取同时进行，内存中的评审详情不超过队列长度 + 并发数 + 一批"""
+    reviews = [{'id': f'r{i}'} for i in range(40)]
+    manager = _manager(write_delay=0.01)
+
+    asyncio.run(manager.async_sync_reviews_parallel(None, 'p', reviews, show_progress=False))
+
+    first_write = next(i for i, event in enumerate(manager.events) if event[0] == 'written')
+    last_fetch = max(i for i, event in enumerate(manager.events) if event[0] == 'fetched')
+    assert first_write < last_fetch, "写库应在抓取完成前开始"
+    assert manager.max_in_memory <= 3 + 4 + 5
+
+
+def test_fetch_failures_do_not_block_pipeline():
+    """测试抓取失败的评审被记录且不标记为已同步"""
+    reviews = [{'id': f'r{i}'} for i in range(10)]
+    manager = _manager(fail_ids={'r3', 'r7'})
+
+    stats = asyncio.run(manager.async_sync_reviews_parallel(None, 'p', reviews, show_progress=False))
+
+    assert len(sum(manager.batches, [])) == 8
+    assert len(stats['errors']) == 2
+    assert not reviews[3].get('_synced') and reviews[4].get('_synced')
+
+
+class FakeWriteDataAccess:
+    """写库批次使用的数据访问：评审 acc id 直接映射为本地 id"""
+
+    def __init__(self):
+        self.marked = {}
+
+    def get_review_ids_by_acc_ids(self, acc_ids):
+        return {acc_id: index + 1 for index, acc_id in enumerate(acc_ids)}
+
+    def mark_reviews_synced(self, stamps):
+        self.marked.update(stamps)
+        return len(stamps)
+
+
+def test_write_batch_reports_per_review_success():
+    """测试写库批次按评审返回同步结果，不依赖共享错误列表的长度"""
+    da = FakeWriteDataAccess()
+    manager = EnhancedReviewSyncManager(data_access=da, enable_cache=False)
+    manager.batch_upsert_reviews = lambda reviews: (len(reviews), 0)
+    manager._prepare_review_file_rows = lambda local_id, versions: []
+    manager._sync_review_progress = lambda local_id, steps: local_id != 2
+    # 其他评审记录的错误不影响本批次的判断
+    manager.sync_stats['errors'].append('unrelated error')
+
+    reviews = [{'id': f'r{i}', 'updatedAt': f't{i}', 'steps': [{'id': 's'}]} for i in range(3)]
+    reviews[2]['_fetch_errors'] = ['versions']
+    counts, synced = manager._write_review_batch(reviews)
+
+    assert synced == {'r0'}
+    assert da.marked == {'r0': 't0'}
+    assert counts['inserted'] == 3 and counts['progress_steps'] == 3
+    assert all('steps' not in review and '_synced' not in review for review in reviews)
+
+
+def test_writer_thread_shut_down_after_sync():
+    """测试同步结束后写库线程已关闭"""
+    manager = _manager()
+    asyncio.run(manager.async_sync_reviews_parallel(None, 'p', [{'id': 'r0'}], show_progress=False))
+
+    time.sleep(0.05)
+    assert not [t for t in threading.enumerate() if t.name.startswith('review-db-writer')]
+
+
+def run_all_tests():
+    """运行所有测试"""
+    tests = [
+        test_all_reviews_written_in_batches,
+        test_fetch_and_write_overlap_with_bounded_memory,
+        test_fetch_failures_do_not_block_pipeline,
+        test_write_batch_reports_per_review_success,
+        test_writer_thread_shut_down_after_sync,
+    ]
+
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+"""
+增量同步的刪除對賬
+
+增量同步只處理 rollup 時間有變化的分支，ACC 中刪除或移出的文件夾/文件不會出現在變更集中，
+數據庫裡的舊行會一直保留，只能靠定期全量重掃清理。這裡把增量同步已經拿到的
+「有變化文件夾的完整子項列表」與數據庫中這些文件夾的未刪除子項ID集合對比：
+
+- 數據庫中有、ACC 所有已列出文件夾中都沒有的子項視為已刪除：文件夾連同其子樹、
+  以及子樹下的文件在一個事務中批量設置 deleted_at（墓碑，遷移腳本 database_sql/add_sync_tombstones.sql）
+- ACC 中出現在另一個父文件夾下的子項視為移動：更新父文件夾並重算移動子樹的路徑
+- 已有墓碑的子項重新出現時清空 deleted_at
+
+只使用成功且完整（已跟隨全部分頁）的列表，請求失敗的文件夾不參與對賬，避免把未列出的子項誤刪。
+"""
+
+import time
+import logging
+from typing import Any, Dict, Iterable, List
+
+logger = logging.getLogger(__name__)
+
+# 已列出文件夾在數據庫中的未刪除子項
+LIVE_CHILDREN_SQL = """
+    SELECT 'folder' AS kind, id, parent_id
+    FROM folders
+    WHERE project_id = $1 AND parent_id = ANY($2::text[]) AND deleted_at IS NULL
+    UNION ALL
+    SELECT 'file' AS kind, id, parent_folder_id AS parent_id
+    FROM files
+    WHERE project_id = $1 AND parent_folder_id = ANY($2::text[]) AND deleted_at IS NULL
+"""
+
+# ACC 中觀察到的子項在數據庫中的父文件夾和墓碑狀態
+KNOWN_ITEMS_SQL = """
+    SELECT 'folder' AS kind, id, parent_id, deleted_at IS NOT NULL AS deleted
+    FROM folders
+    WHERE project_id = $1 AND id = ANY($2::text[])
+    UNION ALL
+    SELECT 'file' AS kind, id, parent_folder_id AS parent_id, deleted_at IS NOT NULL AS deleted
+    FROM files
+    WHERE project_id = $1 AND id = ANY($3::text[])
+"""
+
+MOVE_FOLDERS_SQL = """
+    UPDATE folders
+    SET parent_id = moved.parent_id, deleted_at = NULL, updated_at = CURRENT_TIMESTAMP
+    FROM unnest($2::text[], $3::text[]) AS moved(id, parent_id)
+    WHERE folders.project_id = $1 AND folders.id = moved.id
+"""
+
+MOVE_FILES_SQL = """
+    UPDATE files
+    SET parent_folder_id = moved.parent_id, deleted_at = NULL, updated_at = CURRENT_TIMESTAMP
+    FROM unnest($2::text[], $3::text[]) AS moved(id, parent_id)
+    WHERE files.project_id = $1 AND files.id = moved.id
+"""
+
+# 移動的文件夾及其子樹按新父文件夾重算路徑和深度，返回路徑變化的文件夾。
+# 同一輪中文件夾可能移到另一個也移動了的文件夾的子樹下，此時它會從多個起點各出現一次，
+# 只有從最上層移動文件夾遞歸下來的一行（level 最大）基於已更新的父路徑，每個 id 只取這一行
+REPATH_FOLDERS_SQL = """
+    WITH RECURSIVE tree AS (
+        SELECT f.id, p.path || '/' || f.name AS path, p.depth + 1 AS depth, 0 AS level
+        FROM folders f
+        JOIN folders p ON p.id = f.parent_id
+        WHERE f.project_id = $1 AND f.id = ANY($2::text[])
+        UNION ALL
+        SELECT c.id, t.path || '/' || c.name, t.depth + 1, t.level + 1
+        FROM folders c
+        JOIN tree t ON c.parent_id = t.id
+        WHERE c.project_id = $1 AND c.deleted_at IS NULL
+    ),
+    resolved AS (
+        SELECT DISTINCT ON (id) id, path, depth
+        FROM tree
+        ORDER BY id, level DESC
+    )
+    UPDATE folders
+    SET path = resolved.path, path_segments = string_to_array(resolved.path, '/'), depth = resolved.depth,
+        updated_at = CURRENT_TIMESTAMP
+    FROM resolved
+    WHERE folders.id = resolved.id
+    RETURNING folders.id
+"""
+
+# 路徑變化的文件夾下的文件和移動的文件按所在文件夾重算路徑
+REPATH_FILES_SQL = """
+    UPDATE files
+    SET folder_path = p.path,
+        full_path = p.path || '/' || files.name,
+        path_segments = string_to_array(p.path || '/' || files.name, '/'),
+        depth = p.depth + 1,
+        updated_at = CURRENT_TIMESTAMP
+    FROM folders p
+    WHERE files.project_id = $1
+      AND p.id = files.parent_folder_id
+      AND (files.parent_folder_id = ANY($2::text[]) OR files.id = ANY($3::text[]))
+"""
+
+# 缺失的文件夾連同子樹設置墓碑（ACC 中仍觀察到的子項不在子樹中）
+TOMBSTONE_FOLDERS_SQL = """
+    WITH RECURSIVE subtree AS (
+        SELECT id FROM folders
+        WHERE project_id = $1 AND id = ANY($2::text[]) AND deleted_at IS NULL
+        UNION ALL
+        SELECT c.id FROM folders c
+        JOIN subtree s ON c.parent_id = s.id
+        WHERE c.project_id = $1 AND c.deleted_at IS NULL AND NOT c.id = ANY($3::text[])
+    )
+    UPDATE folders
+    SET deleted_at = CURRENT_TIMESTAMP
+    FROM subtree
+    WHERE folders.id = subtree.id
+    RETURNING folders.id
+"""
+
+# 缺失的文件和已刪除文件夾下的文件設置墓碑
+TOMBSTONE_FILES_SQL = """
+    UPDATE files
+    SET deleted_at = CURRENT_TIMESTAMP
+    WHERE project_id = $1
+      AND deleted_at IS NULL
+      AND (id = ANY($2::text[]) OR parent_folder_id = ANY($3::text[]))
+      AND NOT id = ANY($4::text[])
+    RETURNING id
+"""
+
+
+def collect_observed_children(listings: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Dict[str, str]]:
+    """
+    從文件夾列表中收集觀察到的子項
+
+    Args:
+        listings: {folder_id: 該文件夾的完整子項列表（ACC原始數據）}
+
+    Returns:
+        {'folder': {id: parent_id}, 'file': {id: parent_id}}
+    """
+    observed = {'folder': {}, 'file': {}}
+    for folder_id, items in listings.items():
+        for item in items:
+            item_id = item.get('id')
+            if not item_id:
+                continue
+            if item.get('type') == 'folders':
+                observed['folder'][item_id] = folder_id
+            elif item.get('type') in ('items', 'files'):
+                observed['file'][item_id] = folder_id
+    return observed
+
+
+def _ids(rows: Iterable[Any]) -> List[str]:
+    return [row['id'] for row in rows]
+
+
+class DeletionReconciler:
+    """對比已列出文件夾的子項ID集合，批量設置刪除墓碑並修正移動的子項"""
+
+    def __init__(self, dal):
+        self.dal = dal
+
+    async def reconcile(self, project_id: str, listings: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Any]:
+        """
+        對賬已列出的文件夾
+
+        Args:
+            project_id: 項目ID
+            listings: {folder_id: 完整子項列表}，只應包含成功且已跟隨全部分頁的列表
+
+        Returns:
+            刪除/移動統計和對應ID（供文件樹緩存增量補丁使用）
+        """
+        start_time = time.time()
+        result = {
+            'folders_reconciled': len(listings),
+            'folders_deleted': 0,
+            'files_deleted': 0,
+            'folders_moved': 0,
+            'files_moved': 0,
+            'deleted_folder_ids': [],
+            'deleted_file_ids': [],
+            'moved_folder_ids': [],
+            'moved_file_ids': [],
+        }
+        if not listings:
+            return result
+
+        observed = collect_observed_children(listings)
+        observed_ids = list(observed['folder']) + list(observed['file'])
+
+        async with self.dal.get_connection() as conn:
+            live_rows = await conn.fetch(LIVE_CHILDREN_SQL, project_id, list(listings))
+            known_rows = await conn.fetch(KNOWN_ITEMS_SQL, project_id,
+                                          list(observed['folder']), list(observed['file']))
+
+            # 數據庫中的子項在所有已列出文件夾中都沒有出現 -> 已刪除
+            missing = {'folder': [], 'file': []}
+            for row in live_rows:
+                if row['id'] not in observed[row['kind']]:
+                    missing[row['kind']].append(row['id'])
+
+            # 出現在另一個父文件夾下或帶有墓碑 -> 移動/恢復
+            moved = {'folder': {}, 'file': {}}
+            for row in known_rows:
+                parent_id = observed[row['kind']][row['id']]
+                if row['deleted'] or row['parent_id'] != parent_id:
+                    moved[row['kind']][row['id']] = parent_id
+
+            if not any(missing.values()) and not any(moved.values()):
+                return result
+
+            async with conn.transaction():
+                # 先移動，移走的子樹不會被缺失的舊父文件夾連帶刪除
+                if moved['folder']:
+                    await conn.execute(MOVE_FOLDERS_SQL, project_id,
+                                       list(moved['folder']), list(moved['folder'].values()))
+                if moved['file']:
+                    await conn.execute(MOVE_FILES_SQL, project_id,
+                                       list(moved['file']), list(moved['file'].values()))
+                if moved['folder'] or moved['file']:
+                    repathed = []
+                    if moved['folder']:
+                        repathed = _ids(await conn.fetch(REPATH_FOLDERS_SQL, project_id, list(moved['folder'])))
+                    await conn.execute(REPATH_FILES_SQL, project_id, repathed, list(moved['file']))
+
+                deleted_folders = []
+                if missing['folder']:
+                    deleted_folders = _ids(await conn.fetch(TOMBSTONE_FOLDERS_SQL, project_id,
+                                                            missing['folder'], observed_ids))
+                deleted_files = []
+                if missing['file'] or deleted_folders:
+                    deleted_files = _ids(await conn.fetch(TOMBSTONE_FILES_SQL, project_id,
+                                                          missing['file'], deleted_folders, observed_ids))
+
+        result.update({
+            'folders_deleted': len(deleted_folders),
+            'files_deleted': len(deleted_files),
+            'folders_moved': len(moved['folder']),
+            'files_moved': len(moved['file']),
+            'deleted_folder_ids': deleted_folders,
+            'deleted_file_ids': deleted_files,
+            'moved_folder_ids': list(moved['folder']),
+            'moved_file_ids': list(moved['file']),
+        })
+        logger.info(f"🪦 刪除對賬完成: {len(listings)} 個文件夾, 刪除 {len(deleted_folders)} 文件夾/"
+                    f"{len(deleted_files)} 文件, 移動 {len(moved['folder'])} 文件夾/{len(moved['file'])} 文件, "
+                    f"耗時: {time.time() - start_time:.2f}s")
+        return result
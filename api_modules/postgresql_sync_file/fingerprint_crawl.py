@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""
+基於文件夾內容指紋的增量爬取
+
+原增量同步用 last_modified_time_rollup 與項目級 last_sync_time 比較，任何變化都會
+重新列出所有 rollup 變化的文件夾，本地與ACC的時鐘偏差也只能靠保守重掃兜底。
+這裡為每個文件夾記錄指紋（遷移腳本 database_sql/add_folder_fingerprints.sql）：
+
+- rollup 時間和對象數：來自父文件夾列表（頂層來自 topFolders）中該文件夾的屬性
+- 子項哈希：該文件夾直接子項ID與版本時間的MD5
+
+從頂層開始按層爬取，只進入指紋與數據庫記錄不一致的文件夾，未變化的子樹一次API調用都不需要，
+比較的都是ACC自身返回的值，不依賴本地時鐘。子項哈希一致的文件夾沒有直接子項變化，
+不再逐個比較文件，也不參與刪除對賬。
+
+指紋只在文件夾的整個子樹都成功列出後才返回給調用方保存（列表失敗或超過最大深度時
+其所有祖先都不保存），保證「指紋一致」總是意味著數據庫中的子樹已經是最新的。
+"""
+
+import asyncio
+import hashlib
+import logging
+from typing import Any, Dict, List, Optional
+
+from .folder_crawler import ConcurrentFolderCrawler
+
+logger = logging.getLogger(__name__)
+
+# 報告中列出的跳過/訪問路徑數量上限
+REPORT_PATH_LIMIT = 20
+
+# 從文件列表條目帶到文件記錄上的字段（增量寫庫時使用）
+FILE_RECORD_FIELDS = (
+    'project_id', 'name', 'display_name', 'parent_folder_id', 'folder_path', 'full_path',
+    'path_segments', 'depth', 'create_time', 'create_user_id', 'create_user_name',
+    'last_modified_time', 'last_modified_user_id', 'last_modified_user_name',
+)
+
+
+def child_hash(items: List[Dict[str, Any]]) -> str:
+    """直接子項ID與版本時間（文件夾為rollup時間和對象數，文件為修改時間）的MD5，與順序無關"""
+    entries = []
+    for item in items:
+        attributes = item.get('attributes', {})
+        if item.get('type') == 'folders':
+            version = f"{attributes.get('lastModifiedTimeRollup')}:{attributes.get('objectCount')}"
+        else:
+            version = str(attributes.get('lastModifiedTime'))
+        entries.append(f"{item.get('type')}:{item.get('id')}:{version}")
+    return hashlib.md5('\n'.join(sorted(entries)).encode('utf-8')).hexdigest()
+
+
+class FingerprintCrawl:
+    """
+    按層爬取指紋不一致的文件夾
+
+    用法:
+        crawl = FingerprintCrawl(manager, dal, max_concurrency=16)
+        result = await crawl.run(project_id, top_folders, headers, max_depth)
+
+    result: listings（子項有變化的文件夾的完整列表，供刪除對賬）、changed_folders（文件夾記錄）、
+            changed_files（帶路徑字段的文件列表條目）、fingerprints（可保存的指紋）、report
+    """
+
+    def __init__(self, manager, dal, max_concurrency: int = 16, crawler_cls=ConcurrentFolderCrawler):
+        self.manager = manager
+        self.dal = dal
+        self.max_concurrency = max_concurrency
+        self.crawler_cls = crawler_cls
+
+    def _fingerprint(self, folder: Dict[str, Any]) -> Dict[str, Any]:
+        attributes = folder.get('attributes', {})
+        return {
+            'rollup': self.manager._parse_datetime(attributes.get('lastModifiedTimeRollup')),
+            'object_count': attributes.get('objectCount')
+        }
+
+    @staticmethod
+    def _matches(fingerprint: Dict[str, Any], stored: Optional[Dict[str, Any]]) -> bool:
+        """數據庫中有完整指紋且 rollup 時間、對象數都一致"""
+        if not stored or not stored.get('child_hash') or fingerprint['rollup'] is None:
+            return False
+        return (stored.get('rollup') == fingerprint['rollup'] and
+                stored.get('object_count') == fingerprint['object_count'])
+
+    async def run(self, project_id: str, top_folders: List[Dict[str, Any]], headers: dict,
+                  max_depth: int = 10) -> Dict[str, Any]:
+        report = {
+            'folders_visited': 0,
+            'subtrees_skipped': 0,
+            'objects_skipped': 0,
+            'listing_errors': 0,
+            'changed_listings': 0,
+            'unchanged_listings': 0,
+            'api_calls': 0,
+            'levels': [],
+            'visited_paths': [],
+            'skipped_paths': [],
+        }
+        listings: Dict[str, List[Dict[str, Any]]] = {}
+        changed_folders: List[Dict[str, Any]] = []
+        changed_files: List[Dict[str, Any]] = []
+        nodes: List[Dict[str, Any]] = []
+
+        def skip(path: str, folder: Dict[str, Any]):
+            report['subtrees_skipped'] += 1
+            report['objects_skipped'] += folder.get('attributes', {}).get('objectCount') or 0
+            if len(report['skipped_paths']) < REPORT_PATH_LIMIT:
+                report['skipped_paths'].append(path)
+
+        def select(candidates: List[tuple], stored: Dict[str, Dict[str, Any]], depth: int,
+                   level: Dict[str, int]) -> List[Dict[str, Any]]:
+            """指紋一致的子樹跳過，其餘作為下一層待訪問的節點"""
+            selected = []
+            for folder, parent_path, parent in candidates:
+                record = self.manager._transform_folder_data_v2(folder, project_id, parent_path, depth)
+                fingerprint = self._fingerprint(folder)
+                if self._matches(fingerprint, stored.get(folder['id'])):
+                    skip(record['path'], folder)
+                    level['skipped'] += 1
+                    continue
+
+                changed_folders.append(record)
+                node = {'id': folder['id'], 'path': record['path'], 'depth': depth,
+                        'fingerprint': fingerprint, 'stored': stored.get(folder['id']),
+                        'children': [], 'listed': False, 'child_hash': None}
+                if parent is not None:
+                    parent['children'].append(node)
+                nodes.append(node)
+                selected.append(node)
+            return selected
+
+        level = {'depth': 0, 'visited': 0, 'skipped': 0}
+        stored = await self.dal.get_folder_fingerprints(project_id, [f['id'] for f in top_folders if f.get('id')])
+        frontier = select([(f, '', None) for f in top_folders if f.get('id')], stored, 0, level)
+
+        async with self.crawler_cls(max_concurrency=self.max_concurrency) as crawler:
+            depth = 0
+            while frontier:
+                if depth > max_depth:
+                    # 超過最大深度的文件夾不列出，其祖先的指紋不保存
+                    report['levels'].append(level)
+                    break
+
+                results = await self._list_level(crawler, project_id, frontier, headers)
+
+                next_candidates = []
+                files_to_compare = []
+                for node, items in zip(frontier, results):
+                    if isinstance(items, Exception):
+                        report['listing_errors'] += 1
+                        logger.warning(f"Failed to list folder {node['id']}: {items}")
+                        continue
+
+                    node['listed'] = True
+                    node['child_hash'] = child_hash(items)
+                    level['visited'] += 1
+                    report['folders_visited'] += 1
+                    if len(report['visited_paths']) < REPORT_PATH_LIMIT:
+                        report['visited_paths'].append(node['path'])
+
+                    direct_changes = (node['stored'] or {}).get('child_hash') != node['child_hash']
+                    if direct_changes:
+                        report['changed_listings'] += 1
+                        listings[node['id']] = items
+                    else:
+                        report['unchanged_listings'] += 1
+
+                    for item in items:
+                        if item.get('type') == 'folders' and item.get('id'):
+                            next_candidates.append((item, node['path'], node))
+                        elif direct_changes and item.get('type') in ('items', 'files') and item.get('id'):
+                            files_to_compare.append((item, node))
+
+                changed_files.extend(await self._changed_files(project_id, files_to_compare))
+
+                report['levels'].append(level)
+                depth += 1
+                level = {'depth': depth, 'visited': 0, 'skipped': 0}
+                stored = await self.dal.get_folder_fingerprints(
+                    project_id, [folder['id'] for folder, _, _ in next_candidates]
+                )
+                frontier = select(next_candidates, stored, depth, level)
+
+            report['api_calls'] = crawler.stats['requests']
+
+        # 自底向上：列表成功且所有進入的子文件夾都完整的文件夾才保存指紋
+        complete = {}
+        for node in reversed(nodes):
+            complete[node['id']] = node['listed'] and all(complete.get(child['id']) for child in node['children'])
+
+        fingerprints = [
+            {'id': node['id'], 'rollup': node['fingerprint']['rollup'],
+             'object_count': node['fingerprint']['object_count'], 'child_hash': node['child_hash']}
+            for node in nodes if complete[node['id']] and node['fingerprint']['rollup'] is not None
+        ]
+        report['fingerprints_complete'] = len(fingerprints)
+
+        logger.info(f"🧭 指紋爬取完成: 訪問 {report['folders_visited']} 個文件夾, 跳過 {report['subtrees_skipped']} 個子樹"
+                    f"（{report['objects_skipped']} 個對象）, 列表失敗 {report['listing_errors']}, "
+                    f"API調用 {report['api_calls']}")
+
+        return {
+            'listings': listings,
+            'changed_folders': changed_folders,
+            'changed_files': changed_files,
+            'fingerprints': fingerprints,
+            'report': report
+        }
+
+    async def _list_level(self, crawler, project_id: str, frontier: List[Dict[str, Any]], headers: dict) -> List[Any]:
+        """並發列出一層文件夾（受爬取器並發限制，自動跟隨分頁），失敗的返回異常"""
+        return await asyncio.gather(*[
+            crawler.list_folder_contents(project_id, node['id'], headers) for node in frontier
+        ], return_exceptions=True)
+
+    async def _changed_files(self, project_id: str, files: List[tuple]) -> List[Dict[str, Any]]:
+        """與數據庫中的修改時間不一致（或數據庫中沒有）的文件，帶上寫庫需要的路徑字段"""
+        if not files:
+            return []
+
+        known = await self.dal.get_file_modified_times(project_id, [item['id'] for item, _ in files])
+        changed = []
+        for item, node in files:
+            modified = self.manager._parse_datetime(item.get('attributes', {}).get('lastModifiedTime'))
+            if item['id'] in known and modified is not None and known[item['id']] == modified:
+                continue
+
+            record = self.manager._transform_file_data_v2(item, project_id, node['path'], node['depth'] + 1)
+            record['parent_folder_id'] = node['id']
+            changed.append(dict(item, **{field: record.get(field) for field in FILE_RECORD_FIELDS}))
+        return changed
@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+"""
+按層並發的文件夾爬取器
+將BFS的每一層（frontier）作為一批並發請求發出，受信號量限制，
+共享keep-alive連接池，並自動跟隨 links.next 分頁。
+請求經共享 ACC 客戶端發出（分組限流、429/5xx 重試）
+"""
+
+import asyncio
+import time
+import logging
+import urllib.parse
+from typing import Dict, List, Any, Optional, Callable, Awaitable, AsyncIterator, Tuple
+
+from api_modules.acc_http_client import get_acc_client
+
+logger = logging.getLogger(__name__)
+
+ACC_DATA_API_BASE = "https://developer.api.autodesk.com/data/v1"
+
+# folders/{id}/contents 單頁最大條目數
+CONTENTS_PAGE_LIMIT = 200
+
+
+class ConcurrentFolderCrawler:
+    """
+    按層並發的文件夾BFS爬取器
+
+    用法:
+        async with ConcurrentFolderCrawler(max_concurrency=16) as crawler:
+            async for level in crawler.crawl(project_id, top_folders, headers, max_depth):
+                for entry in level:
+                    ...
+
+    每個 entry 為 dict: folder, depth, parent_path, path, contents, extra, error
+    """
+
+    def __init__(self, max_concurrency: int = 16, connector_limit: int = None,
+                 keepalive_timeout: float = 30.0, request_timeout: float = 60.0,
+                 page_limit: int = CONTENTS_PAGE_LIMIT):
+        self.max_concurrency = max(1, max_concurrency)
+        self.connector_limit = connector_limit or self.max_concurrency * 2
+        self.keepalive_timeout = keepalive_timeout
+        self.request_timeout = request_timeout
+        self.page_limit = page_limit
+
+        self.session = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.http = get_acc_client()
+
+        # 爬取統計
+        self.stats = {
+            'requests': 0,
+            'pages': 0,
+            'failed_requests': 0,
+            'folders_visited': 0,
+            'items_found': 0,
+            'in_flight': 0,
+            'max_in_flight': 0,
+            'levels': []
+        }
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def open(self):
+        """創建共享的keep-alive連接池和會話"""
+        import aiohttp
+
+        if self.session is not None:
+            return
+
+        connector = aiohttp.TCPConnector(
+            limit=self.connector_limit,
+            keepalive_timeout=self.keepalive_timeout,
+            ttl_dns_cache=300
+        )
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.request_timeout)
+        )
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    async def close(self):
+        """關閉會話和連接池"""
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    # ------------------------------------------------------------------
+    # 請求層
+    # ------------------------------------------------------------------
+
+    async def run_bounded(self, coro: Awaitable) -> Any:
+        """在並發信號量內執行協程，並記錄在途請求數"""
+        async with self._semaphore:
+            self.stats['in_flight'] += 1
+            self.stats['max_in_flight'] = max(self.stats['max_in_flight'], self.stats['in_flight'])
+            try:
+                return await coro
+            finally:
+                self.stats['in_flight'] -= 1
+
+    async def _get_json(self, url: str, headers: dict) -> Optional[Dict[str, Any]]:
+        """GET並解析JSON，非200返回None（限流與重試由共享客戶端處理）"""
+        self.stats['requests'] += 1
+        response = await self.http.request('GET', url, headers=headers, session=self.session)
+        if response.status == 200:
+            return response.data
+
+        self.stats['failed_requests'] += 1
+        logger.warning(f"Request failed: {response.status} - {url} - {response.text[:200]}")
+        return None
+
+    async def get_json(self, url: str, headers: dict) -> Optional[Dict[str, Any]]:
+        """受並發限制的GET請求"""
+        return await self.run_bounded(self._get_json(url, headers))
+
+    async def list_folder_contents(self, project_id: str, folder_id: str,
+                                   headers: dict) -> List[Dict[str, Any]]:
+        """獲取文件夾全部內容，自動跟隨 links.next 分頁"""
+        encoded_folder_id = urllib.parse.quote(folder_id, safe='')
+        url = (f"{ACC_DATA_API_BASE}/projects/{project_id}/folders/{encoded_folder_id}/contents"
+               f"?page%5Blimit%5D={self.page_limit}")
+
+        items = []
+        while url:
+            data = await self.get_json(url, headers)
+            if data is None:
+                raise RuntimeError(f"Failed to list folder contents: {folder_id}")
+
+            self.stats['pages'] += 1
+            items.extend(data.get('data', []))
+            url = ((data.get('links') or {}).get('next') or {}).get('href')
+
+        return items
+
+    # ------------------------------------------------------------------
+    # BFS層級並發
+    # ------------------------------------------------------------------
+
+    async def _visit_folder(self, project_id: str, folder: Dict[str, Any], depth: int,
+                            parent_path: str, headers: dict,
+                            folder_extra: Optional[Callable[[str], Awaitable[Any]]]) -> Dict[str, Any]:
+        """訪問單個文件夾：內容列表與附加查詢並發執行"""
+        folder_id = folder.get('id')
+        folder_name = folder.get('attributes', {}).get('name', 'Unknown')
+
+        entry = {
+            'folder': folder,
+            'depth': depth,
+            'parent_path': parent_path,
+            'path': f"{parent_path}/{folder_name}".strip('/'),
+            'contents': [],
+            'extra': None,
+            'error': None
+        }
+
+        tasks = [self.list_folder_contents(project_id, folder_id, headers)]
+        if folder_extra is not None:
+            tasks.append(self.run_bounded(folder_extra(folder_id)))
+
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+
+        contents = results[0]
+        if isinstance(contents, BaseException):
+            entry['error'] = str(contents)
+            logger.error(f"Error getting folder contents for {folder_name}: {contents}")
+        else:
+            entry['contents'] = contents
+            self.stats['items_found'] += len(contents)
+
+        if folder_extra is not None:
+            extra = results[1]
+            if isinstance(extra, BaseException):
+                logger.warning(f"Folder extra lookup failed for {folder_id}: {extra}")
+            else:
+                entry['extra'] = extra
+
+        self.stats['folders_visited'] += 1
+        return entry
+
+    async def crawl(self, project_id: str, top_folders: List[Dict[str, Any]], headers: dict,
+                    max_depth: int = 10,
+                    folder_extra: Optional[Callable[[str], Awaitable[Any]]] = None,
+                    start_depth: int = 0,
+                    parent_paths: Optional[List[str]] = None,
+                    chunk_size: Optional[int] = None
+                    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        按層BFS遍歷，每層的所有文件夾並發訪問
+
+        Args:
+            project_id: 項目ID
+            top_folders: 起始文件夾（API原始數據），默認為項目頂級文件夾
+            headers: 認證頭
+            max_depth: 最大深度
+            folder_extra: 每個文件夾的附加查詢（如自定義屬性定義），與內容列表並發
+            start_depth: 起始文件夾所在深度（從檢查點恢復時大於0）
+            parent_paths: 起始文件夾的父路徑，與 top_folders 一一對應，默認為空
+            chunk_size: 每次最多訪問並產出的文件夾數；為空時整層一次產出。
+                分塊後調用方處理完一塊才會繼續爬取，內存只保留一塊的內容列表
+
+        Yields:
+            每一層（或一層中的一塊）的訪問結果列表
+        """
+        if self.session is None:
+            await self.open()
+
+        paths = parent_paths or [""] * len(top_folders)
+        frontier: List[Tuple[Dict[str, Any], int, str]] = [
+            (folder, start_depth, parent_path) for folder, parent_path in zip(top_folders, paths)
+        ]
+        depth = start_depth
+
+        while frontier and depth < max_depth:
+            level_start = time.time()
+            step = chunk_size or len(frontier)
+            next_frontier = []
+            errors = 0
+
+            for offset in range(0, len(frontier), step):
+                chunk = await asyncio.gather(*[
+                    self._visit_folder(project_id, folder, folder_depth, parent_path, headers, folder_extra)
+                    for folder, folder_depth, parent_path in frontier[offset:offset + step]
+                ])
+
+                for entry in chunk:
+                    errors += 1 if entry['error'] else 0
+                    for item in entry['contents']:
+                        if item.get('type') == 'folders':
+                            next_frontier.append((item, depth + 1, entry['path']))
+
+                yield chunk
+
+            level_stats = {
+                'depth': depth,
+                'folders': len(frontier),
+                'errors': errors,
+                'latency_seconds': round(time.time() - level_start, 3)
+            }
+            self.stats['levels'].append(level_stats)
+            logger.info(f"📂 Level {depth}: {level_stats['folders']} folders, "
+                        f"{level_stats['latency_seconds']}s, max in-flight {self.stats['max_in_flight']}")
+
+            frontier = next_frontier
+            depth += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """獲取爬取統計"""
+        return {
+            **{key: value for key, value in self.stats.items() if key != 'levels'},
+            'levels': list(self.stats['levels']),
+            'max_concurrency': self.max_concurrency
+        }
@@ -4,6 +4,7 @@
 基于五层优化策略，支持智能跳过、批量操作、并发处理
 """
 
+import os
 import asyncio
 import time
 import uuid
@@ -17,6 +18,11 @@ import pytz
 
 from database_sql.optimized_data_access import get_optimized_postgresql_dal
 from database.data_sync_strategy import DataTransformer
+from .folder_crawler import ConcurrentFolderCrawler
+from .streaming_full_sync import FullSyncCheckpointStore, run_streaming_full_sync
+from .deletion_reconciler import DeletionReconciler
+from .fingerprint_crawl import FingerprintCrawl
+from api_modules.acc_http_client import get_acc_client
 
 logger = logging.getLogger(__name__)
 
@@ -26,12 +32,35 @@ CHINA_TZ = pytz.timezone('Asia/Shanghai')
 class OptimizedPostgreSQLSyncManager:
     """优化的PostgreSQL同步管理器"""
     
-    def __init__(self, batch_size: int = 100, api_delay: float = 0.02, max_workers: int = 8, memory_threshold_mb: int = 1024):
+    def __init__(self, batch_size: int = 100, api_delay: float = 0.02, max_workers: int = 8, memory_threshold_mb: int = 1024,
+                 crawl_concurrency: int = 16, streaming_full_sync: bool = None, reconcile_deletions: bool = None,
+                 fingerprint_crawl: bool = None):
         self.batch_size = batch_size
+        # 仅同步降级路径使用；异步请求由共享 ACC 客户端按配额限流
         self.api_delay = api_delay
         self.max_workers = max_workers
         self.memory_threshold_mb = memory_threshold_mb
         
+        # 文件夹爬取并发度（每层BFS的最大在途请求数）
+        self.crawl_concurrency = crawl_concurrency
+        self.last_crawl_stats: Dict[str, Any] = {}
+        
+        # 全量同步使用流式流水线（爬取/补充/写库分批进行，按层保存检查点）
+        if streaming_full_sync is None:
+            streaming_full_sync = os.getenv('FULL_SYNC_STREAMING', '1') == '1'
+        self.streaming_full_sync = streaming_full_sync
+        
+        # 增量同步对比已列出文件夹的子项ID集合，为ACC中已删除的文件夹/文件设置墓碑
+        if reconcile_deletions is None:
+            reconcile_deletions = os.getenv('INCREMENTAL_SYNC_RECONCILE_DELETIONS', '1') == '1'
+        self.reconcile_deletions = reconcile_deletions
+        self.last_folder_listings: Dict[str, List[Dict[str, Any]]] = {}
+        
+        # 增量同步按文件夹内容指纹逐层爬取，只进入指纹变化的子文件夹（不依赖 last_sync_time）
+        if fingerprint_crawl is None:
+            fingerprint_crawl = os.getenv('INCREMENTAL_SYNC_FINGERPRINTS', '1') == '1'
+        self.fingerprint_crawl = fingerprint_crawl
+        
         # 性能统计
         self.stats = {
             'api_calls': 0,
@@ -40,7 +69,8 @@ class OptimizedPostgreSQLSyncManager:
             'batch_operations': 0,
             'concurrent_operations': 0,
             'memory_peak_mb': 0,
-            'processing_time': 0
+            'processing_time': 0,
+            'write_errors': 0
         }
         
         # 数据转换器
@@ -48,6 +78,9 @@ class OptimizedPostgreSQLSyncManager:
         
         # 内存管理 (已在__init__中設置)
         
+        # 共享的 ACC HTTP 客户端（分组限流、429/5xx 重试、keep-alive 连接池）
+        self.http = get_acc_client()
+        
         # 并发控制
         self.api_semaphore = asyncio.Semaphore(8)
         self.db_semaphore = asyncio.Semaphore(15)
@@ -216,6 +249,7 @@ class OptimizedPostgreSQLSyncManager:
                 FROM folders 
                 WHERE project_id = $1 
                   AND depth = 0
+                  AND deleted_at IS NULL
                   AND last_modified_time_rollup IS NOT NULL
                 """
                 
@@ -446,6 +480,9 @@ class OptimizedPostgreSQLSyncManager:
         logger.info(f"📡 开始批量API操作: {len(folders_to_check)} 个文件夹")
         start_time = time.time()
         
+        # 成功且完整（已跟随全部分页）的文件夹列表，供删除对账使用
+        self.last_folder_listings = {}
+        
         try:
             dal = await get_optimized_postgresql_dal()
             last_sync_time = await dal.get_project_last_sync_time(project_id)
@@ -454,81 +491,52 @@ class OptimizedPostgreSQLSyncManager:
             folder_ids = [folder['id'] for folder in folders_to_check]
             
             # 分批处理，避免API限制
-            batch_size = min(20, len(folder_ids))  # API批量限制
-            contents_batches = []
+            batch_size = max(1, min(20, len(folder_ids)))  # API批量限制
             
-            # 使用現有的異步方法逐個獲取文件夾內容
             try:
-                import aiohttp
-                
-                async with aiohttp.ClientSession() as session:
-                    contents_batches = []
-                    
-                    # 分批處理以避免過多並發
-                    for i in range(0, len(folder_ids), batch_size):
-                        batch_ids = folder_ids[i:i + batch_size]
-                        
-                        # 並發獲取當前批次的文件夾內容
-                        tasks = []
-                        for folder_id in batch_ids:
-                            task = self._get_folder_contents_async(session, project_id, folder_id, headers)
-                            tasks.append((folder_id, task))
-                        
-                        # 等待當前批次完成
-                        batch_results = {}
-                        for folder_id, task in tasks:
-                            try:
-                                content = await task
-                                batch_results[folder_id] = content
-                            except Exception as e:
-                                logger.warning(f"Failed to get contents for folder {folder_id}: {e}")
-                                batch_results[folder_id] = {}
-                        
-                        contents_batches.append(batch_results)
-                        
-                        # API節流
-                        if i + batch_size < len(folder_ids):
-                            await asyncio.sleep(self.api_delay)
+                async with ConcurrentFolderCrawler(max_concurrency=batch_size) as crawler:
+                    # 並發獲取文件夾全部內容（自動跟隨 links.next 分頁，節流由共享客戶端的令牌桶負責）
+                    results = await asyncio.gather(*[
+                        crawler.list_folder_contents(project_id, folder_id, headers)
+                        for folder_id in folder_ids
+                    ], return_exceptions=True)
+                    self.stats['api_calls'] += crawler.stats['requests']
+                
+                for folder_id, items in zip(folder_ids, results):
+                    if isinstance(items, Exception):
+                        logger.warning(f"Failed to get contents for folder {folder_id}: {items}")
+                        continue
+                    self.last_folder_listings[folder_id] = items
                             
             except ImportError:
                 logger.warning("aiohttp not available, skipping batch processing")
-                contents_batches = []
             
             # 🔑 解析批量结果，提取变化的文件和文件夹
             changed_folders = []
             changed_files = []
             
-            for batch_contents in contents_batches:
-                for folder_id, contents_data in batch_contents.items():
-                    if not contents_data or not contents_data.get('data'):
-                        continue
+            for folder_id, items in self.last_folder_listings.items():
+                # 处理文件夹内容
+                for item in items:
+                    item_type = item.get('type')
                     
-                    # 找到对应的文件夹信息
-                    folder_info = next((f for f in folders_to_check if f['id'] == folder_id), None)
-                    if not folder_info:
-                        continue
+                    if item_type == 'folders':
+                        # 子文件夹 - 检查rollup时间
+                        subfolder_rollup = self._parse_datetime(
+                            item.get('attributes', {}).get('lastModifiedTimeRollup')
+                        )
+                        if not subfolder_rollup or (last_sync_time and subfolder_rollup > last_sync_time):
+                            changed_folders.append(item)
+                        else:
+                            self.stats['smart_skips'] += 1
                     
-                    # 处理文件夹内容
-                    for item in contents_data['data']:
-                        item_type = item.get('type')
-                        
-                        if item_type == 'folders':
-                            # 子文件夹 - 检查rollup时间
-                            subfolder_rollup = self._parse_datetime(
-                                item.get('attributes', {}).get('lastModifiedTimeRollup')
-                            )
-                            if not subfolder_rollup or (last_sync_time and subfolder_rollup > last_sync_time):
-                                changed_folders.append(item)
-                            else:
-                                self.stats['smart_skips'] += 1
-                        
-                        elif item_type in ['items', 'files']:
-                            # 文件 - 检查修改时间
-                            file_modified = self._parse_datetime(
-                                item.get('attributes', {}).get('lastModifiedTime')
-                            )
-                            if file_modified and last_sync_time and file_modified > last_sync_time:
-                                changed_files.append(item)
+                    elif item_type in ['items', 'files']:
+                        # 文件 - 检查修改时间
+                        file_modified = self._parse_datetime(
+                            item.get('attributes', {}).get('lastModifiedTime')
+                        )
+                        if file_modified and last_sync_time and file_modified > last_sync_time:
+                            changed_files.append(item)
             
             api_time = time.time() - start_time
             self.stats['processing_time'] += api_time
@@ -563,37 +571,28 @@ class OptimizedPostgreSQLSyncManager:
             try:
                 import aiohttp
                 
-                async with aiohttp.ClientSession() as session:
+                async with self.http.limited_session() as session:
                     # 分批处理文件
                     for i in range(0, len(changed_files), batch_size):
                         batch_files = changed_files[i:i + batch_size]
                         
-                        # 并发获取当前批次的版本信息
-                        tasks = []
-                        for file_data in batch_files:
-                            file_id = file_data.get('id')
-                            if file_id:
-                                task = self._get_file_versions_async(session, project_id, file_id, headers)
-                                tasks.append((file_data, task))
+                        # 并发获取当前批次的版本信息（节流由共享客户端的令牌桶负责）
+                        batch_files = [file_data for file_data in batch_files if file_data.get('id')]
+                        results = await asyncio.gather(*[
+                            self._get_file_versions_async(session, project_id, file_data['id'], headers)
+                            for file_data in batch_files
+                        ], return_exceptions=True)
                         
-                        # 等待当前批次完成
-                        for file_data, task in tasks:
-                            try:
-                                versions_info = await task
-                                # 将版本信息合并到文件数据中
-                                file_data['versions_info'] = versions_info
-                                all_file_metadata.append(file_data)
-                                
-                                self.stats['api_calls'] += 1
-                            except Exception as e:
-                                logger.warning(f"获取文件版本失败 {file_data.get('id')}: {e}")
+                        for file_data, versions_info in zip(batch_files, results):
+                            if isinstance(versions_info, Exception):
+                                logger.warning(f"获取文件版本失败 {file_data.get('id')}: {versions_info}")
                                 # 即使版本获取失败，也保留基本文件信息
-                                file_data['versions_info'] = []
-                                all_file_metadata.append(file_data)
-                        
-                        # API节流
-                        if i + batch_size < len(changed_files):
-                            await asyncio.sleep(self.api_delay)
+                                versions_info = []
+                            else:
+                                self.stats['api_calls'] += 1
+                            # 将版本信息合并到文件数据中
+                            file_data['versions_info'] = versions_info
+                            all_file_metadata.append(file_data)
                         
                         self.stats['batch_operations'] += 1
                         
@@ -1033,8 +1032,9 @@ class OptimizedPostgreSQLSyncManager:
         
         logger.info(f"🚀 开始优化增量同步: 项目 {project_id}")
         
-        # 直接使用V2架构的增量同步
-        return await self._optimized_incremental_sync_v2(project_id, max_depth, include_custom_attributes, task_uuid, headers)
+        # 直接使用V2架构的增量同步；整个任务共用一个 keep-alive 连接池
+        async with self.http.session_scope():
+            return await self._optimized_incremental_sync_v2(project_id, max_depth, include_custom_attributes, task_uuid, headers)
             
     async def optimized_full_sync(self, project_id: str, max_depth: int = 10, 
                                 include_custom_attributes: bool = True, 
@@ -1043,8 +1043,9 @@ class OptimizedPostgreSQLSyncManager:
         
         logger.info(f"🚀 开始优化全量同步: 项目 {project_id}")
             
-        # 直接使用V2架构的全量同步
-        return await self._optimized_full_sync_v2(project_id, max_depth, include_custom_attributes, task_uuid, headers)
+        # 直接使用V2架构的全量同步；整个任务共用一个 keep-alive 连接池
+        async with self.http.session_scope():
+            return await self._optimized_full_sync_v2(project_id, max_depth, include_custom_attributes, task_uuid, headers)
     
     # ============================================================================
     # 辅助方法 - 异步API调用
@@ -1055,7 +1056,7 @@ class OptimizedPostgreSQLSyncManager:
         try:
             import aiohttp
             
-            async with aiohttp.ClientSession() as session:
+            async with self.http.limited_session() as session:
                 # Step 1: Get hubs to find the hub containing this project
                 hubs_url = "https://developer.api.autodesk.com/project/v1/hubs"
                 
@@ -1161,7 +1162,7 @@ class OptimizedPostgreSQLSyncManager:
         try:
             import aiohttp
             
-            async with aiohttp.ClientSession() as session:
+            async with self.http.limited_session() as session:
                 while queue and len(queue) > 0:
                     current_batch = queue[:self.batch_size]
                     queue = queue[self.batch_size:]
@@ -1197,10 +1198,6 @@ class OptimizedPostgreSQLSyncManager:
                                     
                         except Exception as e:
                             logger.warning(f"获取文件夹内容失败 {folder_data.get('id')}: {e}")
-                    
-                    # API节流
-                    if queue:
-                        await asyncio.sleep(self.api_delay)
                         
         except ImportError:
             logger.warning("aiohttp not available, using basic collection")
@@ -1254,7 +1251,7 @@ class OptimizedPostgreSQLSyncManager:
         try:
             import aiohttp
             
-            async with aiohttp.ClientSession() as session:
+            async with self.http.limited_session() as session:
                 # Step 1: Get hubs to find the hub containing this project
                 hubs_url = "https://developer.api.autodesk.com/project/v1/hubs"
                 
@@ -1360,7 +1357,7 @@ class OptimizedPostgreSQLSyncManager:
         try:
             import aiohttp
             
-            async with aiohttp.ClientSession() as session:
+            async with self.http.limited_session() as session:
                 while queue:
                     current_batch = queue[:self.batch_size]  # Process in batches
                     queue = queue[self.batch_size:]
@@ -1396,9 +1393,6 @@ class OptimizedPostgreSQLSyncManager:
                             logger.warning(f"Failed to get contents for folder {folder_data.get('id')}: {e}")
                             continue
                     
-                    # Add small delay to avoid rate limiting
-                    if queue:  # Only delay if there are more items to process
-                        await asyncio.sleep(self.api_delay)
                         
         except ImportError:
             # Fallback to synchronous processing
@@ -1503,7 +1497,7 @@ class OptimizedPostgreSQLSyncManager:
                 "urns": version_urns
             }
             
-            async with aiohttp.ClientSession() as session:
+            async with self.http.limited_session() as session:
                 async with session.post(url, headers=headers, json=payload) as response:
                     if response.status == 200:
                         data = await response.json()
@@ -1603,7 +1597,7 @@ class OptimizedPostgreSQLSyncManager:
             
             url = f"https://developer.api.autodesk.com/bim360/docs/v1/projects/{bim360_project_id}/folders/{encoded_folder_id}/custom-attribute-definitions"
             
-            async with aiohttp.ClientSession() as session:
+            async with self.http.limited_session() as session:
                 async with session.get(url, headers=headers) as response:
                     if response.status == 200:
                         data = await response.json()
@@ -2085,30 +2079,64 @@ class OptimizedPostgreSQLSyncManager:
             
             logger.info(f"上次同步时间: {last_sync_time}")
             
-            # 🚀 Layer 1: 智能分支跳过 (V2版本)
-            folders_to_check = await self._smart_branch_filtering_v2(project_id, last_sync_time, headers)
-            
-            if not folders_to_check:
-                logger.info("✅ 智能跳过：项目无变化")
-                return {
-                    'status': 'no_changes',
-                    'folders_synced': 0,
-                    'files_synced': 0,
-                    'custom_attrs_synced': 0,
-                    'performance_stats': self._get_performance_stats(),
-                    'optimization_efficiency': 100.0,
-                    'architecture_version': 'v2'
-                }
+            # 🧭 按文件夹内容指纹逐层爬取（无法获取顶级文件夹时回退到rollup分支过滤）
+            fingerprint_crawl = None
+            if self.fingerprint_crawl:
+                fingerprint_crawl = await self._fingerprint_crawl_v2(project_id, max_depth, headers, dal)
             
-            # 🚀 Layer 2: 批量API调用 (V2版本)
-            changed_folders, changed_files = await self._batch_api_operations_v2(project_id, folders_to_check, headers)
+            if fingerprint_crawl is not None:
+                changed_folders = fingerprint_crawl['changed_folders']
+                changed_files = fingerprint_crawl['changed_files']
+                self.last_folder_listings = fingerprint_crawl['listings']
+                
+                if not changed_folders:
+                    logger.info("✅ 指纹跳过：所有顶级文件夹指纹一致，项目无变化")
+                    return {
+                        'status': 'no_changes',
+                        'folders_synced': 0,
+                        'files_synced': 0,
+                        'custom_attrs_synced': 0,
+                        'fingerprint_crawl': fingerprint_crawl['report'],
+                        'performance_stats': self._get_performance_stats(),
+                        'optimization_efficiency': 100.0,
+                        'architecture_version': 'v2'
+                    }
+            else:
+                # 🚀 Layer 1: 智能分支跳过 (V2版本)
+                folders_to_check = await self._smart_branch_filtering_v2(project_id, last_sync_time, headers)
+                
+                if not folders_to_check:
+                    logger.info("✅ 智能跳过：项目无变化")
+                    return {
+                        'status': 'no_changes',
+                        'folders_synced': 0,
+                        'files_synced': 0,
+                        'custom_attrs_synced': 0,
+                        'performance_stats': self._get_performance_stats(),
+                        'optimization_efficiency': 100.0,
+                        'architecture_version': 'v2'
+                    }
+                
+                # 🚀 Layer 2: 批量API调用 (V2版本)
+                changed_folders, changed_files = await self._batch_api_operations_v2(project_id, folders_to_check, headers)
             
             logger.info(f"📊 API批量操作完成: {len(changed_folders)} 文件夹, {len(changed_files)} 文件")
             
+            # 🪦 删除对账：已列出文件夹中消失的子项设置墓碑，移动的子项更新父文件夹
+            deletions = await self._reconcile_deletions_v2(project_id, dal)
+            
             # 🚀 Layer 3: 文件级timestamp比对和批量标记 (V2版本)
-            files_needing_updates = await self._identify_files_needing_updates_v2(
-                changed_files, project_id, last_sync_time, dal
-            )
+            if fingerprint_crawl is not None:
+                # 指纹爬取已按数据库中的修改时间筛选出变化的文件，不再与 last_sync_time 比较
+                files_needing_updates = [
+                    {'file_id': file_data['id'], 'file_data': file_data, 'reason': 'fingerprint_changed',
+                     'needs_custom_attributes': True, 'needs_version_update': True}
+                    for file_data in changed_files
+                ]
+            else:
+                files_needing_updates = await self._identify_files_needing_updates_v2(
+                    changed_files, project_id, last_sync_time, dal
+                )
             
             logger.info(f"🎯 文件更新分析: {len(files_needing_updates)} 个文件需要更新")
             
@@ -2134,7 +2162,7 @@ class OptimizedPostgreSQLSyncManager:
                 # 转换文件数据为V2格式
                 v2_files_data = []
                 for file_data in files_to_process:
-                    custom_attrs = file_data.get('custom_attributes', {})
+                    custom_attrs = file_data.get('custom_attributes') or {}
                     v2_file = {
                         'id': file_data.get('id'),
                         'project_id': file_data.get('project_id'),
@@ -2145,12 +2173,14 @@ class OptimizedPostgreSQLSyncManager:
                         'full_path': file_data.get('full_path', ''),
                         'path_segments': file_data.get('path_segments', []),
                         'depth': file_data.get('depth', 0),
-                        'create_time': custom_attrs.get('createTime'),
-                        'create_user_id': custom_attrs.get('createUserId'),
-                        'create_user_name': custom_attrs.get('createUserName'),
-                        'last_modified_time': custom_attrs.get('lastModifiedTime'),
-                        'last_modified_user_id': custom_attrs.get('lastModifiedUserId'),
-                        'last_modified_user_name': custom_attrs.get('lastModifiedUserName'),
+                        # 指纹爬取的文件已带有列表中的时间和用户，优先使用
+                        'create_time': file_data.get('create_time') or custom_attrs.get('createTime'),
+                        'create_user_id': file_data.get('create_user_id') or custom_attrs.get('createUserId'),
+                        'create_user_name': file_data.get('create_user_name') or custom_attrs.get('createUserName'),
+                        'last_modified_time': file_data.get('last_modified_time') or custom_attrs.get('lastModifiedTime'),
+                        'last_modified_user_id': file_data.get('last_modified_user_id') or custom_attrs.get('lastModifiedUserId'),
+                        'last_modified_user_name': (file_data.get('last_modified_user_name') or
+                                                    custom_attrs.get('lastModifiedUserName')),
                         'file_type': custom_attrs.get('name', '').split('.')[-1] if custom_attrs.get('name') else '',
                         'mime_type': '',
                         'reserved': False,
@@ -2175,9 +2205,26 @@ class OptimizedPostgreSQLSyncManager:
             if include_custom_attributes and files_to_process:
                 custom_attrs_synced = await self._batch_insert_custom_attributes_v2(files_to_process, dal)
             
+            # 🧭 变更写入且对账成功后才保存指纹，否则下次增量同步会跳过未写入的子树
+            if fingerprint_crawl is not None:
+                await self._save_folder_fingerprints_v2(project_id, fingerprint_crawl, deletions, dal)
+            
             # 只有在实际同步了内容时才更新同步状态
-            if folders_synced > 0 or files_synced > 0 or custom_attrs_synced > 0:
+            file_tree_cache_result = {'mode': 'noop'}
+            reconciled = (deletions['folders_deleted'] + deletions['files_deleted'] +
+                          deletions['folders_moved'] + deletions['files_moved'])
+            if folders_synced > 0 or files_synced > 0 or custom_attrs_synced > 0 or reconciled > 0:
                 await self._update_project_sync_status(project_id, dal)
+                
+                # 🌳 把本次变更集推送给文件树缓存做增量补丁
+                changed_folder_ids = [folder.get('id') for folder in changed_folders if folder.get('id')]
+                changed_file_ids = [file_data.get('id') for file_data in files_to_process if file_data.get('id')]
+                file_tree_cache_result = await self._emit_file_tree_delta(project_id, {
+                    'changed_folder_ids': list(dict.fromkeys(changed_folder_ids + deletions['moved_folder_ids'])),
+                    'changed_file_ids': list(dict.fromkeys(changed_file_ids + deletions['moved_file_ids'])),
+                    'deleted_folder_ids': deletions['deleted_folder_ids'],
+                    'deleted_file_ids': deletions['deleted_file_ids']
+                })
             
             # 计算结果
             duration = time.time() - start_time
@@ -2190,6 +2237,12 @@ class OptimizedPostgreSQLSyncManager:
                 'files_synced': files_synced,
                 'custom_attrs_synced': custom_attrs_synced,
                 'files_needing_updates': len(files_needing_updates),
+                'folders_deleted': deletions['folders_deleted'],
+                'files_deleted': deletions['files_deleted'],
+                'folders_moved': deletions['folders_moved'],
+                'files_moved': deletions['files_moved'],
+                'fingerprint_crawl': fingerprint_crawl['report'] if fingerprint_crawl is not None else None,
+                'file_tree_cache': file_tree_cache_result,
                 'duration_seconds': round(duration, 2),
                 'optimization_efficiency': optimization_efficiency,
                 'performance_stats': self._get_performance_stats(),
@@ -2208,6 +2261,77 @@ class OptimizedPostgreSQLSyncManager:
                 'architecture_version': 'v2'
             }
     
+    async def _reconcile_deletions_v2(self, project_id: str, dal) -> Dict[str, Any]:
+        """对账本次已完整列出的文件夹（失败不影响同步结果，下次增量同步会重新对账）"""
+        empty = {
+            'folders_reconciled': 0, 'folders_deleted': 0, 'files_deleted': 0,
+            'folders_moved': 0, 'files_moved': 0,
+            'deleted_folder_ids': [], 'deleted_file_ids': [], 'moved_folder_ids': [], 'moved_file_ids': []
+        }
+        if not self.reconcile_deletions or not self.last_folder_listings:
+            return empty
+        
+        try:
+            return await DeletionReconciler(dal).reconcile(project_id, self.last_folder_listings)
+        except Exception as e:
+            logger.warning(f"删除对账失败: {e}")
+            return dict(empty, error=str(e))
+    
+    async def _fingerprint_crawl_v2(self, project_id: str, max_depth: int, headers: dict,
+                                    dal) -> Optional[Dict[str, Any]]:
+        """按文件夹内容指纹爬取；无法获取顶级文件夹或爬取失败时返回 None"""
+        try:
+            top_folders_data = await self._get_top_folders_async(project_id, headers)
+            top_folders = (top_folders_data or {}).get('data', [])
+            if not top_folders:
+                logger.warning("指纹爬取未获取到顶级文件夹，回退到rollup分支过滤")
+                return None
+            
+            crawl = FingerprintCrawl(self, dal, max_concurrency=self.crawl_concurrency)
+            result = await crawl.run(project_id, top_folders, headers, max_depth)
+            
+            report = result['report']
+            self.stats['api_calls'] += report['api_calls']
+            self.stats['smart_skips'] += report['subtrees_skipped']
+            logger.info(f"🧭 指纹爬取: 访问 {report['folders_visited']} / 跳过 {report['subtrees_skipped']} 个子树, "
+                        f"每层: {[(level['depth'], level['visited'], level['skipped']) for level in report['levels']]}")
+            return result
+        except Exception as e:
+            logger.warning(f"指纹爬取失败，回退到rollup分支过滤: {e}")
+            return None
+    
+    async def _save_folder_fingerprints_v2(self, project_id: str, fingerprint_crawl: Dict[str, Any],
+                                           deletions: Dict[str, Any], dal):
+        """保存本次完整访问的文件夹指纹，结果记录到爬取报告"""
+        report = fingerprint_crawl['report']
+        report['fingerprints_saved'] = 0
+        
+        if self.stats['write_errors'] or deletions.get('error'):
+            logger.warning(f"本次增量同步有写入/对账失败，不保存文件夹指纹 (写入失败: {self.stats['write_errors']})")
+            return
+        
+        try:
+            report['fingerprints_saved'] = await dal.save_folder_fingerprints(project_id, fingerprint_crawl['fingerprints'])
+        except Exception as e:
+            # 指纹未保存只会让下次增量同步重新访问这些文件夹，不影响本次同步结果
+            logger.warning(f"保存文件夹指纹失败: {e}")
+            report['fingerprints_error'] = str(e)
+    
+    async def _emit_file_tree_delta(self, project_id: str, delta: Dict[str, List[str]]) -> Dict[str, Any]:
+        """将同步变更集应用到文件树缓存（增量补丁，失败不影响同步结果）"""
+        try:
+            from api_modules.file_CDE_function.file_tree_builder import apply_file_tree_delta
+            from database_sql.neon_config import NeonConfig
+            
+            result = await asyncio.to_thread(
+                apply_file_tree_delta, project_id, delta, NeonConfig().get_db_params()
+            )
+            logger.info(f"🌳 文件树缓存更新: {result}")
+            return result
+        except Exception as e:
+            logger.warning(f"文件树缓存增量更新失败: {e}")
+            return {'mode': 'failed', 'reason': str(e)}
+    
     async def _smart_branch_filtering_v2(self, project_id: str, last_sync_time: datetime, 
                                        headers: dict) -> List[Dict[str, Any]]:
         """V2架构的智能分支过滤"""
@@ -2229,31 +2353,16 @@ class OptimizedPostgreSQLSyncManager:
                                     task_uuid: str = None, headers: dict = None) -> Dict[str, Any]:
         """V2架构的优化全量同步"""
         
+        if self.streaming_full_sync:
+            return await self._streaming_full_sync_v2(project_id, max_depth, include_custom_attributes, task_uuid, headers)
+        
         logger.info(f"🚀 开始优化全量同步 V2: 项目 {project_id}")
         start_time = time.time()
         
         try:
             # 1. 清除现有项目数据
             dal = await get_optimized_postgresql_dal()
-            
-            async with dal.get_connection() as conn:
-                # Clear existing project data - first count, then delete
-                deleted_attrs = await conn.fetchval("SELECT COUNT(*) FROM custom_attribute_values WHERE project_id = $1", project_id) or 0
-                await conn.execute("DELETE FROM custom_attribute_values WHERE project_id = $1", project_id)
-                
-                deleted_defs = await conn.fetchval("SELECT COUNT(*) FROM custom_attribute_definitions WHERE project_id = $1", project_id) or 0
-                await conn.execute("DELETE FROM custom_attribute_definitions WHERE project_id = $1", project_id)
-                
-                deleted_versions = await conn.fetchval("SELECT COUNT(*) FROM file_versions WHERE project_id = $1", project_id) or 0
-                await conn.execute("DELETE FROM file_versions WHERE project_id = $1", project_id)
-                
-                deleted_files = await conn.fetchval("SELECT COUNT(*) FROM files WHERE project_id = $1", project_id) or 0
-                await conn.execute("DELETE FROM files WHERE project_id = $1", project_id)
-                
-                deleted_folders = await conn.fetchval("SELECT COUNT(*) FROM folders WHERE project_id = $1", project_id) or 0
-                await conn.execute("DELETE FROM folders WHERE project_id = $1", project_id)
-                
-            logger.info(f"🧹 数据清理完成: 文件夹({deleted_folders}), 文件({deleted_files}), 版本({deleted_versions}), 属性定义({deleted_defs}), 属性值({deleted_attrs})")
+            await self._clear_project_data_v2(project_id, dal)
             
             # 2. 检查认证头
             if not headers:
@@ -2304,43 +2413,7 @@ class OptimizedPostgreSQLSyncManager:
                 folders_synced = await self._batch_insert_folders_v2(all_folders, dal)
                 
                 # 5.2 插入文件 (使用V2字段)
-                # 转换文件数据为V2格式
-                v2_files_data = []
-                for file_data in all_files:
-                    # 使用自定义属性中的信息来填充V2字段
-                    custom_attrs = file_data.get('custom_attributes', {})
-                    
-                    v2_file = {
-                        'id': file_data.get('id'),
-                        'project_id': file_data.get('project_id'),
-                        'name': file_data.get('name') or custom_attrs.get('name'),
-                        'display_name': file_data.get('display_name') or custom_attrs.get('title'),
-                        'parent_folder_id': file_data.get('parent_folder_id'),
-                        'folder_path': file_data.get('folder_path', ''),
-                        'full_path': file_data.get('full_path', ''),
-                        'path_segments': file_data.get('path_segments', []),
-                        'depth': file_data.get('depth', 0),
-                        'create_time': custom_attrs.get('createTime'),
-                        'create_user_id': custom_attrs.get('createUserId'),
-                        'create_user_name': custom_attrs.get('createUserName'),
-                        'last_modified_time': custom_attrs.get('lastModifiedTime'),
-                        'last_modified_user_id': custom_attrs.get('lastModifiedUserId'),
-                        'last_modified_user_name': custom_attrs.get('lastModifiedUserName'),
-                        'file_type': custom_attrs.get('name', '').split('.')[-1] if custom_attrs.get('name') else '',
-                        'mime_type': '',
-                        'reserved': False,
-                        'hidden': False,
-                        'metadata': {},
-                        'file_permissions': {},
-                        'file_settings': {},
-                        'review_info': {},
-                        'sync_info': {'synced_at': datetime.now().isoformat()}
-                    }
-                    
-                    # 转换时间戳字段为中国时区
-                    timestamp_fields = ['create_time', 'last_modified_time']
-                    v2_file = self._batch_convert_timestamps_to_china(v2_file, timestamp_fields)
-                    v2_files_data.append(v2_file)
+                v2_files_data = [self._build_v2_file_record(file_data) for file_data in all_files]
                 
                 files_synced = await self._batch_insert_files_v2(v2_files_data, dal)
                 
@@ -2386,6 +2459,7 @@ class OptimizedPostgreSQLSyncManager:
                     'custom_attrs_synced': custom_attrs_synced,
                     'total_time_seconds': round(duration, 2),
                     'performance_stats': self.stats,
+                    'crawl_stats': self.last_crawl_stats,
                     'architecture_version': 'v2'
                 }
                 
@@ -2414,78 +2488,165 @@ class OptimizedPostgreSQLSyncManager:
                 'architecture_version': 'v2'
             }
     
+    async def _clear_project_data_v2(self, project_id: str, dal):
+        """全量同步前清除项目现有的文件树数据"""
+        async with dal.get_connection() as conn:
+            # Clear existing project data - first count, then delete
+            deleted_attrs = await conn.fetchval("SELECT COUNT(*) FROM custom_attribute_values WHERE project_id = $1", project_id) or 0
+            await conn.execute("DELETE FROM custom_attribute_values WHERE project_id = $1", project_id)
+            
+            deleted_defs = await conn.fetchval("SELECT COUNT(*) FROM custom_attribute_definitions WHERE project_id = $1", project_id) or 0
+            await conn.execute("DELETE FROM custom_attribute_definitions WHERE project_id = $1", project_id)
+            
+            deleted_versions = await conn.fetchval("SELECT COUNT(*) FROM file_versions WHERE project_id = $1", project_id) or 0
+            await conn.execute("DELETE FROM file_versions WHERE project_id = $1", project_id)
+            
+            deleted_files = await conn.fetchval("SELECT COUNT(*) FROM files WHERE project_id = $1", project_id) or 0
+            await conn.execute("DELETE FROM files WHERE project_id = $1", project_id)
+            
+            deleted_folders = await conn.fetchval("SELECT COUNT(*) FROM folders WHERE project_id = $1", project_id) or 0
+            await conn.execute("DELETE FROM folders WHERE project_id = $1", project_id)
+            
+        logger.info(f"🧹 数据清理完成: 文件夹({deleted_folders}), 文件({deleted_files}), 版本({deleted_versions}), 属性定义({deleted_defs}), 属性值({deleted_attrs})")
+    
+    async def _streaming_full_sync_v2(self, project_id: str, max_depth: int = 10, 
+                                      include_custom_attributes: bool = True, 
+                                      task_uuid: str = None, headers: dict = None) -> Dict[str, Any]:
+        """
+        流式全量同步：爬取、补充详情、写库通过有界队列流水线执行，
+        文件夹和文件按批写入；每层提交后保存检查点，中断后从最后提交的层继续
+        """
+        
+        logger.info(f"🚀 开始流式全量同步: 项目 {project_id}")
+        start_time = time.time()
+        
+        if not headers:
+            logger.error("Missing authentication headers")
+            return {
+                'status': 'error',
+                'error': 'Missing authentication headers'
+            }
+        
+        try:
+            dal = await get_optimized_postgresql_dal()
+            
+            # 1. 读取检查点；检查点表不可用时仍可同步，只是不能断点续传
+            checkpoints = FullSyncCheckpointStore(dal)
+            try:
+                checkpoint = await checkpoints.load(project_id)
+            except Exception as e:
+                logger.warning(f"全量同步检查点不可用，本次不保存检查点: {e}")
+                checkpoints, checkpoint = None, None
+            
+            top_folders = []
+            if checkpoint is None:
+                # 2. 从头开始：清除现有数据并获取顶级文件夹
+                await self._clear_project_data_v2(project_id, dal)
+                
+                top_folders_data = await self._get_top_folders_async(project_id, headers)
+                top_folders = (top_folders_data or {}).get('data', [])
+                if not top_folders:
+                    logger.warning(f"No top-level folders found for project {project_id}")
+                    return {
+                        'status': 'success',
+                        'message': 'No folders found in project',
+                        'folders_synced': 0,
+                        'files_synced': 0,
+                        'custom_attrs_synced': 0,
+                        'performance_stats': self.stats
+                    }
+                logger.info(f"📂 找到 {len(top_folders)} 个顶级文件夹")
+            
+            # 3. 流水线同步
+            stream_result = await run_streaming_full_sync(
+                self, dal, project_id, top_folders, headers, max_depth,
+                include_custom_attributes, task_uuid, checkpoint, checkpoints
+            )
+            
+            # 4. 完成后删除检查点并更新项目同步状态
+            if checkpoints is not None:
+                await checkpoints.clear(project_id)
+            await self._update_project_sync_status(project_id, dal)
+            
+            result = {
+                'status': 'success',
+                'folders_synced': stream_result['folders_synced'],
+                'files_synced': stream_result['files_synced'],
+                'versions_synced': stream_result['versions_synced'],
+                'custom_attrs_synced': stream_result['custom_attrs_synced'],
+                'folder_attr_defs_synced': stream_result['folder_attr_defs_synced'],
+                'total_time_seconds': round(time.time() - start_time, 2),
+                'performance_stats': self.stats,
+                'crawl_stats': self.last_crawl_stats,
+                'pipeline_stats': stream_result['pipeline_stats'],
+                'resumed_from_checkpoint': checkpoint is not None,
+                'architecture_version': 'v2'
+            }
+            
+            logger.info(f"✅ 流式全量同步完成: {result}")
+            return result
+            
+        except Exception as e:
+            logger.error(f"❌ 流式全量同步失败（已提交的层可从检查点恢复）: {e}")
+            return {
+                'status': 'error',
+                'error': str(e),
+                'folders_synced': 0,
+                'files_synced': 0,
+                'custom_attrs_synced': 0,
+                'architecture_version': 'v2'
+            }
+    
     async def _bfs_collect_all_data_v2(self, project_id: str, top_folders: List[Dict], 
                                      max_depth: int, include_custom_attributes: bool, 
                                      headers: dict) -> Tuple[List[Dict], List[Dict], Dict]:
-        """BFS收集所有数据 - V2优化版本"""
+        """BFS收集所有数据 - V2优化版本（按层并发）"""
         
         all_folders = []
         all_files = []
         all_custom_attrs = {'definitions': [], 'values': []}
         
         try:
-            import aiohttp
-            
-            async with aiohttp.ClientSession() as session:
-                # BFS队列：(folder_data, depth, parent_path)
-                queue = [(folder, 0, "") for folder in top_folders]
+            crawler = ConcurrentFolderCrawler(max_concurrency=self.crawl_concurrency)
+            
+            async with crawler:
+                # 🔑 文件夹自定义属性定义与内容列表并发获取
+                folder_extra = None
+                if include_custom_attributes:
+                    async def folder_extra(folder_id: str) -> List[Dict]:
+                        return await self._get_folder_custom_attr_definitions_v2(
+                            project_id, folder_id, headers, crawler.session
+                        )
                 
-                while queue and len(queue) > 0:
-                    current_folder, depth, parent_path = queue.pop(0)
-                    
-                    if depth >= max_depth:
-                        continue
-                    
-                    folder_id = current_folder.get('id')
-                    folder_name = current_folder.get('attributes', {}).get('name', 'Unknown')
-                    current_path = f"{parent_path}/{folder_name}".strip('/')
-                    
-                    # 转换文件夹数据为V2格式
-                    folder_data = self._transform_folder_data_v2(current_folder, project_id, parent_path, depth)
-                    all_folders.append(folder_data)
-
-                    # 🔑 收集文件夹自定义属性定义
-                    if include_custom_attributes:
-                        try:
-                            folder_defs = await self._get_folder_custom_attr_definitions_v2(
-                                project_id, folder_id, headers, session
-                            )
-                            if folder_defs:
-                                all_custom_attrs['definitions'].extend(folder_defs)
-                                logger.info(f"📋 Found {len(folder_defs)} custom attribute definitions for folder {folder_name}")
-                        except Exception as e:
-                            logger.warning(f"Failed to get custom attributes for folder {folder_id}: {e}")
-                    
-                    # 获取文件夹内容
-                    contents_url = f"https://developer.api.autodesk.com/data/v1/projects/{project_id}/folders/{folder_id}/contents"
-                    
-                    try:
-                        async with session.get(contents_url, headers=headers) as response:
-                            if response.status == 200:
-                                contents_data = await response.json()
-                                self.stats['api_calls'] += 1
-                                
-                                for item in contents_data.get('data', []):
-                                    item_type = item.get('type')
-                                    
-                                    if item_type == 'folders':
-                                        # 添加子文件夹到队列
-                                        queue.append((item, depth + 1, current_path))
-                                    
-                                    elif item_type == 'items':
-                                        # 转换文件数据为V2格式
-                                        file_data = self._transform_file_data_v2(item, project_id, current_path, depth + 1)
-                                        all_files.append(file_data)
-                            
-                            else:
-                                logger.warning(f"Failed to get folder contents: {response.status}")
-                                
-                    except Exception as e:
-                        logger.error(f"Error getting folder contents for {folder_name}: {e}")
-                        continue
+                async for level in crawler.crawl(project_id, top_folders, headers, max_depth, folder_extra):
+                    for entry in level:
+                        depth = entry['depth']
+                        current_path = entry['path']
+                        
+                        # 转换文件夹数据为V2格式
+                        folder_data = self._transform_folder_data_v2(
+                            entry['folder'], project_id, entry['parent_path'], depth
+                        )
+                        all_folders.append(folder_data)
+                        
+                        if entry['extra']:
+                            all_custom_attrs['definitions'].extend(entry['extra'])
+                        
+                        for item in entry['contents']:
+                            if item.get('type') == 'items':
+                                # 转换文件数据为V2格式
+                                file_data = self._transform_file_data_v2(item, project_id, current_path, depth + 1)
+                                all_files.append(file_data)
+                
+                crawl_stats = crawler.get_stats()
+                self.last_crawl_stats = crawl_stats
+                self.stats['api_calls'] += crawl_stats['requests']
+                self.stats['concurrent_operations'] += crawl_stats['folders_visited']
                 
                 # 文件夹自定义属性已在BFS遍历中收集到all_custom_attrs['definitions']
-                logger.info(f"📊 BFS收集完成: {len(all_folders)} 文件夹, {len(all_files)} 文件, {len(all_custom_attrs.get('definitions', []))} 文件夹属性定义")
+                logger.info(f"📊 BFS收集完成: {len(all_folders)} 文件夹, {len(all_files)} 文件, "
+                            f"{len(all_custom_attrs.get('definitions', []))} 文件夹属性定义, "
+                            f"{len(crawl_stats['levels'])} 层, 最大并发 {crawl_stats['max_in_flight']}")
                 
                 return all_folders, all_files, all_custom_attrs
                 
@@ -2566,6 +2727,42 @@ class OptimizedPostgreSQLSyncManager:
         timestamp_fields = ['create_time', 'last_modified_time']
         return self._batch_convert_timestamps_to_china(file_record, timestamp_fields)
     
+    def _build_v2_file_record(self, file_data: Dict) -> Dict:
+        """将补充了版本和自定义属性的文件数据转换为 files 表的V2记录"""
+        # 使用自定义属性中的信息来填充V2字段
+        custom_attrs = file_data.get('custom_attributes') or {}
+        
+        v2_file = {
+            'id': file_data.get('id'),
+            'project_id': file_data.get('project_id'),
+            'name': file_data.get('name') or custom_attrs.get('name'),
+            'display_name': file_data.get('display_name') or custom_attrs.get('title'),
+            'parent_folder_id': file_data.get('parent_folder_id'),
+            'folder_path': file_data.get('folder_path', ''),
+            'full_path': file_data.get('full_path', ''),
+            'path_segments': file_data.get('path_segments', []),
+            'depth': file_data.get('depth', 0),
+            'create_time': custom_attrs.get('createTime'),
+            'create_user_id': custom_attrs.get('createUserId'),
+            'create_user_name': custom_attrs.get('createUserName'),
+            'last_modified_time': custom_attrs.get('lastModifiedTime'),
+            'last_modified_user_id': custom_attrs.get('lastModifiedUserId'),
+            'last_modified_user_name': custom_attrs.get('lastModifiedUserName'),
+            'file_type': custom_attrs.get('name', '').split('.')[-1] if custom_attrs.get('name') else '',
+            'mime_type': '',
+            'reserved': False,
+            'hidden': False,
+            'metadata': {},
+            'file_permissions': {},
+            'file_settings': {},
+            'review_info': {},
+            'sync_info': {'synced_at': datetime.now().isoformat()}
+        }
+        
+        # 转换时间戳字段为中国时区
+        timestamp_fields = ['create_time', 'last_modified_time']
+        return self._batch_convert_timestamps_to_china(v2_file, timestamp_fields)
+    
     async def _batch_insert_folders_v2(self, folders_data: List[Dict], dal) -> int:
         """批量插入文件夹 - V2架构"""
         if not folders_data:
@@ -2573,9 +2770,11 @@ class OptimizedPostgreSQLSyncManager:
         
         try:
             result = await dal.batch_upsert_folders(folders_data)
+            self.stats['write_errors'] += len(result.get('errors') or [])
             return result.get('upserted', 0)
         except Exception as e:
             logger.error(f"V2 folder batch insert failed: {e}")
+            self.stats['write_errors'] += 1
             return 0
     
     async def _batch_insert_files_v2(self, files_data: List[Dict], dal) -> int:
@@ -2585,9 +2784,11 @@ class OptimizedPostgreSQLSyncManager:
         
         try:
             result = await dal.batch_upsert_files(files_data)
+            self.stats['write_errors'] += len(result.get('errors') or [])
             return result.get('upserted', 0)
         except Exception as e:
             logger.error(f"V2 file batch insert failed: {e}")
+            self.stats['write_errors'] += 1
             return 0
     
     async def _batch_insert_file_versions_v2(self, files_data: List[Dict], dal) -> int:
@@ -2800,37 +3001,28 @@ class OptimizedPostgreSQLSyncManager:
             try:
                 import aiohttp
                 
-                async with aiohttp.ClientSession() as session:
+                async with self.http.limited_session() as session:
                     # 分批处理文件
                     for i in range(0, len(changed_files), batch_size):
                         batch_files = changed_files[i:i + batch_size]
                         
-                        # 并发获取当前批次的版本信息
-                        tasks = []
-                        for file_data in batch_files:
-                            file_id = file_data.get('id')
-                            if file_id:
-                                task = self._get_file_versions_async(session, project_id, file_id, headers)
-                                tasks.append((file_data, task))
+                        # 并发获取当前批次的版本信息（节流由共享客户端的令牌桶负责）
+                        batch_files = [file_data for file_data in batch_files if file_data.get('id')]
+                        results = await asyncio.gather(*[
+                            self._get_file_versions_async(session, project_id, file_data['id'], headers)
+                            for file_data in batch_files
+                        ], return_exceptions=True)
                         
-                        # 等待当前批次完成
-                        for file_data, task in tasks:
-                            try:
-                                versions_info = await task
-                                # 将版本信息合并到文件数据中
-                                file_data['versions_info'] = versions_info
-                                all_file_metadata.append(file_data)
-                                
-                                self.stats['api_calls'] += 1
-                            except Exception as e:
-                                logger.warning(f"获取文件版本失败 {file_data.get('id')}: {e}")
+                        for file_data, versions_info in zip(batch_files, results):
+                            if isinstance(versions_info, Exception):
+                                logger.warning(f"获取文件版本失败 {file_data.get('id')}: {versions_info}")
                                 # 即使版本获取失败，也保留基本文件信息
-                                file_data['versions_info'] = []
-                                all_file_metadata.append(file_data)
-                        
-                        # API节流
-                        if i + batch_size < len(changed_files):
-                            await asyncio.sleep(self.api_delay)
+                                versions_info = []
+                            else:
+                                self.stats['api_calls'] += 1
+                            # 将版本信息合并到文件数据中
+                            file_data['versions_info'] = versions_info
+                            all_file_metadata.append(file_data)
                         
                         self.stats['batch_operations'] += 1
                         
@@ -5,7 +5,6 @@ PostgreSQL同步路由 - HTTP API層
 專注於HTTP請求處理和響應格式化
 """
 
-import asyncio
 import logging
 from datetime import datetime
 from flask import Blueprint, jsonify, request
@@ -16,7 +15,9 @@ from .postgresql_sync_utils import (
     SyncManagerFactory, AuthUtils, RollupCheckUtils, 
     ResponseUtils, PerformanceUtils
 )
+from .sync_job_queue import get_sync_job_queue, get_sync_worker_pool
 from database_sql.optimized_data_access import get_optimized_postgresql_dal
+from database_sql.async_bridge import run_async
 
 logger = logging.getLogger(__name__)
 
@@ -61,58 +62,27 @@ def unified_sync_api(project_id):
                 "INVALID_PARAMETERS"
             )), 400
         
-        logger.info(f"Starting {sync_type} for project {project_id} with {performance_mode} mode")
-        
-        # 執行同步 - 使用服務層
-        def run_sync():
-            if sync_type == 'full_sync':
-                return asyncio.run(postgresql_sync_service.start_full_sync(
-                    project_id=project_id,
-                    max_depth=max_depth,
-                    include_custom_attributes=include_custom_attributes,
-                    performance_mode=performance_mode
-                ))
-            else:  # incremental_sync
-                return asyncio.run(postgresql_sync_service.start_incremental_sync(
-                    project_id=project_id,
-                    max_depth=max_depth,
-                    include_custom_attributes=include_custom_attributes,
-                    performance_mode=performance_mode,
-                    enable_top_level_rollup_check=enable_top_level_rollup_check
-                ))
-        
-        # 在後台執行同步
-        import threading
-        
-        def background_sync():
-            try:
-                result = run_sync()
-                logger.info(f"Sync completed: {result.get('status', 'unknown')}")
-            except Exception as e:
-                logger.error(f"Background sync failed: {e}")
-        
-        # 立即執行以獲取任務ID和初始狀態
-        result = run_sync()
-        
-        # 如果是no_changes狀態，直接返回
-        if result.get('status') == 'no_changes':
-            return jsonify(ResponseUtils.create_success_response(
-                result, "Project skipped due to optimization"
-            )), 200
-        
-        # 如果有錯誤，直接返回
-        if result.get('status') == 'error':
-            return jsonify(ResponseUtils.create_error_response(
-                result.get('error', 'Unknown error'), "SYNC_ERROR"
-            )), 500
+        # 入隊後立即返回，由後台worker池執行同步
+        job = get_sync_job_queue().enqueue(
+            project_id, sync_type, performance_mode,
+            parameters={
+                'max_depth': max_depth,
+                'include_custom_attributes': include_custom_attributes,
+                'enable_top_level_rollup_check': enable_top_level_rollup_check
+            }
+        )
+        get_sync_worker_pool().notify()
+        
+        logger.info(f"Queued {job['task_type']} for project {project_id}: {job['task_uuid']}"
+                    f"{' (coalesced)' if job['coalesced'] else ''}")
         
-        # 返回成功響應
         response_data = ResponseUtils.create_sync_response(
-            task_id=result.get('task_uuid', 'unknown'),
-            sync_type=sync_type,
+            task_id=job['task_uuid'],
+            sync_type=job['task_type'],
             performance_mode=performance_mode,
-            status="started",
-            message=f"PostgreSQL {sync_type} started successfully",
+            status="queued",
+            message=f"PostgreSQL {job['task_type']} queued",
+            coalesced=job['coalesced'],
             top_level_rollup_check=enable_top_level_rollup_check
         )
         
@@ -124,13 +94,43 @@ def unified_sync_api(project_id):
             str(e), "API_ERROR"
         )), 500
 
+@postgresql_sync_bp.route('/api/postgresql-sync/project/<project_id>/cancel/<task_id>', methods=['POST'])
+def cancel_sync_task(project_id, task_id):
+    """取消排隊中或運行中的同步任務（運行中的任務在下次心跳時中止）"""
+    try:
+        state = get_sync_job_queue().cancel(task_id)
+        if state is None:
+            return jsonify(ResponseUtils.create_error_response(
+                f"任務 {task_id} 不存在或已結束", "TASK_NOT_ACTIVE"
+            )), 404
+        
+        return jsonify(ResponseUtils.create_success_response(
+            {'task_id': task_id, 'project_id': project_id, 'status': state},
+            "Sync task cancelled" if state == 'cancelled' else "Cancellation requested"
+        )), 200
+        
+    except Exception as e:
+        logger.error(f"Cancel sync task error: {e}")
+        return jsonify(ResponseUtils.create_error_response(str(e), "API_ERROR")), 500
+
+@postgresql_sync_bp.route('/api/postgresql-sync/jobs', methods=['GET'])
+def get_sync_jobs_overview():
+    """同步任務隊列概況（排隊/運行中任務數、worker池指標）"""
+    try:
+        data = get_sync_worker_pool(start=False).get_metrics()
+        data['queue_stats'] = get_sync_job_queue().get_queue_stats()
+        return jsonify(ResponseUtils.create_success_response(data)), 200
+    except Exception as e:
+        logger.error(f"Get sync jobs overview error: {e}")
+        return jsonify(ResponseUtils.create_error_response(str(e), "API_ERROR")), 500
+
 @postgresql_sync_bp.route('/api/postgresql-sync/project/<project_id>/status/<task_id>', methods=['GET'])
 def get_sync_status(project_id, task_id):
     """獲取PostgreSQL同步任務狀態 - 重構版本"""
     try:
         # 使用服務層獲取狀態
         def get_status():
-            return asyncio.run(postgresql_sync_service.get_sync_status(task_id))
+            return run_async(postgresql_sync_service.get_sync_status(task_id))
         
         result = get_status()
         
@@ -177,7 +177,7 @@ def check_rollup_status(project_id):
         # 执行顶层rollup检查
         def check_rollup():
             sync_manager = sync_managers['standard']
-            return asyncio.run(_check_project_top_level_rollup(project_id, sync_manager, last_sync_time))
+            return run_async(_check_project_top_level_rollup(project_id, sync_manager, last_sync_time))
         
         rollup_result = check_rollup()
         
@@ -204,7 +204,7 @@ def get_postgresql_performance_stats(project_id):
     """获取PostgreSQL同步性能统计"""
     try:
         def get_stats():
-            return asyncio.run(_get_postgresql_performance_stats(project_id))
+            return run_async(_get_postgresql_performance_stats(project_id))
         
         stats = get_stats()
         
@@ -226,7 +226,7 @@ def get_optimization_report(project_id):
     """获取优化报告"""
     try:
         def get_report():
-            return asyncio.run(_generate_optimization_report(project_id))
+            return run_async(_generate_optimization_report(project_id))
         
         report = get_report()
         
@@ -505,7 +505,7 @@ def get_performance_stats(project_id):
     """獲取項目性能統計"""
     try:
         def get_stats():
-            return asyncio.run(postgresql_sync_service.get_sync_performance_stats(project_id))
+            return run_async(postgresql_sync_service.get_sync_performance_stats(project_id))
         
         result = get_stats()
         
@@ -526,6 +526,8 @@ def get_performance_stats(project_id):
 def register_postgresql_sync_routes(app):
     """註冊PostgreSQL同步路由 - 重構版本"""
     app.register_blueprint(postgresql_sync_bp)
+    # 啟動後台worker池，接手重啟前遺留的排隊任務
+    get_sync_worker_pool()
     logger.info("PostgreSQL sync routes registered successfully")
 
 # 向後兼容的函數名
@@ -28,7 +28,8 @@ class PostgreSQLSyncService:
     
     async def start_full_sync(self, project_id: str, max_depth: int = 10, 
                             include_custom_attributes: bool = True, 
-                            performance_mode: str = None) -> Dict[str, Any]:
+                            performance_mode: str = None,
+                            task_uuid: str = None) -> Dict[str, Any]:
         """
         啟動全量同步 - 重構版本
         
@@ -37,6 +38,7 @@ class PostgreSQLSyncService:
             max_depth: 最大深度
             include_custom_attributes: 是否包含自定義屬性
             performance_mode: 性能模式，如果為None則使用當前模式
+            task_uuid: 任務隊列中已認領的任務UUID（任務記錄已存在，不再創建）
         
         Returns:
             同步結果
@@ -59,8 +61,10 @@ class PostgreSQLSyncService:
                     'error': f"參數驗證失敗: {', '.join(validation['errors'])}"
                 }
             
-            # 生成任務UUID
-            task_uuid = TaskManager.generate_task_uuid()
+            # 生成任務UUID（隊列任務沿用已認領的UUID）
+            queued_task = task_uuid is not None
+            if not queued_task:
+                task_uuid = TaskManager.generate_task_uuid()
             
             # 獲取認證頭
             headers = AuthUtils.get_auth_headers_safe()
@@ -82,7 +86,7 @@ class PostgreSQLSyncService:
                     'include_custom_attributes': include_custom_attributes
             }
             
-            task_created = await TaskManager.create_sync_task_record(
+            task_created = queued_task or await TaskManager.create_sync_task_record(
                 project_id, task_uuid, 'full_sync', performance_mode, parameters
             )
             
@@ -119,13 +123,14 @@ class PostgreSQLSyncService:
             return {
                 'status': 'error',
                 'error': str(e),
-                'task_uuid': task_uuid if 'task_uuid' in locals() else None
+                'task_uuid': task_uuid
             }
     
     async def start_incremental_sync(self, project_id: str, max_depth: int = 10, 
                                    include_custom_attributes: bool = True, 
                                    performance_mode: str = None,
-                                   enable_top_level_rollup_check: bool = True) -> Dict[str, Any]:
+                                   enable_top_level_rollup_check: bool = True,
+                                   task_uuid: str = None) -> Dict[str, Any]:
         """
         啟動增量同步 - 重構版本，包含頂層rollup檢查優化
         
@@ -135,6 +140,7 @@ class PostgreSQLSyncService:
             include_custom_attributes: 是否包含自定義屬性
             performance_mode: 性能模式，如果為None則使用當前模式
             enable_top_level_rollup_check: 是否啟用頂層rollup檢查
+            task_uuid: 任務隊列中已認領的任務UUID（任務記錄已存在，不再創建）
         
         Returns:
             同步結果
@@ -157,8 +163,10 @@ class PostgreSQLSyncService:
                     'error': f"參數驗證失敗: {', '.join(validation['errors'])}"
                 }
             
-            # 生成任務UUID
-            task_uuid = TaskManager.generate_task_uuid()
+            # 生成任務UUID（隊列任務沿用已認領的UUID）
+            queued_task = task_uuid is not None
+            if not queued_task:
+                task_uuid = TaskManager.generate_task_uuid()
             
             # 🔑 關鍵優化：頂層rollup時間檢查
             if enable_top_level_rollup_check:
@@ -202,7 +210,7 @@ class PostgreSQLSyncService:
                 'enable_top_level_rollup_check': enable_top_level_rollup_check
             }
             
-            task_created = await TaskManager.create_sync_task_record(
+            task_created = queued_task or await TaskManager.create_sync_task_record(
                 project_id, task_uuid, 'incremental_sync', performance_mode, parameters
             )
             
@@ -240,7 +248,7 @@ class PostgreSQLSyncService:
             return {
                 'status': 'error',
                 'error': str(e),
-                'task_uuid': task_uuid if 'task_uuid' in locals() else None
+                'task_uuid': task_uuid
             }
     
     async def get_sync_status(self, task_uuid: str) -> Dict[str, Any]:
@@ -405,6 +413,7 @@ class PostgreSQLSyncService:
             self.sync_manager.max_workers = 16
             self.sync_manager.api_delay = 0.01
             self.sync_manager.memory_threshold_mb = 2048
+            self.sync_manager.crawl_concurrency = 32
             
         elif performance_mode == 'memory_optimized':
             # 内存优化模式：较小的批量大小，较少的并发
@@ -412,6 +421,7 @@ class PostgreSQLSyncService:
             self.sync_manager.max_workers = 4
             self.sync_manager.api_delay = 0.05
             self.sync_manager.memory_threshold_mb = 512
+            self.sync_manager.crawl_concurrency = 8
             
         else:  # standard
             # 标准模式：平衡的参数
@@ -419,6 +429,7 @@ class PostgreSQLSyncService:
             self.sync_manager.max_workers = 8
             self.sync_manager.api_delay = 0.02
             self.sync_manager.memory_threshold_mb = 1024
+            self.sync_manager.crawl_concurrency = 16
         
         logger.info(f"同步管理器已调整为 {performance_mode} 模式")
     
@@ -61,19 +61,22 @@ class SyncManagerFactory:
             'batch_size': 100,
             'api_delay': 0.02,
             'max_workers': 8,
-            'memory_threshold_mb': 1024
+            'memory_threshold_mb': 1024,
+            'crawl_concurrency': 16
         },
         'high_performance': {
             'batch_size': 200,
             'api_delay': 0.01,
             'max_workers': 16,
-            'memory_threshold_mb': 2048
+            'memory_threshold_mb': 2048,
+            'crawl_concurrency': 32
         },
         'memory_optimized': {
             'batch_size': 50,
             'api_delay': 0.05,
             'max_workers': 4,
-            'memory_threshold_mb': 512
+            'memory_threshold_mb': 512,
+            'crawl_concurrency': 8
         }
     }
     
@@ -104,6 +107,7 @@ class SyncManagerFactory:
         sync_manager.api_delay = config['api_delay']
         sync_manager.max_workers = config['max_workers']
         sync_manager.memory_threshold_mb = config['memory_threshold_mb']
+        sync_manager.crawl_concurrency = config['crawl_concurrency']
         
         logger.info(f"同步管理器已調整為 {performance_mode} 模式")
 
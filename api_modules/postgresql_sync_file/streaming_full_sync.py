@@ -0,0 +1,331 @@
+# -*- coding: utf-8 -*-
+"""
+流式全量同步
+
+原全量同步先用BFS收集整個項目的文件夾和文件，再統一獲取版本/自定義屬性，最後批量寫庫，
+峰值內存隨項目規模增長。這裡把爬取、補充詳情、寫庫拆成由有界隊列連接的流水線：
+
+- 爬取：按塊訪問文件夾（ConcurrentFolderCrawler chunk_size），文件夾和文件按固定批量向下游推送
+- 補充：多個worker並發獲取文件版本和自定義屬性
+- 寫庫：單個寫入協程按到達順序寫入文件夾、文件、版本和自定義屬性
+
+隊列有界，下游變慢時上游自動等待，內存只與批量大小和隊列長度相關。
+每層文件夾的全部數據寫入後保存檢查點（下一層的待訪問文件夾，遷移腳本
+database_sql/add_full_sync_checkpoints.sql），中斷的全量同步從最後提交的層繼續，而不是從頭開始。
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+from .folder_crawler import ConcurrentFolderCrawler
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STREAM_BATCH_SIZE = int(os.getenv('FULL_SYNC_STREAM_BATCH_SIZE', 100))
+DEFAULT_STREAM_QUEUE_SIZE = int(os.getenv('FULL_SYNC_STREAM_QUEUE_SIZE', 4))
+DEFAULT_ENRICH_WORKERS = int(os.getenv('FULL_SYNC_ENRICH_WORKERS', 2))
+# 超過該時間未更新的檢查點不再用於恢復
+DEFAULT_CHECKPOINT_TTL_SECONDS = float(os.getenv('FULL_SYNC_CHECKPOINT_TTL_SECONDS', 24 * 3600))
+
+# 檢查點中累計的寫入計數
+COUNTER_KEYS = ('folders_synced', 'files_synced', 'versions_synced',
+                'custom_attrs_synced', 'folder_attr_defs_synced')
+
+
+class FullSyncCheckpointStore:
+    """full_sync_checkpoints 表的讀寫（每個項目最多一個檢查點）"""
+
+    def __init__(self, dal, ttl_seconds: float = DEFAULT_CHECKPOINT_TTL_SECONDS):
+        self.dal = dal
+        self.ttl_seconds = ttl_seconds
+
+    async def load(self, project_id: str) -> Optional[Dict[str, Any]]:
+        """讀取未過期的檢查點"""
+        async with self.dal.get_connection() as conn:
+            row = await conn.fetchrow("""
+                SELECT task_uuid, depth, frontier, counters
+                FROM full_sync_checkpoints
+                WHERE project_id = $1
+                  AND updated_at > NOW() - make_interval(secs => $2)
+            """, project_id, float(self.ttl_seconds))
+
+        if not row:
+            return None
+        return {
+            'task_uuid': row['task_uuid'],
+            'depth': row['depth'],
+            'frontier': json.loads(row['frontier']) if isinstance(row['frontier'], str) else row['frontier'],
+            'counters': json.loads(row['counters']) if isinstance(row['counters'], str) else row['counters']
+        }
+
+    async def save(self, project_id: str, task_uuid: Optional[str], depth: int,
+                   frontier: List[Dict[str, Any]], counters: Dict[str, int]):
+        """保存已提交的邊界：depth 之前的層已全部寫入，frontier 為下一層待訪問的文件夾"""
+        async with self.dal.get_connection() as conn:
+            await conn.execute("""
+                INSERT INTO full_sync_checkpoints (project_id, task_uuid, depth, frontier, counters, updated_at)
+                VALUES ($1, $2, $3, $4, $5, CURRENT_TIMESTAMP)
+                ON CONFLICT (project_id) DO UPDATE SET
+                    task_uuid = EXCLUDED.task_uuid,
+                    depth = EXCLUDED.depth,
+                    frontier = EXCLUDED.frontier,
+                    counters = EXCLUDED.counters,
+                    updated_at = CURRENT_TIMESTAMP
+            """, project_id, task_uuid, depth, json.dumps(frontier), json.dumps(counters))
+
+    async def clear(self, project_id: str):
+        """同步完成後刪除檢查點"""
+        async with self.dal.get_connection() as conn:
+            await conn.execute("DELETE FROM full_sync_checkpoints WHERE project_id = $1", project_id)
+
+
+class StreamingFullSync:
+    """
+    爬取 -> 補充 -> 寫庫 三段流水線
+
+    manager 為 OptimizedPostgreSQLSyncManager，復用其數據轉換、詳情獲取和批量寫入方法。
+    """
+
+    def __init__(self, manager, dal, checkpoints: Optional[FullSyncCheckpointStore] = None,
+                 batch_size: int = DEFAULT_STREAM_BATCH_SIZE,
+                 queue_size: int = DEFAULT_STREAM_QUEUE_SIZE,
+                 enrich_workers: int = DEFAULT_ENRICH_WORKERS,
+                 crawler_factory=None):
+        self.manager = manager
+        self.dal = dal
+        self.checkpoints = checkpoints
+        self.batch_size = max(1, batch_size)
+        self.queue_size = max(1, queue_size)
+        self.enrich_workers = max(1, enrich_workers)
+        self.crawler_factory = crawler_factory or (
+            lambda: ConcurrentFolderCrawler(max_concurrency=manager.crawl_concurrency)
+        )
+
+        self.stats = {
+            'folder_batches': 0,
+            'file_batches': 0,
+            'checkpoints_saved': 0,
+            'resumed_from_depth': None,
+            'max_enrich_queue': 0,
+            'max_write_queue': 0
+        }
+
+    async def run(self, project_id: str, top_folders: List[Dict[str, Any]], headers: dict,
+                  max_depth: int = 10, include_custom_attributes: bool = True,
+                  task_uuid: str = None, checkpoint: Optional[Dict[str, Any]] = None) -> Dict[str, int]:
+        """
+        執行流式同步，返回累計的寫入計數
+
+        checkpoint 不為空時從其 depth/frontier 繼續，計數在其基礎上累加
+        """
+        start_depth = 0
+        parent_paths = None
+        totals = {key: 0 for key in COUNTER_KEYS}
+
+        if checkpoint:
+            start_depth = checkpoint['depth']
+            top_folders = [node['folder'] for node in checkpoint['frontier']]
+            parent_paths = [node['parent_path'] for node in checkpoint['frontier']]
+            totals.update(checkpoint.get('counters') or {})
+            self.stats['resumed_from_depth'] = start_depth
+            logger.info(f"♻️ 從檢查點恢復全量同步: 深度 {start_depth}, {len(top_folders)} 個待訪問文件夾")
+
+        self._project_id = project_id
+        self._task_uuid = task_uuid
+        self._totals = totals
+        self._level_counts: Dict[int, Dict[str, int]] = {}
+        self._pending: Dict[int, int] = {}
+        self._closed: Dict[int, List[Dict[str, Any]]] = {}
+        self._next_checkpoint = start_depth
+
+        enrich_queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+        write_queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+
+        crawler = self.crawler_factory()
+        async with crawler:
+            folder_extra = None
+            if include_custom_attributes:
+                async def folder_extra(folder_id: str) -> List[Dict]:
+                    return await self.manager._get_folder_custom_attr_definitions_v2(
+                        project_id, folder_id, headers, crawler.session
+                    )
+
+            crawl = crawler.crawl(project_id, top_folders, headers, max_depth, folder_extra,
+                                  start_depth=start_depth, parent_paths=parent_paths,
+                                  chunk_size=self.batch_size)
+
+            async def crawl_stage():
+                await self._crawl(crawl, enrich_queue, write_queue, project_id)
+                for _ in range(self.enrich_workers):
+                    await enrich_queue.put(None)
+
+            async def enrich_stage():
+                await asyncio.gather(*[
+                    self._enrich(enrich_queue, write_queue, project_id, headers)
+                    for _ in range(self.enrich_workers)
+                ])
+                await write_queue.put(None)
+
+            # 任一階段出錯即取消整條流水線，已保存的檢查點保留用於恢復
+            tasks = [
+                asyncio.create_task(crawl_stage()),
+                asyncio.create_task(enrich_stage()),
+                asyncio.create_task(self._write(write_queue, include_custom_attributes))
+            ]
+            try:
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+                for task in done:
+                    if task.exception() is not None:
+                        raise task.exception()
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                await crawl.aclose()
+
+            crawl_stats = crawler.get_stats()
+
+        self.manager.last_crawl_stats = crawl_stats
+        self.manager.stats['api_calls'] += crawl_stats['requests']
+        self.manager.stats['concurrent_operations'] += crawl_stats['folders_visited']
+        return dict(self._totals)
+
+    # ------------------------------------------------------------------
+    # 流水線各階段
+    # ------------------------------------------------------------------
+
+    async def _crawl(self, crawl, enrich_queue: asyncio.Queue, write_queue: asyncio.Queue, project_id: str):
+        """爬取階段：每塊文件夾作為一批直接寫庫，其中的文件按批量送去補充詳情"""
+        depth = self._next_checkpoint
+        next_frontier: List[Dict[str, Any]] = []
+
+        async for chunk in crawl:
+            chunk_depth = chunk[0]['depth']
+            if chunk_depth != depth:
+                # 上一層已全部產出
+                await self._close_level(depth, next_frontier, write_queue)
+                depth, next_frontier = chunk_depth, []
+
+            folders, definitions, files = [], [], []
+            for entry in chunk:
+                folders.append(self.manager._transform_folder_data_v2(
+                    entry['folder'], project_id, entry['parent_path'], entry['depth']
+                ))
+                if entry['extra']:
+                    definitions.extend(entry['extra'])
+
+                for item in entry['contents']:
+                    if item.get('type') == 'folders':
+                        next_frontier.append({'folder': item, 'parent_path': entry['path']})
+                    elif item.get('type') == 'items':
+                        files.append(self.manager._transform_file_data_v2(
+                            item, project_id, entry['path'], entry['depth'] + 1
+                        ))
+
+            self._pending[depth] = self._pending.get(depth, 0) + 1
+            await write_queue.put(('folders', depth, (folders, definitions)))
+            self.stats['folder_batches'] += 1
+
+            for offset in range(0, len(files), self.batch_size):
+                self._pending[depth] += 1
+                await enrich_queue.put((depth, files[offset:offset + self.batch_size]))
+                self.stats['max_enrich_queue'] = max(self.stats['max_enrich_queue'], enrich_queue.qsize())
+
+        await self._close_level(depth, next_frontier, write_queue)
+
+    async def _close_level(self, depth: int, next_frontier: List[Dict[str, Any]], write_queue: asyncio.Queue):
+        """標記一層已全部產出；寫入協程在該層數據寫完後保存檢查點"""
+        self._closed[depth] = next_frontier
+        await write_queue.put(('level_closed', depth, None))
+
+    async def _enrich(self, enrich_queue: asyncio.Queue, write_queue: asyncio.Queue,
+                      project_id: str, headers: dict):
+        """補充階段：獲取一批文件的版本和自定義屬性"""
+        while True:
+            job = await enrich_queue.get()
+            if job is None:
+                return
+            depth, files = job
+            enriched = await self.manager._batch_get_file_versions_and_custom_attrs_v2(project_id, files, headers)
+            await write_queue.put(('files', depth, enriched))
+            self.stats['max_write_queue'] = max(self.stats['max_write_queue'], write_queue.qsize())
+
+    async def _write(self, write_queue: asyncio.Queue, include_custom_attributes: bool):
+        """寫庫階段：按到達順序寫入，並在每層完成後推進檢查點"""
+        while True:
+            job = await write_queue.get()
+            if job is None:
+                return
+
+            kind, depth, payload = job
+            if kind == 'folders':
+                await self._write_folders(depth, *payload, include_custom_attributes)
+            elif kind == 'files':
+                await self._write_files(depth, payload, include_custom_attributes)
+
+            if kind != 'level_closed':
+                self._pending[depth] -= 1
+            await self._advance_checkpoint()
+
+    async def _write_folders(self, depth: int, folders: List[Dict], definitions: List[Dict],
+                             include_custom_attributes: bool):
+        counts = self._level_counts.setdefault(depth, {key: 0 for key in COUNTER_KEYS})
+        counts['folders_synced'] += await self.manager._batch_insert_folders_v2(folders, self.dal)
+
+        if include_custom_attributes and definitions:
+            unique_definitions = self.manager._deduplicate_definitions(definitions)
+            try:
+                result = await self.dal.batch_upsert_custom_attribute_definitions(unique_definitions)
+                counts['folder_attr_defs_synced'] += result.get('upserted', 0)
+            except Exception as e:
+                logger.error(f"Failed to sync folder custom attribute definitions: {e}")
+
+    async def _write_files(self, depth: int, files: List[Dict], include_custom_attributes: bool):
+        counts = self._level_counts.setdefault(depth, {key: 0 for key in COUNTER_KEYS})
+        v2_files = [self.manager._build_v2_file_record(file_data) for file_data in files]
+        counts['files_synced'] += await self.manager._batch_insert_files_v2(v2_files, self.dal)
+        counts['versions_synced'] += await self.manager._batch_insert_file_versions_v2(files, self.dal)
+        if include_custom_attributes:
+            counts['custom_attrs_synced'] += await self.manager._batch_insert_custom_attributes_v2(files, self.dal)
+        self.stats['file_batches'] += 1
+
+    async def _advance_checkpoint(self):
+        """按層順序保存檢查點：某層已產出完畢且其所有批次都已寫入"""
+        while self._next_checkpoint in self._closed and self._pending.get(self._next_checkpoint, 0) == 0:
+            depth = self._next_checkpoint
+            frontier = self._closed.pop(depth)
+            for key, value in self._level_counts.pop(depth, {}).items():
+                self._totals[key] = self._totals.get(key, 0) + value
+            self._pending.pop(depth, None)
+            self._next_checkpoint = depth + 1
+
+            if self.checkpoints is not None and frontier:
+                await self.checkpoints.save(self._project_id, self._task_uuid, depth + 1,
+                                            frontier, dict(self._totals))
+                self.stats['checkpoints_saved'] += 1
+                logger.info(f"📌 全量同步檢查點: 深度 {depth} 已提交, 下一層 {len(frontier)} 個文件夾")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """獲取流水線統計"""
+        return dict(self.stats)
+
+
+async def run_streaming_full_sync(manager, dal, project_id: str, top_folders: List[Dict[str, Any]],
+                                  headers: dict, max_depth: int = 10,
+                                  include_custom_attributes: bool = True, task_uuid: str = None,
+                                  checkpoint: Optional[Dict[str, Any]] = None,
+                                  checkpoints: Optional[FullSyncCheckpointStore] = None) -> Dict[str, Any]:
+    """執行一次流式全量同步，返回計數和流水線統計"""
+    start = time.time()
+    pipeline = StreamingFullSync(manager, dal, checkpoints, batch_size=manager.batch_size)
+    counters = await pipeline.run(project_id, top_folders, headers, max_depth,
+                                  include_custom_attributes, task_uuid, checkpoint)
+    return {
+        **counters,
+        'pipeline_stats': pipeline.get_stats(),
+        'pipeline_seconds': round(time.time() - start, 2)
+    }
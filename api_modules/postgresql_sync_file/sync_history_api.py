@@ -10,6 +10,7 @@ from typing import Dict, List, Any, Optional
 from flask import Blueprint, request, jsonify
 
 from database_sql.optimized_data_access import get_optimized_postgresql_dal
+from database_sql.async_bridge import run_async
 
 logger = logging.getLogger(__name__)
 
@@ -78,8 +79,7 @@ def get_project_sync_history(project_id):
         
         # 执行查询
         def run_query():
-            import asyncio
-            return asyncio.run(_get_sync_history_data(conditions, params, limit, offset))
+            return run_async(_get_sync_history_data(conditions, params, limit, offset))
         
         result = run_query()
         
@@ -112,8 +112,7 @@ def get_project_sync_summary(project_id):
     """
     try:
         def run_query():
-            import asyncio
-            return asyncio.run(_get_project_sync_summary(project_id))
+            return run_async(_get_project_sync_summary(project_id))
         
         summary = run_query()
         
@@ -145,8 +144,7 @@ def get_all_projects_sync_summary():
         days = int(request.args.get('days', 7))
         
         def run_query():
-            import asyncio
-            return asyncio.run(_get_all_projects_summary(days))
+            return run_async(_get_all_projects_summary(days))
         
         summary = run_query()
         
@@ -173,8 +171,7 @@ def get_sync_task_details(task_uuid):
     """
     try:
         def run_query():
-            import asyncio
-            return asyncio.run(_get_task_details(task_uuid))
+            return run_async(_get_task_details(task_uuid))
         
         task_details = run_query()
         
@@ -0,0 +1,591 @@
+# -*- coding: utf-8 -*-
+"""
+PostgreSQL同步任務隊列
+
+統一同步API之前在HTTP請求內同步執行整個同步，一次全量同步會佔住一個Flask worker。
+這裡把 sync_tasks 表作為持久化隊列（遷移腳本 database_sql/add_sync_job_queue.sql）：
+
+- SyncJobQueue：入隊、認領、心跳、完成、取消、卡死任務恢復（psycopg2 連接池，毫秒級）
+  - 同一項目最多一個 pending 任務，重複請求合併到已有任務（全量請求會把 pending 增量升級為全量）
+  - 認領使用 FOR UPDATE SKIP LOCKED，按優先級（增量高於全量）和入隊時間排序
+  - 同一項目已有運行中任務時不認領該項目的任務
+- SyncWorkerPool：後台線程中的asyncio worker池，並發數可配置（SYNC_WORKER_CONCURRENCY）
+  - 運行中定期寫心跳並檢查取消請求
+  - 心跳超時的任務重新排隊（超過最大嘗試次數則標記失敗）
+"""
+
+import os
+import json
+import socket
+import asyncio
+import logging
+import threading
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# 增量同步優先於全量同步
+TASK_PRIORITIES = {
+    'incremental_sync': 10,
+    'full_sync': 0
+}
+
+DEFAULT_WORKER_CONCURRENCY = int(os.getenv('SYNC_WORKER_CONCURRENCY', 2))
+DEFAULT_POLL_INTERVAL = float(os.getenv('SYNC_WORKER_POLL_INTERVAL', 5))
+DEFAULT_HEARTBEAT_INTERVAL = float(os.getenv('SYNC_WORKER_HEARTBEAT_INTERVAL', 30))
+# 心跳超過該時間未更新視為worker已失聯
+DEFAULT_STALE_SECONDS = float(os.getenv('SYNC_WORKER_STALE_SECONDS', 300))
+DEFAULT_MAX_ATTEMPTS = int(os.getenv('SYNC_JOB_MAX_ATTEMPTS', 3))
+
+_UNIQUE_VIOLATION = '23505'
+
+
+def _default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class SyncJobQueue:
+    """基於 sync_tasks 表的持久化任務隊列（線程安全，每次操作借用一個連接）"""
+
+    def __init__(self, connection_factory: Callable = None,
+                 stale_seconds: float = DEFAULT_STALE_SECONDS,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        self._connection_factory = connection_factory
+        self.stale_seconds = stale_seconds
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._metrics = {'enqueued': 0, 'coalesced': 0, 'upgraded': 0, 'recovered': 0, 'claim_conflicts': 0}
+
+    def _connect(self):
+        if self._connection_factory is None:
+            from database_sql.pg_pool import get_pooled_connection
+            self._connection_factory = get_pooled_connection
+        return self._connection_factory()
+
+    def _count(self, key: str, amount: int = 1):
+        with self._lock:
+            self._metrics[key] += amount
+
+    def enqueue(self, project_id: str, task_type: str, performance_mode: str = 'standard',
+                parameters: Dict[str, Any] = None) -> Dict[str, Any]:
+        """
+        同步請求入隊
+
+        Returns:
+            {'task_uuid', 'task_type', 'status': 'pending', 'coalesced': bool}
+        """
+        priority = TASK_PRIORITIES.get(task_type, 0)
+        parameters_json = json.dumps(parameters or {})
+
+        conn = self._connect()
+        try:
+            cursor = conn.cursor()
+            # 同一項目的入隊串行化，保證最多一個 pending 任務
+            cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", [f"sync_tasks:{project_id}"])
+            cursor.execute("""
+                SELECT task_uuid, task_type
+                FROM sync_tasks
+                WHERE project_id = %s AND task_status = 'pending' AND queued_at IS NOT NULL
+                ORDER BY queued_at
+                LIMIT 1
+                FOR UPDATE
+            """, [project_id])
+            pending = cursor.fetchone()
+
+            if pending:
+                pending_uuid, pending_type = pending
+                if pending_type == task_type or pending_type == 'full_sync':
+                    # 已有同類型（或覆蓋範圍更大的全量）任務排隊，直接合併
+                    cursor.execute("""
+                        UPDATE sync_tasks
+                        SET coalesced_requests = COALESCE(coalesced_requests, 0) + 1,
+                            updated_at = NOW()
+                        WHERE task_uuid = %s
+                    """, [pending_uuid])
+                    result_type = pending_type
+                else:
+                    # 排隊中的增量任務升級為全量
+                    cursor.execute("""
+                        UPDATE sync_tasks
+                        SET task_type = %s, priority = %s, performance_mode = %s,
+                            parameters = %s::jsonb,
+                            coalesced_requests = COALESCE(coalesced_requests, 0) + 1,
+                            updated_at = NOW()
+                        WHERE task_uuid = %s
+                    """, [task_type, priority, performance_mode, parameters_json, pending_uuid])
+                    result_type = task_type
+                    self._count('upgraded')
+                conn.commit()
+                cursor.close()
+                self._count('coalesced')
+                return {'task_uuid': pending_uuid, 'task_type': result_type,
+                        'status': 'pending', 'coalesced': True}
+
+            task_uuid = str(uuid.uuid4())
+            cursor.execute("""
+                INSERT INTO sync_tasks (
+                    task_uuid, project_id, task_type, task_status, performance_mode,
+                    parameters, priority, queued_at, created_at, updated_at
+                ) VALUES (%s, %s, %s, 'pending', %s, %s::jsonb, %s, NOW(), NOW(), NOW())
+            """, [task_uuid, project_id, task_type, performance_mode, parameters_json, priority])
+            conn.commit()
+            cursor.close()
+            self._count('enqueued')
+            return {'task_uuid': task_uuid, 'task_type': task_type,
+                    'status': 'pending', 'coalesced': False}
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def claim(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        """認領下一個可執行的任務，沒有任務時返回None"""
+        conn = self._connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE sync_tasks t
+                SET task_status = 'running',
+                    worker_id = %s,
+                    heartbeat_at = NOW(),
+                    start_time = NOW(),
+                    attempts = COALESCE(t.attempts, 0) + 1,
+                    updated_at = NOW()
+                WHERE t.id = (
+                    SELECT p.id
+                    FROM sync_tasks p
+                    WHERE p.task_status = 'pending'
+                      AND p.queued_at IS NOT NULL
+                      AND NOT EXISTS (
+                          SELECT 1 FROM sync_tasks r
+                          WHERE r.project_id = p.project_id
+                            AND r.task_status = 'running'
+                            AND (r.queued_at IS NOT NULL
+                                 OR r.updated_at > NOW() - make_interval(secs => %s))
+                      )
+                    ORDER BY p.priority DESC, p.queued_at
+                    LIMIT 1
+                    FOR UPDATE SKIP LOCKED
+                )
+                AND t.task_status = 'pending'
+                RETURNING t.task_uuid, t.project_id, t.task_type, t.performance_mode,
+                          t.parameters, t.attempts
+            """, [worker_id, self.stale_seconds])
+            row = cursor.fetchone()
+            conn.commit()
+            cursor.close()
+        except Exception as e:
+            conn.rollback()
+            if getattr(e, 'pgcode', None) == _UNIQUE_VIOLATION:
+                # 另一個worker同時認領了同一項目的任務
+                self._count('claim_conflicts')
+                return None
+            raise
+        finally:
+            conn.close()
+
+        if not row:
+            return None
+
+        task_uuid, project_id, task_type, performance_mode, parameters, attempts = row
+        if isinstance(parameters, str):
+            parameters = json.loads(parameters)
+        return {
+            'task_uuid': task_uuid,
+            'project_id': project_id,
+            'task_type': task_type,
+            'performance_mode': performance_mode or 'standard',
+            'parameters': parameters or {},
+            'attempts': attempts
+        }
+
+    def heartbeat(self, task_uuid: str, worker_id: str) -> Optional[str]:
+        """
+        更新心跳
+
+        Returns:
+            'ok' 繼續執行；'cancel' 已請求取消；None 任務已不屬於該worker（被恢復流程收回）
+        """
+        conn = self._connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE sync_tasks
+                SET heartbeat_at = NOW()
+                WHERE task_uuid = %s AND worker_id = %s
+                RETURNING task_status, cancel_requested
+            """, [task_uuid, worker_id])
+            row = cursor.fetchone()
+            conn.commit()
+            cursor.close()
+        finally:
+            conn.close()
+
+        if not row:
+            return None
+        task_status, cancel_requested = row
+        if task_status == 'running' and cancel_requested:
+            return 'cancel'
+        return 'ok'
+
+    def finish(self, task_uuid: str, worker_id: str, status: str,
+               results: Dict[str, Any] = None, error: str = None) -> bool:
+        """
+        結束任務（completed / failed / cancelled）
+
+        同步服務已通過 TaskManager 寫入完成記錄時不覆蓋，只補全仍處於 running 的任務
+        """
+        conn = self._connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE sync_tasks
+                SET task_status = %s,
+                    sync_results = COALESCE(%s::jsonb, sync_results),
+                    error_message = COALESCE(%s, error_message),
+                    end_time = NOW(),
+                    duration_seconds = EXTRACT(EPOCH FROM (NOW() - start_time)),
+                    updated_at = NOW()
+                WHERE task_uuid = %s AND worker_id = %s AND task_status = 'running'
+            """, [status, json.dumps(results, default=str) if results is not None else None,
+                  error, task_uuid, worker_id])
+            updated = cursor.rowcount == 1
+            conn.commit()
+            cursor.close()
+            return updated
+        finally:
+            conn.close()
+
+    def cancel(self, task_uuid: str) -> Optional[str]:
+        """
+        取消任務
+
+        Returns:
+            'cancelled'（排隊中的任務直接取消）、'cancelling'（運行中，下次心跳時中止）、
+            None（任務不存在或已結束）
+        """
+        conn = self._connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE sync_tasks
+                SET task_status = CASE WHEN task_status = 'pending' THEN 'cancelled' ELSE task_status END,
+                    end_time = CASE WHEN task_status = 'pending' THEN NOW() ELSE end_time END,
+                    cancel_requested = TRUE,
+                    updated_at = NOW()
+                WHERE task_uuid = %s AND task_status IN ('pending', 'running')
+                RETURNING task_status
+            """, [task_uuid])
+            row = cursor.fetchone()
+            conn.commit()
+            cursor.close()
+        finally:
+            conn.close()
+
+        if not row:
+            return None
+        return 'cancelled' if row[0] == 'cancelled' else 'cancelling'
+
+    def get_task_status(self, task_uuid: str) -> Optional[str]:
+        """任務當前狀態（pending / running / completed / failed / cancelled），不存在時返回None"""
+        conn = self._connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT task_status FROM sync_tasks WHERE task_uuid = %s", [task_uuid])
+            row = cursor.fetchone()
+            cursor.close()
+        finally:
+            conn.close()
+        return row[0] if row else None
+
+    def recover_stuck(self) -> int:
+        """心跳超時的運行中任務重新排隊；超過最大嘗試次數或項目已有新任務排隊時標記失敗"""
+        conn = self._connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE sync_tasks t
+                SET task_status = CASE
+                        WHEN COALESCE(t.attempts, 0) < %s
+                             AND NOT t.cancel_requested
+                             AND NOT EXISTS (
+                                 SELECT 1 FROM sync_tasks p
+                                 WHERE p.project_id = t.project_id
+                                   AND p.task_status = 'pending'
+                                   AND p.queued_at IS NOT NULL)
+                        THEN 'pending' ELSE 'failed' END,
+                    error_message = 'worker heartbeat lost: ' || COALESCE(t.worker_id, 'unknown'),
+                    worker_id = NULL,
+                    heartbeat_at = NULL,
+                    updated_at = NOW()
+                WHERE t.task_status = 'running'
+                  AND t.queued_at IS NOT NULL
+                  AND COALESCE(t.heartbeat_at, t.start_time) < NOW() - make_interval(secs => %s)
+                RETURNING t.task_uuid, t.task_status
+            """, [self.max_attempts, self.stale_seconds])
+            rows = cursor.fetchall()
+            conn.commit()
+            cursor.close()
+        finally:
+            conn.close()
+
+        for task_uuid, task_status in rows:
+            logger.warning(f"Recovered stuck sync task {task_uuid} -> {task_status}")
+        if rows:
+            self._count('recovered', len(rows))
+        return len(rows)
+
+    def get_queue_stats(self) -> Dict[str, Any]:
+        """隊列中 pending / running 任務數與最早排隊時間"""
+        conn = self._connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT task_status, COUNT(*), EXTRACT(EPOCH FROM (NOW() - MIN(queued_at)))
+                FROM sync_tasks
+                WHERE queued_at IS NOT NULL AND task_status IN ('pending', 'running')
+                GROUP BY task_status
+            """)
+            rows = cursor.fetchall()
+            cursor.close()
+        finally:
+            conn.close()
+
+        stats = {'pending': 0, 'running': 0, 'oldest_pending_seconds': None}
+        for task_status, count, oldest in rows:
+            stats[task_status] = count
+            if task_status == 'pending' and oldest is not None:
+                stats['oldest_pending_seconds'] = round(float(oldest), 1)
+        return stats
+
+    def get_metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._metrics)
+
+
+async def run_postgresql_sync_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """默認的任務執行器：按任務類型調用PostgreSQL同步服務"""
+    try:
+        from .postgresql_sync_service import create_sync_service
+    except ImportError:
+        from postgresql_sync_service import create_sync_service
+
+    parameters = job.get('parameters') or {}
+    performance_mode = job.get('performance_mode') or 'standard'
+    # 每個任務使用獨立的同步服務，避免並發任務共享同一個同步管理器的狀態
+    service = create_sync_service(performance_mode)
+
+    if job['task_type'] == 'full_sync':
+        return await service.start_full_sync(
+            project_id=job['project_id'],
+            max_depth=parameters.get('max_depth', 10),
+            include_custom_attributes=parameters.get('include_custom_attributes', True),
+            performance_mode=performance_mode,
+            task_uuid=job['task_uuid']
+        )
+    return await service.start_incremental_sync(
+        project_id=job['project_id'],
+        max_depth=parameters.get('max_depth', 10),
+        include_custom_attributes=parameters.get('include_custom_attributes', True),
+        performance_mode=performance_mode,
+        enable_top_level_rollup_check=parameters.get('enable_top_level_rollup_check', True),
+        task_uuid=job['task_uuid']
+    )
+
+
+class SyncWorkerPool:
+    """從 SyncJobQueue 認領並執行同步任務的asyncio worker池"""
+
+    def __init__(self, queue: SyncJobQueue,
+                 runner: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]] = None,
+                 concurrency: int = DEFAULT_WORKER_CONCURRENCY,
+                 poll_interval: float = DEFAULT_POLL_INTERVAL,
+                 heartbeat_interval: float = DEFAULT_HEARTBEAT_INTERVAL,
+                 recover_interval: float = None,
+                 worker_id: str = None):
+        self.queue = queue
+        self.runner = runner or run_postgresql_sync_job
+        self.concurrency = max(1, concurrency)
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.recover_interval = recover_interval if recover_interval is not None else queue.stale_seconds / 2
+        self.worker_id = worker_id or _default_worker_id()
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._in_flight: Dict[str, Dict[str, Any]] = {}
+        self._metrics = {'claimed': 0, 'completed': 0, 'failed': 0, 'cancelled': 0, 'lost': 0, 'errors': 0}
+
+    # ------------------------------------------------------------------
+    # 生命週期
+    # ------------------------------------------------------------------
+
+    def start(self):
+        """在後台daemon線程中啟動worker池（重複調用無副作用）"""
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=lambda: asyncio.run(self.run()),
+                                            name='sync-worker-pool', daemon=True)
+            self._thread.start()
+            logger.info(f"Sync worker pool started: worker_id={self.worker_id}, concurrency={self.concurrency}")
+
+    def notify(self):
+        """有新任務入隊時喚醒空閒worker（可在任意線程調用）"""
+        if self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def stop(self):
+        """停止認領新任務，運行中的任務執行完畢後退出"""
+        self._stopping = True
+        self.notify()
+
+    async def run(self):
+        """運行worker池直到 stop()"""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        recover_task = asyncio.create_task(self._recover_loop())
+        try:
+            await asyncio.gather(*(self._worker_loop() for _ in range(self.concurrency)))
+        finally:
+            recover_task.cancel()
+            self._loop = None
+
+    # ------------------------------------------------------------------
+    # worker
+    # ------------------------------------------------------------------
+
+    async def _wait_for_work(self, timeout: float):
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+
+    async def _worker_loop(self):
+        while not self._stopping:
+            try:
+                job = await asyncio.to_thread(self.queue.claim, self.worker_id)
+            except Exception as e:
+                logger.warning(f"Sync job claim failed: {e}")
+                self._metrics['errors'] += 1
+                job = None
+
+            if job is None:
+                await self._wait_for_work(self.poll_interval)
+                continue
+
+            self._metrics['claimed'] += 1
+            await self._run_job(job)
+            # 同一項目的下一個任務此時才可認領，喚醒其他空閒worker
+            self._wakeup.set()
+
+    async def _run_job(self, job: Dict[str, Any]):
+        task_uuid = job['task_uuid']
+        self._in_flight[task_uuid] = {'project_id': job['project_id'], 'task_type': job['task_type']}
+        logger.info(f"Running sync job {task_uuid}: {job['task_type']} for project {job['project_id']}")
+
+        sync_task = asyncio.create_task(self.runner(job))
+        outcome = None
+        try:
+            while True:
+                done, _ = await asyncio.wait({sync_task}, timeout=self.heartbeat_interval)
+                if done:
+                    break
+                try:
+                    state = await asyncio.to_thread(self.queue.heartbeat, task_uuid, self.worker_id)
+                except Exception as e:
+                    logger.warning(f"Sync job heartbeat failed for {task_uuid}: {e}")
+                    continue
+                if state is None or state == 'cancel':
+                    outcome = 'lost' if state is None else 'cancelled'
+                    sync_task.cancel()
+                    break
+
+            try:
+                result = await sync_task
+            except asyncio.CancelledError:
+                result = None
+            except Exception as e:
+                logger.error(f"Sync job {task_uuid} raised: {e}")
+                result = {'status': 'error', 'error': str(e)}
+
+            if outcome == 'lost':
+                # 任務已被恢復流程收回，由認領它的worker負責記錄
+                self._metrics['lost'] += 1
+                logger.warning(f"Sync job {task_uuid} no longer owned by {self.worker_id}, abandoned")
+                return
+
+            if outcome == 'cancelled':
+                status, error = 'cancelled', 'cancelled by request'
+            elif (result or {}).get('status') == 'error':
+                status, error = 'failed', result.get('error', 'Unknown error')
+            else:
+                status, error = 'completed', None
+            self._metrics[status] += 1
+
+            try:
+                await asyncio.to_thread(self.queue.finish, task_uuid, self.worker_id, status, result, error)
+            except Exception as e:
+                logger.error(f"Failed to finish sync job {task_uuid}: {e}")
+                self._metrics['errors'] += 1
+        finally:
+            self._in_flight.pop(task_uuid, None)
+
+    async def _recover_loop(self):
+        while True:
+            try:
+                recovered = await asyncio.to_thread(self.queue.recover_stuck)
+                if recovered:
+                    self._wakeup.set()
+            except Exception as e:
+                logger.warning(f"Stuck sync job recovery failed: {e}")
+            await asyncio.sleep(self.recover_interval)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        metrics = dict(self._metrics)
+        metrics.update({
+            'worker_id': self.worker_id,
+            'concurrency': self.concurrency,
+            'running': self._thread is not None and self._thread.is_alive(),
+            'in_flight': dict(self._in_flight),
+            'queue': self.queue.get_metrics()
+        })
+        return metrics
+
+
+# ============================================================================
+# 進程級共享實例
+# ============================================================================
+
+_queue: Optional[SyncJobQueue] = None
+_pool: Optional[SyncWorkerPool] = None
+_instance_lock = threading.RLock()
+
+
+def get_sync_job_queue() -> SyncJobQueue:
+    """進程內共享的同步任務隊列"""
+    global _queue
+    if _queue is None:
+        with _instance_lock:
+            if _queue is None:
+                _queue = SyncJobQueue()
+    return _queue
+
+
+def get_sync_worker_pool(start: bool = True) -> SyncWorkerPool:
+    """進程內共享的worker池，默認確保已啟動"""
+    global _pool
+    if _pool is None:
+        with _instance_lock:
+            if _pool is None:
+                _pool = SyncWorkerPool(get_sync_job_queue())
+    if start:
+        _pool.start()
+    return _pool
@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""
+測試增量同步的刪除對賬（內存模擬的 folders/files 表，不訪問ACC和數據庫）
+"""
+
+import sys
+import os
+import asyncio
+from contextlib import asynccontextmanager
+
+# 添加項目根目錄到路徑
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from api_modules.postgresql_sync_file import deletion_reconciler as dr
+from api_modules.postgresql_sync_file.deletion_reconciler import DeletionReconciler
+
+
+class FakeConnection:
+    """按對賬使用的SQL在內存表上執行等價操作"""
+
+    def __init__(self, folders, files):
+        self.folders = folders
+        self.files = files
+        self.statements = []
+        self.transactions = 0
+        # 文件夾路徑以 id 作為名稱
+        for fid in folders:
+            folders[fid]['path'] = self._path(fid)
+
+    def _path(self, folder_id):
+        parent_id = self.folders[folder_id]['parent_id']
+        return folder_id if parent_id is None else f"{self._path(parent_id)}/{folder_id}"
+
+    @asynccontextmanager
+    async def transaction(self):
+        self.transactions += 1
+        yield
+
+    def _children(self, folder_id):
+        return [fid for fid, row in self.folders.items()
+                if row['parent_id'] == folder_id and row['deleted_at'] is None]
+
+    async def fetch(self, sql, project_id, *args):
+        self.statements.append(sql)
+        if sql == dr.LIVE_CHILDREN_SQL:
+            parents = set(args[0])
+            return ([{'kind': 'folder', 'id': fid, 'parent_id': row['parent_id']}
+                     for fid, row in self.folders.items()
+                     if row['parent_id'] in parents and row['deleted_at'] is None] +
+                    [{'kind': 'file', 'id': fid, 'parent_id': row['parent_id']}
+                     for fid, row in self.files.items()
+                     if row['parent_id'] in parents and row['deleted_at'] is None])
+        if sql == dr.KNOWN_ITEMS_SQL:
+            folder_ids, file_ids = args
+            return ([{'kind': 'folder', 'id': fid, 'parent_id': self.folders[fid]['parent_id'],
+                      'deleted': self.folders[fid]['deleted_at'] is not None}
+                     for fid in folder_ids if fid in self.folders] +
+                    [{'kind': 'file', 'id': fid, 'parent_id': self.files[fid]['parent_id'],
+                      'deleted': self.files[fid]['deleted_at'] is not None}
+                     for fid in file_ids if fid in self.files])
+        if sql == dr.REPATH_FOLDERS_SQL:
+            # 從每個移動的文件夾按其父文件夾當前路徑遞歸，每個 id 取 level 最大的一行
+            stack = [(fid, f"{self.folders[self.folders[fid]['parent_id']]['path']}/{fid}", 0)
+                     for fid in args[0] if self.folders[fid]['parent_id'] in self.folders]
+            resolved = {}
+            while stack:
+                fid, path, level = stack.pop()
+                if fid not in resolved or level > resolved[fid][1]:
+                    resolved[fid] = (path, level)
+                stack.extend((child, f"{path}/{child}", level + 1) for child in self._children(fid))
+            for fid, (path, _) in resolved.items():
+                self.folders[fid]['path'] = path
+            return [{'id': fid} for fid in resolved]
+        if sql == dr.TOMBSTONE_FOLDERS_SQL:
+            missing, observed = args
+            deleted, stack = [], [fid for fid in missing if self.folders[fid]['deleted_at'] is None]
+            while stack:
+                fid = stack.pop()
+                deleted.append(fid)
+                stack.extend(child for child in self._children(fid) if child not in observed)
+            for fid in deleted:
+                self.folders[fid]['deleted_at'] = 'now'
+            return [{'id': fid} for fid in deleted]
+        if sql == dr.TOMBSTONE_FILES_SQL:
+            missing, deleted_folders, observed = args
+            deleted = [fid for fid, row in self.files.items()
+                       if row['deleted_at'] is None and fid not in observed
+                       and (fid in missing or row['parent_id'] in deleted_folders)]
+            for fid in deleted:
+                self.files[fid]['deleted_at'] = 'now'
+            return [{'id': fid} for fid in deleted]
+        raise AssertionError(f"unexpected query: {sql}")
+
+    async def execute(self, sql, project_id, *args):
+        self.statements.append(sql)
+        if sql in (dr.MOVE_FOLDERS_SQL, dr.MOVE_FILES_SQL):
+            table = self.folders if sql == dr.MOVE_FOLDERS_SQL else self.files
+            for item_id, parent_id in zip(*args):
+                table[item_id].update(parent_id=parent_id, deleted_at=None)
+        elif sql != dr.REPATH_FILES_SQL:
+            raise AssertionError(f"unexpected statement: {sql}")
+
+
+class FakeDAL:
+    def __init__(self, conn):
+        self.conn = conn
+
+    @asynccontextmanager
+    async def get_connection(self):
+        yield self.conn
+
+
+def _row(parent_id, deleted_at=None):
+    return {'parent_id': parent_id, 'deleted_at': deleted_at}
+
+
+def _folder(folder_id):
+    return {'id': folder_id, 'type': 'folders'}
+
+
+def _item(item_id):
+    return {'id': item_id, 'type': 'items'}
+
+
+def make_db():
+    # root -> (a, b, f0)，a -> (a1, f1)，a1 -> (f4)，b -> (f2)，c -> (f3, old)，old 已有墓碑
+    folders = {
+        'root': _row(None), 'a': _row('root'), 'a1': _row('a'), 'b': _row('root'), 'c': _row(None),
+    }
+    files = {
+        'f0': _row('root'), 'f1': _row('a'), 'f2': _row('b'), 'f3': _row('c'), 'f4': _row('a1'),
+        'old': _row('c', deleted_at='earlier'),
+    }
+    return FakeConnection(folders, files)
+
+
+def test_missing_subtree_is_tombstoned_in_one_transaction():
+    """測試已列出文件夾中消失的文件夾連同子樹和文件一起設置墓碑"""
+    conn = make_db()
+    listings = {'root': [_folder('b'), _item('f0')], 'b': [_item('f2')]}
+
+    result = asyncio.run(DeletionReconciler(FakeDAL(conn)).reconcile('p1', listings))
+
+    assert sorted(result['deleted_folder_ids']) == ['a', 'a1']
+    assert sorted(result['deleted_file_ids']) == ['f1', 'f4']
+    assert result['folders_deleted'] == 2 and result['files_deleted'] == 2
+    assert result['folders_moved'] == 0 and result['files_moved'] == 0
+    assert conn.transactions == 1
+    # 未列出的文件夾不參與對賬
+    assert conn.folders['c']['deleted_at'] is None and conn.files['f3']['deleted_at'] is None
+
+
+def test_moved_items_are_reparented_not_deleted():
+    """測試移到另一個已列出文件夾下的子項更新父文件夾，其子樹不被連帶刪除"""
+    conn = make_db()
+    # a 從 root 移到 b 下；f1 從 a 移到 b 下；a 中已無其他內容
+    listings = {
+        'root': [_folder('b'), _item('f0')],
+        'b': [_folder('a'), _item('f2'), _item('f1')],
+        'a': [_folder('a1')],
+    }
+
+    result = asyncio.run(DeletionReconciler(FakeDAL(conn)).reconcile('p1', listings))
+
+    assert result['deleted_folder_ids'] == [] and result['deleted_file_ids'] == []
+    assert result['moved_folder_ids'] == ['a'] and result['moved_file_ids'] == ['f1']
+    assert conn.folders['a']['parent_id'] == 'b' and conn.files['f1']['parent_id'] == 'b'
+    assert conn.folders['a1']['deleted_at'] is None and conn.files['f4']['deleted_at'] is None
+    assert dr.REPATH_FOLDERS_SQL in conn.statements and dr.REPATH_FILES_SQL in conn.statements
+    assert conn.folders['a']['path'] == 'root/b/a' and conn.folders['a1']['path'] == 'root/b/a/a1'
+
+
+def test_nested_moves_repath_from_topmost_move():
+    """測試同一輪中 a 移到 b 下、b 移到 c 下：路徑基於 b 的新位置，每個文件夾只重算一次"""
+    conn = make_db()
+    listings = {
+        'root': [_item('f0')],
+        'c': [_folder('b'), _item('f3')],
+        'b': [_folder('a'), _item('f2')],
+        'a': [_folder('a1'), _item('f1')],
+    }
+
+    result = asyncio.run(DeletionReconciler(FakeDAL(conn)).reconcile('p1', listings))
+
+    assert result['deleted_folder_ids'] == [] and result['deleted_file_ids'] == []
+    assert sorted(result['moved_folder_ids']) == ['a', 'b']
+    assert conn.folders['b']['parent_id'] == 'c' and conn.folders['a']['parent_id'] == 'b'
+    assert conn.folders['b']['path'] == 'c/b'
+    assert conn.folders['a']['path'] == 'c/b/a' and conn.folders['a1']['path'] == 'c/b/a/a1'
+
+
+def test_reappearing_tombstone_is_restored_and_unchanged_listing_is_noop():
+    """測試帶墓碑的子項重新出現時清空墓碑；子項集合未變化時不開啟事務"""
+    conn = make_db()
+    reconciler = DeletionReconciler(FakeDAL(conn))
+
+    result = asyncio.run(reconciler.reconcile('p1', {'c': [_item('f3'), _item('old')]}))
+    assert result['moved_file_ids'] == ['old'] and result['files_deleted'] == 0
+    assert conn.files['old']['deleted_at'] is None
+
+    conn.transactions = 0
+    result = asyncio.run(reconciler.reconcile('p1', {'c': [_item('f3'), _item('old')], 'b': [_item('f2')]}))
+    assert result['folders_reconciled'] == 2
+    assert result['files_moved'] == 0 and result['files_deleted'] == 0
+    assert conn.transactions == 0
+
+    assert asyncio.run(reconciler.reconcile('p1', {}))['folders_reconciled'] == 0
+
+
+def run_all_tests():
+    """運行所有測試"""
+    tests = [
+        test_missing_subtree_is_tombstoned_in_one_transaction,
+        test_moved_items_are_reparented_not_deleted,
+        test_nested_moves_repath_from_topmost_move,
+        test_reappearing_tombstone_is_restored_and_unchanged_listing_is_noop,
+    ]
+
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
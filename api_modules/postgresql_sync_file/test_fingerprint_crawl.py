@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+"""
+測試基於文件夾內容指紋的增量爬取（模擬的爬取器和數據庫，不訪問ACC和數據庫）
+"""
+
+import sys
+import os
+import copy
+import asyncio
+from datetime import datetime
+
+# 添加項目根目錄到路徑
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from api_modules.postgresql_sync_file.folder_crawler import ConcurrentFolderCrawler
+from api_modules.postgresql_sync_file.fingerprint_crawl import FingerprintCrawl
+
+
+def _folder(folder_id, name, rollup, count):
+    return {'id': folder_id, 'type': 'folders',
+            'attributes': {'name': name, 'lastModifiedTimeRollup': rollup, 'objectCount': count}}
+
+
+def _item(item_id, name, modified):
+    return {'id': item_id, 'type': 'items', 'attributes': {'name': name, 'lastModifiedTime': modified}}
+
+
+T1 = '2025-10-20T02:32:52.0000000Z'
+T2 = '2025-10-21T08:00:00.0000000Z'
+
+# 頂層 p -> (a, f0)，a -> (a1, f1)，a1 -> (f4)；頂層 q -> (f2)
+TOP = [_folder('p', 'P', T1, 2), _folder('q', 'Q', T1, 1)]
+TREE = {
+    'p': [_folder('a', 'A', T1, 2), _item('f0', 'zero.pdf', T1)],
+    'a': [_folder('a1', 'A1', T1, 1), _item('f1', 'one.pdf', T1)],
+    'a1': [_item('f4', 'four.pdf', T1)],
+    'q': [_item('f2', 'two.pdf', T1)],
+}
+
+
+def make_crawler_cls(tree, fail=()):
+    class FakeCrawler(ConcurrentFolderCrawler):
+        """用內存數據替代HTTP請求的爬取器"""
+
+        visited = []
+
+        async def open(self):
+            self.session = object()
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def close(self):
+            self.session = None
+
+        async def _get_json(self, url, headers):
+            self.stats['requests'] += 1
+            folder_id = url.split('/folders/')[1].split('/contents')[0]
+            FakeCrawler.visited.append(folder_id)
+            if folder_id in fail:
+                return None
+            return {'data': tree[folder_id], 'links': {}}
+
+    return FakeCrawler
+
+
+class FakeManager:
+    """提供時間解析和記錄轉換"""
+
+    def _parse_datetime(self, value):
+        if not value:
+            return None
+        date_part, time_part = value.rstrip('Z').split('T')
+        base, fraction = time_part.split('.')
+        return datetime.fromisoformat(f"{date_part}T{base}.{fraction[:6]}+00:00")
+
+    def _transform_folder_data_v2(self, folder, project_id, parent_path, depth):
+        return {'id': folder['id'], 'project_id': project_id, 'depth': depth,
+                'path': f"{parent_path}/{folder['attributes']['name']}".strip('/')}
+
+    def _transform_file_data_v2(self, item, project_id, folder_path, depth):
+        return {'id': item['id'], 'project_id': project_id, 'name': item['attributes']['name'],
+                'folder_path': folder_path, 'depth': depth,
+                'full_path': f"{folder_path}/{item['attributes']['name']}".strip('/'),
+                'last_modified_time': self._parse_datetime(item['attributes']['lastModifiedTime'])}
+
+
+class FakeDAL:
+    """內存中的文件夾指紋和文件修改時間"""
+
+    def __init__(self):
+        self.fingerprints = {}
+        self.file_times = {}
+
+    async def get_folder_fingerprints(self, project_id, folder_ids):
+        return {fid: self.fingerprints[fid] for fid in folder_ids if fid in self.fingerprints}
+
+    async def get_file_modified_times(self, project_id, file_ids):
+        return {fid: self.file_times[fid] for fid in file_ids if fid in self.file_times}
+
+    def commit(self, result):
+        """模擬寫庫成功後保存指紋和文件"""
+        for fp in result['fingerprints']:
+            self.fingerprints[fp['id']] = {'rollup': fp['rollup'], 'object_count': fp['object_count'],
+                                           'child_hash': fp['child_hash']}
+        for file_data in result['changed_files']:
+            self.file_times[file_data['id']] = file_data['last_modified_time']
+
+
+def crawl(dal, top, tree, fail=()):
+    crawler_cls = make_crawler_cls(tree, fail)
+    result = asyncio.run(FingerprintCrawl(FakeManager(), dal, max_concurrency=2, crawler_cls=crawler_cls)
+                         .run('p1', top, {}, max_depth=10))
+    return result, crawler_cls.visited
+
+
+def test_first_run_visits_everything_and_captures_fingerprints():
+    """測試沒有指紋時訪問所有文件夾，所有文件視為變化，並返回全部指紋"""
+    dal = FakeDAL()
+    result, visited = crawl(dal, TOP, TREE)
+
+    assert sorted(visited) == ['a', 'a1', 'p', 'q']
+    assert sorted(f['id'] for f in result['changed_files']) == ['f0', 'f1', 'f2', 'f4']
+    assert sorted(fp['id'] for fp in result['fingerprints']) == ['a', 'a1', 'p', 'q']
+    assert sorted(result['listings']) == ['a', 'a1', 'p', 'q']
+
+    f4 = next(f for f in result['changed_files'] if f['id'] == 'f4')
+    assert f4['parent_folder_id'] == 'a1' and f4['full_path'] == 'P/A/A1/four.pdf' and f4['depth'] == 3
+    assert {r['id']: r['path'] for r in result['changed_folders']}['a1'] == 'P/A/A1'
+
+    report = result['report']
+    assert report['folders_visited'] == 4 and report['subtrees_skipped'] == 0 and report['api_calls'] == 4
+
+
+def test_unchanged_project_needs_no_listing():
+    """測試指紋全部一致時一個文件夾都不列出"""
+    dal = FakeDAL()
+    dal.commit(crawl(dal, TOP, TREE)[0])
+
+    result, visited = crawl(dal, TOP, TREE)
+
+    assert visited == [] and result['changed_folders'] == [] and result['changed_files'] == []
+    assert result['report']['subtrees_skipped'] == 2 and result['report']['objects_skipped'] == 3
+    assert result['report']['api_calls'] == 0
+
+
+def test_only_changed_path_is_visited():
+    """測試深層文件修改只訪問變化路徑上的文件夾，其他子樹跳過"""
+    dal = FakeDAL()
+    dal.commit(crawl(dal, TOP, TREE)[0])
+
+    top, tree = copy.deepcopy(TOP), copy.deepcopy(TREE)
+    tree['a1'][0]['attributes']['lastModifiedTime'] = T2
+    tree['a'][0]['attributes']['lastModifiedTimeRollup'] = T2
+    tree['p'][0]['attributes']['lastModifiedTimeRollup'] = T2
+    top[0]['attributes']['lastModifiedTimeRollup'] = T2
+
+    result, visited = crawl(dal, top, tree)
+
+    assert visited == ['p', 'a', 'a1']
+    assert [f['id'] for f in result['changed_files']] == ['f4']
+    assert sorted(result['listings']) == ['a', 'a1', 'p']
+    report = result['report']
+    assert report['subtrees_skipped'] == 1 and report['skipped_paths'] == ['Q']
+    assert report['visited_paths'] == ['P', 'P/A', 'P/A/A1']
+    assert [(level['visited'], level['skipped']) for level in report['levels']] == [(1, 1), (1, 0), (1, 0)]
+
+
+def test_failed_listing_keeps_ancestor_fingerprints_stale():
+    """測試列表失敗時該文件夾及其祖先都不保存指紋，下次仍會重新訪問"""
+    dal = FakeDAL()
+    top, tree = copy.deepcopy(TOP), copy.deepcopy(TREE)
+
+    result, _ = crawl(dal, top, tree, fail=('a1',))
+    assert result['report']['listing_errors'] == 1
+    assert sorted(fp['id'] for fp in result['fingerprints']) == ['q']
+    dal.commit(result)
+
+    result, visited = crawl(dal, top, tree)
+    assert visited == ['p', 'a', 'a1']
+    assert sorted(fp['id'] for fp in result['fingerprints']) == ['a', 'a1', 'p']
+
+
+class BrokenDAL(FakeDAL):
+    """指紋列不存在等查詢失敗的情況"""
+
+    async def get_folder_fingerprints(self, project_id, folder_ids):
+        raise RuntimeError('column "fingerprint_rollup" does not exist')
+
+
+def test_fingerprint_query_failure_falls_back():
+    """測試指紋查詢失敗時不當作「沒有指紋」全量列出，而是由同步管理器回退到rollup分支過濾"""
+    from api_modules.postgresql_sync_file.postgresql_sync_manager import OptimizedPostgreSQLSyncManager
+
+    crawler_cls = make_crawler_cls(TREE)
+    crawler_cls.visited = []
+    try:
+        asyncio.run(FingerprintCrawl(FakeManager(), BrokenDAL(), crawler_cls=crawler_cls).run('p1', TOP, {}))
+        assert False, "指紋查詢失敗應該拋出"
+    except RuntimeError:
+        pass
+    assert crawler_cls.visited == []
+
+    manager = OptimizedPostgreSQLSyncManager.__new__(OptimizedPostgreSQLSyncManager)
+    manager.crawl_concurrency = 2
+    manager.stats = {'api_calls': 0, 'smart_skips': 0}
+
+    async def top_folders(project_id, headers):
+        return {'data': TOP}
+
+    manager._get_top_folders_async = top_folders
+    assert asyncio.run(manager._fingerprint_crawl_v2('p1', 10, {}, BrokenDAL())) is None
+
+
+def run_all_tests():
+    """運行所有測試"""
+    tests = [
+        test_first_run_visits_everything_and_captures_fingerprints,
+        test_unchanged_project_needs_no_listing,
+        test_only_changed_path_is_visited,
+        test_failed_listing_keeps_ancestor_fingerprints_stale,
+        test_fingerprint_query_failure_falls_back,
+    ]
+
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
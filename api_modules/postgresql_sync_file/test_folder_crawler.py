@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+测试按层并发文件夹爬取器（不访问网络，使用模拟的分页响应）
+"""
+
+import sys
+import os
+import asyncio
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from api_modules.postgresql_sync_file.folder_crawler import ConcurrentFolderCrawler
+
+
+def _folder(folder_id, name):
+    return {'id': folder_id, 'type': 'folders', 'attributes': {'name': name}}
+
+
+def _item(item_id, name):
+    return {'id': item_id, 'type': 'items', 'attributes': {'name': name}}
+
+
+# 模拟的文件夹树：root -> (a, b)，a -> (a1)，b 的内容分两页
+FAKE_TREE = {
+    'root': [[_folder('a', 'A'), _folder('b', 'B')]],
+    'a': [[_folder('a1', 'A1'), _item('f1', 'one.pdf')]],
+    'b': [[_item('f2', 'two.pdf')], [_item('f3', 'three.pdf')]],
+    'a1': [[]],
+}
+
+
+class FakeCrawler(ConcurrentFolderCrawler):
+    """用内存数据替代HTTP请求的爬取器"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.session = object()
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    async def _get_json(self, url, headers):
+        self.stats['requests'] += 1
+        await asyncio.sleep(0.01)
+
+        folder_id = url.split('/folders/')[1].split('/contents')[0]
+        page = int(url.split('cursor=')[1]) if 'cursor=' in url else 0
+        pages = FAKE_TREE[folder_id]
+
+        data = {'data': pages[page], 'links': {}}
+        if page + 1 < len(pages):
+            data['links']['next'] = {'href': f"{url.split('?')[0]}?cursor={page + 1}"}
+        return data
+
+    async def close(self):
+        self.session = None
+
+
+def _run_crawl(crawler, max_depth=10, folder_extra=None):
+    async def run():
+        levels = []
+        async for level in crawler.crawl('b.project', [_folder('root', 'Root')], {}, max_depth, folder_extra):
+            levels.append(level)
+        return levels
+    return asyncio.run(run())
+
+
+def test_crawl_levels_and_pagination():
+    """测试按层遍历与分页"""
+    crawler = FakeCrawler(max_concurrency=4)
+    levels = _run_crawl(crawler)
+
+    assert [len(level) for level in levels] == [1, 2, 1], "每层文件夹数量不正确"
+
+    paths = {entry['folder']['id']: entry['path'] for level in levels for entry in level}
+    assert paths == {'root': 'Root', 'a': 'Root/A', 'b': 'Root/B', 'a1': 'Root/A/A1'}
+
+    b_entry = next(entry for entry in levels[1] if entry['folder']['id'] == 'b')
+    assert [item['id'] for item in b_entry['contents']] == ['f2', 'f3'], "分页内容未合并"
+
+    stats = crawler.get_stats()
+    assert stats['folders_visited'] == 4
+    assert stats['pages'] == 5
+    assert stats['in_flight'] == 0
+    assert len(stats['levels']) == 3
+    print(f"   ✓ 统计: {stats}")
+
+
+def test_crawl_respects_max_depth_and_concurrency():
+    """测试最大深度与并发上限"""
+    crawler = FakeCrawler(max_concurrency=1)
+    levels = _run_crawl(crawler, max_depth=2)
+
+    assert len(levels) == 2, "max_depth 未生效"
+    assert crawler.get_stats()['max_in_flight'] == 1, "并发超过信号量上限"
+
+
+def test_crawl_folder_extra():
+    """测试附加查询与内容列表并发执行"""
+    crawler = FakeCrawler(max_concurrency=4)
+
+    async def folder_extra(folder_id):
+        return [{'attr_id': 1, 'scope_folder_id': folder_id}]
+
+    levels = _run_crawl(crawler, folder_extra=folder_extra)
+    extras = [entry['extra'][0]['scope_folder_id'] for level in levels for entry in level]
+    assert sorted(extras) == ['a', 'a1', 'b', 'root']
+
+
+def test_crawl_chunks_and_start_depth():
+    """测试分块产出与从指定深度的文件夹继续爬取"""
+    crawler = FakeCrawler(max_concurrency=4)
+
+    async def run():
+        chunks = []
+        async for chunk in crawler.crawl('b.project', [_folder('a', 'A'), _folder('b', 'B')], {},
+                                         start_depth=1, parent_paths=['Root', 'Root'], chunk_size=1):
+            chunks.append(chunk)
+        return chunks
+
+    chunks = asyncio.run(run())
+    assert [[entry['folder']['id'] for entry in chunk] for chunk in chunks] == [['a'], ['b'], ['a1']]
+    assert chunks[2][0]['depth'] == 2 and chunks[2][0]['path'] == 'Root/A/A1'
+    assert [level['folders'] for level in crawler.get_stats()['levels']] == [2, 1]
+
+
+def run_all_tests():
+    """运行所有测试"""
+    tests = [
+        test_crawl_levels_and_pagination,
+        test_crawl_respects_max_depth_and_concurrency,
+        test_crawl_folder_extra,
+        test_crawl_chunks_and_start_depth,
+    ]
+
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
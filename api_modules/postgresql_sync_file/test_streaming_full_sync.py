@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""
+測試流式全量同步流水線（模擬的爬取器、同步管理器和數據庫，不訪問ACC和數據庫）
+"""
+
+import sys
+import os
+import asyncio
+
+# 添加項目根目錄到路徑
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from api_modules.postgresql_sync_file.folder_crawler import ConcurrentFolderCrawler
+from api_modules.postgresql_sync_file.streaming_full_sync import StreamingFullSync
+
+
+def _folder(folder_id, name):
+    return {'id': folder_id, 'type': 'folders', 'attributes': {'name': name}}
+
+
+def _item(item_id, name):
+    return {'id': item_id, 'type': 'items', 'attributes': {'name': name}}
+
+
+# root -> (a, b, f0)，a -> (a1, f1)，b -> (f2, f3)，a1 -> (f4)
+FAKE_TREE = {
+    'root': [_folder('a', 'A'), _folder('b', 'B'), _item('f0', 'zero.pdf')],
+    'a': [_folder('a1', 'A1'), _item('f1', 'one.pdf')],
+    'b': [_item('f2', 'two.pdf'), _item('f3', 'three.pdf')],
+    'a1': [_item('f4', 'four.pdf')],
+}
+
+
+class FakeCrawler(ConcurrentFolderCrawler):
+    """用內存數據替代HTTP請求的爬取器"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.visited = []
+
+    async def open(self):
+        self.session = object()
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    async def close(self):
+        self.session = None
+
+    async def _get_json(self, url, headers):
+        self.stats['requests'] += 1
+        folder_id = url.split('/folders/')[1].split('/contents')[0]
+        self.visited.append(folder_id)
+        await asyncio.sleep(0.001)
+        return {'data': FAKE_TREE[folder_id], 'links': {}}
+
+
+class FakeManager:
+    """提供流水線所需的轉換/補充/寫入方法，記錄寫入順序"""
+
+    crawl_concurrency = 4
+
+    def __init__(self, fail_on_file=None):
+        self.fail_on_file = fail_on_file
+        self.writes = []
+        self.stats = {'api_calls': 0, 'concurrent_operations': 0}
+        self.last_crawl_stats = {}
+
+    async def _get_folder_custom_attr_definitions_v2(self, project_id, folder_id, headers, session):
+        return [{'attr_id': 1, 'project_id': project_id, 'scope_folder_id': folder_id}]
+
+    def _transform_folder_data_v2(self, folder, project_id, parent_path, depth):
+        return {'id': folder['id'], 'depth': depth,
+                'path': f"{parent_path}/{folder['attributes']['name']}".strip('/')}
+
+    def _transform_file_data_v2(self, item, project_id, folder_path, depth):
+        return {'id': item['id'], 'project_id': project_id, 'folder_path': folder_path, 'depth': depth}
+
+    async def _batch_get_file_versions_and_custom_attrs_v2(self, project_id, files, headers):
+        await asyncio.sleep(0.002)
+        return [dict(file_data, versions_info=[{'id': file_data['id'] + '_v1'}]) for file_data in files]
+
+    def _build_v2_file_record(self, file_data):
+        return {'id': file_data['id']}
+
+    def _deduplicate_definitions(self, definitions):
+        return definitions
+
+    async def _batch_insert_folders_v2(self, folders, dal):
+        self.writes.extend(('folder', folder['id']) for folder in folders)
+        return len(folders)
+
+    async def _batch_insert_files_v2(self, files, dal):
+        if self.fail_on_file in [file_data['id'] for file_data in files]:
+            raise RuntimeError('database unavailable')
+        self.writes.extend(('file', file_data['id']) for file_data in files)
+        return len(files)
+
+    async def _batch_insert_file_versions_v2(self, files, dal):
+        return sum(len(file_data['versions_info']) for file_data in files)
+
+    async def _batch_insert_custom_attributes_v2(self, files, dal):
+        return 0
+
+
+class FakeDal:
+    def __init__(self):
+        self.definitions = []
+
+    async def batch_upsert_custom_attribute_definitions(self, definitions):
+        self.definitions.extend(definitions)
+        return {'upserted': len(definitions)}
+
+
+class MemoryCheckpoints:
+    def __init__(self):
+        self.saved = []
+
+    async def save(self, project_id, task_uuid, depth, frontier, counters):
+        self.saved.append({'depth': depth, 'frontier': frontier, 'counters': counters})
+
+
+def _pipeline(manager, checkpoints, crawlers, batch_size=1):
+    def factory():
+        crawler = FakeCrawler(max_concurrency=4)
+        crawlers.append(crawler)
+        return crawler
+    return StreamingFullSync(manager, FakeDal(), checkpoints, batch_size=batch_size,
+                             queue_size=1, enrich_workers=2, crawler_factory=factory)
+
+
+def test_pipeline_writes_in_batches_and_checkpoints_per_level():
+    """測試按批寫入全部文件夾和文件、文件夾先於其文件寫入、每層提交後保存檢查點"""
+    manager = FakeManager()
+    checkpoints = MemoryCheckpoints()
+    crawlers = []
+    pipeline = _pipeline(manager, checkpoints, crawlers)
+
+    totals = asyncio.run(pipeline.run('b.p', [_folder('root', 'Root')], {}, task_uuid='t1'))
+
+    assert totals['folders_synced'] == 4 and totals['files_synced'] == 5
+    assert totals['versions_synced'] == 5 and totals['folder_attr_defs_synced'] == 4
+    assert {key for kind, key in manager.writes if kind == 'file'} == {'f0', 'f1', 'f2', 'f3', 'f4'}
+    position = {key: index for index, (kind, key) in enumerate(manager.writes)}
+    assert position['a1'] < position['f4'] and position['root'] < position['f0']
+
+    # 葉子層沒有下一層，不再保存檢查點
+    assert [saved['depth'] for saved in checkpoints.saved] == [1, 2]
+    assert [node['folder']['id'] for node in checkpoints.saved[1]['frontier']] == ['a1']
+    assert checkpoints.saved[1]['frontier'][0]['parent_path'] == 'Root/A'
+    assert checkpoints.saved[0]['counters']['files_synced'] == 1
+
+    stats = pipeline.get_stats()
+    assert stats['folder_batches'] == 4 and stats['file_batches'] == 5
+    assert stats['max_enrich_queue'] <= 1 and stats['max_write_queue'] <= 1
+    assert manager.last_crawl_stats['folders_visited'] == 4
+
+
+def test_interrupted_sync_resumes_from_last_committed_level():
+    """測試寫庫失敗時保留最後提交的檢查點，恢復後只爬取剩餘的層且計數累加"""
+    manager = FakeManager(fail_on_file='f4')
+    checkpoints = MemoryCheckpoints()
+    crawlers = []
+
+    try:
+        asyncio.run(_pipeline(manager, checkpoints, crawlers).run('b.p', [_folder('root', 'Root')], {}))
+        assert False, "寫庫失敗應中止流水線"
+    except RuntimeError as e:
+        assert 'database unavailable' in str(e)
+
+    checkpoint = checkpoints.saved[-1]
+    assert checkpoint['depth'] == 2 and checkpoint['counters']['files_synced'] == 4
+
+    manager = FakeManager()
+    crawlers = []
+    pipeline = _pipeline(manager, MemoryCheckpoints(), crawlers)
+    totals = asyncio.run(pipeline.run('b.p', [], {}, checkpoint=checkpoint))
+
+    assert crawlers[0].visited == ['a1']
+    assert manager.writes == [('folder', 'a1'), ('file', 'f4')]
+    assert totals['folders_synced'] == 4 and totals['files_synced'] == 5
+    assert pipeline.get_stats()['resumed_from_depth'] == 2
+
+
+def run_all_tests():
+    """運行所有測試"""
+    tests = [
+        test_pipeline_writes_in_batches_and_checkpoints_per_level,
+        test_interrupted_sync_resumes_from_last_committed_level,
+    ]
+
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""
+測試同步任務隊列與worker池（內存隊列 / 模擬連接，不訪問數據庫和ACC）
+"""
+
+import sys
+import os
+import asyncio
+import threading
+
+# 添加項目根目錄到路徑
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(os.path.dirname(current_dir))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+if current_dir not in sys.path:
+    sys.path.insert(0, current_dir)
+
+from sync_job_queue import SyncJobQueue, SyncWorkerPool, TASK_PRIORITIES
+
+
+class MemoryQueue:
+    """與 SyncJobQueue 接口一致的內存隊列：按優先級認領，同一項目同時只運行一個任務"""
+
+    stale_seconds = 60
+
+    def __init__(self, jobs, heartbeat_state='ok'):
+        self.pending = [dict(job, parameters={}, performance_mode='standard') for job in jobs]
+        self.running = {}
+        self.finished = {}
+        self.heartbeat_state = heartbeat_state
+        self.heartbeats = 0
+        self._lock = threading.Lock()
+
+    def claim(self, worker_id):
+        with self._lock:
+            busy = {job['project_id'] for job in self.running.values()}
+            candidates = [job for job in self.pending if job['project_id'] not in busy]
+            if not candidates:
+                return None
+            job = max(candidates, key=lambda j: TASK_PRIORITIES[j['task_type']])
+            self.pending.remove(job)
+            self.running[job['task_uuid']] = job
+            return job
+
+    def heartbeat(self, task_uuid, worker_id):
+        self.heartbeats += 1
+        return self.heartbeat_state
+
+    def finish(self, task_uuid, worker_id, status, results=None, error=None):
+        with self._lock:
+            self.running.pop(task_uuid, None)
+            self.finished[task_uuid] = (status, error)
+        return True
+
+    def recover_stuck(self):
+        return 0
+
+    def get_metrics(self):
+        return {}
+
+
+def _run_pool(pool, until, timeout=5):
+    """運行worker池直到 until() 為真"""
+    async def main():
+        pool_task = asyncio.create_task(pool.run())
+        for _ in range(int(timeout / 0.01)):
+            if until():
+                break
+            await asyncio.sleep(0.01)
+        pool.stop()
+        await asyncio.wait_for(pool_task, timeout)
+
+    asyncio.run(main())
+
+
+def test_pool_respects_concurrency_and_records_outcomes():
+    """測試並發上限、同項目串行、優先執行增量任務，並按結果記錄任務狀態"""
+    jobs = [
+        {'task_uuid': f't{i}', 'project_id': f'p{i % 3}',
+         'task_type': 'incremental_sync' if i % 2 else 'full_sync'}
+        for i in range(9)
+    ]
+    queue = MemoryQueue(jobs)
+    state = {'in_flight': 0, 'max_in_flight': 0, 'projects': set(), 'overlap': False, 'order': []}
+
+    async def runner(job):
+        if job['project_id'] in state['projects']:
+            state['overlap'] = True
+        state['projects'].add(job['project_id'])
+        state['order'].append(job['task_type'])
+        state['in_flight'] += 1
+        state['max_in_flight'] = max(state['max_in_flight'], state['in_flight'])
+        await asyncio.sleep(0.02)
+        state['in_flight'] -= 1
+        state['projects'].discard(job['project_id'])
+        if job['task_uuid'] == 't4':
+            return {'status': 'error', 'error': 'boom'}
+        if job['task_uuid'] == 't5':
+            raise RuntimeError('crashed')
+        return {'status': 'no_changes' if job['task_uuid'] == 't1' else 'success'}
+
+    pool = SyncWorkerPool(queue, runner=runner, concurrency=2, poll_interval=0.01, heartbeat_interval=1)
+    _run_pool(pool, lambda: len(queue.finished) == len(jobs))
+
+    assert len(queue.finished) == 9
+    assert state['max_in_flight'] == 2 and not state['overlap']
+    # 第一輪認領的都是增量任務
+    assert state['order'][:2] == ['incremental_sync', 'incremental_sync']
+    assert queue.finished['t1'] == ('completed', None)
+    assert queue.finished['t4'] == ('failed', 'boom')
+    assert queue.finished['t5'] == ('failed', 'crashed')
+    metrics = pool.get_metrics()
+    assert metrics['claimed'] == 9 and metrics['completed'] == 7 and metrics['failed'] == 2
+
+
+def test_cancel_requested_via_heartbeat():
+    """測試心跳返回取消請求時中止運行中的同步並記錄為 cancelled"""
+    queue = MemoryQueue([{'task_uuid': 'c1', 'project_id': 'p', 'task_type': 'full_sync'}],
+                        heartbeat_state='cancel')
+    cancelled = []
+
+    async def runner(job):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(job['task_uuid'])
+            raise
+        return {'status': 'success'}
+
+    pool = SyncWorkerPool(queue, runner=runner, concurrency=1, poll_interval=0.01, heartbeat_interval=0.02)
+    _run_pool(pool, lambda: 'c1' in queue.finished)
+
+    assert cancelled == ['c1']
+    assert queue.finished['c1'] == ('cancelled', 'cancelled by request')
+
+
+def test_lost_ownership_abandons_without_finishing():
+    """測試任務被恢復流程收回後，原worker中止執行且不再寫入結果"""
+    queue = MemoryQueue([{'task_uuid': 'l1', 'project_id': 'p', 'task_type': 'incremental_sync'}],
+                        heartbeat_state=None)
+
+    async def runner(job):
+        await asyncio.sleep(10)
+
+    pool = SyncWorkerPool(queue, runner=runner, concurrency=1, poll_interval=0.01, heartbeat_interval=0.02)
+    _run_pool(pool, lambda: pool.get_metrics()['lost'] == 1)
+
+    assert 'l1' not in queue.finished
+
+
+class FakeCursor:
+    def __init__(self, fetchone_results):
+        self.fetchone_results = list(fetchone_results)
+        self.statements = []
+        self.rowcount = 1
+
+    def execute(self, sql, params=None):
+        self.statements.append((' '.join(sql.split()), params))
+
+    def fetchone(self):
+        return self.fetchone_results.pop(0) if self.fetchone_results else None
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, cursor):
+        self.cursor_obj = cursor
+        self.committed = False
+        self.closed = False
+
+    def cursor(self):
+        return self.cursor_obj
+
+    def commit(self):
+        self.committed = True
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+def test_enqueue_coalesces_per_project():
+    """測試入隊：無排隊任務時插入；同類型合併；全量請求把排隊中的增量升級為全量"""
+    cursor = FakeCursor([None])
+    conn = FakeConnection(cursor)
+    job = SyncJobQueue(connection_factory=lambda: conn).enqueue('b.p', 'incremental_sync')
+    assert not job['coalesced'] and conn.committed and conn.closed
+    assert cursor.statements[-1][0].startswith('INSERT INTO sync_tasks')
+    assert cursor.statements[-1][1][-1] == TASK_PRIORITIES['incremental_sync']
+
+    cursor = FakeCursor([('existing', 'incremental_sync')])
+    queue = SyncJobQueue(connection_factory=lambda: FakeConnection(cursor))
+    job = queue.enqueue('b.p', 'incremental_sync')
+    assert job == {'task_uuid': 'existing', 'task_type': 'incremental_sync', 'status': 'pending', 'coalesced': True}
+    assert 'SET coalesced_requests' in cursor.statements[-1][0]
+
+    cursor = FakeCursor([('existing', 'incremental_sync')])
+    queue = SyncJobQueue(connection_factory=lambda: FakeConnection(cursor))
+    job = queue.enqueue('b.p', 'full_sync')
+    assert job['task_uuid'] == 'existing' and job['task_type'] == 'full_sync'
+    assert 'SET task_type' in cursor.statements[-1][0]
+    assert queue.get_metrics()['upgraded'] == 1
+
+
+def run_all_tests():
+    """運行所有測試"""
+    tests = [
+        test_pool_respects_concurrency_and_records_outcomes,
+        test_cancel_requested_via_heartbeat,
+        test_lost_ownership_abandons_without_finishing,
+        test_enqueue_coalesces_per_project,
+    ]
+
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
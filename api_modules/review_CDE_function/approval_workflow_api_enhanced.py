@@ -35,6 +35,16 @@ except ImportError:
     except ImportError:
         from database_access import DatabaseAccess as EnhancedReviewDataAccess
 
+try:
+    from database_sql.pg_pool import get_pooled_connection, REQUEST_STATEMENT_TIMEOUT_MS
+except ImportError:
+    from pg_pool import get_pooled_connection, REQUEST_STATEMENT_TIMEOUT_MS
+
+try:
+    from database_sql.membership_index import get_membership_index
+except ImportError:
+    from membership_index import get_membership_index
+
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -96,17 +106,17 @@ class EnhancedApprovalWorkflowManager:
             if hasattr(self, 'da'):
                 return self.da.get_connection()
             elif hasattr(self, 'neon_config') and self.neon_config:
-                return psycopg2.connect(**self.neon_config.get_db_params())
+                return get_pooled_connection(self.neon_config.get_db_params(), REQUEST_STATEMENT_TIMEOUT_MS)
             else:
                 # Environment variable fallback
-                return psycopg2.connect(
-                    host=os.getenv('DB_HOST', 'localhost'),
-                    port=os.getenv('DB_PORT', 5432),
-                    database=os.getenv('DB_NAME', 'neondb'),
-                    user=os.getenv('DB_USER', 'neondb_owner'),
-                    password=os.getenv('DB_PASSWORD', ''),
-                    sslmode=os.getenv('DB_SSL', 'require')
-                )
+                return get_pooled_connection({
+                    'host': os.getenv('DB_HOST', 'localhost'),
+                    'port': os.getenv('DB_PORT', 5432),
+                    'database': os.getenv('DB_NAME', 'neondb'),
+                    'user': os.getenv('DB_USER', 'neondb_owner'),
+                    'password': os.getenv('DB_PASSWORD', ''),
+                    'sslmode': os.getenv('DB_SSL', 'require')
+                }, REQUEST_STATEMENT_TIMEOUT_MS)
         except Exception as e:
             logger.error(f"Failed to get database connection: {str(e)}")
             raise
@@ -137,68 +147,47 @@ class EnhancedApprovalWorkflowManager:
             if isinstance(user, dict) and user.get('autodeskId') == user_id:
                 return True, "Direct user assignment"
         
-        # Check role-based permissions
+        # Role / company checks are in-memory lookups on the cached project membership index
         roles = candidates.get('roles', [])
-        if roles and project_id:
-            user_roles = self._get_user_roles(user_id, project_id)
-            for role in roles:
-                role_id = role.get('id') if isinstance(role, dict) else role
-                if role_id in user_roles:
-                    return True, f"Role-based permission: {role_id}"
+        companies = candidates.get('companies', [])
+        if not project_id or not (roles or companies):
+            return False, "User not found in any candidate list (users, roles, or companies)"
+        
+        membership = get_membership_index().get(project_id)
+        
+        # Check role-based permissions
+        user_roles = membership.roles_of(user_id)
+        for role in roles:
+            role_id = role.get('id') if isinstance(role, dict) else role
+            if role_id in user_roles:
+                return True, f"Role-based permission: {role_id}"
         
         # Check company-based permissions
-        companies = candidates.get('companies', [])
-        if companies and project_id:
-            user_company = self._get_user_company(user_id, project_id)
+        user_company = membership.company_of(user_id)
+        if user_company:
             for company in companies:
-                company_id = company.get('autodeskId') if isinstance(company, dict) else company
+                company_id = (company.get('autodeskId') or company.get('id')) if isinstance(company, dict) else company
                 if company_id == user_company:
                     return True, f"Company-based permission: {company_id}"
         
         return False, "User not found in any candidate list (users, roles, or companies)"
     
     def _get_user_roles(self, user_id: str, project_id: str) -> List[str]:
-        """Get user roles in project"""
-        try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT DISTINCT role_id 
-                FROM project_user_roles 
-                WHERE user_id = %s AND project_id = %s
-            """, [user_id, project_id])
-            
-            roles = [row[0] for row in cursor.fetchall()]
-            cursor.close()
-            conn.close()
-            return roles
-            
-        except Exception as e:
-            logger.warning(f"Could not fetch user roles: {str(e)}")
-            return []
+        """Get user roles in project (from the membership index)"""
+        return sorted(get_membership_index().get(project_id).roles_of(user_id))
     
     def _get_user_company(self, user_id: str, project_id: str) -> Optional[str]:
-        """Get user company in project"""
-        try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT company_id 
-                FROM project_users 
-                WHERE user_id = %s AND project_id = %s
-                LIMIT 1
-            """, [user_id, project_id])
-            
-            result = cursor.fetchone()
-            cursor.close()
-            conn.close()
-            return result[0] if result else None
-            
-        except Exception as e:
-            logger.warning(f"Could not fetch user company: {str(e)}")
-            return None
+        """Get user company in project (from the membership index)"""
+        return get_membership_index().get(project_id).company_of(user_id)
+    
+    @staticmethod
+    def _inbox_permission_reason(match_type: str, match_ref: Optional[str]) -> str:
+        """Describe how a user_inbox row matched (same wording as _check_comprehensive_permissions)"""
+        if match_type == 'role':
+            return f"Role-based permission: {match_ref}"
+        if match_type == 'company':
+            return f"Company-based permission: {match_ref}"
+        return "Direct user assignment"
     
     # ========================================================================
     # Enhanced Core Approval Functions
@@ -223,106 +212,86 @@ class EnhancedApprovalWorkflowManager:
             conn = self.get_connection()
             cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
             
-            # Build dynamic query with filters
+            # Read the user_inbox projection (maintained by triggers, see create_user_inbox.sql):
+            # role/company candidates are already expanded to users and file counters precomputed,
+            # so this is a primary-key range scan on (user_id, project_id) without joins or grouping
             base_query = """
                 SELECT 
-                    r.id as review_id,
-                    r.name as review_name,
-                    r.status as review_status,
-                    r.current_step_id,
-                    r.current_step_name,
-                    r.current_step_due_date,
-                    r.created_at as review_created_at,
-                    r.project_id,
-                    r.priority,
-                    r.department,
-                    r.category,
+                    review_id,
+                    review_name,
+                    review_status,
+                    step_id as current_step_id,
+                    due_at as current_step_due_date,
+                    review_created_at,
+                    project_id,
+                    priority,
+                    department,
+                    category,
                     
                     -- Current step information
-                    rp.step_name,
-                    rp.step_type,
-                    rp.step_order,
-                    rp.status as step_status,
-                    rp.due_date as step_due_date,
+                    step_name,
+                    step_type,
+                    step_order,
+                    step_status,
+                    step_due_date,
                     
-                    -- Candidates configuration
-                    rsc.candidates,
-                    rsc.source as candidates_source,
+                    -- How the user became a candidate
+                    match_type,
+                    match_ref,
+                    candidates_source,
                     
                     -- File statistics
-                    COUNT(rfv.id) as total_files,
-                    COUNT(CASE WHEN rfv.approval_status = 'PENDING' THEN 1 END) as pending_files,
-                    COUNT(CASE WHEN rfv.approval_status = 'APPROVED' THEN 1 END) as approved_files,
-                    COUNT(CASE WHEN rfv.approval_status = 'REJECTED' THEN 1 END) as rejected_files,
+                    total_files,
+                    pending_files,
+                    approved_files,
+                    rejected_files,
                     
                     -- Urgency calculation
                     CASE 
-                        WHEN r.current_step_due_date < CURRENT_TIMESTAMP THEN 'overdue'
-                        WHEN r.current_step_due_date < CURRENT_TIMESTAMP + INTERVAL '1 day' THEN 'urgent'
-                        WHEN r.current_step_due_date < CURRENT_TIMESTAMP + INTERVAL '3 days' THEN 'soon'
+                        WHEN due_at < CURRENT_TIMESTAMP THEN 'overdue'
+                        WHEN due_at < CURRENT_TIMESTAMP + INTERVAL '1 day' THEN 'urgent'
+                        WHEN due_at < CURRENT_TIMESTAMP + INTERVAL '3 days' THEN 'soon'
                         ELSE 'normal'
                     END as urgency_level
                     
-                FROM reviews r
-                JOIN review_progress rp ON r.id = rp.review_id AND r.current_step_id = rp.step_id
-                JOIN review_step_candidates rsc ON r.id = rsc.review_id AND r.current_step_id = rsc.step_id
-                LEFT JOIN review_file_versions rfv ON r.id = rfv.review_id
-                
-                WHERE r.status IN ('OPEN')
-                AND rp.status IN ('PENDING', 'CLAIMED')
-                AND rsc.is_active = true
+                FROM user_inbox
+                WHERE user_id = %s
             """
             
-            params = []
-            
-            # Add user permission check
-            base_query += """
-                AND (
-                    rsc.candidates::jsonb -> 'users' @> %s::jsonb
-                    OR EXISTS (
-                        SELECT 1 FROM jsonb_array_elements(rsc.candidates::jsonb -> 'users') as user_obj
-                        WHERE user_obj ->> 'autodeskId' = %s
-                    )
-                )
-            """
-            params.extend([json.dumps([{"autodeskId": user_id}]), user_id])
+            params = [user_id]
             
             # Add project filter
             if project_id:
-                base_query += " AND r.project_id = %s"
+                base_query += " AND project_id = %s"
                 params.append(project_id)
             
             # Add additional filters
             if filters:
                 if filters.get('priority'):
-                    base_query += " AND r.priority = %s"
+                    base_query += " AND priority = %s"
                     params.append(filters['priority'])
                 
                 if filters.get('department'):
-                    base_query += " AND r.department = %s"
+                    base_query += " AND department = %s"
                     params.append(filters['department'])
                 
                 if filters.get('urgency_level'):
                     urgency_filter = filters['urgency_level']
                     if urgency_filter == 'overdue':
-                        base_query += " AND r.current_step_due_date < CURRENT_TIMESTAMP"
+                        base_query += " AND due_at < CURRENT_TIMESTAMP"
                     elif urgency_filter == 'urgent':
-                        base_query += " AND r.current_step_due_date < CURRENT_TIMESTAMP + INTERVAL '1 day'"
+                        base_query += " AND due_at < CURRENT_TIMESTAMP + INTERVAL '1 day'"
             
-            # Add grouping and ordering
+            # Add ordering
             base_query += """
-                GROUP BY r.id, r.name, r.status, r.current_step_id, r.current_step_name, 
-                         r.current_step_due_date, r.created_at, r.project_id, r.priority,
-                         r.department, r.category, rp.step_name, rp.step_type, rp.step_order, 
-                         rp.status, rp.due_date, rsc.candidates, rsc.source
                 ORDER BY 
                     CASE 
-                        WHEN r.current_step_due_date < CURRENT_TIMESTAMP THEN 0
+                        WHEN due_at < CURRENT_TIMESTAMP THEN 0
                         ELSE 1 
                     END,
-                    r.priority ASC,
-                    r.current_step_due_date ASC NULLS LAST,
-                    r.created_at DESC
+                    priority ASC,
+                    due_at ASC NULLS LAST,
+                    review_created_at DESC
             """
             
             cursor.execute(base_query, params)
@@ -330,42 +299,36 @@ class EnhancedApprovalWorkflowManager:
             
             pending_reviews = []
             for result in results:
-                # Verify permissions for each review
-                has_permission, permission_reason = self._check_comprehensive_permissions(
-                    user_id, result['candidates'], result['project_id']
-                )
-                
-                if has_permission:
-                    pending_reviews.append({
-                        'review_id': result['review_id'],
-                        'review_name': result['review_name'],
-                        'review_status': result['review_status'],
-                        'project_id': result['project_id'],
-                        'priority': result['priority'],
-                        'department': result['department'],
-                        'category': result['category'],
-                        'urgency_level': result['urgency_level'],
-                        'permission_reason': permission_reason,
-                        'current_step': {
-                            'step_id': result['current_step_id'],
-                            'step_name': result['step_name'],
-                            'step_type': result['step_type'],
-                            'step_order': result['step_order'],
-                            'status': result['step_status'],
-                            'due_date': result['step_due_date'].isoformat() if result['step_due_date'] else None
-                        },
-                        'files_summary': {
-                            'total': result['total_files'],
-                            'pending': result['pending_files'],
-                            'approved': result['approved_files'],
-                            'rejected': result['rejected_files'],
-                            'completion_rate': round(
-                                (result['approved_files'] + result['rejected_files']) / max(result['total_files'], 1) * 100, 1
-                            )
-                        },
-                        'candidates_source': result['candidates_source'],
-                        'created_at': result['review_created_at'].isoformat() if result['review_created_at'] else None
-                    })
+                pending_reviews.append({
+                    'review_id': result['review_id'],
+                    'review_name': result['review_name'],
+                    'review_status': result['review_status'],
+                    'project_id': result['project_id'],
+                    'priority': result['priority'],
+                    'department': result['department'],
+                    'category': result['category'],
+                    'urgency_level': result['urgency_level'],
+                    'permission_reason': self._inbox_permission_reason(result['match_type'], result['match_ref']),
+                    'current_step': {
+                        'step_id': result['current_step_id'],
+                        'step_name': result['step_name'],
+                        'step_type': result['step_type'],
+                        'step_order': result['step_order'],
+                        'status': result['step_status'],
+                        'due_date': result['step_due_date'].isoformat() if result['step_due_date'] else None
+                    },
+                    'files_summary': {
+                        'total': result['total_files'],
+                        'pending': result['pending_files'],
+                        'approved': result['approved_files'],
+                        'rejected': result['rejected_files'],
+                        'completion_rate': round(
+                            (result['approved_files'] + result['rejected_files']) / max(result['total_files'], 1) * 100, 1
+                        )
+                    },
+                    'candidates_source': result['candidates_source'],
+                    'created_at': result['review_created_at'].isoformat() if result['review_created_at'] else None
+                })
             
             # Calculate summary statistics
             total_pending = len(pending_reviews)
@@ -16,6 +16,10 @@ import sys
 import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../database_sql'))
 from neon_config import NeonConfig
+try:
+    from database_sql.pg_pool import get_pooled_connection, REQUEST_STATEMENT_TIMEOUT_MS
+except ImportError:
+    from pg_pool import get_pooled_connection, REQUEST_STATEMENT_TIMEOUT_MS
 import psycopg2
 import psycopg2.extras
 
@@ -30,8 +34,8 @@ class ReviewCRUDManager:
         self.db_params = self.neon_config.get_db_params()
     
     def get_connection(self):
-        """获取数据库连接"""
-        return psycopg2.connect(**self.db_params)
+        """获取数据库连接（共享连接池，close() 归还）"""
+        return get_pooled_connection(self.db_params, REQUEST_STATEMENT_TIMEOUT_MS)
     
     def create_review(self, review_data: Dict[str, Any]) -> Dict[str, Any]:
         """
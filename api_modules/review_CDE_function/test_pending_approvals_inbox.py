@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+测试待审批列表读取 user_inbox（使用模拟连接，不访问数据库）
+"""
+
+import sys
+import os
+from datetime import datetime, timezone
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from api_modules.review_CDE_function.approval_workflow_api_enhanced import EnhancedApprovalWorkflowManager
+
+
+DUE = datetime(2026, 1, 2, tzinfo=timezone.utc)
+CREATED = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def _row(review_id, match_type='user', match_ref=None, urgency='normal'):
+    return {
+        'review_id': review_id, 'review_name': f'Review {review_id}', 'review_status': 'OPEN',
+        'current_step_id': 's1', 'current_step_due_date': DUE, 'review_created_at': CREATED,
+        'project_id': 'p1', 'priority': 1, 'department': 'ARCH', 'category': None,
+        'step_name': 'Check', 'step_type': 'REVIEWER', 'step_order': 1, 'step_status': 'PENDING',
+        'step_due_date': DUE, 'match_type': match_type, 'match_ref': match_ref,
+        'candidates_source': 'workflow', 'total_files': 4, 'pending_files': 2,
+        'approved_files': 1, 'rejected_files': 1, 'urgency_level': urgency,
+    }
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.executed = []
+
+    def execute(self, sql, params=None):
+        self.executed.append((sql, params))
+
+    def fetchall(self):
+        return self.rows
+
+
+class FakeConnection:
+    def __init__(self, rows):
+        self.cursor_obj = FakeCursor(rows)
+        self.closed = False
+
+    def cursor(self, cursor_factory=None):
+        return self.cursor_obj
+
+    def close(self):
+        self.closed = True
+
+
+def _manager(rows):
+    manager = EnhancedApprovalWorkflowManager.__new__(EnhancedApprovalWorkflowManager)
+    manager.conn = FakeConnection(rows)
+    manager.get_connection = lambda: manager.conn
+    return manager
+
+
+def _normalize(sql):
+    return ' '.join(sql.split())
+
+
+def test_inbox_permission_reason():
+    """测试收件箱命中来源的说明与实时权限检查的措辞一致"""
+    reason = EnhancedApprovalWorkflowManager._inbox_permission_reason
+    assert reason('user', None) == "Direct user assignment"
+    assert reason('role', 'r-arch') == "Role-based permission: r-arch"
+    assert reason('company', 'c-a') == "Company-based permission: c-a"
+
+
+def test_pending_approvals_reads_inbox_by_key():
+    """测试只按 (user_id, project_id) 读取 user_inbox，不做 JOIN 和分组"""
+    manager = _manager([_row(1), _row(2, 'role', 'r-arch', 'overdue')])
+
+    result = manager.get_pending_approvals('u1', 'p1', {'priority': 1, 'urgency_level': 'overdue'})
+
+    assert result['success'], result
+    [(sql, params)] = manager.conn.cursor_obj.executed
+    sql = _normalize(sql)
+    assert 'FROM user_inbox WHERE user_id = %s AND project_id = %s AND priority = %s' in sql
+    assert 'AND due_at < CURRENT_TIMESTAMP ORDER BY' in sql
+    assert ' JOIN ' not in sql and 'GROUP BY' not in sql
+    assert params == ['u1', 'p1', 1]
+    assert manager.conn.closed
+
+
+def test_pending_approvals_response_shape():
+    """测试收件箱行转换为原有的响应结构"""
+    manager = _manager([_row(1), _row(2, 'role', 'r-arch', 'overdue')])
+
+    data = manager.get_pending_approvals('u1')['data']
+
+    assert manager.conn.cursor_obj.executed[0][1] == ['u1']
+    assert data['summary'] == {'total_pending': 2, 'overdue': 1, 'urgent': 0, 'normal': 1}
+    first, second = data['reviews']
+    assert first['permission_reason'] == "Direct user assignment"
+    assert second['permission_reason'] == "Role-based permission: r-arch"
+    assert first['current_step'] == {'step_id': 's1', 'step_name': 'Check', 'step_type': 'REVIEWER',
+                                     'step_order': 1, 'status': 'PENDING', 'due_date': DUE.isoformat()}
+    assert first['files_summary'] == {'total': 4, 'pending': 2, 'approved': 1, 'rejected': 1,
+                                      'completion_rate': 50.0}
+    assert first['created_at'] == CREATED.isoformat()
+
+
+def run_all_tests():
+    """运行所有测试"""
+    tests = [
+        test_inbox_permission_reason,
+        test_pending_approvals_reads_inbox_by_key,
+        test_pending_approvals_response_shape,
+    ]
+
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
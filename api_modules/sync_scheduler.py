@@ -0,0 +1,495 @@
+# -*- coding: utf-8 -*-
+"""
+多项目同步调度器
+
+读取 projects_config.yaml，对所有 status 为 active 的项目周期性执行增量同步：
+文件（经 SyncJobQueue 排队执行）、评审、项目用户、权限。
+
+- 同时执行同步的项目数不超过 global.max_concurrent_syncs
+- 共享 API 预算：按共享 ACC 客户端的调用计数统计最近一小时的调用量，
+  预算不足以覆盖某项目上次周期的调用量时推迟该项目
+- 自适应轮询：项目有变化（顶层 rollup 时间前移、评审有更新）时间隔回到 min_interval，
+  没有变化时间隔按 backoff 倍数增长，直到 max_interval
+- 每个项目记录数据新鲜度（距最近一次成功周期开始的秒数），供指标接口查看
+
+配置（projects_config.yaml 的 global.scheduler，均可省略）:
+    min_interval / max_interval / backoff / api_budget_per_hour / sync_types
+单个项目可以用 sync_types 覆盖要执行的同步类型。
+
+项目配置中的 database / host / port 由多数据库部署使用；各同步管理器写入的是共享的 Neon 数据库，
+调度器只使用项目 ID 和状态。
+
+用法:
+    python -m api_modules.sync_scheduler                 # 持续调度
+    python -m api_modules.sync_scheduler --once          # 每个项目执行一轮后退出
+"""
+
+import os
+import sys
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'projects_config.yaml')
+
+SYNC_TYPES = ('files', 'reviews', 'accounts', 'permissions')
+
+DEFAULT_MAX_CONCURRENT_SYNCS = 3
+DEFAULT_MIN_INTERVAL = 300
+DEFAULT_MAX_INTERVAL = 3600
+DEFAULT_BACKOFF = 2.0
+DEFAULT_API_BUDGET_PER_HOUR = 20000
+
+# 预算不足时多久后重新检查
+BUDGET_RETRY_SECONDS = 60
+# 等待文件同步任务完成
+FILE_JOB_POLL_SECONDS = 5
+FILE_JOB_TIMEOUT_SECONDS = 3 * 3600
+
+
+# ============================================================================
+# 配置
+# ============================================================================
+
+def load_projects_config(path: str = DEFAULT_CONFIG_PATH) -> Dict[str, Any]:
+    """读取 projects_config.yaml"""
+    import yaml
+
+    with open(path, 'r', encoding='utf-8') as f:
+        return yaml.safe_load(f) or {}
+
+
+def _parse_time(value) -> Optional[datetime]:
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        return None
+
+
+# ============================================================================
+# 各类型的增量同步
+# ============================================================================
+
+def _auth_headers() -> Dict[str, str]:
+    import utils
+
+    access_token = utils.get_access_token()
+    if not access_token:
+        raise RuntimeError('No access token available')
+    return {"Authorization": f"Bearer {access_token}", "Content-Type": "application/json"}
+
+
+def _project_rollup_time(project_id: str) -> Optional[datetime]:
+    """项目文件夹的最大 last_modified_time_rollup（增量文件同步后读取）"""
+    from database_sql.pg_pool import get_pooled_connection
+
+    conn = get_pooled_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT MAX(last_modified_time_rollup) FROM folders WHERE project_id = %s", [project_id])
+        row = cursor.fetchone()
+        cursor.close()
+        return row[0] if row else None
+    finally:
+        conn.close()
+
+
+async def sync_project_files(project_id: str) -> Dict[str, Any]:
+    """增量文件同步：放入同步任务队列并等待完成（与手动触发的同步合并、同项目串行）"""
+    from api_modules.postgresql_sync_file.sync_job_queue import get_sync_job_queue, get_sync_worker_pool
+
+    queue = get_sync_job_queue()
+    job = await asyncio.to_thread(queue.enqueue, project_id, 'incremental_sync')
+    get_sync_worker_pool().notify()
+
+    deadline = time.monotonic() + FILE_JOB_TIMEOUT_SECONDS
+    task_status = 'pending'
+    while task_status in ('pending', 'running'):
+        if time.monotonic() > deadline:
+            return {'status': 'error', 'error': f"file sync {job['task_uuid']} timed out"}
+        await asyncio.sleep(FILE_JOB_POLL_SECONDS)
+        task_status = await asyncio.to_thread(queue.get_task_status, job['task_uuid'])
+
+    if task_status != 'completed':
+        return {'status': 'error', 'error': f"file sync {job['task_uuid']} {task_status}"}
+    return {'status': 'success', 'rollup': await asyncio.to_thread(_project_rollup_time, project_id)}
+
+
+async def sync_project_reviews(project_id: str) -> Dict[str, Any]:
+    """按水位线增量同步评审"""
+    from api_modules.postgresql_review_sync.review_sync_manager_enhanced import EnhancedReviewSyncManager
+    import utils
+
+    access_token = await asyncio.to_thread(utils.get_access_token)
+    manager = EnhancedReviewSyncManager()
+    result = await manager.full_project_sync_with_templates(
+        project_id, access_token, sync_templates=False, show_progress=False, incremental=True
+    )
+    if result.get('error'):
+        return {'status': 'error', 'error': result['error']}
+    review_sync = result.get('results', {}).get('review_sync', {})
+    return {'status': 'success', 'changed': review_sync.get('reviews_changed', 0) > 0}
+
+
+async def sync_project_accounts(project_id: str) -> Dict[str, Any]:
+    """同步项目用户（角色、公司归属）"""
+    from api_modules.acc_http_client import get_acc_client
+    from database_sql.account_sync import AccountDataSyncManager
+
+    headers = await asyncio.to_thread(_auth_headers)
+    manager = AccountDataSyncManager()
+    async with get_acc_client().limited_session() as session:
+        await manager.sync_project_users(session, project_id, headers, show_progress=False)
+    if manager.stats.errors:
+        return {'status': 'error', 'error': manager.stats.errors[-1]}
+    return {'status': 'success'}
+
+
+async def sync_project_permissions(project_id: str) -> Dict[str, Any]:
+    """只为 rollup 晚于上次权限同步的文件夹同步权限"""
+    from api_modules.permissions_db_sync import run_permissions_sync
+
+    await run_permissions_sync(project_id, incremental=True)
+    return {'status': 'success'}
+
+
+DEFAULT_RUNNERS: Dict[str, Callable[[str], Awaitable[Dict[str, Any]]]] = {
+    'files': sync_project_files,
+    'reviews': sync_project_reviews,
+    'accounts': sync_project_accounts,
+    'permissions': sync_project_permissions,
+}
+
+
+def acc_api_calls() -> int:
+    """共享 ACC 客户端累计的调用次数"""
+    from api_modules.acc_http_client import get_acc_client
+
+    return sum(endpoint['calls'] for endpoint in get_acc_client().get_metrics()['endpoints'].values())
+
+
+# ============================================================================
+# 调度状态
+# ============================================================================
+
+@dataclass
+class ProjectSchedule:
+    """单个项目的调度状态"""
+    project_id: str
+    sync_types: List[str]
+    interval: float
+    next_run: float = 0.0
+    running: bool = False
+    last_started_at: Optional[datetime] = None
+    last_success_at: Optional[datetime] = None
+    last_change_at: Optional[datetime] = None
+    last_rollup: Optional[datetime] = None
+    last_api_calls: int = 0
+    cycles: int = 0
+    failures: int = 0
+    last_results: Dict[str, str] = field(default_factory=dict)
+
+
+class ApiBudget:
+    """最近一小时的 ACC 调用预算（按调用计数的采样差值计算）"""
+
+    WINDOW_SECONDS = 3600
+
+    def __init__(self, per_hour: int, usage: Callable[[], int], clock: Callable[[], float] = time.monotonic):
+        self.per_hour = per_hour
+        self._usage = usage
+        self._clock = clock
+        self._samples: deque = deque()
+
+    def used(self) -> int:
+        now = self._clock()
+        try:
+            total = self._usage()
+        except Exception as e:
+            logger.warning(f"Could not read ACC API usage: {e}")
+            return 0
+        # 指标被重置时计数会变小，重新开始采样
+        if self._samples and total < self._samples[-1][1]:
+            self._samples.clear()
+        self._samples.append((now, total))
+        while len(self._samples) > 1 and self._samples[1][0] <= now - self.WINDOW_SECONDS:
+            self._samples.popleft()
+        return total - self._samples[0][1]
+
+    def remaining(self) -> int:
+        return self.per_hour - self.used()
+
+    def allows(self, estimated_calls: int) -> bool:
+        return self.remaining() >= max(estimated_calls, 1)
+
+
+class SyncScheduler:
+    """按项目自适应间隔调度增量同步"""
+
+    def __init__(self, config: Dict[str, Any],
+                 runners: Dict[str, Callable[[str], Awaitable[Dict[str, Any]]]] = None,
+                 api_usage: Callable[[], int] = None,
+                 clock: Callable[[], float] = time.monotonic,
+                 tick_seconds: float = 5.0):
+        global_config = config.get('global') or {}
+        scheduler_config = global_config.get('scheduler') or {}
+
+        self.max_concurrent = int(global_config.get('max_concurrent_syncs', DEFAULT_MAX_CONCURRENT_SYNCS))
+        self.min_interval = float(scheduler_config.get('min_interval', DEFAULT_MIN_INTERVAL))
+        self.max_interval = float(scheduler_config.get('max_interval', DEFAULT_MAX_INTERVAL))
+        self.backoff = float(scheduler_config.get('backoff', DEFAULT_BACKOFF))
+        default_types = [t for t in scheduler_config.get('sync_types', SYNC_TYPES) if t in SYNC_TYPES]
+
+        self.runners = runners or DEFAULT_RUNNERS
+        self.tick_seconds = tick_seconds
+        self._clock = clock
+        self.budget = ApiBudget(int(scheduler_config.get('api_budget_per_hour', DEFAULT_API_BUDGET_PER_HOUR)),
+                                api_usage or acc_api_calls, clock)
+
+        self.projects: Dict[str, ProjectSchedule] = {}
+        for project_id, project_config in (config.get('projects') or {}).items():
+            project_config = project_config or {}
+            if project_config.get('status', 'active') != 'active':
+                continue
+            sync_types = [t for t in project_config.get('sync_types', default_types) if t in SYNC_TYPES]
+            self.projects[project_id] = ProjectSchedule(
+                project_id=project_id,
+                sync_types=sync_types,
+                interval=self.min_interval,
+                last_success_at=_parse_time(project_config.get('last_sync'))
+            )
+
+        self._active = 0
+        self._tasks: set = set()
+        self._stopping = False
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._thread: Optional[threading.Thread] = None
+        self._metrics = {'cycles': 0, 'failed_cycles': 0, 'budget_deferrals': 0}
+
+    @classmethod
+    def from_config_file(cls, path: str = DEFAULT_CONFIG_PATH, **kwargs) -> 'SyncScheduler':
+        return cls(load_projects_config(path), **kwargs)
+
+    # ------------------------------------------------------------------
+    # 调度
+    # ------------------------------------------------------------------
+
+    def _due_projects(self, now: float) -> List[ProjectSchedule]:
+        due = [s for s in self.projects.values() if not s.running and s.next_run <= now]
+        return sorted(due, key=lambda s: s.next_run)
+
+    def _dispatch(self) -> int:
+        """启动到期项目的同步周期（不超过并发上限和 API 预算），返回启动数"""
+        now = self._clock()
+        started = 0
+        for schedule in self._due_projects(now):
+            if self._active >= self.max_concurrent:
+                break
+            if not self.budget.allows(schedule.last_api_calls):
+                self._metrics['budget_deferrals'] += 1
+                schedule.next_run = now + BUDGET_RETRY_SECONDS
+                continue
+            schedule.running = True
+            self._active += 1
+            task = asyncio.create_task(self._run_cycle(schedule))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            started += 1
+        return started
+
+    async def _run_cycle(self, schedule: ProjectSchedule):
+        calls_before = self.budget.used()
+        started_at = datetime.now(timezone.utc)
+        schedule.last_started_at = started_at
+        changed = False
+        ok = True
+
+        try:
+            for sync_type in schedule.sync_types:
+                try:
+                    result = await self.runners[sync_type](schedule.project_id) or {}
+                except Exception as e:
+                    logger.error(f"[Scheduler] {sync_type} sync failed for {schedule.project_id}: {e}")
+                    result = {'status': 'error', 'error': str(e)}
+
+                schedule.last_results[sync_type] = result.get('status', 'success')
+                if result.get('status') == 'error':
+                    ok = False
+                if result.get('changed'):
+                    changed = True
+                if result.get('rollup') is not None:
+                    rollup = result['rollup']
+                    if schedule.last_rollup is not None and rollup > schedule.last_rollup:
+                        changed = True
+                    schedule.last_rollup = rollup
+        finally:
+            # 并发周期的调用会互相计入，这里只作为下一次预算检查的估计值
+            schedule.last_api_calls = max(0, self.budget.used() - calls_before)
+            self._reschedule(schedule, changed, ok, started_at)
+            schedule.running = False
+            self._active -= 1
+            if self._wakeup is not None:
+                self._wakeup.set()
+
+    def _reschedule(self, schedule: ProjectSchedule, changed: bool, ok: bool, started_at: datetime):
+        schedule.cycles += 1
+        self._metrics['cycles'] += 1
+        if changed:
+            schedule.last_change_at = started_at
+            schedule.interval = self.min_interval
+        elif ok:
+            schedule.interval = min(self.max_interval, schedule.interval * self.backoff)
+
+        if ok:
+            schedule.last_success_at = started_at
+            delay = schedule.interval
+        else:
+            schedule.failures += 1
+            self._metrics['failed_cycles'] += 1
+            delay = min(schedule.interval, self.min_interval)
+        schedule.next_run = self._clock() + delay
+
+    async def run(self):
+        """持续调度直到 stop()"""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        logger.info(f"[Scheduler] {len(self.projects)} active projects, max_concurrent_syncs={self.max_concurrent}")
+        try:
+            while not self._stopping:
+                self._dispatch()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.tick_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+            if self._tasks:
+                await asyncio.gather(*self._tasks, return_exceptions=True)
+        finally:
+            self._loop = None
+
+    async def run_once(self):
+        """每个项目执行一轮同步（仍受并发上限和预算限制），完成后返回"""
+        self._wakeup = asyncio.Event()
+        pending = set(self.projects)
+        while pending:
+            for schedule in self._due_projects(float('inf')):
+                if schedule.project_id not in pending:
+                    continue
+                if self._active >= self.max_concurrent:
+                    break
+                if not self.budget.allows(schedule.last_api_calls):
+                    self._metrics['budget_deferrals'] += 1
+                    await asyncio.sleep(BUDGET_RETRY_SECONDS)
+                    break
+                pending.discard(schedule.project_id)
+                schedule.running = True
+                self._active += 1
+                task = asyncio.create_task(self._run_cycle(schedule))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+            if pending and self._active:
+                await self._wakeup.wait()
+                self._wakeup.clear()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def start(self):
+        """在后台 daemon 线程中启动调度"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=lambda: asyncio.run(self.run()), name='sync-scheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopping = True
+        if self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    # ------------------------------------------------------------------
+    # 指标
+    # ------------------------------------------------------------------
+
+    def get_metrics(self) -> Dict[str, Any]:
+        now = self._clock()
+        wall_now = datetime.now(timezone.utc)
+        projects = {}
+        for project_id, schedule in self.projects.items():
+            projects[project_id] = {
+                'sync_types': schedule.sync_types,
+                'running': schedule.running,
+                'interval_seconds': round(schedule.interval, 1),
+                'next_run_in_seconds': round(max(0.0, schedule.next_run - now), 1),
+                'last_started_at': schedule.last_started_at.isoformat() if schedule.last_started_at else None,
+                'last_success_at': schedule.last_success_at.isoformat() if schedule.last_success_at else None,
+                'last_change_at': schedule.last_change_at.isoformat() if schedule.last_change_at else None,
+                # 数据新鲜度：数据库中的数据最多落后 ACC 这么多秒
+                'freshness_lag_seconds': round((wall_now - schedule.last_success_at).total_seconds(), 1)
+                if schedule.last_success_at else None,
+                'last_api_calls': schedule.last_api_calls,
+                'cycles': schedule.cycles,
+                'failures': schedule.failures,
+                'last_results': dict(schedule.last_results)
+            }
+        metrics = dict(self._metrics)
+        metrics.update({
+            'max_concurrent_syncs': self.max_concurrent,
+            'active_syncs': self._active,
+            'api_budget': {'per_hour': self.budget.per_hour, 'remaining': self.budget.remaining()},
+            'projects': projects
+        })
+        return metrics
+
+
+# ============================================================================
+# 进程级共享实例
+# ============================================================================
+
+_scheduler: Optional[SyncScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_sync_scheduler(config_path: str = DEFAULT_CONFIG_PATH) -> SyncScheduler:
+    """进程内共享的调度器（首次调用时读取配置，不自动启动）"""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = SyncScheduler.from_config_file(config_path)
+    return _scheduler
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    parser = argparse.ArgumentParser(description='多项目增量同步调度器')
+    parser.add_argument('--config', default=DEFAULT_CONFIG_PATH, help='projects_config.yaml 路径')
+    parser.add_argument('--once', action='store_true', help='每个项目执行一轮后退出')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    scheduler = SyncScheduler.from_config_file(args.config)
+
+    if args.once:
+        asyncio.run(scheduler.run_once())
+        print(json.dumps(scheduler.get_metrics(), indent=2, ensure_ascii=False, default=str))
+    else:
+        try:
+            asyncio.run(scheduler.run())
+        except KeyboardInterrupt:
+            print("\n[Scheduler] 已停止")
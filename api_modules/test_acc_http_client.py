@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+测试共享 ACC HTTP 客户端（不访问网络，使用模拟的会话）
+"""
+
+import sys
+import os
+import time
+import asyncio
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from api_modules.acc_http_client import (
+    AccHttpClient, AccHttpError, TokenBucket, api_family, endpoint_key, parse_retry_after
+)
+
+
+class FakeResponse:
+    def __init__(self, status, body=b'{}', headers=None):
+        self.status = status
+        self.status_code = status
+        self._body = body
+        self.headers = {'Content-Type': 'application/json', **(headers or {})}
+
+    async def read(self):
+        return self._body
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def close(self):
+        pass
+
+
+class FakeSession:
+    """按顺序返回预设响应，记录请求时间"""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = []
+        self.closed = False
+
+    def request(self, method, url, **kwargs):
+        self.calls.append(time.monotonic())
+        return self.responses.pop(0)
+
+
+def test_family_and_endpoint_key():
+    """测试按路径分组与端点聚合"""
+    assert api_family('https://developer.api.autodesk.com/data/v1/projects/b.1/folders/x/contents') == 'data'
+    assert api_family('https://developer.api.autodesk.com/construction/reviews/v1/projects/1/reviews') == 'reviews'
+    assert api_family('https://developer.api.autodesk.com/hq/v1/accounts/1/users') == 'admin'
+    assert api_family('https://developer.api.autodesk.com/oss/v2/buckets/b/objects/o') == 'oss'
+    assert api_family('https://example.com/other') == 'default'
+
+    key = endpoint_key('get', 'https://developer.api.autodesk.com/data/v1/projects/b.1eea4119-3553/folders/'
+                              'urn:adsk.wipprod:fs.folder:co.abc/contents?page%5Blimit%5D=200')
+    assert key == 'GET /data/v1/projects/{id}/folders/{id}/contents'
+
+    assert parse_retry_after('3') == 3.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0.0
+
+
+def test_token_bucket_pacing_and_pause():
+    """测试突发容量用完后按速率排队，429 暂停后降速"""
+    bucket = TokenBucket(rate=10, capacity=2)
+    waits = [bucket.reserve() for _ in range(4)]
+    assert waits[0] == 0 and waits[1] == 0
+    assert 0.05 < waits[2] <= 0.1 and 0.15 < waits[3] <= 0.2
+
+    bucket.pause(1.0)
+    assert bucket.rate == 5
+    assert bucket.reserve() >= 1.0
+    bucket.on_success()
+    assert bucket.rate > 5
+
+
+def test_async_retry_honors_retry_after():
+    """测试 429 按 Retry-After 等待后重试，5xx 重试耗尽后返回最后的响应"""
+    client = AccHttpClient(backoff_base=0.01)
+    url = 'https://developer.api.autodesk.com/data/v1/projects/b.1/items/urn:x/versions'
+
+    session = FakeSession([FakeResponse(429, headers={'Retry-After': '0.2'}),
+                           FakeResponse(200, b'{"data": [1, 2]}')])
+    response = asyncio.run(client.request('GET', url, session=session))
+    assert response.ok and response.data == {'data': [1, 2]} and response.attempts == 2
+    assert session.calls[1] - session.calls[0] >= 0.2
+
+    session = FakeSession([FakeResponse(503, b'busy')] * 3)
+    try:
+        asyncio.run(client.get_json(url, session=session, max_retries=2))
+        assert False, "应抛出 AccHttpError"
+    except AccHttpError as e:
+        assert e.status == 503
+    assert len(session.calls) == 3
+
+    metrics = client.get_metrics()
+    endpoint = metrics['endpoints']['GET /data/v1/projects/{id}/items/{id}/versions']
+    assert endpoint['calls'] == 2 and endpoint['retries'] == 3 and endpoint['throttled'] == 1
+    assert endpoint['errors'] == 1
+    assert metrics['families']['data']['rate'] < metrics['families']['data']['max_rate']
+
+
+def test_sync_request_shares_limiter():
+    """测试同步请求同样重试并计入指标"""
+    client = AccHttpClient(backoff_base=0.01)
+    client._sync_session = FakeSession([FakeResponse(502), FakeResponse(200)])
+
+    response = client.request_sync('GET', '/oss/v2/buckets/b/objects/o/signeds3download')
+    assert response.status_code == 200
+    assert client.get_metrics()['endpoints']['GET /oss/v2/buckets/b/objects/o/signeds3download']['retries'] == 1
+
+
+def run_all_tests():
+    """运行所有测试"""
+    tests = [
+        test_family_and_endpoint_key,
+        test_token_bucket_pacing_and_pause,
+        test_async_retry_honors_retry_after,
+        test_sync_request_shares_limiter,
+    ]
+
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
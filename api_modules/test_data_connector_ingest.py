@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+"""
+测试 Data Connector CSV 批量导入（使用模拟的数据库连接，不访问数据库）
+"""
+
+import sys
+import os
+import io
+import csv
+import json
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from api_modules.data_connector_ingest import DataConnectorIngest, load_schema, DEFAULT_EXTRACT_FOLDER
+
+
+class FakeCursor:
+    def __init__(self, db):
+        self.db = db
+        self.rowcount = -1
+        self.staged = 0
+
+    def execute(self, sql):
+        self.db.record(sql)
+        if sql.startswith('INSERT') or sql.startswith('DELETE'):
+            if self.db.fail_on and self.db.fail_on in sql:
+                raise RuntimeError('invalid input syntax for type uuid')
+            self.rowcount = self.staged if sql.startswith('INSERT') else 0
+
+    def copy_expert(self, sql, file):
+        self.db.record(sql)
+        # 按块读取，模拟 psycopg2 流式发送
+        data = ''
+        while True:
+            chunk = file.read(8)
+            if not chunk:
+                break
+            data += chunk
+        self.staged = len(list(csv.reader(io.StringIO(data)))) - 1
+        self.db.copied.append(data)
+        self.rowcount = self.staged
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, db):
+        self.db = db
+
+    def cursor(self):
+        return FakeCursor(self.db)
+
+    def commit(self):
+        self.db.record('COMMIT')
+
+    def rollback(self):
+        self.db.record('ROLLBACK')
+
+    def close(self):
+        pass
+
+
+class FakeDatabase:
+    """记录每个线程执行的 SQL"""
+
+    def __init__(self, fail_on=None):
+        self.fail_on = fail_on
+        self.lock = threading.Lock()
+        self.statements = []
+        self.copied = []
+
+    def record(self, sql):
+        with self.lock:
+            self.statements.append(sql)
+
+    def connect(self):
+        return FakeConnection(self)
+
+
+SCHEMA = {
+    'transmittals': {
+        'workflow_transmittals': {
+            'id': {'data_type': 'string: UUID', 'ordinal_position': 1},
+            'bim360_project_id': {'data_type': 'string: UUID', 'ordinal_position': 2},
+            'title': {'data_type': 'string', 'ordinal_position': 3},
+            'docs_count': {'data_type': 'number', 'ordinal_position': 4},
+            'created_at': {'data_type': 'timestamp: SQL', 'ordinal_position': 5},
+        },
+        'transmittal_documents': {
+            'id': {'data_type': 'string: UUID', 'ordinal_position': 1},
+            'workflow_transmittal_id': {'data_type': 'string: UUID', 'ordinal_position': 2},
+            'bim360_project_id': {'data_type': 'string: UUID', 'ordinal_position': 3},
+            'file_name': {'data_type': 'string', 'ordinal_position': 4},
+        },
+    },
+    'relationships': {
+        'entity_relationship': {
+            'relationship_guid': {'data_type': 'string: UUID', 'ordinal_position': 1},
+            'is_deleted': {'data_type': 'boolean', 'ordinal_position': 2},
+        },
+    },
+}
+
+PROJECT = 'e0a0f0a1-0000-4000-8000-000000000001'
+
+
+def make_extract():
+    folder = Path(tempfile.mkdtemp())
+    (folder / 'schemas').mkdir()
+    with open(folder / 'schemas' / 'schema.json', 'w', encoding='utf-8') as f:
+        json.dump(SCHEMA, f)
+
+    files = {
+        'transmittals_workflow_transmittals.csv':
+            'id,bim360_project_id,title,docs_count,created_at,extra\n'
+            f'a1000000-0000-4000-8000-000000000001,{PROJECT},"Title, with comma",2,2025-10-20 08:12:00,x\n'
+            f'a1000000-0000-4000-8000-000000000002,{PROJECT},"multi\nline",,2025-10-21 08:12:00,y\n',
+        'transmittals_transmittal_documents.csv':
+            'id,workflow_transmittal_id,bim360_project_id,file_name\n'
+            f'd1000000-0000-4000-8000-000000000001,a1000000-0000-4000-8000-000000000001,{PROJECT},a.pdf\n',
+        'relationships_entity_relationship.csv':
+            'relationship_guid,is_deleted\nf1000000-0000-4000-8000-000000000001,false\n',
+        'metadata.csv': 'created_at,region\n2025-10-27 09:38:53,US\n',
+    }
+    for name, content in files.items():
+        with open(folder / name, 'w', encoding='utf-8-sig', newline='') as f:
+            f.write(content)
+    return folder
+
+
+def test_bundled_extract_plans_parents_first():
+    """测试随仓库的导出目录：每张 CSV 都匹配到 schema，父表所在层先于子表"""
+    schema = load_schema(DEFAULT_EXTRACT_FOLDER / 'schemas')
+    assert dict(schema['issues']['issues'])['issue_id'] == 'uuid'
+    assert dict(schema['markups']['markup'])['created_at'] == 'timestamp without time zone'
+
+    plan = DataConnectorIngest(DEFAULT_EXTRACT_FOLDER).plan()
+    assert plan['skipped'] == ['metadata.csv']
+    level_of = {spec.name: index for index, level in enumerate(plan['levels']) for spec in level}
+    assert len(level_of) == 35
+
+    for parent, child in [('issues_issue_types', 'issues_issue_subtypes'),
+                          ('issues_issues', 'issues_comments'),
+                          ('forms_forms', 'forms_form_attachments'),
+                          ('markups_markup', 'markups_link'),
+                          ('transmittals_workflow_transmittals', 'transmittals_transmittal_documents')]:
+        assert level_of[parent] < level_of[child], f"{parent} should load before {child}"
+
+
+def test_ingest_streams_copy_and_merges_typed_rows():
+    """测试 COPY 流式导入暂存表、按类型转换后替换目标项目数据，并报告 rows/sec"""
+    folder = make_extract()
+    db = FakeDatabase()
+    try:
+        report = DataConnectorIngest(folder, parallel=2, connection_factory=db.connect).ingest()
+    finally:
+        shutil.rmtree(folder)
+
+    assert report['success'], report['error']
+    assert report['levels'] == [['relationships_entity_relationship', 'transmittals_workflow_transmittals'],
+                                ['transmittals_transmittal_documents']]
+    assert report['skipped_files'] == ['metadata.csv']
+
+    parent = report['tables']['transmittals_workflow_transmittals']
+    assert parent['rows'] == 2 and parent['staged_rows'] == 2 and parent['rows_per_sec'] > 0
+    assert parent['ignored_columns'] == ['extra']
+    assert report['total_rows'] == 4
+
+    # 表头 BOM 不会进入暂存表，多行字段原样交给 COPY
+    assert not any(data.startswith('﻿') for data in db.copied)
+    assert any('"multi\nline"' in data for data in db.copied)
+
+    sql = '\n'.join(db.statements)
+    assert 'CREATE TABLE IF NOT EXISTS "acc_data_schema"."transmittals_workflow_transmittals"' in sql
+    assert 'COPY "stage_transmittals_workflow_transmittals" ("id", "bim360_project_id", "title", ' \
+           '"docs_count", "created_at", "extra") FROM STDIN WITH (FORMAT csv, HEADER true)' in sql
+    assert ('SELECT NULLIF("id", \'\')::uuid, NULLIF("bim360_project_id", \'\')::uuid, "title", '
+            'NULLIF("docs_count", \'\')::numeric, NULLIF("created_at", \'\')::timestamp without time zone '
+            'FROM "stage_transmittals_workflow_transmittals"') in sql
+    # 有项目列只替换导出涉及的项目，没有项目列整表替换
+    assert 'WHERE "bim360_project_id" IN (SELECT DISTINCT NULLIF("bim360_project_id", \'\')::uuid' in sql
+    assert 'DELETE FROM "acc_data_schema"."relationships_entity_relationship"\n' in sql + '\n'
+    assert sql.count('SET LOCAL statement_timeout = 0') == 3
+
+
+def test_failed_table_rolls_back_and_skips_children():
+    """测试单表失败时回滚该表事务，依赖它的子表不导入，其他表不受影响"""
+    folder = make_extract()
+    db = FakeDatabase(fail_on='"transmittals_workflow_transmittals"')
+    try:
+        report = DataConnectorIngest(folder, parallel=2, connection_factory=db.connect).ingest()
+    finally:
+        shutil.rmtree(folder)
+
+    assert not report['success']
+    assert report['tables']['transmittals_workflow_transmittals']['status'] == 'error'
+    assert report['tables']['transmittals_transmittal_documents']['status'] == 'skipped'
+    assert report['tables']['relationships_entity_relationship']['status'] == 'success'
+    assert 'ROLLBACK' in db.statements
+    assert not any('"transmittals_transmittal_documents" ("id"' in sql for sql in db.statements
+                   if sql.startswith('COPY'))
+
+
+def test_connection_failure_is_a_table_error():
+    """测试导入表时连接失败记为该表的错误结果，子表被跳过，不会中断整个导入"""
+    folder = make_extract()
+    db = FakeDatabase()
+    calls = []
+
+    def connect():
+        calls.append(1)
+        if len(calls) > 1:  # prepare 之后的连接全部失败
+            raise RuntimeError('connection refused')
+        return db.connect()
+
+    try:
+        report = DataConnectorIngest(folder, parallel=2, connection_factory=connect).ingest()
+    finally:
+        shutil.rmtree(folder)
+
+    assert not report['success']
+    for name in ('transmittals_workflow_transmittals', 'relationships_entity_relationship'):
+        assert report['tables'][name]['status'] == 'error'
+        assert report['tables'][name]['error'] == 'connection refused'
+    assert report['tables']['transmittals_transmittal_documents']['status'] == 'skipped'
+
+
+def run_all_tests():
+    """运行所有测试"""
+    tests = [
+        test_bundled_extract_plans_parents_first,
+        test_ingest_streams_copy_and_merges_typed_rows,
+        test_failed_table_rolls_back_and_skips_children,
+        test_connection_failure_is_a_table_error,
+    ]
+
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
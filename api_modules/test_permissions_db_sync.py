@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+测试文件夹权限并发同步（不访问 ACC 和数据库）
+"""
+
+import sys
+import os
+import asyncio
+from contextlib import asynccontextmanager
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from api_modules import permissions_db_sync
+from api_modules.acc_http_client import AdaptiveConcurrency
+from api_modules.permissions_db_sync import PermissionsDatabaseSync
+
+
+class FakeClient:
+    @asynccontextmanager
+    async def session_scope(self):
+        yield None
+
+
+def _syncer(folders, throttled_ids=(), failed_ids=()):
+    """构造不连接数据库的 PermissionsDatabaseSync，记录并发数与写入批次"""
+    permissions_db_sync.get_acc_client = lambda: FakeClient()
+
+    async def get_token():
+        return 'token'
+
+    permissions_db_sync.utils.get_token = get_token
+
+    syncer = PermissionsDatabaseSync('b.project')
+    syncer.batches = []
+    syncer.only_changed = None
+    syncer.in_flight = 0
+    syncer.max_in_flight = 0
+    syncer.in_flight_at_start = []
+
+    async def get_all_folder_ids(only_changed=False):
+        syncer.only_changed = only_changed
+        return folders
+
+    async def batch_update_permissions(updates):
+        if updates:
+            syncer.batches.append([update[0] for update in updates])
+
+    async def fetch(project_id, folder_id, headers, session=None):
+        syncer.in_flight += 1
+        syncer.in_flight_at_start.append(syncer.in_flight)
+        syncer.max_in_flight = max(syncer.max_in_flight, syncer.in_flight)
+        await asyncio.sleep(0.005)
+        syncer.in_flight -= 1
+        if folder_id in failed_ids:
+            return {"status": "error", "error": "Project or folder does not exist",
+                    "error_code": "NOT_FOUND", "http_status": 404, "attempts": 1}
+        data = [{"subjectType": "USER", "actions": ["VIEW", "COLLABORATE"]}]
+        return {"status": "success", "data": data, "retrieved_at": "2025-01-01T00:00:00+00:00",
+                "attempts": 3 if folder_id in throttled_ids else 1}
+
+    syncer.get_all_folder_ids = get_all_folder_ids
+    syncer.batch_update_permissions = batch_update_permissions
+    permissions_db_sync.get_folder_permissions_async = fetch
+    return syncer
+
+
+def _folders(count):
+    return [(f'f{i}', f'Folder {i}', f'/Folder {i}') for i in range(count)]
+
+
+def test_concurrent_sync_writes_all_batches():
+    """测试并发请求且每满一批写入一次"""
+    syncer = _syncer(_folders(23), failed_ids={'f5'})
+
+    stats = asyncio.run(syncer.sync_all_permissions(batch_size=5, max_in_flight=4))
+
+    written = sum(syncer.batches, [])
+    assert sorted(written) == sorted(f'f{i}' for i in range(23) if i != 5)
+    assert all(len(batch) <= 5 for batch in syncer.batches)
+    assert stats['successful_syncs'] == 22 and stats['failed_syncs'] == 1
+    assert stats['errors'][0]['folder_id'] == 'f5'
+    assert 1 < syncer.max_in_flight <= 4
+    assert syncer.only_changed is False
+
+
+def test_incremental_flag_passed_to_folder_query():
+    """测试增量模式只查询有变化的文件夹"""
+    syncer = _syncer(_folders(3))
+
+    stats = asyncio.run(syncer.sync_all_permissions(incremental=True))
+    assert syncer.only_changed is True
+    assert stats['incremental'] is True and stats['successful_syncs'] == 3
+
+
+def test_adaptive_concurrency_backs_off():
+    """测试限流后并发窗口减半，顺利后逐步恢复"""
+    limiter = AdaptiveConcurrency(8)
+
+    async def run():
+        await limiter.acquire()
+        await limiter.release(congested=True)
+        assert limiter.limit == 4
+        await limiter.acquire()
+        await limiter.release(congested=True)
+        assert limiter.limit == 2
+        for _ in range(10):
+            await limiter.acquire()
+            await limiter.release()
+        assert 4 < limiter.limit <= 8
+
+        # 窗口内的请求数不超过上限
+        limiter.limit = 2
+        await limiter.acquire()
+        await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0.01)
+        assert not waiter.done()
+        await limiter.release()
+        await asyncio.wait_for(waiter, 1)
+        assert limiter.in_flight == 2
+
+    asyncio.run(run())
+
+
+def test_throttled_requests_shrink_concurrency():
+    """测试发生重试的请求会降低实际并发"""
+    folders = _folders(30)
+    syncer = _syncer(folders, throttled_ids={f'f{i}' for i in range(30)})
+
+    asyncio.run(syncer.sync_all_permissions(batch_size=50, max_in_flight=8))
+    # 第一轮 8 个请求全部重试后，窗口收缩到最小值
+    assert max(syncer.in_flight_at_start[:8]) == 8
+    assert max(syncer.in_flight_at_start[16:]) <= 2
+    assert len(sum(syncer.batches, [])) == 30
+
+
+def run_all_tests():
+    """运行所有测试"""
+    tests = [
+        test_concurrent_sync_writes_all_batches,
+        test_incremental_flag_passed_to_folder_query,
+        test_adaptive_concurrency_backs_off,
+        test_throttled_requests_shrink_concurrency,
+    ]
+
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+测试多项目同步调度器（使用模拟的同步函数，不访问 ACC 和数据库）
+"""
+
+import sys
+import os
+import asyncio
+from datetime import datetime, timezone
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from api_modules.sync_scheduler import SyncScheduler, ApiBudget
+
+
+def make_config(project_count=3, **scheduler):
+    return {
+        'projects': {f'b.p{i}': {'status': 'active'} for i in range(project_count)},
+        'global': {
+            'max_concurrent_syncs': 2,
+            'scheduler': {'min_interval': 100, 'max_interval': 800, 'backoff': 2.0,
+                          'sync_types': ['files', 'reviews'], **scheduler}
+        }
+    }
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_config_selects_active_projects():
+    """测试只调度 active 项目、项目级 sync_types 覆盖，并用 last_sync 初始化新鲜度"""
+    config = make_config(1)
+    config['projects']['b.off'] = {'status': 'inactive'}
+    config['projects']['b.perm'] = {'status': 'active', 'sync_types': ['permissions', 'bogus'],
+                                    'last_sync': '2024-11-06T15:45:00Z'}
+    scheduler = SyncScheduler(config, runners={}, api_usage=lambda: 0)
+
+    assert set(scheduler.projects) == {'b.p0', 'b.perm'}
+    assert scheduler.projects['b.p0'].sync_types == ['files', 'reviews']
+    assert scheduler.projects['b.perm'].sync_types == ['permissions']
+    assert scheduler.max_concurrent == 2
+    metrics = scheduler.get_metrics()['projects']
+    assert metrics['b.perm']['freshness_lag_seconds'] > 0 and metrics['b.p0']['freshness_lag_seconds'] is None
+
+
+def test_run_once_respects_concurrency_cap():
+    """测试每个项目执行一轮，同时执行的项目数不超过 max_concurrent_syncs"""
+    state = {'active': 0, 'max_active': 0, 'calls': []}
+
+    async def runner(project_id):
+        state['active'] += 1
+        state['max_active'] = max(state['max_active'], state['active'])
+        state['calls'].append(project_id)
+        await asyncio.sleep(0.01)
+        state['active'] -= 1
+        return {'status': 'success'}
+
+    scheduler = SyncScheduler(make_config(5, sync_types=['files']), runners={'files': runner}, api_usage=lambda: 0)
+    asyncio.run(scheduler.run_once())
+
+    assert sorted(state['calls']) == [f'b.p{i}' for i in range(5)]
+    assert state['max_active'] == 2
+    metrics = scheduler.get_metrics()
+    assert metrics['cycles'] == 5 and metrics['active_syncs'] == 0
+    assert all(p['last_success_at'] for p in metrics['projects'].values())
+
+
+def test_adaptive_interval():
+    """测试有变化时回到最小间隔，无变化时按倍数增长到上限，失败时不增长并尽快重试"""
+    clock = FakeClock()
+    results = {'files': {'status': 'success', 'rollup': datetime(2024, 1, 1, tzinfo=timezone.utc)},
+               'reviews': {'status': 'success'}}
+
+    async def files(project_id):
+        return results['files']
+
+    async def reviews(project_id):
+        return results['reviews']
+
+    scheduler = SyncScheduler(make_config(1), runners={'files': files, 'reviews': reviews},
+                              api_usage=lambda: 0, clock=clock)
+    schedule = scheduler.projects['b.p0']
+
+    def cycle():
+        schedule.running = True
+        scheduler._active += 1
+        asyncio.run(scheduler._run_cycle(schedule))
+
+    # 第一次只记录 rollup 基线
+    cycle()
+    assert schedule.interval == 200 and schedule.last_change_at is None
+    cycle()
+    cycle()
+    cycle()
+    assert schedule.interval == 800 and schedule.next_run == clock.now + 800
+
+    # rollup 前移 -> 变化
+    results['files'] = {'status': 'success', 'rollup': datetime(2024, 1, 2, tzinfo=timezone.utc)}
+    cycle()
+    assert schedule.interval == 100 and schedule.last_change_at is not None
+
+    # 评审有变化
+    cycle()
+    assert schedule.interval == 200
+    results['reviews'] = {'status': 'success', 'changed': True}
+    cycle()
+    assert schedule.interval == 100
+
+    # 失败：间隔不增长，失败计数增加
+    results['reviews'] = {'status': 'error', 'error': 'boom'}
+    success_before = schedule.last_success_at
+    cycle()
+    assert schedule.interval == 100 and schedule.failures == 1
+    assert schedule.last_success_at == success_before and schedule.last_results['reviews'] == 'error'
+
+
+def test_budget_defers_dispatch():
+    """测试最近一小时的调用量超出预算时推迟项目，窗口滑过后恢复"""
+    clock = FakeClock()
+    usage = {'calls': 0}
+    budget = ApiBudget(100, lambda: usage['calls'], clock)
+
+    budget.used()
+    usage['calls'] = 80
+    assert budget.remaining() == 20
+    assert budget.allows(20) and not budget.allows(30)
+
+    clock.now += 3601
+    usage['calls'] = 90
+    assert budget.remaining() == 90
+
+    async def runner(project_id):
+        return {'status': 'success'}
+
+    scheduler = SyncScheduler(make_config(2, api_budget_per_hour=50), runners={'files': runner, 'reviews': runner},
+                              api_usage=lambda: usage['calls'], clock=clock)
+    scheduler.budget.used()
+    usage['calls'] += 60
+    for schedule in scheduler.projects.values():
+        schedule.last_api_calls = 10
+
+    async def dispatch():
+        return scheduler._dispatch()
+
+    assert asyncio.run(dispatch()) == 0
+    assert scheduler.get_metrics()['budget_deferrals'] == 2
+    assert all(s.next_run > clock.now for s in scheduler.projects.values())
+
+
+def run_all_tests():
+    """运行所有测试"""
+    tests = [
+        test_config_selects_active_projects,
+        test_run_once_respects_concurrency_cap,
+        test_adaptive_interval,
+        test_budget_defers_dispatch,
+    ]
+
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+Transmittal CSV Incremental Sync Tests
+======================================
+Tests checksum-based file skipping and change-set building of the incremental
+sync mode with an in-memory data access layer (no database required).
+
+Usage:
+    python api_modules/test_transmittal_csv_sync.py
+"""
+
+import sys
+import shutil
+import tempfile
+from pathlib import Path
+
+# Add project root to path
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from api_modules.transmittal_csv_sync import TransmittalCSVSync
+
+
+class MemoryDataAccess:
+    """Records merges and keeps file checksums in memory"""
+
+    def __init__(self, fail_merge: bool = False):
+        self.fail_merge = fail_merge
+        self.checksums = {}
+        self.merges = []
+
+    def get_file_checksums(self):
+        return dict(self.checksums)
+
+    def merge_incremental(self, changes, file_states):
+        if self.fail_merge:
+            raise RuntimeError('deadlock detected')
+        self.merges.append(changes)
+        for state in file_states:
+            self.checksums[state['file_name']] = state['checksum']
+        return {table: {'inserted': len(rows), 'updated': 0, 'deleted': 0, 'unchanged': 0}
+                for table, rows in changes.items()}
+
+    def get_table_counts(self):
+        return {}
+
+
+def make_folder() -> Path:
+    folder = Path(tempfile.mkdtemp())
+    for filename in TransmittalCSVSync.CSV_FILE_MAPPING:
+        shutil.copy(PROJECT_ROOT / 'transmittal' / filename, folder / filename)
+    return folder
+
+
+def test_first_sync_merges_all_files_with_row_hashes():
+    """All files are merged on the first run; rows carry a stable row_hash"""
+    folder = make_folder()
+    dal = MemoryDataAccess()
+    try:
+        result = TransmittalCSVSync(folder, dal=dal).sync_to_database(incremental=True)
+    finally:
+        shutil.rmtree(folder)
+
+    assert result['success'], result['error']
+    assert result['mode'] == 'incremental' and result['files_skipped'] == []
+    changes = dal.merges[0]
+    assert set(changes) == set(TransmittalCSVSync.CSV_FILE_MAPPING.values())
+    transmittals = changes['transmittals_workflow_transmittals']
+    assert transmittals and all(len(row['row_hash']) == 32 for row in transmittals)
+    assert len({row['row_hash'] for row in transmittals}) == len(transmittals)
+    assert len(dal.checksums) == 4
+
+
+def test_unchanged_files_are_skipped():
+    """A second run without CSV changes touches nothing; editing one file merges only that file"""
+    folder = make_folder()
+    dal = MemoryDataAccess()
+    try:
+        sync = TransmittalCSVSync(folder, dal=dal)
+        first = sync.sync_to_database(incremental=True)
+        first_hashes = {row['id']: row['row_hash'] for row in dal.merges[0]['transmittals_transmittal_recipients']}
+
+        result = sync.sync_to_database(incremental=True)
+        assert result['success'] and len(result['files_skipped']) == 4
+        assert len(dal.merges) == 1 and result['records_inserted'] == {}
+
+        recipients = folder / 'transmittals_transmittal_recipients.csv'
+        content = recipients.read_text(encoding='utf-8-sig')
+        edited = [line.replace('Dickson Lai', 'Dickson Lai (Consultant)') if line.startswith('df3f9959') else line
+                  for line in content.split('\n')]
+        recipients.write_text('\n'.join(edited), encoding='utf-8-sig')
+
+        result = sync.sync_to_database(incremental=True)
+    finally:
+        shutil.rmtree(folder)
+
+    assert first['success'] and result['success']
+    assert list(result['files_processed']) == ['transmittals_transmittal_recipients.csv']
+    assert list(dal.merges[-1]) == ['transmittals_transmittal_recipients']
+
+    # Only the edited row gets a new hash
+    new_hashes = {row['id']: row['row_hash'] for row in dal.merges[-1]['transmittals_transmittal_recipients']}
+    changed = [row_id for row_id in new_hashes if new_hashes[row_id] != first_hashes[row_id]]
+    assert changed == ['df3f9959-f22c-4e96-8232-62775ece320b']
+
+
+def test_failed_merge_keeps_previous_checksums():
+    """A failed merge reports the error and does not record checksums"""
+    folder = make_folder()
+    dal = MemoryDataAccess(fail_merge=True)
+    try:
+        result = TransmittalCSVSync(folder, dal=dal).sync_to_database(incremental=True)
+    finally:
+        shutil.rmtree(folder)
+
+    assert not result['success']
+    assert 'deadlock detected' in result['error']
+    assert dal.checksums == {}
+
+
+def run_all_tests():
+    """Run all tests"""
+    tests = [
+        test_first_sync_merges_all_files_with_row_hashes,
+        test_unchanged_files_are_skipped,
+        test_failed_merge_keeps_previous_checksums,
+    ]
+
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
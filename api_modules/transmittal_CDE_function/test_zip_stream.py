@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+测试并行流式 ZIP 打包（不访问网络，使用模拟的文档下载）
+"""
+
+import io
+import sys
+import os
+import json
+import time
+import zipfile
+import threading
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from api_modules.transmittal_CDE_function.zip_stream import ParallelZipStreamer, compress_type_for
+
+
+CONTENTS = {
+    'drawing.pdf': b'%PDF-1.7 ' + b'x' * 5000,
+    'notes.txt': b'hello transmittal\n' * 200,
+    'model.rvt': b'\x00\x01' * 3000,
+}
+
+
+def _documents(names):
+    return [{'arcname': name, 'file_name': name, 'urn': f"urn:{name}"} for name in names]
+
+
+def _read_zip(chunks):
+    return zipfile.ZipFile(io.BytesIO(b''.join(chunks)))
+
+
+def test_stream_roundtrip_and_compression():
+    """测试流式输出可被正常解压，已压缩格式使用 ZIP_STORED"""
+    def fetch(document, file_obj):
+        file_obj.write(CONTENTS[document['arcname']])
+
+    streamer = ParallelZipStreamer(fetch, max_workers=3, chunk_size=1024)
+    chunks = list(streamer.stream(_documents(CONTENTS), manifest_extra={'transmittal': {'id': 't1'}}))
+    assert len(chunks) > 1, "ZIP 应分块输出"
+
+    archive = _read_zip(chunks)
+    assert archive.testzip() is None
+    for name, data in CONTENTS.items():
+        assert archive.read(name) == data
+        assert archive.getinfo(name).compress_type == compress_type_for(name)
+
+    assert archive.getinfo('drawing.pdf').compress_type == zipfile.ZIP_STORED
+    assert archive.getinfo('notes.txt').compress_type == zipfile.ZIP_DEFLATED
+
+    manifest = json.loads(archive.read(ParallelZipStreamer.MANIFEST_NAME))
+    assert manifest['file_count'] == 3 and manifest['failed_count'] == 0
+    assert manifest['transmittal']['id'] == 't1'
+
+
+def test_partial_failure_in_manifest():
+    """测试部分失败时其余文档照常打包，失败记录在清单中"""
+    def fetch(document, file_obj):
+        if document['arcname'] == 'model.rvt':
+            raise RuntimeError('HTTP 404')
+        file_obj.write(CONTENTS[document['arcname']])
+
+    streamer = ParallelZipStreamer(fetch, max_workers=2)
+    archive = _read_zip(streamer.stream(_documents(CONTENTS)))
+
+    assert 'model.rvt' not in archive.namelist()
+    manifest = json.loads(archive.read(ParallelZipStreamer.MANIFEST_NAME))
+    assert manifest['failed_files'][0]['file_name'] == 'model.rvt'
+    assert 'HTTP 404' in manifest['failed_files'][0]['error']
+    assert len(streamer.report['succeeded']) == 2
+
+
+def test_bounded_concurrency():
+    """测试并发下载数不超过线程池上限"""
+    state = {'active': 0, 'max_active': 0}
+    lock = threading.Lock()
+
+    def fetch(document, file_obj):
+        with lock:
+            state['active'] += 1
+            state['max_active'] = max(state['max_active'], state['active'])
+        time.sleep(0.02)
+        file_obj.write(b'data')
+        with lock:
+            state['active'] -= 1
+
+    streamer = ParallelZipStreamer(fetch, max_workers=3)
+    archive = _read_zip(streamer.stream(_documents([f"file-{i}.txt" for i in range(12)])))
+
+    assert len(archive.namelist()) == 13
+    assert 1 < state['max_active'] <= 3, f"并发数异常: {state['max_active']}"
+
+
+def test_disconnect_releases_running_fetches():
+    """测试客户端中途断开后，仍在下载的文档完成时关闭其缓冲文件"""
+    started, release = threading.Event(), threading.Event()
+    spools = []
+
+    def fetch(document, file_obj):
+        if document['arcname'] == 'slow.txt':
+            started.set()
+            release.wait(5)
+        file_obj.write(b'data')
+
+    class RecordingStreamer(ParallelZipStreamer):
+        def _fetch(self, document):
+            spool = super()._fetch(document)
+            spools.append((document['arcname'], spool))
+            return spool
+
+    streamer = RecordingStreamer(fetch, max_workers=2)
+    chunks = streamer.stream(_documents(['fast.txt', 'slow.txt']))
+    next(chunks)
+    assert started.wait(5)
+    chunks.close()
+
+    release.set()
+    deadline = time.time() + 5
+    while time.time() < deadline and not (len(spools) == 2 and all(spool.closed for _, spool in spools)):
+        time.sleep(0.01)
+
+    assert sorted(name for name, _ in spools) == ['fast.txt', 'slow.txt']
+    assert all(spool.closed for _, spool in spools), "断开后缓冲文件未关闭"
+
+
+def run_all_tests():
+    """运行所有测试"""
+    tests = [
+        test_stream_roundtrip_and_compression,
+        test_partial_failure_in_manifest,
+        test_bounded_concurrency,
+        test_disconnect_releases_running_fetches,
+    ]
+
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -9,7 +9,7 @@ APIs:
 3. GET  /api/transmittals/<transmittal_id>/recipients - 获取传输单接收者列表
 4. POST /api/transmittals/<transmittal_id>/mark-viewed - 标记用户已查看
 5. POST /api/transmittals/<transmittal_id>/mark-downloaded - 标记用户已下载
-6. POST /api/transmittals/<transmittal_id>/download-zip - 打包下载文件 (TODO)
+6. POST /api/transmittals/<transmittal_id>/download-zip - 打包下载文件（并发下载，流式输出 ZIP）
 """
 
 import sys
@@ -18,9 +18,6 @@ from functools import wraps
 from datetime import datetime
 from typing import Dict, Any, List, Optional, Tuple
 import tempfile
-import zipfile
-import requests
-import shutil
 from pathlib import Path
 import time
 import threading
@@ -30,18 +27,21 @@ import atexit
 if sys.platform.startswith('win'):
     os.environ['PYTHONIOENCODING'] = 'utf-8'
 
-from flask import Blueprint, jsonify, request, send_file
+from flask import Blueprint, Response, jsonify, request, send_file
 import psycopg2
 import psycopg2.extras
 from psycopg2.extras import RealDictCursor
 
 # 导入数据库配置和数据访问层
 from database_sql.neon_config import NeonConfig
+from database_sql.pg_pool import get_pooled_connection, REQUEST_STATEMENT_TIMEOUT_MS
 from database_sql.transmittal_data_access import TransmittalDataAccess
 
 # 导入认证工具和下载管理器
 import utils
 from api_modules.urn_download_simple import URNDownloadManager
+from api_modules.file_CDE_function.file_download import FileDownloadManager
+from api_modules.transmittal_CDE_function.zip_stream import ParallelZipStreamer
 
 # 创建 Blueprint
 transmittal_bp = Blueprint('transmittal', __name__, url_prefix='/api/transmittals')
@@ -146,10 +146,15 @@ class TransmittalManager:
         self.neon_config = NeonConfig()
         self.db_params = self.neon_config.get_db_params()
         self.urn_manager = URNDownloadManager()
+        # 解析 item -> 签名 URL（带有效期缓存）并打开 S3 流
+        self.download_manager = FileDownloadManager()
+
+    # ZIP 打包时并发下载的文档数
+    ZIP_MAX_WORKERS = 6
 
     def get_connection(self):
-        """获取数据库连接"""
-        return psycopg2.connect(**self.db_params)
+        """获取数据库连接（共享连接池，close() 归还）"""
+        return get_pooled_connection(self.db_params, REQUEST_STATEMENT_TIMEOUT_MS)
 
     def get_transmittals_list(self, project_id: str, limit: int = 100, offset: int = 0) -> Dict[str, Any]:
         """
@@ -686,9 +691,9 @@ class TransmittalManager:
             if conn:
                 conn.close()
 
-    def create_zip_package(self, transmittal_id: str) -> Dict[str, Any]:
+    def prepare_zip_package(self, transmittal_id: str) -> Dict[str, Any]:
         """
-        创建传输单文件的 ZIP 压缩包
+        查询传输单及其文档，生成打包计划（不下载文件）
 
         Args:
             transmittal_id: 传输单ID (UUID)
@@ -696,18 +701,13 @@ class TransmittalManager:
         Returns:
             {
                 'success': bool,
-                'zip_path': str,              # ZIP 文件路径
                 'zip_filename': str,          # ZIP 文件名
-                'file_count': int,            # 打包的文件数量
-                'total_size': int,            # 总大小(字节)
-                'failed_files': List[Dict],   # 下载失败的文件列表
+                'documents': List[Dict],      # 文档列表，包含 arcname（ZIP 内文件名）
                 'transmittal_info': Dict      # 传输单信息
             }
         """
         conn = None
         cursor = None
-        temp_dir = None
-        zip_path = None
 
         try:
             # 1. 获取传输单基本信息
@@ -759,32 +759,22 @@ class TransmittalManager:
                     'error': 'No documents found in this transmittal'
                 }
 
-            # 3. 获取 access token
-            access_token = utils.get_access_token()
-            if not access_token:
+            # 3. 确认 access token 可用（在开始输出响应前失败）
+            if not utils.get_access_token():
                 return {
                     'success': False,
                     'error': 'Access token not found',
                     'error_type': 'unauthorized'
                 }
 
-            # 4. 创建临时目录
-            temp_dir = tempfile.mkdtemp(prefix='transmittal_')
-            print(f"[ZIP] Created temp directory: {temp_dir}")
-
-            # 5. 下载所有文件
-            downloaded_files = []
-            failed_files = []
-            total_size = 0
-
-            for idx, doc in enumerate(documents, 1):
+            # 4. 生成 ZIP 内文件名（带版本号，重名时追加序号）
+            planned = []
+            used_names = set()
+            for doc in documents:
                 doc_dict = dict(doc)
-                urn = doc_dict['urn']
                 file_name = doc_dict['file_name']
                 version_number = doc_dict.get('version_number', 1)
 
-                print(f"[ZIP] Downloading {idx}/{len(documents)}: {file_name}")
-
                 # 安全的文件名 (移除非法字符)
                 safe_filename = self._sanitize_filename(file_name)
 
@@ -796,128 +786,122 @@ class TransmittalManager:
                     else:
                         safe_filename = f"{safe_filename}_v{version_number}"
 
-                try:
-                    # 1. Normalize URN to lineage format
-                    full_lineage_urn = self._normalize_urn_to_lineage(urn)
-
-                    print(f"[ZIP] Original URN: {urn}")
-                    print(f"[ZIP] Normalized lineage URN: {full_lineage_urn}")
-
-                    # 2. 使用 Data Management API 获取 item 信息（包含 storage location）
-                    item_url = f"https://developer.api.autodesk.com/data/v1/projects/b.{project_id}/items/{full_lineage_urn}"
-                    headers = {
-                        "Authorization": f"Bearer {access_token}",
-                        "Content-Type": "application/json"
-                    }
-
-                    item_response = requests.get(item_url, headers=headers, timeout=30)
-
-                    if item_response.status_code != 200:
-                        raise Exception(f"Failed to get item info: {item_response.status_code} - {item_response.text}")
+                arcname = safe_filename
+                suffix = 2
+                while arcname.lower() in used_names:
+                    name_parts = safe_filename.rsplit('.', 1)
+                    arcname = (f"{name_parts[0]} ({suffix}).{name_parts[1]}" if len(name_parts) == 2
+                               else f"{safe_filename} ({suffix})")
+                    suffix += 1
+                used_names.add(arcname.lower())
+
+                planned.append({
+                    'arcname': arcname,
+                    'file_name': file_name,
+                    'urn': doc_dict['urn'],
+                    'project_id': project_id
+                })
 
-                    item_data = item_response.json()
+            # 创建 ZIP 文件名
+            timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
+            safe_title = self._sanitize_filename(title) if title else f"transmittal_{sequence_id}"
 
-                    # 3. 从响应中提取 storage location
-                    storage_data = None
-                    if 'included' in item_data:
-                        for included_item in item_data['included']:
-                            if included_item.get('type') == 'versions':
-                                storage_rel = included_item.get('relationships', {}).get('storage', {})
-                                storage_data = storage_rel.get('data', {})
-                                break
+            return {
+                'success': True,
+                'zip_filename': f"{safe_title}_{timestamp}.zip",
+                'documents': planned,
+                'transmittal_info': {
+                    'id': transmittal_id,
+                    'sequence_id': sequence_id,
+                    'title': title,
+                    'project_id': project_id
+                }
+            }
 
-                    if not storage_data or not storage_data.get('id'):
-                        raise Exception(f"Storage location not found in item response")
+        finally:
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()
 
-                    storage_id = storage_data['id']
-                    print(f"[ZIP] Storage ID: {storage_id}")
+    def _fetch_document(self, document: Dict[str, Any], file_obj):
+        """下载单个文档到 file_obj（在线程池中运行）"""
+        result = self.download_manager.open_stream(document['urn'], document['project_id'])
+        if not result.get('success'):
+            raise Exception(result.get('error', 'Failed to resolve download URL'))
 
-                    # 4. 解析 storage URN 以获取 bucket 和 object key
-                    # Format: urn:adsk.objects:os.object:BUCKET/OBJECT_KEY
-                    if not storage_id.startswith('urn:adsk.objects:os.object:'):
-                        raise Exception(f"Invalid storage URN format: {storage_id}")
+        if result['status_code'] != 200:
+            result['upstream'].close()
+            raise Exception(f"Download failed: HTTP {result['status_code']}")
 
-                    storage_path = storage_id.replace('urn:adsk.objects:os.object:', '')
-                    if '/' not in storage_path:
-                        raise Exception(f"Invalid storage path format: {storage_path}")
+        # 命中本地緩存時直接讀本地文件，否則邊下載邊寫入緩存
+        for chunk in self.download_manager.iter_stream(result):
+            file_obj.write(chunk)
 
-                    bucket_key, object_key = storage_path.split('/', 1)
-                    print(f"[ZIP] Bucket: {bucket_key}, Object: {object_key}")
+        source = 'cache' if result.get('blob') else 'S3'
+        print(f"[ZIP] ✓ Downloaded: {document['arcname']} (from {source})")
 
-                    # 5. 获取 S3 签名下载 URL
-                    s3_url = f"https://developer.api.autodesk.com/oss/v2/buckets/{bucket_key}/objects/{object_key}/signeds3download"
-                    s3_response = requests.get(s3_url, headers=headers, timeout=30)
+    def stream_zip_package(self, package: Dict[str, Any], max_workers: int = None) -> Tuple[ParallelZipStreamer, Any]:
+        """
+        并发下载文档并流式生成 ZIP
 
-                    if s3_response.status_code != 200:
-                        raise Exception(f"Failed to get S3 signed URL: {s3_response.status_code} - {s3_response.text}")
+        Args:
+            package: prepare_zip_package 的返回值
+            max_workers: 并发下载数
 
-                    s3_data = s3_response.json()
-                    download_url = s3_data.get('url')
+        Returns:
+            (streamer, chunks) - chunks 为 ZIP 字节块生成器，streamer.report 记录成功/失败文档
+        """
+        streamer = ParallelZipStreamer(self._fetch_document, max_workers=max_workers or self.ZIP_MAX_WORKERS)
+        chunks = streamer.stream(package['documents'], manifest_extra={
+            'transmittal': package['transmittal_info'],
+            'requested_count': len(package['documents'])
+        })
+        return streamer, chunks
 
-                    if not download_url:
-                        raise Exception(f"No download URL in S3 response")
+    def create_zip_package(self, transmittal_id: str) -> Dict[str, Any]:
+        """
+        创建传输单文件的 ZIP 压缩包（写入临时文件，供非流式下载使用）
 
-                    print(f"[ZIP] Got S3 signed URL")
+        Args:
+            transmittal_id: 传输单ID (UUID)
 
-                    # 6. 下载文件（不需要 Authorization header，因为 URL 已经签名）
-                    file_path = os.path.join(temp_dir, safe_filename)
-                    download_response = requests.get(download_url, timeout=300, stream=True)
+        Returns:
+            {
+                'success': bool,
+                'zip_path': str,              # ZIP 文件路径
+                'zip_filename': str,          # ZIP 文件名
+                'file_count': int,            # 打包的文件数量
+                'total_size': int,            # 总大小(字节)
+                'failed_files': List[Dict],   # 下载失败的文件列表
+                'transmittal_info': Dict      # 传输单信息
+            }
+        """
+        zip_path = None
 
-                    if download_response.status_code == 200:
-                        with open(file_path, 'wb') as f:
-                            for chunk in download_response.iter_content(chunk_size=8192):
-                                if chunk:
-                                    f.write(chunk)
+        try:
+            package = self.prepare_zip_package(transmittal_id)
+            if not package.get('success'):
+                return package
 
-                        file_size = os.path.getsize(file_path)
-                        total_size += file_size
+            zip_filename = package['zip_filename']
+            zip_path = os.path.join(tempfile.gettempdir(), zip_filename)
+            print(f"[ZIP] Creating ZIP archive: {zip_path}")
 
-                        downloaded_files.append({
-                            'file_name': safe_filename,
-                            'original_name': file_name,
-                            'file_path': file_path,
-                            'file_size': file_size,
-                            'urn': urn
-                        })
+            streamer, chunks = self.stream_zip_package(package)
+            with open(zip_path, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
 
-                        print(f"[ZIP] ✓ Downloaded: {safe_filename} ({file_size} bytes)")
-                    else:
-                        failed_files.append({
-                            'file_name': file_name,
-                            'urn': urn,
-                            'error': f'Download failed: HTTP {download_response.status_code}'
-                        })
-                        print(f"[ZIP] ✗ Download failed: {file_name} (HTTP {download_response.status_code})")
-
-                except Exception as e:
-                    failed_files.append({
-                        'file_name': file_name,
-                        'urn': urn,
-                        'error': str(e)
-                    })
-                    print(f"[ZIP] ✗ Exception downloading {file_name}: {e}")
-
-            # 6. 创建 ZIP 文件
-            if not downloaded_files:
+            report = streamer.report
+            if not report['succeeded']:
+                os.remove(zip_path)
                 return {
                     'success': False,
                     'error': 'No files were successfully downloaded',
-                    'failed_files': failed_files
+                    'failed_files': report['failed']
                 }
 
-            # 创建 ZIP 文件名
-            timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
-            safe_title = self._sanitize_filename(title) if title else f"transmittal_{sequence_id}"
-            zip_filename = f"{safe_title}_{timestamp}.zip"
-            zip_path = os.path.join(tempfile.gettempdir(), zip_filename)
-
-            print(f"[ZIP] Creating ZIP archive: {zip_path}")
-
-            with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                for file_info in downloaded_files:
-                    zipf.write(file_info['file_path'], arcname=file_info['file_name'])
-                    print(f"[ZIP] Added to archive: {file_info['file_name']}")
-
             zip_size = os.path.getsize(zip_path)
             print(f"[ZIP] ✓ ZIP created: {zip_filename} ({zip_size} bytes)")
 
@@ -925,34 +909,20 @@ class TransmittalManager:
                 'success': True,
                 'zip_path': zip_path,
                 'zip_filename': zip_filename,
-                'file_count': len(downloaded_files),
+                'file_count': len(report['succeeded']),
                 'total_size': zip_size,
-                'failed_files': failed_files,
-                'transmittal_info': {
-                    'id': transmittal_id,
-                    'sequence_id': sequence_id,
-                    'title': title,
-                    'project_id': project_id
-                }
+                'failed_files': report['failed'],
+                'transmittal_info': package['transmittal_info']
             }
 
         except Exception as e:
             print(f"[ZIP] ERROR: {e}")
-            raise Exception(f"Failed to create ZIP package: {str(e)}")
-
-        finally:
-            # 清理临时文件
-            if temp_dir and os.path.exists(temp_dir):
+            if zip_path and os.path.exists(zip_path):
                 try:
-                    shutil.rmtree(temp_dir)
-                    print(f"[ZIP] Cleaned up temp directory: {temp_dir}")
-                except Exception as e:
-                    print(f"[ZIP] Warning: Failed to cleanup temp directory: {e}")
-
-            if cursor:
-                cursor.close()
-            if conn:
-                conn.close()
+                    os.remove(zip_path)
+                except Exception:
+                    pass
+            raise Exception(f"Failed to create ZIP package: {str(e)}")
 
     def _sanitize_filename(self, filename: str) -> str:
         """
@@ -1217,6 +1187,56 @@ def mark_downloaded(transmittal_id):
         return jsonify(result), 404
 
 
+def _mark_downloaded_quietly(transmittal_id: str, email: Optional[str]):
+    """标记用户已下载，失败只记录警告"""
+    if not email:
+        return
+    try:
+        mark_result = transmittal_manager.mark_downloaded(transmittal_id, email)
+        if mark_result.get('success'):
+            print(f"[API] Marked as downloaded for user: {email}")
+        else:
+            print(f"[API] Warning: Failed to mark downloaded for {email}: {mark_result.get('error')}")
+    except Exception as e:
+        print(f"[API] Warning: Exception marking downloaded: {e}")
+
+
+def _stream_zip_response(transmittal_id: str, email: Optional[str]):
+    """并发下载并以流的形式返回 ZIP"""
+    print(f"[API] Starting streaming ZIP for transmittal: {transmittal_id}")
+    package = transmittal_manager.prepare_zip_package(transmittal_id)
+
+    if not package.get('success'):
+        status = 401 if package.get('error_type') == 'unauthorized' else 404
+        return jsonify({
+            'success': False,
+            'error': package.get('error', 'Failed to prepare ZIP package'),
+            'error_type': package.get('error_type', 'zip_creation_failed')
+        }), status
+
+    streamer, chunks = transmittal_manager.stream_zip_package(package)
+    zip_filename = package['zip_filename']
+
+    def generate():
+        start_time = time.time()
+        yield from chunks
+        report = streamer.report
+        print(f"[API] ZIP streamed: {zip_filename} ({len(report['succeeded'])} files, "
+              f"{len(report['failed'])} failed, {time.time() - start_time:.1f}s)")
+        # 只有整个 ZIP 都已交给客户端才记为已下载（中途断开或出错不记录）
+        _mark_downloaded_quietly(transmittal_id, email)
+
+    return Response(
+        generate(),
+        mimetype='application/zip',
+        headers={
+            'X-File-Count': str(len(package['documents'])),
+            'Content-Disposition': f'attachment; filename="{zip_filename}"'
+        },
+        direct_passthrough=True
+    )
+
+
 @transmittal_bp.route('/<transmittal_id>/download-zip', methods=['POST'])
 @handle_exceptions
 def download_zip(transmittal_id):
@@ -1227,24 +1247,23 @@ def download_zip(transmittal_id):
 
     可选请求体参数:
         {
-            "email": "user@example.com"  # 如果提供，会自动标记该用户已下载
+            "email": "user@example.com",  # 如果提供，会自动标记该用户已下载
+            "stream": true                # 默认流式输出；false 时先生成完整 ZIP 文件再发送
         }
 
     流程:
     1. 从 transmittals_transmittal_documents 表获取所有文档的 URN
-    2. 使用 utils.get_access_token() 获取 ACC API token
-    3. 使用 URNDownloadManager 批量下载文件
-    4. 将所有文件打包成 ZIP
-    5. 返回 ZIP 文件流供下载
+    2. 在有界线程池中并发解析签名 URL 并下载文档
+    3. 每个文档下载完成后立即写入 ZIP 流发送给客户端（已压缩格式使用 ZIP_STORED）
+    4. ZIP 末尾附带 _manifest.json，列出成功与失败的文档
 
     返回:
         - 成功: 返回 ZIP 文件流 (application/zip)
         - 失败: 返回 JSON 错误信息
 
     注意:
-        - 下载大量文件可能需要较长时间
-        - ZIP 文件在发送后会自动清理
-        - 如果部分文件下载失败，会在响应头中包含失败列表
+        - 流式模式下响应头无法携带失败列表，请查看 ZIP 内的 _manifest.json
+        - 非流式模式的 ZIP 文件在发送后会自动清理
     """
     try:
         # 检查是否需要标记用户已下载
@@ -1252,6 +1271,10 @@ def download_zip(transmittal_id):
         data = request.get_json(silent=True)
         if data and 'email' in data:
             email = data['email'].strip()
+        stream = str((data or {}).get('stream', True)).lower() not in ('false', '0', 'no')
+
+        if stream:
+            return _stream_zip_response(transmittal_id, email)
 
         # 创建 ZIP 压缩包
         print(f"[API] Starting ZIP creation for transmittal: {transmittal_id}")
@@ -1273,15 +1296,7 @@ def download_zip(transmittal_id):
         print(f"[API] ZIP created successfully: {zip_filename} ({file_count} files, {total_size} bytes)")
 
         # 如果提供了 email，标记用户已下载
-        if email:
-            try:
-                mark_result = transmittal_manager.mark_downloaded(transmittal_id, email)
-                if mark_result.get('success'):
-                    print(f"[API] Marked as downloaded for user: {email}")
-                else:
-                    print(f"[API] Warning: Failed to mark downloaded for {email}: {mark_result.get('error')}")
-            except Exception as e:
-                print(f"[API] Warning: Exception marking downloaded: {e}")
+        _mark_downloaded_quietly(transmittal_id, email)
 
         # 准备响应头
         headers = {
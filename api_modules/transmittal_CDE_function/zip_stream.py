@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""
+并行下载 + 流式 ZIP 打包
+
+文档在有界线程池中并发解析/下载，完成一个就立即写入 ZIP 流并交给客户端，
+不需要先把全部文件落盘再整体压缩。已压缩格式使用 ZIP_STORED，
+失败的文档记录在末尾的清单文件中。
+"""
+
+import json
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+# 本身已压缩的格式：再 DEFLATE 只浪费 CPU
+PRECOMPRESSED_EXTENSIONS = {
+    'pdf', 'dwg', 'dwf', 'dwfx', 'rvt', 'rfa', 'rte', 'nwd', 'nwc',
+    'zip', '7z', 'rar', 'gz', 'tgz', 'bz2', 'xz',
+    'jpg', 'jpeg', 'png', 'gif', 'webp', 'heic',
+    'mp3', 'mp4', 'mov', 'avi', 'mkv',
+    'docx', 'xlsx', 'pptx', 'ifczip'
+}
+
+
+def compress_type_for(file_name: str) -> int:
+    """按扩展名选择压缩方式"""
+    ext = file_name.rsplit('.', 1)[-1].lower() if '.' in file_name else ''
+    return zipfile.ZIP_STORED if ext in PRECOMPRESSED_EXTENSIONS else zipfile.ZIP_DEFLATED
+
+
+class _ZipStreamBuffer:
+    """
+    ZipFile 的只写输出目标：累积写入的字节，由生成器定期取走
+
+    不提供 seek/tell，ZipFile 会按不可寻址流处理（使用 data descriptor）
+    """
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self.bytes_written = 0
+
+    def write(self, data) -> int:
+        if data:
+            self._chunks.append(bytes(data))
+            self.bytes_written += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class ParallelZipStreamer:
+    """
+    并发获取文档并以流的形式输出 ZIP
+
+    用法:
+        streamer = ParallelZipStreamer(fetch_document, max_workers=6)
+        for chunk in streamer.stream(documents, manifest_extra={...}):
+            ...
+        streamer.report  # {'succeeded': [...], 'failed': [...]}
+
+    documents 中每项必须带 arcname（ZIP 内文件名），其余字段原样传给 fetch_fn。
+    fetch_fn(document, file_obj) 负责把文档内容写入 file_obj，失败时抛出异常。
+    """
+
+    MANIFEST_NAME = '_manifest.json'
+
+    def __init__(self, fetch_fn: Callable[[Dict[str, Any], Any], None], max_workers: int = 6,
+                 chunk_size: int = 1024 * 1024, spool_max_size: int = 32 * 1024 * 1024):
+        self.fetch_fn = fetch_fn
+        self.max_workers = max(1, max_workers)
+        self.chunk_size = chunk_size
+        # 单个文档在内存中缓冲的上限，超过后转存到临时文件
+        self.spool_max_size = spool_max_size
+
+        self.report: Dict[str, Any] = {'succeeded': [], 'failed': []}
+        self._lock = threading.Lock()
+
+    def _fetch(self, document: Dict[str, Any]):
+        """线程池任务：把文档内容获取到 SpooledTemporaryFile"""
+        spool = tempfile.SpooledTemporaryFile(max_size=self.spool_max_size)
+        try:
+            self.fetch_fn(document, spool)
+            spool.seek(0)
+            return spool
+        except BaseException:
+            spool.close()
+            raise
+
+    def _write_entry(self, zf: zipfile.ZipFile, buffer: _ZipStreamBuffer,
+                     arcname: str, source) -> Iterator[bytes]:
+        """把一个文档写入 ZIP，每写一块就把已生成的字节交出去"""
+        info = zipfile.ZipInfo(arcname, date_time=datetime.now().timetuple()[:6])
+        info.compress_type = compress_type_for(arcname)
+        info.external_attr = 0o644 << 16
+
+        size = 0
+        with zf.open(info, 'w', force_zip64=True) as dest:
+            while True:
+                chunk = source.read(self.chunk_size)
+                if not chunk:
+                    break
+                dest.write(chunk)
+                size += len(chunk)
+                data = buffer.drain()
+                if data:
+                    yield data
+
+        data = buffer.drain()
+        if data:
+            yield data
+        return size
+
+    def stream(self, documents: List[Dict[str, Any]],
+               manifest_extra: Optional[Dict[str, Any]] = None) -> Iterator[bytes]:
+        """
+        生成 ZIP 字节流
+
+        Args:
+            documents: 文档列表（需包含 arcname）
+            manifest_extra: 写入清单的附加信息
+
+        Yields:
+            ZIP 数据块
+        """
+        buffer = _ZipStreamBuffer()
+        zf = zipfile.ZipFile(buffer, 'w', allowZip64=True)
+        pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='zip-fetch')
+        pending = {}
+        remaining = iter(documents)
+
+        def submit_next():
+            document = next(remaining, None)
+            if document is not None:
+                pending[pool.submit(self._fetch, document)] = document
+
+        try:
+            # 并发窗口等于线程数：最多同时缓冲 max_workers 个已完成的文档
+            for _ in range(self.max_workers):
+                submit_next()
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    document = pending.pop(future)
+                    submit_next()
+
+                    try:
+                        spool = future.result()
+                    except Exception as e:
+                        self._record_failure(document, e)
+                        continue
+
+                    with spool:
+                        size = yield from self._write_entry(zf, buffer, document['arcname'], spool)
+                    with self._lock:
+                        self.report['succeeded'].append({'file_name': document['arcname'], 'size': size})
+
+            # 末尾写入清单，记录成功与失败的文档
+            manifest = {
+                **(manifest_extra or {}),
+                'generated_at': datetime.utcnow().isoformat() + 'Z',
+                'file_count': len(self.report['succeeded']),
+                'failed_count': len(self.report['failed']),
+                'files': self.report['succeeded'],
+                'failed_files': self.report['failed']
+            }
+            zf.writestr(self.MANIFEST_NAME, json.dumps(manifest, ensure_ascii=False, indent=2, default=str),
+                        compress_type=zipfile.ZIP_DEFLATED)
+            zf.close()
+
+            data = buffer.drain()
+            if data:
+                yield data
+
+        finally:
+            # 客户端中途断开时取消尚未开始的任务；已完成和仍在下载的任务在完成时释放缓冲文件
+            pool.shutdown(wait=False, cancel_futures=True)
+            for future in pending:
+                future.add_done_callback(self._close_result)
+
+    @staticmethod
+    def _close_result(future):
+        """关闭未写入 ZIP 的任务结果（已完成的任务立即调用）"""
+        if not future.cancelled() and future.exception() is None:
+            future.result().close()
+
+    def _record_failure(self, document: Dict[str, Any], error: Exception):
+        entry = {
+            'file_name': document.get('file_name') or document['arcname'],
+            'urn': document.get('urn'),
+            'error': str(error)
+        }
+        with self._lock:
+            self.report['failed'].append(entry)
+        print(f"[ZIP] ✗ Failed: {entry['file_name']}: {error}")
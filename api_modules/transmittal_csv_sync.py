@@ -5,14 +5,17 @@ Transmittal CSV Full Sync Script
 Synchronizes transmittal data from CSV files to PostgreSQL database.
 
 Usage:
-    python api_modules/transmittal_csv_sync.py <project_id>
+    python api_modules/transmittal_csv_sync.py [--full]
 
 Example:
-    python api_modules/transmittal_csv_sync.py b.1eea4119-3553-4167-b93d-3a3d5d07d33d
+    python api_modules/transmittal_csv_sync.py          # incremental (default)
+    python api_modules/transmittal_csv_sync.py --full   # truncate and reload
 
 Features:
     - Auto-detects and validates required CSV files
-    - Clears existing transmittal data before sync
+    - Incremental mode: skips unchanged CSV files (SHA-256 checksum) and
+      applies only inserts, updates and deletes in a single transaction
+    - Full mode: clears existing transmittal data before sync
     - Batch inserts data with proper type conversion
     - Maintains referential integrity (parent → child order)
     - Detailed sync reporting with statistics
@@ -22,6 +25,8 @@ Features:
 import os
 import sys
 import csv
+import json
+import hashlib
 from pathlib import Path
 from datetime import datetime
 from typing import Dict, List, Tuple
@@ -45,15 +50,16 @@ class TransmittalCSVSync:
         'transmittals_transmittal_non_members.csv': 'transmittals_transmittal_non_members'
     }
 
-    def __init__(self, csv_folder: Path = None):
+    def __init__(self, csv_folder: Path = None, dal: TransmittalDataAccess = None):
         """
         Initialize CSV sync manager.
 
         Args:
             csv_folder: Path to folder containing CSV files (default: ./transmittal)
+            dal: Data access layer (default: TransmittalDataAccess())
         """
         self.csv_folder = csv_folder or PROJECT_ROOT / "transmittal"
-        self.dal = TransmittalDataAccess()
+        self.dal = dal or TransmittalDataAccess()
 
     def validate_csv_files(self) -> Tuple[bool, List[str], List[str]]:
         """
@@ -113,6 +119,49 @@ class TransmittalCSVSync:
 
         return data, len(data)
 
+    def file_checksum(self, filename: str) -> str:
+        """
+        Compute the SHA-256 checksum of a CSV file without loading it into memory.
+
+        Args:
+            filename: CSV filename
+
+        Returns:
+            Hex digest
+        """
+        digest = hashlib.sha256()
+        with open(self.csv_folder / filename, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @staticmethod
+    def row_hash(row: Dict) -> str:
+        """
+        Hash a CSV row so unchanged rows can be skipped during merge.
+
+        Args:
+            row: CSV row dictionary (as returned by read_csv_file)
+
+        Returns:
+            MD5 hex digest of the row values
+        """
+        return hashlib.md5(json.dumps(row, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+    def get_converters(self) -> Dict:
+        """
+        Row converter for each CSV file.
+
+        Returns:
+            Dict mapping CSV filename to its conversion method
+        """
+        return {
+            'transmittals_workflow_transmittals.csv': self.convert_transmittal_row,
+            'transmittals_transmittal_documents.csv': self.convert_document_row,
+            'transmittals_transmittal_recipients.csv': self.convert_recipient_row,
+            'transmittals_transmittal_non_members.csv': self.convert_non_member_row
+        }
+
     def convert_transmittal_row(self, row: Dict) -> Dict:
         """
         Convert CSV row to database format for workflow_transmittals.
@@ -217,16 +266,23 @@ class TransmittalCSVSync:
             'updated_at': datetime.fromisoformat(row['updated_at'].replace('Z', '+00:00'))
         }
 
-    def sync_to_database(self) -> Dict:
+    def sync_to_database(self, incremental: bool = False) -> Dict:
         """
-        Perform full sync from CSV files to database.
+        Perform sync from CSV files to database.
+
+        Args:
+            incremental: Apply only changes (see sync_incremental) instead of truncate-and-reload
 
         Returns:
             Sync result dictionary with statistics
         """
+        if incremental:
+            return self.sync_incremental()
+
         start_time = datetime.now()
         result = {
             'success': False,
+            'mode': 'full',
             'database_name': 'neondb',
             'csv_folder': str(self.csv_folder),
             'files_processed': {},
@@ -343,6 +399,122 @@ class TransmittalCSVSync:
 
         return result
 
+    def sync_incremental(self) -> Dict:
+        """
+        Perform incremental sync from CSV files to database.
+
+        CSV files whose checksum matches the last successful sync are skipped.
+        Changed files are treated as full snapshots of their table: rows are
+        hashed, staged and merged (insert new, update changed, delete missing)
+        in a single transaction, so readers never see a partially loaded table.
+
+        Returns:
+            Sync result dictionary with statistics
+        """
+        start_time = datetime.now()
+        result = {
+            'success': False,
+            'mode': 'incremental',
+            'database_name': 'neondb',
+            'csv_folder': str(self.csv_folder),
+            'files_processed': {},
+            'files_skipped': [],
+            'tables_cleared': {},
+            'records_inserted': {},
+            'records_updated': {},
+            'records_deleted': {},
+            'total_records': 0,
+            'duration_seconds': 0,
+            'error': None
+        }
+
+        try:
+            # Step 1: Validate CSV files
+            print("Step 1: Validating CSV files...")
+            all_valid, found_files, missing_files = self.validate_csv_files()
+
+            if not all_valid:
+                error_msg = f"Missing CSV files: {', '.join(missing_files)}"
+                result['error'] = error_msg
+                print(f"[FAIL] {error_msg}")
+                print(f"Expected location: {self.csv_folder}")
+                return result
+
+            print(f"[OK] All {len(found_files)} CSV files found in {self.csv_folder}\n")
+
+            # Step 2: Compare file checksums with the last sync
+            print("Step 2: Detecting changed CSV files...")
+            previous = self.dal.get_file_checksums()
+            changed_files = {}
+            for filename in self.CSV_FILE_MAPPING.keys():
+                checksum = self.file_checksum(filename)
+                if previous.get(filename) == checksum:
+                    result['files_skipped'].append(filename)
+                    print(f"  [SKIP] {filename}: unchanged")
+                else:
+                    changed_files[filename] = checksum
+                    print(f"  [OK] {filename}: changed")
+            print()
+
+            if changed_files:
+                # Step 3: Read, convert and hash changed files
+                print("Step 3: Reading changed CSV files...")
+                converters = self.get_converters()
+                changes = {}
+                file_states = []
+                for filename, checksum in changed_files.items():
+                    data, count = self.read_csv_file(filename)
+                    rows = []
+                    for row in data:
+                        converted = converters[filename](row)
+                        converted['row_hash'] = self.row_hash(row)
+                        rows.append(converted)
+                    changes[self.CSV_FILE_MAPPING[filename]] = rows
+                    file_states.append({'file_name': filename, 'checksum': checksum, 'row_count': count})
+                    result['files_processed'][filename] = count
+                    print(f"  [OK] {filename}: {count} rows")
+                print()
+
+                # Step 4: Merge changes in a single transaction
+                print("Step 4: Merging changes into database...")
+                merge_stats = self.dal.merge_incremental(changes, file_states)
+                for table, stats in merge_stats.items():
+                    short_name = table.replace('transmittals_', '')
+                    result['records_inserted'][short_name] = stats['inserted']
+                    result['records_updated'][short_name] = stats['updated']
+                    result['records_deleted'][short_name] = stats['deleted']
+                    print(f"  [OK] {short_name}: {stats['inserted']} inserted, {stats['updated']} updated, "
+                          f"{stats['deleted']} deleted, {stats['unchanged']} unchanged")
+                print()
+            else:
+                print("[OK] No CSV changes since last sync\n")
+
+            # Step 5: Verify sync
+            print("Step 5: Verifying sync...")
+            table_counts = self.dal.get_table_counts()
+            result['total_records'] = sum(table_counts.values())
+            for table, count in table_counts.items():
+                short_name = table.replace('transmittals_', '')
+                print(f"  [OK] {short_name}: {count} records")
+
+            result['success'] = True
+
+        except FileNotFoundError as e:
+            result['error'] = str(e)
+            print(f"\n❌ File Error: {e}")
+        except ValueError as e:
+            result['error'] = str(e)
+            print(f"\n❌ Data Error: {e}")
+        except Exception as e:
+            result['error'] = f"Unexpected error: {e}"
+            print(f"\n❌ Error: {e}")
+            import traceback
+            traceback.print_exc()
+
+        result['duration_seconds'] = (datetime.now() - start_time).total_seconds()
+
+        return result
+
     def print_summary(self, result: Dict):
         """
         Print formatted sync summary.
@@ -351,7 +523,7 @@ class TransmittalCSVSync:
             result: Sync result dictionary
         """
         print("\n" + "=" * 70)
-        print("📊 TRANSMITTAL CSV FULL SYNC REPORT")
+        print(f"📊 TRANSMITTAL CSV {result.get('mode', 'full').upper()} SYNC REPORT")
         print("=" * 70)
         print(f"Database: {result['database_name']}")
         print(f"CSV Folder: {result['csv_folder']}")
@@ -371,10 +543,19 @@ class TransmittalCSVSync:
                 status = "✓" if success else "✗"
                 print(f"  {status} {table.replace('transmittals_', '')}")
 
+        if result.get('files_skipped'):
+            print(f"\n✓ Files Unchanged (skipped):")
+            for filename in result['files_skipped']:
+                print(f"  - {filename}")
+
         if result['records_inserted']:
             print(f"\n✓ Data Synced:")
             for table, count in result['records_inserted'].items():
-                print(f"  - {table}: {count} records inserted")
+                if result.get('mode') == 'incremental':
+                    print(f"  - {table}: {count} inserted, {result['records_updated'].get(table, 0)} updated, "
+                          f"{result['records_deleted'].get(table, 0)} deleted")
+                else:
+                    print(f"  - {table}: {count} records inserted")
 
         print(f"\nTotal Records: {result['total_records']}")
 
@@ -386,11 +567,18 @@ class TransmittalCSVSync:
 
 def main():
     """Main execution function"""
+    incremental = '--full' not in sys.argv[1:]
+    mode = 'INCREMENTAL' if incremental else 'FULL'
+
     print("=" * 70)
-    print("TRANSMITTAL CSV FULL SYNC")
+    print(f"TRANSMITTAL CSV {mode} SYNC")
     print("=" * 70)
     print("Description:")
-    print("  Performs full sync of transmittal data from CSV files to database.")
+    if incremental:
+        print("  Applies only changed transmittal rows from CSV files to database.")
+        print("  Unchanged CSV files are skipped. Use --full to truncate and reload.")
+    else:
+        print("  Performs full sync of transmittal data from CSV files to database.")
     print("  CSV files must be located in the 'transmittal/' folder.\n")
     print("Required CSV files:")
     for filename in TransmittalCSVSync.CSV_FILE_MAPPING.keys():
@@ -400,7 +588,7 @@ def main():
 
     # Perform sync
     sync_manager = TransmittalCSVSync()
-    result = sync_manager.sync_to_database()
+    result = sync_manager.sync_to_database(incremental=incremental)
 
     # Print summary
     sync_manager.print_summary(result)
@@ -168,6 +168,15 @@ if TASK_TRACKING_API_AVAILABLE:
     except Exception as e:
         safe_print(f"⚠️ Failed to start Task Lifecycle Manager: {e}")
 
+# 多項目同步調度器（需設置 SYNC_SCHEDULER_ENABLED=1）
+if os.getenv('SYNC_SCHEDULER_ENABLED') == '1':
+    try:
+        from api_modules.sync_scheduler import get_sync_scheduler
+        get_sync_scheduler().start()
+        safe_print("🚀 Sync Scheduler started")
+    except Exception as e:
+        safe_print(f"⚠️ Failed to start Sync Scheduler: {e}")
+
 # 注册優化同步API蓝图（如果可用）
 if OPTIMIZED_SYNC_API_AVAILABLE:
     app.register_blueprint(optimized_sync_bp)
@@ -377,6 +386,52 @@ def health_check():
         }
     }
 
+# 数据库连接池指标
+@app.route('/api/db/pool-stats')
+def get_db_pool_stats():
+    """数据库连接池指标（等待时间分位数、借出次数、占用中的连接数）"""
+    try:
+        from database_sql.pg_pool import get_pool_stats
+        return jsonify({"success": True, "data": get_pool_stats()})
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/acc/http-metrics')
+def get_acc_http_metrics():
+    """ACC API 调用指标（按端点统计延迟、重试、429 次数，各分组当前限流速率）"""
+    try:
+        from api_modules.acc_http_client import get_acc_client
+        return jsonify({"success": True, "data": get_acc_client().get_metrics()})
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/review/membership-metrics')
+def get_membership_metrics():
+    """审批权限检查使用的项目成员索引指标（命中率、加载次数、各项目缓存规模）"""
+    try:
+        from database_sql.membership_index import get_membership_index
+        return jsonify({"success": True, "data": get_membership_index().get_metrics()})
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/sync/scheduler-metrics')
+def get_sync_scheduler_metrics():
+    """同步调度器指标（各项目轮询间隔、数据新鲜度、API 预算余量）"""
+    try:
+        from api_modules.sync_scheduler import get_sync_scheduler
+        return jsonify({"success": True, "data": get_sync_scheduler().get_metrics()})
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/async-bridge/metrics')
+def get_async_bridge_metrics():
+    """后台事件循环桥指标（调度延迟、在途调用、超时与取消次数）"""
+    try:
+        from database_sql.async_bridge import get_async_bridge
+        return jsonify({"success": True, "data": get_async_bridge().get_metrics()})
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
 # 配置API端点
 @app.route('/api/config/monitoring')
 def get_monitoring_config():
@@ -632,6 +687,13 @@ if __name__ == '__main__':
         except Exception as e:
             safe_print(f"Error shutting down download executor: {e}")
         
+        # 关闭数据库连接池
+        try:
+            from database_sql.pg_pool import close_all_pools
+            close_all_pools()
+        except Exception as e:
+            safe_print(f"Error closing database pools: {e}")
+        
         safe_print("Background services stopped")
     
     def signal_handler(signum, frame):
@@ -58,6 +58,11 @@ SECRET_KEY = 'acc-forms-sync-poc-secret-key-change-in-production'
 MONITORING_INTERVAL_SECONDS = 30  # 监察间隔（秒）- 默认30秒
 MONITORING_ENABLED = True  # 是否启用监测功能
 
+# 本地文件下载缓存（按版本/存储 URN 缓存 S3 文件，重复下载不再访问 S3）
+BLOB_CACHE_ENABLED = os.getenv('BLOB_CACHE_ENABLED', 'true').lower() == 'true'
+BLOB_CACHE_DIR = os.getenv('BLOB_CACHE_DIR')  # 默认: <系统临时目录>/acc_blob_cache
+BLOB_CACHE_MAX_BYTES = int(os.getenv('BLOB_CACHE_MAX_BYTES', str(10 * 1024 ** 3)))  # 默认 10GB
+
 # 数据库同步配置
 ENABLE_REVIEW_SYNC = True  # 启用Review数据同步
 ENABLE_FILE_SYNC = True    # 启用文件数据同步
@@ -278,6 +278,31 @@ CREATE TRIGGER trigger_update_account_project_count
     AFTER INSERT OR DELETE ON projects
     FOR EACH ROW EXECUTE FUNCTION update_account_project_count();
 
+-- 项目成员变化时刷新用户收件箱（user_inbox 由 create_user_inbox.sql 创建；重建账户表后在此恢复触发器）
+DO $$
+BEGIN
+    IF to_regprocedure('user_inbox_project_users_changed()') IS NOT NULL THEN
+        DROP TRIGGER IF EXISTS trigger_user_inbox_project_users_insert ON project_users;
+        DROP TRIGGER IF EXISTS trigger_user_inbox_project_users_update ON project_users;
+        DROP TRIGGER IF EXISTS trigger_user_inbox_project_users_delete ON project_users;
+
+        CREATE TRIGGER trigger_user_inbox_project_users_insert
+            AFTER INSERT ON project_users
+            REFERENCING NEW TABLE AS changed_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION user_inbox_project_users_changed();
+
+        CREATE TRIGGER trigger_user_inbox_project_users_update
+            AFTER UPDATE ON project_users
+            REFERENCING NEW TABLE AS changed_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION user_inbox_project_users_changed();
+
+        CREATE TRIGGER trigger_user_inbox_project_users_delete
+            AFTER DELETE ON project_users
+            REFERENCING OLD TABLE AS changed_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION user_inbox_project_users_changed();
+    END IF;
+END $$;
+
 -- ============================================================================
 -- 视图定义（简化）
 -- ============================================================================
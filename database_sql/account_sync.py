@@ -27,14 +27,21 @@ try:
     from database_sql.neon_config import NeonConfig
     import psycopg2
     import psycopg2.extras
+    from database_sql.pg_upsert import execute_upsert
     # Import utils for 2-legged token support
     from utils import get_two_legged_token
 except ImportError:
     print("Warning: Could not import database dependencies")
     NeonConfig = None
     psycopg2 = None
+    execute_upsert = None
     get_two_legged_token = None
 
+# 共享的 ACC HTTP 客户端（分组限流、429/5xx 重试、keep-alive 连接池）
+from api_modules.acc_http_client import get_acc_client
+# 审批权限检查使用的项目成员索引，项目用户同步后需失效
+from database_sql.membership_index import invalidate_membership
+
 @dataclass
 class AccountSyncStats:
     """账户同步统计"""
@@ -52,14 +59,25 @@ class AccountSyncStats:
         if self.errors is None:
             self.errors = []
 
+# 分页接口并发获取的页数上限
+DEFAULT_PAGE_CONCURRENCY = 8
+
 class AccountDataSyncManager:
     """账户数据同步管理器"""
     
-    def __init__(self):
-        """初始化同步管理器"""
+    def __init__(self, page_concurrency: int = DEFAULT_PAGE_CONCURRENCY):
+        """
+        初始化同步管理器
+        
+        Args:
+            page_concurrency: 分页接口同时请求的页数上限
+        """
         self.neon_config = NeonConfig() if NeonConfig else None
         self.db_params = self.neon_config.get_db_params() if self.neon_config else {}
         self.stats = AccountSyncStats()
+        self.page_concurrency = max(1, page_concurrency)
+        # full_account_sync 期间缓存分页结果，角色提取与用户同步共用同一份数据
+        self._page_cache: Optional[Dict[str, List[Dict]]] = None
     
     def get_connection(self):
         """获取数据库连接"""
@@ -382,6 +400,118 @@ class AccountDataSyncManager:
             if conn:
                 conn.close()
     
+    # ========================================================================
+    # 分页获取与集合式 UPSERT（公共工具）
+    # ========================================================================
+    
+    async def _fetch_page(
+        self,
+        session: aiohttp.ClientSession,
+        url: str,
+        headers: Dict[str, str],
+        params: Dict[str, Any]
+    ) -> Tuple[List[Dict], Optional[int]]:
+        """
+        获取一页数据
+        
+        Returns:
+            (本页记录, totalResults)；HQ 接口直接返回数组，没有总数时为 None
+        """
+        async with session.get(url, headers=headers, params=params) as response:
+            if response.status != 200:
+                error_text = await response.text()
+                raise Exception(f"API调用失败: {response.status} - {error_text}")
+            
+            data = await response.json()
+        
+        if isinstance(data, list):
+            return data, None
+        
+        items = data.get('results', []) if data else []
+        total = (data.get('pagination') or {}).get('totalResults') if data else None
+        return items, total
+    
+    async def _fetch_offset_pages(
+        self,
+        session: aiohttp.ClientSession,
+        url: str,
+        headers: Dict[str, str],
+        params: Dict[str, Any],
+        limit: int,
+        label: str,
+        show_progress: bool = True
+    ) -> List[Dict]:
+        """
+        按 offset 分页获取全部记录：先取第一页，其余页并发获取（最多 page_concurrency 个同时进行）
+        
+        - 响应带 totalResults 时，一次性并发请求剩余所有 offset
+        - 没有总数时（HQ 接口），每轮并发请求 page_concurrency 页，直到出现不满一页的结果
+        结果按 offset 顺序合并。
+        """
+        cache_key = f"{url}?{json.dumps(params, sort_keys=True)}&limit={limit}"
+        if self._page_cache is not None and cache_key in self._page_cache:
+            if show_progress:
+                print(f"   📡 {label}: 使用本次同步已获取的 {len(self._page_cache[cache_key])} 条数据")
+            return list(self._page_cache[cache_key])
+        
+        semaphore = asyncio.Semaphore(self.page_concurrency)
+        
+        async def fetch(offset: int) -> Tuple[List[Dict], Optional[int]]:
+            async with semaphore:
+                return await self._fetch_page(session, url, headers, {**params, 'limit': limit, 'offset': offset})
+        
+        if show_progress:
+            print(f"   📡 获取{label}: offset=0, limit={limit}")
+        
+        first_page, total = await fetch(0)
+        pages = [first_page]
+        
+        if total is not None:
+            offsets = list(range(limit, total, limit))
+            if offsets and show_progress:
+                print(f"   📡 获取{label}: 并发请求剩余 {len(offsets)} 页 (共 {total} 条)")
+            results = await asyncio.gather(*(fetch(offset) for offset in offsets))
+            pages.extend(items for items, _ in results)
+        else:
+            offset = limit
+            done = len(first_page) < limit
+            while not done:
+                offsets = [offset + i * limit for i in range(self.page_concurrency)]
+                if show_progress:
+                    print(f"   📡 获取{label}: offset={offsets[0]}..{offsets[-1]}, limit={limit}")
+                results = await asyncio.gather(*(fetch(o) for o in offsets))
+                for items, _ in results:
+                    pages.append(items)
+                    if len(items) < limit:
+                        done = True
+                        break
+                offset += len(offsets) * limit
+        
+        all_items = []
+        for items in pages:
+            all_items.extend(items)
+            if len(items) < limit and total is None:
+                break
+        
+        if show_progress:
+            print(f"      获取到 {len(all_items)} 个{label}")
+        
+        if self._page_cache is not None:
+            self._page_cache[cache_key] = all_items
+        return list(all_items)
+    
+    def _transform_rows(self, items: List[Dict], transform, label: str) -> List[Dict]:
+        """逐条转换数据，转换失败的记录写入错误列表后跳过"""
+        rows = []
+        for item in items:
+            try:
+                rows.append(transform(item))
+            except Exception as e:
+                error_msg = f"处理{label}失败 {item.get('id', 'unknown')}: {str(e)}"
+                self.stats.errors.append(error_msg)
+                print(f"      [ERROR] {error_msg}")
+        return rows
+    
     # ========================================================================
     # 用户同步 (基于 ACC Account Users API)
     # ========================================================================
@@ -459,47 +589,17 @@ class AccountDataSyncManager:
         headers: Dict[str, str],
         show_progress: bool = True
     ) -> List[Dict]:
-        """获取所有账户用户（分页）"""
-        all_users = []
-        offset = 0
-        limit = 100  # API最大限制
-        
-        while True:
-            url = f"https://developer.api.autodesk.com/hq/v1/accounts/{account_id}/users"
-            params = {
-                'limit': limit,
-                'offset': offset,
-                'sort': 'name'
-            }
-            
-            if show_progress:
-                print(f"   📡 获取用户数据: offset={offset}, limit={limit}")
-            
-            async with session.get(url, headers=headers, params=params) as response:
-                if response.status != 200:
-                    error_text = await response.text()
-                    raise Exception(f"API调用失败: {response.status} - {error_text}")
-                
-                users = await response.json()
-                
-                if not users:
-                    break
-                
-                all_users.extend(users)
-                
-                if show_progress:
-                    print(f"      获取到 {len(users)} 个用户，总计 {len(all_users)}")
-                
-                # 检查是否还有更多数据
-                if len(users) < limit:
-                    break
-                
-                offset += limit
-        
-        return all_users
+        """获取所有账户用户（第一页之后并发分页）"""
+        url = f"https://developer.api.autodesk.com/hq/v1/accounts/{account_id}/users"
+        return await self._fetch_offset_pages(
+            session, url, headers, {'sort': 'name'},
+            limit=100,  # API最大限制
+            label='用户数据',
+            show_progress=show_progress
+        )
     
     def _batch_upsert_users(self, account_id: str, users: List[Dict]) -> Tuple[int, int]:
-        """批量UPSERT用户"""
+        """批量UPSERT用户（execute_values 集合写入）"""
         if not users:
             return 0, 0
         
@@ -508,15 +608,11 @@ class AccountDataSyncManager:
             conn = self.get_connection()
             cursor = conn.cursor()
             
-            # 准备批量UPSERT SQL（简化版）
             upsert_sql = """
                 INSERT INTO users (
                     user_id, account_id, email, name, status, company_id,
                     default_role_id, account_roles, created_at, updated_at
-                ) VALUES (
-                    %(user_id)s, %(account_id)s, %(email)s, %(name)s, %(status)s, %(company_id)s,
-                    %(default_role_id)s, %(account_roles)s, %(created_at)s, %(updated_at)s
-                )
+                ) VALUES %s
                 ON CONFLICT (user_id)
                 DO UPDATE SET
                     email = EXCLUDED.email,
@@ -528,27 +624,16 @@ class AccountDataSyncManager:
                     updated_at = EXCLUDED.updated_at
                 RETURNING (xmax = 0) AS inserted
             """
+            template = """(
+                %(user_id)s, %(account_id)s, %(email)s, %(name)s, %(status)s, %(company_id)s,
+                %(default_role_id)s, %(account_roles)s, %(created_at)s, %(updated_at)s
+            )"""
             
-            # 处理每个用户
-            results = []
-            for user in users:
-                try:
-                    user_data = self._transform_user_data(account_id, user)
-                    cursor.execute(upsert_sql, user_data)
-                    result = cursor.fetchone()
-                    if result:
-                        results.append(result)
-                except Exception as e:
-                    error_msg = f"处理用户失败 {user.get('id', 'unknown')}: {str(e)}"
-                    self.stats.errors.append(error_msg)
-                    print(f"      [ERROR] {error_msg}")
+            rows = self._transform_rows(users, lambda user: self._transform_user_data(account_id, user), '用户')
+            inserted, updated = execute_upsert(cursor, upsert_sql, template, rows, ('user_id',))
             
             conn.commit()
             
-            # 统计结果 (users return single boolean value)
-            inserted = sum(1 for result in results if result[0] == True)
-            updated = len(results) - inserted
-            
             return inserted, updated
             
         except Exception as e:
@@ -689,47 +774,17 @@ class AccountDataSyncManager:
         headers: Dict[str, str],
         show_progress: bool = True
     ) -> List[Dict]:
-        """获取所有项目公司（分页）"""
-        all_companies = []
-        offset = 0
-        limit = 100  # API最大限制
-        
-        while True:
-            url = f"https://developer.api.autodesk.com/hq/v1/accounts/{account_id}/projects/{project_id}/companies"
-            params = {
-                'limit': limit,
-                'offset': offset,
-                'sort': 'name'
-            }
-            
-            if show_progress:
-                print(f"   📡 获取公司数据: offset={offset}, limit={limit}")
-            
-            async with session.get(url, headers=headers, params=params) as response:
-                if response.status != 200:
-                    error_text = await response.text()
-                    raise Exception(f"API调用失败: {response.status} - {error_text}")
-                
-                companies = await response.json()
-                
-                if not companies:
-                    break
-                
-                all_companies.extend(companies)
-                
-                if show_progress:
-                    print(f"      获取到 {len(companies)} 个公司，总计 {len(all_companies)}")
-                
-                # 检查是否还有更多数据
-                if len(companies) < limit:
-                    break
-                
-                offset += limit
-        
-        return all_companies
+        """获取所有项目公司（第一页之后并发分页）"""
+        url = f"https://developer.api.autodesk.com/hq/v1/accounts/{account_id}/projects/{project_id}/companies"
+        return await self._fetch_offset_pages(
+            session, url, headers, {'sort': 'name'},
+            limit=100,  # API最大限制
+            label='公司数据',
+            show_progress=show_progress
+        )
     
     def _batch_upsert_companies(self, account_id: str, project_id: str, companies: List[Dict]) -> Tuple[int, int]:
-        """批量UPSERT公司"""
+        """批量UPSERT公司（execute_values 集合写入）"""
         if not companies:
             return 0, 0
         
@@ -738,13 +793,10 @@ class AccountDataSyncManager:
             conn = self.get_connection()
             cursor = conn.cursor()
             
-            # 准备批量UPSERT SQL（简化版）
             upsert_sql = """
                 INSERT INTO companies (
                     company_id, account_id, name, trade, country, created_at, updated_at
-                ) VALUES (
-                    %(company_id)s, %(account_id)s, %(name)s, %(trade)s, %(country)s, %(created_at)s, %(updated_at)s
-                )
+                ) VALUES %s
                 ON CONFLICT (company_id)
                 DO UPDATE SET
                     name = EXCLUDED.name,
@@ -753,27 +805,17 @@ class AccountDataSyncManager:
                     updated_at = EXCLUDED.updated_at
                 RETURNING (xmax = 0) AS inserted
             """
+            template = """(
+                %(company_id)s, %(account_id)s, %(name)s, %(trade)s, %(country)s, %(created_at)s, %(updated_at)s
+            )"""
             
-            # 处理每个公司
-            results = []
-            for company in companies:
-                try:
-                    company_data = self._transform_company_data(account_id, project_id, company)
-                    cursor.execute(upsert_sql, company_data)
-                    result = cursor.fetchone()
-                    if result:
-                        results.append(result)
-                except Exception as e:
-                    error_msg = f"处理公司失败 {company.get('id', 'unknown')}: {str(e)}"
-                    self.stats.errors.append(error_msg)
-                    print(f"      [ERROR] {error_msg}")
+            rows = self._transform_rows(
+                companies, lambda company: self._transform_company_data(account_id, project_id, company), '公司'
+            )
+            inserted, updated = execute_upsert(cursor, upsert_sql, template, rows, ('company_id',))
             
             conn.commit()
             
-            # 统计结果 (companies return single boolean value)
-            inserted = sum(1 for result in results if result[0] == True)
-            updated = len(results) - inserted
-            
             return inserted, updated
             
         except Exception as e:
@@ -910,7 +952,7 @@ class AccountDataSyncManager:
             return {'roles_synced': 0}
     
     def _batch_upsert_roles(self, roles_set: set, show_progress: bool = True) -> int:
-        """批量UPSERT角色"""
+        """批量UPSERT角色（execute_values 集合写入）"""
         if not roles_set:
             return 0
         
@@ -919,48 +961,33 @@ class AccountDataSyncManager:
             conn = self.get_connection()
             cursor = conn.cursor()
             
-            # 准备批量UPSERT SQL
             upsert_sql = """
                 INSERT INTO roles (
                     role_id, name, description, created_at, updated_at
-                ) VALUES (
-                    %(role_id)s, %(name)s, %(description)s, %(created_at)s, %(updated_at)s
-                )
+                ) VALUES %s
                 ON CONFLICT (role_id)
                 DO UPDATE SET
                     name = EXCLUDED.name,
                     updated_at = EXCLUDED.updated_at
                 RETURNING (xmax = 0) AS inserted
             """
+            template = "(%(role_id)s, %(name)s, %(description)s, %(created_at)s, %(updated_at)s)"
             
-            # 处理每个角色
-            results = []
             now = datetime.now(timezone.utc)
-            
-            for role_id, role_name in roles_set:
-                try:
-                    role_data = {
-                        'role_id': role_id,
-                        'name': role_name,
-                        'description': f"Role: {role_name}",  # 简单描述
-                        'created_at': now,
-                        'updated_at': now
-                    }
-                    cursor.execute(upsert_sql, role_data)
-                    result = cursor.fetchone()
-                    if result:
-                        results.append(result)
-                except Exception as e:
-                    error_msg = f"Process role failed {role_id}: {str(e)}"
-                    self.stats.errors.append(error_msg)
-                    if show_progress:
-                        print(f"      [ERROR] {error_msg}")
+            rows = [
+                {
+                    'role_id': role_id,
+                    'name': role_name,
+                    'description': f"Role: {role_name}",  # 简单描述
+                    'created_at': now,
+                    'updated_at': now
+                }
+                for role_id, role_name in roles_set
+            ]
+            inserted, _ = execute_upsert(cursor, upsert_sql, template, rows, ('role_id',))
             
             conn.commit()
             
-            # 统计结果 (roles return single boolean value)
-            inserted = sum(1 for result in results if result[0] == True)
-            
             return inserted
             
         except Exception as e:
@@ -1016,6 +1043,9 @@ class AccountDataSyncManager:
             self.stats.project_users_synced += inserted
             self.stats.project_users_updated += updated
             
+            # 项目成员（角色、公司）可能已变化
+            invalidate_membership(project_id)
+            
             if show_progress:
                 print(f"   [OK] 项目用户同步完成: {inserted}个新增, {updated}个更新")
             
@@ -1038,55 +1068,24 @@ class AccountDataSyncManager:
         headers: Dict[str, str],
         show_progress: bool = True
     ) -> List[Dict]:
-        """获取所有项目用户（分页）"""
-        all_users = []
-        offset = 0
-        limit = 200  # API最大限制
-        
+        """获取所有项目用户（第一页返回 totalResults 后并发获取其余页）"""
         # 清理项目ID前缀
         clean_project_id = project_id.replace('b.', '') if project_id.startswith('b.') else project_id
         
-        while True:
-            url = f"https://developer.api.autodesk.com/construction/admin/v1/projects/{clean_project_id}/users"
-            params = {
-                'limit': limit,
-                'offset': offset,
-                'sort': 'name',
-                'fields': 'name,email,firstName,lastName,autodeskId,analyticsId,addressLine1,addressLine2,city,stateOrProvince,postalCode,country,imageUrl,phone,jobTitle,industry,aboutMe,accessLevels,companyId,companyName,roleIds,roles,status,addedOn,products'
-            }
-            
-            if show_progress:
-                print(f"   📡 获取项目用户数据: offset={offset}, limit={limit}")
-            
-            async with session.get(url, headers=headers, params=params) as response:
-                if response.status != 200:
-                    error_text = await response.text()
-                    raise Exception(f"API调用失败: {response.status} - {error_text}")
-                
-                data = await response.json()
-                users = data.get('results', [])
-                
-                if not users:
-                    break
-                
-                all_users.extend(users)
-                
-                # 检查是否还有更多数据
-                pagination = data.get('pagination', {})
-                total_results = pagination.get('totalResults', len(users))
-                
-                if show_progress:
-                    print(f"      获取到 {len(users)} 个用户，总计 {len(all_users)}/{total_results}")
-                
-                if offset + len(users) >= total_results:
-                    break
-                
-                offset += limit
-        
-        return all_users
+        url = f"https://developer.api.autodesk.com/construction/admin/v1/projects/{clean_project_id}/users"
+        params = {
+            'sort': 'name',
+            'fields': 'name,email,firstName,lastName,autodeskId,analyticsId,addressLine1,addressLine2,city,stateOrProvince,postalCode,country,imageUrl,phone,jobTitle,industry,aboutMe,accessLevels,companyId,companyName,roleIds,roles,status,addedOn,products'
+        }
+        return await self._fetch_offset_pages(
+            session, url, headers, params,
+            limit=200,  # API最大限制
+            label='项目用户数据',
+            show_progress=show_progress
+        )
     
     def _batch_upsert_project_users(self, project_id: str, users: List[Dict]) -> Tuple[int, int]:
-        """批量UPSERT项目用户"""
+        """批量UPSERT项目用户（execute_values 集合写入）"""
         if not users:
             return 0, 0
         
@@ -1095,19 +1094,13 @@ class AccountDataSyncManager:
             conn = self.get_connection()
             cursor = conn.cursor()
             
-            # 准备批量UPSERT SQL
             upsert_sql = """
                 INSERT INTO project_users (
                     project_id, user_id, project_user_id, autodesk_id, analytics_id,
                     status, access_levels, role_ids, roles, products,
                     project_company_id, project_company_name, added_on,
                     last_synced_at, sync_status, created_at, updated_at
-                ) VALUES (
-                    %(project_id)s, %(user_id)s, %(project_user_id)s, %(autodesk_id)s, %(analytics_id)s,
-                    %(status)s, %(access_levels)s, %(role_ids)s, %(roles)s, %(products)s,
-                    %(project_company_id)s, %(project_company_name)s, %(added_on)s,
-                    %(last_synced_at)s, %(sync_status)s, %(created_at)s, %(updated_at)s
-                )
+                ) VALUES %s
                 ON CONFLICT (project_id, user_id)
                 DO UPDATE SET
                     project_user_id = EXCLUDED.project_user_id,
@@ -1124,29 +1117,24 @@ class AccountDataSyncManager:
                     last_synced_at = EXCLUDED.last_synced_at,
                     sync_status = EXCLUDED.sync_status,
                     updated_at = EXCLUDED.updated_at
-                RETURNING id, (xmax = 0) AS inserted
+                RETURNING (xmax = 0) AS inserted
             """
-            
-            # 处理每个用户
-            results = []
-            for user in users:
-                try:
-                    user_data = self._transform_project_user_data(project_id, user)
-                    cursor.execute(upsert_sql, user_data)
-                    result = cursor.fetchone()
-                    if result:
-                        results.append(result)
-                except Exception as e:
-                    error_msg = f"处理项目用户失败 {user.get('id', 'unknown')}: {str(e)}"
-                    self.stats.errors.append(error_msg)
-                    print(f"      [ERROR] {error_msg}")
+            template = """(
+                %(project_id)s, %(user_id)s, %(project_user_id)s, %(autodesk_id)s, %(analytics_id)s,
+                %(status)s, %(access_levels)s, %(role_ids)s, %(roles)s, %(products)s,
+                %(project_company_id)s, %(project_company_name)s, %(added_on)s,
+                %(last_synced_at)s, %(sync_status)s, %(created_at)s, %(updated_at)s
+            )"""
+            
+            rows = self._transform_rows(
+                users, lambda user: self._transform_project_user_data(project_id, user), '项目用户'
+            )
+            inserted, updated = execute_upsert(
+                cursor, upsert_sql, template, rows, ('project_id', 'user_id')
+            )
             
             conn.commit()
             
-            # 统计结果 (project_users return id and boolean)
-            inserted = sum(1 for _, is_insert in results if is_insert)
-            updated = len(results) - inserted
-            
             return inserted, updated
             
         except Exception as e:
@@ -1470,6 +1458,49 @@ class AccountDataSyncManager:
     # 完整同步流程
     # ========================================================================
     
+    async def _run_full_sync_steps(
+        self,
+        account_id: str,
+        project_ids: List[str],
+        headers: Dict[str, str],
+        show_progress: bool
+    ):
+        """full_account_sync 的 API 同步步骤（公司 -> 角色 -> 用户 -> 项目用户）"""
+        async with get_acc_client().limited_session() as session:
+            # 1. 同步账户信息
+            if show_progress:
+                print(f"\n[SYNC] Syncing account information...")
+            self.sync_account_info(account_id)
+            
+            # 2. 同步项目信息和公司 (必须在用户之前)
+            for project_id in project_ids:
+                if show_progress:
+                    print(f"\n[PROJECT] Processing project: {project_id}")
+                
+                # 同步项目基本信息
+                self.sync_project_info(project_id, account_id)
+                
+                # 同步项目公司 (必须在用户之前，因为用户表有外键引用)
+                await self.sync_project_companies(session, account_id, project_id, headers, show_progress)
+            
+            # 3. 同步角色 (在用户之前，因为用户表有外键引用)
+            if show_progress:
+                print(f"\n[ROLES] Syncing roles...")
+            await self.sync_roles_from_project_users(session, account_id, project_ids, headers, show_progress)
+            
+            # 4. 同步用户 (在公司和角色同步完成后)
+            if show_progress:
+                print(f"\n[USERS] Syncing account users...")
+            await self.sync_account_users(session, account_id, headers, show_progress)
+            
+            # 5. 同步项目用户 (在用户和公司都同步完成后)
+            for project_id in project_ids:
+                if show_progress:
+                    print(f"\n[PROJ_USERS] Processing project users: {project_id}")
+                
+                # 同步项目用户
+                await self.sync_project_users(session, project_id, headers, show_progress)
+    
     async def full_account_sync(
         self,
         account_id: str,
@@ -1519,6 +1550,8 @@ class AccountDataSyncManager:
                 if show_progress:
                     print("   [WARN] Warning: Failed to drop some tables, continuing anyway...")
             
+            invalidate_membership()
+            
             # Recreate schema
             schema_success = self.create_account_schema(show_progress)
             if not schema_success:
@@ -1544,40 +1577,12 @@ class AccountDataSyncManager:
                     'sync_time': datetime.now(timezone.utc).isoformat()
                 }
         
-        async with aiohttp.ClientSession() as session:
-            # 1. 同步账户信息
-            if show_progress:
-                print(f"\n[SYNC] Syncing account information...")
-            self.sync_account_info(account_id)
-            
-            # 2. 同步项目信息和公司 (必须在用户之前)
-            for project_id in project_ids:
-                if show_progress:
-                    print(f"\n[PROJECT] Processing project: {project_id}")
-                
-                # 同步项目基本信息
-                self.sync_project_info(project_id, account_id)
-                
-                # 同步项目公司 (必须在用户之前，因为用户表有外键引用)
-                await self.sync_project_companies(session, account_id, project_id, headers, show_progress)
-            
-            # 3. 同步角色 (在用户之前，因为用户表有外键引用)
-            if show_progress:
-                print(f"\n[ROLES] Syncing roles...")
-            await self.sync_roles_from_project_users(session, account_id, project_ids, headers, show_progress)
-            
-            # 4. 同步用户 (在公司和角色同步完成后)
-            if show_progress:
-                print(f"\n[USERS] Syncing account users...")
-            await self.sync_account_users(session, account_id, headers, show_progress)
-            
-            # 5. 同步项目用户 (在用户和公司都同步完成后)
-            for project_id in project_ids:
-                if show_progress:
-                    print(f"\n[PROJ_USERS] Processing project users: {project_id}")
-                
-                # 同步项目用户
-                await self.sync_project_users(session, project_id, headers, show_progress)
+        # 角色提取和用户同步都需要账户用户 / 项目用户列表，本次同步内只获取一次
+        self._page_cache = {}
+        try:
+            await self._run_full_sync_steps(account_id, project_ids, headers, show_progress)
+        finally:
+            self._page_cache = None
         
         total_time = time.time() - start_time
         
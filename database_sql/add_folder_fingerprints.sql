@@ -0,0 +1,16 @@
+-- ============================================================================
+-- 数据库迁移脚本：文件夹内容指纹
+-- 增量同步在每个完整访问过的文件夹上记录指纹（rollup时间、对象数、子项ID哈希），
+-- 下次增量同步只进入指纹与ACC不一致的子文件夹，API调用数与变化路径长度成正比；
+-- 指纹为空的文件夹（新建或全量同步后尚未被增量同步访问）总是会被访问
+-- ============================================================================
+
+ALTER TABLE folders ADD COLUMN IF NOT EXISTS fingerprint_rollup TIMESTAMP WITH TIME ZONE;
+ALTER TABLE folders ADD COLUMN IF NOT EXISTS fingerprint_object_count INTEGER;
+ALTER TABLE folders ADD COLUMN IF NOT EXISTS fingerprint_child_hash CHAR(32);
+ALTER TABLE folders ADD COLUMN IF NOT EXISTS fingerprint_at TIMESTAMP WITH TIME ZONE;
+
+COMMENT ON COLUMN folders.fingerprint_rollup IS '记录指纹时ACC返回的 lastModifiedTimeRollup';
+COMMENT ON COLUMN folders.fingerprint_object_count IS '记录指纹时ACC返回的 objectCount';
+COMMENT ON COLUMN folders.fingerprint_child_hash IS '直接子项（ID与版本时间）的MD5';
+COMMENT ON COLUMN folders.fingerprint_at IS '指纹记录时间，NULL表示该文件夹子树尚未被完整访问';
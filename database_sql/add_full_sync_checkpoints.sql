@@ -0,0 +1,19 @@
+-- ============================================================================
+-- 数据库迁移脚本：流式全量同步检查点
+-- 流式全量同步每提交一层文件夹（该层的文件夹、文件、版本、自定义属性均已写入）
+-- 就保存下一层待访问的文件夹；中断后从最后提交的层继续，完成后删除检查点
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS full_sync_checkpoints (
+    project_id VARCHAR(255) PRIMARY KEY,
+    task_uuid VARCHAR(255),
+    depth INTEGER NOT NULL,
+    frontier JSONB NOT NULL DEFAULT '[]',
+    counters JSONB NOT NULL DEFAULT '{}',
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+COMMENT ON TABLE full_sync_checkpoints IS '流式全量同步的已提交边界，每个项目最多一条';
+COMMENT ON COLUMN full_sync_checkpoints.depth IS '下一层（待访问文件夹）的深度，之前的层已全部写入';
+COMMENT ON COLUMN full_sync_checkpoints.frontier IS '下一层待访问的文件夹：[{folder: ACC原始数据, parent_path}]';
+COMMENT ON COLUMN full_sync_checkpoints.counters IS '已提交层的累计写入计数';
@@ -0,0 +1,26 @@
+-- ============================================================================
+-- 数据库迁移脚本：评审增量同步水位线
+-- reviews.acc_updated_at 记录每个评审已完整同步的 ACC updatedAt，
+-- review_sync_state 记录每个项目的 updatedAt 水位线
+-- ============================================================================
+
+ALTER TABLE reviews
+ADD COLUMN IF NOT EXISTS acc_updated_at TIMESTAMP WITH TIME ZONE;
+
+COMMENT ON COLUMN reviews.acc_updated_at IS '已完整同步（含文件和步骤）的 ACC updatedAt';
+
+CREATE TABLE IF NOT EXISTS review_sync_state (
+    project_id VARCHAR(255) PRIMARY KEY,
+    watermark TIMESTAMP WITH TIME ZONE,
+    last_run_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    reviews_listed INTEGER DEFAULT 0,
+    reviews_changed INTEGER DEFAULT 0,
+    reviews_failed INTEGER DEFAULT 0
+);
+
+COMMENT ON TABLE review_sync_state IS '评审增量同步状态：每个项目已完整同步的最大 ACC updatedAt';
+
+-- 增量同步按项目读取每个评审的 acc_updated_at
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_reviews_project_acc_updated
+ON reviews (project_id, acc_review_id, acc_updated_at)
+WHERE acc_review_id IS NOT NULL;
@@ -0,0 +1,37 @@
+-- ============================================================================
+-- 数据库迁移脚本：sync_tasks 作为持久化同步任务队列
+-- HTTP 接口只写入 pending 任务（queued_at 非空），由 SyncJobQueue / SyncWorkerPool
+-- 以 FOR UPDATE SKIP LOCKED 认领执行；运行中任务定期写 heartbeat_at，
+-- 心跳超时的任务由恢复流程重新排队或标记失败
+-- ============================================================================
+
+ALTER TABLE sync_tasks ADD COLUMN IF NOT EXISTS priority INTEGER DEFAULT 0;
+ALTER TABLE sync_tasks ADD COLUMN IF NOT EXISTS queued_at TIMESTAMP WITH TIME ZONE;
+ALTER TABLE sync_tasks ADD COLUMN IF NOT EXISTS worker_id VARCHAR(100);
+ALTER TABLE sync_tasks ADD COLUMN IF NOT EXISTS heartbeat_at TIMESTAMP WITH TIME ZONE;
+ALTER TABLE sync_tasks ADD COLUMN IF NOT EXISTS attempts INTEGER DEFAULT 0;
+ALTER TABLE sync_tasks ADD COLUMN IF NOT EXISTS cancel_requested BOOLEAN DEFAULT FALSE;
+ALTER TABLE sync_tasks ADD COLUMN IF NOT EXISTS coalesced_requests INTEGER DEFAULT 0;
+
+COMMENT ON COLUMN sync_tasks.priority IS '队列优先级，数值越大越先执行（增量同步高于全量同步）';
+COMMENT ON COLUMN sync_tasks.queued_at IS '进入队列的时间；为空表示不经过队列直接执行的旧任务';
+COMMENT ON COLUMN sync_tasks.worker_id IS '认领任务的 worker（主机名:进程号）';
+COMMENT ON COLUMN sync_tasks.heartbeat_at IS '运行中任务最近一次心跳';
+COMMENT ON COLUMN sync_tasks.attempts IS '被认领执行的次数';
+COMMENT ON COLUMN sync_tasks.cancel_requested IS '已请求取消，运行中的 worker 在下次心跳时中止';
+COMMENT ON COLUMN sync_tasks.coalesced_requests IS '合并到本任务的重复同步请求数';
+
+-- 认领：按优先级和入队时间取下一个 pending 任务
+CREATE INDEX IF NOT EXISTS idx_sync_tasks_queue_pending
+ON sync_tasks (priority DESC, queued_at)
+WHERE task_status = 'pending' AND queued_at IS NOT NULL;
+
+-- 入队合并与认领时按项目查找 pending / running 任务
+CREATE INDEX IF NOT EXISTS idx_sync_tasks_project_active
+ON sync_tasks (project_id, task_status)
+WHERE task_status IN ('pending', 'running');
+
+-- 每个项目同时只有一个队列任务在运行
+CREATE UNIQUE INDEX IF NOT EXISTS idx_sync_tasks_one_running_per_project
+ON sync_tasks (project_id)
+WHERE task_status = 'running' AND queued_at IS NOT NULL;
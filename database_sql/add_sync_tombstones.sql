@@ -0,0 +1,21 @@
+-- ============================================================================
+-- 数据库迁移脚本：增量同步删除墓碑
+-- 增量同步对比每个有变化文件夹的子项ID集合与ACC实际返回的内容，
+-- ACC中已不存在的文件夹（连同其子树）和文件批量设置 deleted_at，而不是物理删除；
+-- 之后再次出现（恢复或移动回来）时由 upsert 清空 deleted_at
+-- ============================================================================
+
+ALTER TABLE folders ADD COLUMN IF NOT EXISTS deleted_at TIMESTAMP WITH TIME ZONE;
+ALTER TABLE files ADD COLUMN IF NOT EXISTS deleted_at TIMESTAMP WITH TIME ZONE;
+
+COMMENT ON COLUMN folders.deleted_at IS '增量同步发现ACC中已删除的时间，NULL表示存在';
+COMMENT ON COLUMN files.deleted_at IS '增量同步发现ACC中已删除的时间，NULL表示存在';
+
+-- 对账按父文件夹查找未删除的子项
+CREATE INDEX IF NOT EXISTS idx_folders_live_children
+ON folders (project_id, parent_id)
+WHERE deleted_at IS NULL;
+
+CREATE INDEX IF NOT EXISTS idx_files_live_children
+ON files (project_id, parent_folder_id)
+WHERE deleted_at IS NULL;
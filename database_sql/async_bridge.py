@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+"""
+长期运行的后台事件循环：同步 Flask 代码调用异步 DAL 的桥
+
+路由之前在每个请求里 asyncio.run(...)，每次新建并销毁一个事件循环；
+而 asyncpg 连接池绑定在创建它的事件循环上，结果要么每个请求重新建连接池，
+要么跨事件循环报错。这里在一个 daemon 线程中运行一个长期事件循环：
+
+- run_async(coro, timeout) 经 run_coroutine_threadsafe 提交并阻塞等待结果，
+  只需一次线程间调度；超时会取消协程并抛出 AsyncBridgeTimeout
+- 事件循环生命周期内持有 ACC 客户端的 keep-alive 会话，DAL 的连接池也建在这个循环上，
+  请求之间复用热连接
+- 进程退出时取消未完成的协程，关闭会话和连接池
+"""
+
+import os
+import time
+import atexit
+import asyncio
+import logging
+import threading
+import concurrent.futures
+from contextlib import AsyncExitStack
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = float(os.getenv('ASYNC_BRIDGE_TIMEOUT', 60))
+
+
+class AsyncBridgeTimeout(TimeoutError):
+    """桥接调用超时（协程已被取消）"""
+
+
+class AsyncLoopBridge:
+    """
+    后台线程中的长期事件循环
+
+    用法:
+        bridge = AsyncLoopBridge()
+        result = bridge.run(dal_coroutine(), timeout=10)
+    """
+
+    def __init__(self, name: str = 'async-bridge', default_timeout: float = DEFAULT_TIMEOUT):
+        self.name = name
+        self.default_timeout = default_timeout
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+        self._stop_event: Optional[asyncio.Event] = None
+        self._start_lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+
+        # 在事件循环生命周期内保持打开的异步上下文（如 ACC keep-alive 会话）
+        self._scopes: List[Callable[[], Any]] = []
+        # 事件循环退出前执行的清理协程（如关闭连接池）
+        self._shutdown_hooks: List[Callable[[], Awaitable[Any]]] = []
+
+        self._metrics = {
+            'calls': 0,
+            'completed': 0,
+            'errors': 0,
+            'timeouts': 0,
+            'cancelled': 0,
+            'in_flight': 0,
+            'max_in_flight': 0,
+            'schedule_delay_ms_total': 0.0,
+            'schedule_delay_ms_max': 0.0
+        }
+
+    def add_scope(self, factory: Callable[[], Any]):
+        """注册一个异步上下文工厂，事件循环启动时进入、退出时关闭"""
+        self._scopes.append(factory)
+
+    def add_shutdown_hook(self, hook: Callable[[], Awaitable[Any]]):
+        """注册事件循环退出前执行的清理协程"""
+        self._shutdown_hooks.append(hook)
+
+    # ------------------------------------------------------------------
+    # 生命周期
+    # ------------------------------------------------------------------
+
+    def is_running(self) -> bool:
+        return self._loop is not None and self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """启动后台事件循环线程（重复调用无副作用）"""
+        with self._start_lock:
+            if self.is_running():
+                return
+            self._ready.clear()
+            self._thread = threading.Thread(target=self._run_loop, name=self.name, daemon=True)
+            self._thread.start()
+            self._ready.wait()
+            if not self.is_running():
+                raise RuntimeError(f"Async bridge {self.name} failed to start")
+            logger.info(f"Async bridge {self.name} started")
+
+    def stop(self, timeout: float = 10.0):
+        """取消未完成的协程、执行清理并停止事件循环"""
+        loop, thread = self._loop, self._thread
+        if loop is None or thread is None or self._stop_event is None:
+            return
+        try:
+            loop.call_soon_threadsafe(self._stop_event.set)
+        except RuntimeError:
+            return
+        if thread is not threading.current_thread():
+            thread.join(timeout)
+
+    def _run_loop(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self._loop = loop
+        try:
+            loop.run_until_complete(self._main())
+            loop.run_until_complete(loop.shutdown_asyncgens())
+        except Exception as e:
+            logger.error(f"Async bridge {self.name} crashed: {e}")
+        finally:
+            self._loop = None
+            self._ready.set()
+            loop.close()
+
+    async def _main(self):
+        self._stop_event = asyncio.Event()
+        async with AsyncExitStack() as stack:
+            for factory in self._scopes:
+                try:
+                    await stack.enter_async_context(factory())
+                except Exception as e:
+                    logger.warning(f"Async bridge scope unavailable: {e}")
+
+            self._ready.set()
+            await self._stop_event.wait()
+
+            # 先取消仍在运行的调用，再关闭它们可能在用的连接池和会话
+            current = asyncio.current_task()
+            pending = [task for task in asyncio.all_tasks() if task is not current]
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+            for hook in self._shutdown_hooks:
+                try:
+                    await hook()
+                except Exception as e:
+                    logger.warning(f"Async bridge shutdown hook failed: {e}")
+
+    # ------------------------------------------------------------------
+    # 调用
+    # ------------------------------------------------------------------
+
+    def submit(self, coro: Awaitable[Any]) -> concurrent.futures.Future:
+        """提交协程到后台事件循环，返回 concurrent.futures.Future（可 cancel）"""
+        self.start()
+        with self._metrics_lock:
+            self._metrics['calls'] += 1
+        return asyncio.run_coroutine_threadsafe(self._instrumented(coro, time.perf_counter()), self._loop)
+
+    def run(self, coro: Awaitable[Any], timeout: Optional[float] = None) -> Any:
+        """
+        在后台事件循环中执行协程并阻塞等待结果
+
+        Args:
+            coro: 协程
+            timeout: 超时秒数，默认 default_timeout；超时后协程被取消
+
+        Raises:
+            AsyncBridgeTimeout: 超时
+            协程自身抛出的异常原样抛出
+        """
+        if self._thread is threading.current_thread():
+            coro.close()
+            raise RuntimeError("Cannot block on the async bridge from its own event loop thread")
+
+        timeout = self.default_timeout if timeout is None else timeout
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            if future.done():
+                # 协程自身抛出的 TimeoutError
+                raise
+            future.cancel()
+            with self._metrics_lock:
+                self._metrics['timeouts'] += 1
+            raise AsyncBridgeTimeout(f"Async call timed out after {timeout}s")
+
+    async def _instrumented(self, coro: Awaitable[Any], submitted_at: float) -> Any:
+        delay_ms = (time.perf_counter() - submitted_at) * 1000
+        with self._metrics_lock:
+            metrics = self._metrics
+            metrics['schedule_delay_ms_total'] += delay_ms
+            metrics['schedule_delay_ms_max'] = max(metrics['schedule_delay_ms_max'], delay_ms)
+            metrics['in_flight'] += 1
+            metrics['max_in_flight'] = max(metrics['max_in_flight'], metrics['in_flight'])
+
+        outcome = 'errors'
+        try:
+            result = await coro
+            outcome = 'completed'
+            return result
+        except asyncio.CancelledError:
+            outcome = 'cancelled'
+            raise
+        finally:
+            with self._metrics_lock:
+                self._metrics[outcome] += 1
+                self._metrics['in_flight'] -= 1
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """获取调用指标（调度延迟、超时、取消次数）"""
+        with self._metrics_lock:
+            metrics = dict(self._metrics)
+        started = metrics['completed'] + metrics['errors'] + metrics['cancelled'] + metrics['in_flight']
+        metrics['schedule_delay_ms_avg'] = round(
+            metrics.pop('schedule_delay_ms_total') / started, 3
+        ) if started else 0.0
+        metrics['schedule_delay_ms_max'] = round(metrics['schedule_delay_ms_max'], 3)
+        metrics['running'] = self.is_running()
+        metrics['default_timeout'] = self.default_timeout
+        return metrics
+
+
+# ============================================================================
+# 进程级共享实例
+# ============================================================================
+
+_bridge: Optional[AsyncLoopBridge] = None
+_bridge_lock = threading.Lock()
+
+
+def _acc_session_scope():
+    """ACC 客户端在桥接事件循环上的长期 keep-alive 会话"""
+    from api_modules.acc_http_client import get_acc_client
+    return get_acc_client().session_scope()
+
+
+async def _close_dal_pool():
+    """关闭 DAL 在桥接事件循环上的连接池"""
+    from database_sql.optimized_data_access import optimized_postgresql_dal
+    await optimized_postgresql_dal.close()
+
+
+def get_async_bridge() -> AsyncLoopBridge:
+    """获取（并按需启动）进程级共享的后台事件循环"""
+    global _bridge
+    with _bridge_lock:
+        if _bridge is None:
+            _bridge = AsyncLoopBridge()
+            _bridge.add_scope(_acc_session_scope)
+            _bridge.add_shutdown_hook(_close_dal_pool)
+            atexit.register(_bridge.stop)
+    _bridge.start()
+    return _bridge
+
+
+def run_async(coro: Awaitable[Any], timeout: Optional[float] = None) -> Any:
+    """在共享后台事件循环中执行协程并返回结果（替代路由中的 asyncio.run）"""
+    return get_async_bridge().run(coro, timeout)
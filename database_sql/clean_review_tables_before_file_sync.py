@@ -73,7 +73,11 @@ def clean_review_tables():
         -- Drop materialized views
         DROP MATERIALIZED VIEW IF EXISTS mv_file_approval_summary CASCADE;
 
+        -- Drop the inbox triggers on project_users (account schema, not dropped with the review tables)
+        DROP FUNCTION IF EXISTS user_inbox_project_users_changed() CASCADE;
+
         -- Drop tables (CASCADE will handle dependencies)
+        DROP TABLE IF EXISTS user_inbox CASCADE;
         DROP TABLE IF EXISTS file_approval_history CASCADE;
         DROP TABLE IF EXISTS review_notifications CASCADE;
         DROP TABLE IF EXISTS approval_decisions CASCADE;
@@ -148,7 +148,8 @@ class TransmittalTableCreator:
                 'transmittals_workflow_transmittals',
                 'transmittals_transmittal_documents',
                 'transmittals_transmittal_recipients',
-                'transmittals_transmittal_non_members'
+                'transmittals_transmittal_non_members',
+                'transmittals_sync_state'
             ]
 
             existing_tables = []
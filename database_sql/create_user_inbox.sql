@@ -0,0 +1,379 @@
+-- 创建用户待审批收件箱（user_inbox）
+-- 把每个 OPEN 评审当前步骤的候选人（users / roles / companies）展开为具体用户（autodeskId），
+-- get_pending_approvals 按 (user_id, project_id) 主键范围读取，不再在请求时 JOIN + GROUP BY。
+--
+-- 维护方式（均由语句级触发器在写入的同一事务内完成，转换表中涉及的评审一次批量重算）：
+--   review_step_candidates / review_progress 变化      -> 重算该评审的收件箱行
+--   reviews 状态、当前步骤、名称、优先级、截止时间变化 -> 重算该评审的收件箱行
+--   reviews 文件统计字段变化（review_file_versions 触发） -> 只更新计数
+--   project_users 变化（角色、公司归属）                -> 重算该项目中按角色/公司分配的评审
+--
+-- 依赖：review_system_schema.sql、create_review_step_candidates.sql、account_schema_optimized.sql (project_users)
+
+CREATE TABLE IF NOT EXISTS user_inbox (
+    user_id VARCHAR(36) NOT NULL,  -- autodeskId
+    project_id VARCHAR(255) NOT NULL,
+    review_id INTEGER NOT NULL REFERENCES reviews(id) ON DELETE CASCADE,
+    step_id VARCHAR(50) NOT NULL,
+
+    -- 候选来源：user / role / company（同一用户命中多种来源时保留最直接的一种）
+    match_type VARCHAR(10) NOT NULL CHECK (match_type IN ('user', 'role', 'company')),
+    match_ref VARCHAR(255),  -- 命中的角色ID或公司ID
+
+    -- 评审信息（冗余存储）
+    review_name VARCHAR(255),
+    review_status VARCHAR(20),
+    priority INTEGER,
+    department VARCHAR(100),
+    category VARCHAR(100),
+    review_created_at TIMESTAMP WITH TIME ZONE,
+
+    -- 当前步骤信息
+    step_name VARCHAR(255),
+    step_type VARCHAR(50),
+    step_order INTEGER,
+    step_status VARCHAR(20),
+    step_due_date TIMESTAMP WITH TIME ZONE,
+    due_at TIMESTAMP WITH TIME ZONE,  -- reviews.current_step_due_date，紧急程度（overdue/urgent/soon/normal）读取时按它分档
+    candidates_source VARCHAR(50),
+
+    -- 文件统计（来自 reviews 上由触发器维护的统计字段）
+    total_files INTEGER DEFAULT 0,
+    pending_files INTEGER DEFAULT 0,
+    approved_files INTEGER DEFAULT 0,
+    rejected_files INTEGER DEFAULT 0,
+
+    refreshed_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+
+    PRIMARY KEY (user_id, project_id, review_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_user_inbox_review ON user_inbox(review_id);
+
+-- 紧急程度汇总可只读索引完成
+CREATE INDEX IF NOT EXISTS idx_user_inbox_user_due ON user_inbox(user_id, project_id, due_at);
+
+-- ============================================================================
+-- 重算一批评审的收件箱行
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION refresh_user_inbox_reviews(p_review_ids INTEGER[])
+RETURNS VOID AS $$
+BEGIN
+    IF p_review_ids IS NULL OR cardinality(p_review_ids) = 0 THEN
+        RETURN;
+    END IF;
+
+    -- 按评审加事务级咨询锁（按 id 排序避免死锁），并发事务重算同一评审时串行执行，
+    -- 否则双方都在对方提交前 DELETE 再 INSERT，后提交的一方触发 unique_violation
+    PERFORM pg_advisory_xact_lock(hashtext('user_inbox'), review_id)
+    FROM (SELECT DISTINCT unnest(p_review_ids) AS review_id) ids
+    ORDER BY review_id;
+
+    DELETE FROM user_inbox WHERE review_id = ANY(p_review_ids);
+
+    INSERT INTO user_inbox (
+        user_id, project_id, review_id, step_id, match_type, match_ref,
+        review_name, review_status, priority, department, category, review_created_at,
+        step_name, step_type, step_order, step_status, step_due_date, due_at, candidates_source,
+        total_files, pending_files, approved_files, rejected_files, refreshed_at
+    )
+    SELECT DISTINCT ON (r.id, c.user_id)
+        c.user_id, r.project_id, r.id, r.current_step_id, c.match_type, c.match_ref,
+        r.name, r.status::text, r.priority, r.department, r.category, r.created_at,
+        rp.step_name, rp.step_type::text, rp.step_order, rp.status, rp.due_date,
+        r.current_step_due_date, rsc.source,
+        COALESCE(r.total_file_versions, 0), COALESCE(r.pending_versions, 0),
+        COALESCE(r.approved_versions, 0), COALESCE(r.rejected_versions, 0),
+        CURRENT_TIMESTAMP
+    FROM reviews r
+    JOIN LATERAL (
+        SELECT step_name, step_type, step_order, status, due_date
+        FROM review_progress
+        WHERE review_id = r.id
+          AND step_id = r.current_step_id
+          AND status IN ('PENDING', 'CLAIMED')
+        ORDER BY created_at DESC
+        LIMIT 1
+    ) rp ON TRUE
+    JOIN review_step_candidates rsc
+      ON rsc.review_id = r.id
+     AND rsc.step_id = r.current_step_id
+     AND rsc.is_active = true
+    CROSS JOIN LATERAL (
+        -- 直接指定的用户
+        SELECT u ->> 'autodeskId' AS user_id, 'user' AS match_type, NULL::text AS match_ref, 1 AS match_rank
+        FROM jsonb_array_elements(
+            CASE WHEN jsonb_typeof(rsc.candidates::jsonb -> 'users') = 'array'
+                 THEN rsc.candidates::jsonb -> 'users' ELSE '[]'::jsonb END
+        ) AS u
+        WHERE u ->> 'autodeskId' IS NOT NULL
+
+        UNION ALL
+
+        -- 角色 -> 项目中拥有该角色的用户
+        SELECT pu.autodesk_id, 'role', cr.role_id, 2
+        FROM (
+            SELECT CASE WHEN jsonb_typeof(x) = 'object' THEN x ->> 'id' ELSE x #>> '{}' END AS role_id
+            FROM jsonb_array_elements(
+                CASE WHEN jsonb_typeof(rsc.candidates::jsonb -> 'roles') = 'array'
+                     THEN rsc.candidates::jsonb -> 'roles' ELSE '[]'::jsonb END
+            ) AS x
+        ) cr
+        JOIN project_users pu
+          ON pu.project_id = r.project_id
+         AND (pu.role_ids @> jsonb_build_array(cr.role_id)
+              OR pu.roles @> jsonb_build_array(jsonb_build_object('id', cr.role_id)))
+        WHERE pu.autodesk_id IS NOT NULL
+
+        UNION ALL
+
+        -- 公司 -> 项目中属于该公司的用户
+        SELECT pu.autodesk_id, 'company', cc.company_id, 3
+        FROM (
+            SELECT CASE WHEN jsonb_typeof(x) = 'object' THEN COALESCE(x ->> 'autodeskId', x ->> 'id')
+                        ELSE x #>> '{}' END AS company_id
+            FROM jsonb_array_elements(
+                CASE WHEN jsonb_typeof(rsc.candidates::jsonb -> 'companies') = 'array'
+                     THEN rsc.candidates::jsonb -> 'companies' ELSE '[]'::jsonb END
+            ) AS x
+        ) cc
+        JOIN project_users pu
+          ON pu.project_id = r.project_id
+         AND pu.project_company_id = cc.company_id
+        WHERE pu.autodesk_id IS NOT NULL
+    ) c
+    WHERE r.id = ANY(p_review_ids)
+      AND r.status = 'OPEN'
+    ORDER BY r.id, c.user_id, c.match_rank;
+END;
+$$ LANGUAGE plpgsql;
+
+-- 重算单个评审的收件箱行
+CREATE OR REPLACE FUNCTION refresh_user_inbox(p_review_id INTEGER)
+RETURNS VOID AS $$
+BEGIN
+    PERFORM refresh_user_inbox_reviews(ARRAY[p_review_id]);
+END;
+$$ LANGUAGE plpgsql;
+
+-- ============================================================================
+-- 触发器函数
+-- ============================================================================
+
+-- 触发器均为语句级：INSERT / DELETE 使用 changed_rows（NEW / OLD TABLE），
+-- UPDATE 同时引用 old_rows 和 new_rows 按主键比较，只重算影响收件箱的评审。
+-- 同步脚本批量写入时每条语句只触发一次，同一评审只重算一次。
+
+-- 候选人配置变化
+CREATE OR REPLACE FUNCTION user_inbox_candidates_changed()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' THEN
+        PERFORM refresh_user_inbox_reviews(ARRAY(
+            SELECT review_id FROM old_rows
+            UNION
+            SELECT review_id FROM new_rows
+        ));
+    ELSE
+        PERFORM refresh_user_inbox_reviews(ARRAY(SELECT DISTINCT review_id FROM changed_rows));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- 步骤进度变化（更新时只在影响收件箱的字段变化时重算）
+CREATE OR REPLACE FUNCTION user_inbox_progress_changed()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' THEN
+        PERFORM refresh_user_inbox_reviews(ARRAY(
+            SELECT o.review_id
+            FROM old_rows o
+            JOIN new_rows n ON n.id = o.id
+            WHERE o.review_id <> n.review_id
+               OR o.step_id IS DISTINCT FROM n.step_id
+               OR o.status IS DISTINCT FROM n.status
+               OR o.step_name IS DISTINCT FROM n.step_name
+               OR o.step_type IS DISTINCT FROM n.step_type
+               OR o.step_order IS DISTINCT FROM n.step_order
+               OR o.due_date IS DISTINCT FROM n.due_date
+            UNION
+            SELECT n.review_id
+            FROM old_rows o
+            JOIN new_rows n ON n.id = o.id
+            WHERE o.review_id <> n.review_id
+        ));
+    ELSE
+        PERFORM refresh_user_inbox_reviews(ARRAY(SELECT DISTINCT review_id FROM changed_rows));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- 评审变化：状态 / 当前步骤等变化时重算，仅文件统计变化时只更新计数
+CREATE OR REPLACE FUNCTION user_inbox_review_changed()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM refresh_user_inbox_reviews(ARRAY(SELECT id FROM changed_rows WHERE status = 'OPEN'));
+        RETURN NULL;
+    END IF;
+
+    PERFORM refresh_user_inbox_reviews(ARRAY(
+        SELECT n.id
+        FROM old_rows o
+        JOIN new_rows n ON n.id = o.id
+        WHERE o.status IS DISTINCT FROM n.status
+           OR o.current_step_id IS DISTINCT FROM n.current_step_id
+           OR o.current_step_due_date IS DISTINCT FROM n.current_step_due_date
+           OR o.name IS DISTINCT FROM n.name
+           OR o.priority IS DISTINCT FROM n.priority
+           OR o.department IS DISTINCT FROM n.department
+           OR o.category IS DISTINCT FROM n.category
+           OR o.project_id IS DISTINCT FROM n.project_id
+    ));
+
+    -- 上面已重算的评审计数已是最新，这里更新的是只有计数变化的评审
+    UPDATE user_inbox ui SET
+        total_files = COALESCE(n.total_file_versions, 0),
+        pending_files = COALESCE(n.pending_versions, 0),
+        approved_files = COALESCE(n.approved_versions, 0),
+        rejected_files = COALESCE(n.rejected_versions, 0),
+        refreshed_at = CURRENT_TIMESTAMP
+    FROM old_rows o
+    JOIN new_rows n ON n.id = o.id
+    WHERE ui.review_id = n.id
+      AND (o.total_file_versions IS DISTINCT FROM n.total_file_versions
+           OR o.pending_versions IS DISTINCT FROM n.pending_versions
+           OR o.approved_versions IS DISTINCT FROM n.approved_versions
+           OR o.rejected_versions IS DISTINCT FROM n.rejected_versions);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- 项目成员变化（语句级，changed_rows 为转换表）：重算受影响项目中按角色/公司分配的评审
+CREATE OR REPLACE FUNCTION user_inbox_project_users_changed()
+RETURNS TRIGGER AS $$
+BEGIN
+    -- 评审表被清理重建期间（project_users 属于账户 schema，不随评审表删除）不做任何事
+    IF to_regclass('reviews') IS NULL
+       OR to_regclass('review_step_candidates') IS NULL
+       OR to_regclass('user_inbox') IS NULL THEN
+        RETURN NULL;
+    END IF;
+
+    PERFORM refresh_user_inbox_reviews(ARRAY(
+        SELECT DISTINCT r.id
+        FROM reviews r
+        JOIN review_step_candidates rsc
+          ON rsc.review_id = r.id
+         AND rsc.step_id = r.current_step_id
+         AND rsc.is_active = true
+        WHERE r.status = 'OPEN'
+          AND r.project_id IN (SELECT DISTINCT project_id FROM changed_rows)
+          AND (jsonb_typeof(rsc.candidates::jsonb -> 'roles') = 'array'
+                   AND jsonb_array_length(rsc.candidates::jsonb -> 'roles') > 0
+               OR jsonb_typeof(rsc.candidates::jsonb -> 'companies') = 'array'
+                   AND jsonb_array_length(rsc.candidates::jsonb -> 'companies') > 0)
+    ));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ============================================================================
+-- 触发器
+-- ============================================================================
+
+-- 带转换表的触发器只能监听一种事件，因此每种事件各建一个
+DROP TRIGGER IF EXISTS trigger_user_inbox_candidates ON review_step_candidates;
+DROP TRIGGER IF EXISTS trigger_user_inbox_candidates_insert ON review_step_candidates;
+DROP TRIGGER IF EXISTS trigger_user_inbox_candidates_update ON review_step_candidates;
+DROP TRIGGER IF EXISTS trigger_user_inbox_candidates_delete ON review_step_candidates;
+
+CREATE TRIGGER trigger_user_inbox_candidates_insert
+    AFTER INSERT ON review_step_candidates
+    REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION user_inbox_candidates_changed();
+
+CREATE TRIGGER trigger_user_inbox_candidates_update
+    AFTER UPDATE ON review_step_candidates
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION user_inbox_candidates_changed();
+
+CREATE TRIGGER trigger_user_inbox_candidates_delete
+    AFTER DELETE ON review_step_candidates
+    REFERENCING OLD TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION user_inbox_candidates_changed();
+
+DROP TRIGGER IF EXISTS trigger_user_inbox_progress ON review_progress;
+DROP TRIGGER IF EXISTS trigger_user_inbox_progress_insert ON review_progress;
+DROP TRIGGER IF EXISTS trigger_user_inbox_progress_update ON review_progress;
+DROP TRIGGER IF EXISTS trigger_user_inbox_progress_delete ON review_progress;
+
+CREATE TRIGGER trigger_user_inbox_progress_insert
+    AFTER INSERT ON review_progress
+    REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION user_inbox_progress_changed();
+
+CREATE TRIGGER trigger_user_inbox_progress_update
+    AFTER UPDATE ON review_progress
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION user_inbox_progress_changed();
+
+CREATE TRIGGER trigger_user_inbox_progress_delete
+    AFTER DELETE ON review_progress
+    REFERENCING OLD TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION user_inbox_progress_changed();
+
+-- 评审删除时收件箱行由外键 ON DELETE CASCADE 清除
+DROP TRIGGER IF EXISTS trigger_user_inbox_review ON reviews;
+DROP TRIGGER IF EXISTS trigger_user_inbox_review_insert ON reviews;
+DROP TRIGGER IF EXISTS trigger_user_inbox_review_update ON reviews;
+
+CREATE TRIGGER trigger_user_inbox_review_insert
+    AFTER INSERT ON reviews
+    REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION user_inbox_review_changed();
+
+CREATE TRIGGER trigger_user_inbox_review_update
+    AFTER UPDATE ON reviews
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION user_inbox_review_changed();
+
+-- project_users 属于账户 schema，可能尚未创建
+DO $$
+BEGIN
+    IF to_regclass('project_users') IS NOT NULL THEN
+        DROP TRIGGER IF EXISTS trigger_user_inbox_project_users_insert ON project_users;
+        DROP TRIGGER IF EXISTS trigger_user_inbox_project_users_update ON project_users;
+        DROP TRIGGER IF EXISTS trigger_user_inbox_project_users_delete ON project_users;
+
+        CREATE TRIGGER trigger_user_inbox_project_users_insert
+            AFTER INSERT ON project_users
+            REFERENCING NEW TABLE AS changed_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION user_inbox_project_users_changed();
+
+        CREATE TRIGGER trigger_user_inbox_project_users_update
+            AFTER UPDATE ON project_users
+            REFERENCING NEW TABLE AS changed_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION user_inbox_project_users_changed();
+
+        CREATE TRIGGER trigger_user_inbox_project_users_delete
+            AFTER DELETE ON project_users
+            REFERENCING OLD TABLE AS changed_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION user_inbox_project_users_changed();
+    END IF;
+END $$;
+
+-- ============================================================================
+-- 回填现有的 OPEN 评审
+-- ============================================================================
+
+SELECT refresh_user_inbox_reviews(ARRAY(SELECT id FROM reviews WHERE status = 'OPEN'));
+
+-- 添加注释
+COMMENT ON TABLE user_inbox IS '用户待审批收件箱 - 由触发器维护的 (用户, 评审当前步骤) 投影，候选角色/公司已展开为具体用户';
+COMMENT ON COLUMN user_inbox.user_id IS '候选用户 autodeskId';
+COMMENT ON COLUMN user_inbox.match_type IS '候选来源：user(直接指定), role(角色), company(公司)';
+COMMENT ON COLUMN user_inbox.due_at IS '当前步骤截止时间，紧急程度读取时按当前时间分档';
@@ -438,7 +438,11 @@ class FullReviewSync:
             -- Drop materialized views
             DROP MATERIALIZED VIEW IF EXISTS mv_file_approval_summary CASCADE;
             
+            -- Drop the inbox triggers on project_users (account schema, not dropped with the review tables)
+            DROP FUNCTION IF EXISTS user_inbox_project_users_changed() CASCADE;
+            
             -- Drop tables (CASCADE will handle dependencies)
+            DROP TABLE IF EXISTS user_inbox CASCADE;  -- Projection of reviews, rebuilt by its triggers
             DROP TABLE IF EXISTS file_approval_history CASCADE;
             DROP TABLE IF EXISTS review_notifications CASCADE;
             DROP TABLE IF EXISTS approval_decisions CASCADE;
@@ -451,6 +455,7 @@ class FullReviewSync:
             DROP TABLE IF EXISTS reviews CASCADE;
             DROP TABLE IF EXISTS workflow_templates CASCADE;
             DROP TABLE IF EXISTS workflows CASCADE;
+            DROP TABLE IF EXISTS review_sync_state CASCADE;  -- Reset incremental watermarks with the data
             
             -- Drop enum types
             DROP TYPE IF EXISTS data_source_type CASCADE;
@@ -604,6 +609,24 @@ class FullReviewSync:
                 print(f"\n2. [WARNING] Candidates schema file not found: {candidates_schema_file}")
                 print("   [INFO] review_step_candidates table may not be created with proper constraints")
             
+            # 3. Execute user_inbox schema (depends on review_step_candidates)
+            inbox_schema_file = os.path.join(current_dir, 'create_user_inbox.sql')
+            
+            if os.path.exists(inbox_schema_file):
+                print(f"\n3. Reading user inbox schema file: {inbox_schema_file}")
+                
+                with open(inbox_schema_file, 'r', encoding='utf-8') as f:
+                    inbox_sql = f.read()
+                
+                print("   Executing user_inbox schema SQL...")
+                
+                cursor.execute(inbox_sql)
+                conn.commit()
+                
+                print("   [OK] user_inbox schema and triggers created successfully!")
+            else:
+                print(f"\n3. [WARNING] User inbox schema file not found: {inbox_schema_file}")
+            
             print(f"\n[SUCCESS] Complete review schema recreated successfully!")
             
         except Exception as e:
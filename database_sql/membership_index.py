@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+"""
+进程级项目成员索引
+
+审批权限检查（_check_comprehensive_permissions）需要知道用户在项目中的角色和公司，
+之前每次检查都新开连接查询两次。这里按项目从 project_users 一次性加载：
+
+- user -> roles、user -> company、role -> users、company -> users 四个映射
+- 字符串 intern、集合用 frozenset，同一项目的成员数据只占一份内存
+- 按 TTL 过期、按 LRU 限制缓存的项目数；AccountDataSyncManager 同步项目用户后主动失效
+- 记录命中 / 未命中 / 加载次数，供指标接口查看
+
+用户标识与候选人配置一致，使用 autodeskId（缺失时退回 user_id）。
+"""
+
+import sys
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, FrozenSet, Optional
+
+logger = logging.getLogger(__name__)
+
+_EMPTY: FrozenSet[str] = frozenset()
+
+# 默认缓存时间（秒）与最多缓存的项目数
+DEFAULT_TTL = 300
+DEFAULT_MAX_PROJECTS = 64
+
+
+class ProjectMembership:
+    """单个项目的成员索引（只读）"""
+
+    __slots__ = ('project_id', 'user_roles', 'user_company', 'role_users', 'company_users', 'loaded_at')
+
+    def __init__(self, project_id: str, rows=()):
+        """
+        Args:
+            rows: 可迭代的 (user_id, role_ids, company_id)，role_ids 为角色 ID 列表
+        """
+        user_roles: Dict[str, set] = {}
+        user_company: Dict[str, str] = {}
+        role_users: Dict[str, set] = {}
+        company_users: Dict[str, set] = {}
+
+        for user_id, role_ids, company_id in rows:
+            if not user_id:
+                continue
+            user_id = sys.intern(str(user_id))
+            roles = user_roles.setdefault(user_id, set())
+            for role_id in role_ids or ():
+                if role_id:
+                    role_id = sys.intern(str(role_id))
+                    roles.add(role_id)
+                    role_users.setdefault(role_id, set()).add(user_id)
+            if company_id:
+                company_id = sys.intern(str(company_id))
+                user_company[user_id] = company_id
+                company_users.setdefault(company_id, set()).add(user_id)
+
+        self.project_id = project_id
+        self.user_roles = {user: frozenset(roles) for user, roles in user_roles.items()}
+        self.user_company = user_company
+        self.role_users = {role: frozenset(users) for role, users in role_users.items()}
+        self.company_users = {company: frozenset(users) for company, users in company_users.items()}
+        self.loaded_at = time.monotonic()
+
+    def roles_of(self, user_id: str) -> FrozenSet[str]:
+        return self.user_roles.get(user_id, _EMPTY)
+
+    def company_of(self, user_id: str) -> Optional[str]:
+        return self.user_company.get(user_id)
+
+    def users_with_role(self, role_id: str) -> FrozenSet[str]:
+        return self.role_users.get(role_id, _EMPTY)
+
+    def users_in_company(self, company_id: str) -> FrozenSet[str]:
+        return self.company_users.get(company_id, _EMPTY)
+
+    def __len__(self) -> int:
+        return len(self.user_roles)
+
+
+def _role_ids_from_row(role_ids, roles) -> list:
+    """project_users.role_ids（ID 数组）与 roles（[{id, name}]）合并"""
+    result = [role_id for role_id in (role_ids or []) if isinstance(role_id, str)]
+    for role in roles or []:
+        if isinstance(role, dict) and role.get('id'):
+            result.append(role['id'])
+    return result
+
+
+def load_project_membership(project_id: str, connection_factory: Callable = None) -> ProjectMembership:
+    """从 project_users 加载一个项目的成员索引"""
+    if connection_factory is None:
+        from database_sql.pg_pool import get_pooled_connection
+        connection_factory = get_pooled_connection
+
+    conn = connection_factory()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT COALESCE(autodesk_id, user_id), role_ids, roles, project_company_id
+            FROM project_users
+            WHERE project_id = %s
+        """, [project_id])
+        rows = [
+            (user_id, _role_ids_from_row(role_ids, roles), company_id)
+            for user_id, role_ids, roles, company_id in cursor.fetchall()
+        ]
+        cursor.close()
+    finally:
+        conn.close()
+
+    return ProjectMembership(project_id, rows)
+
+
+class MembershipIndex:
+    """按项目缓存 ProjectMembership（线程安全，TTL + LRU）"""
+
+    def __init__(self, ttl: float = DEFAULT_TTL, max_projects: int = DEFAULT_MAX_PROJECTS,
+                 loader: Callable[[str], ProjectMembership] = None):
+        self.ttl = ttl
+        self.max_projects = max_projects
+        self._loader = loader or load_project_membership
+        self._entries: 'OrderedDict[str, ProjectMembership]' = OrderedDict()
+        self._lock = threading.Lock()
+        # 同一项目只由一个线程加载
+        self._load_locks: Dict[str, threading.Lock] = {}
+        # 每次失效递增；加载期间发生失效时不缓存加载结果
+        self._generation = 0
+        self._metrics = {'hits': 0, 'misses': 0, 'loads': 0, 'load_errors': 0,
+                         'invalidations': 0, 'evictions': 0, 'load_seconds': 0.0}
+
+    def _fresh(self, project_id: str) -> Optional[ProjectMembership]:
+        entry = self._entries.get(project_id)
+        if entry is not None and time.monotonic() - entry.loaded_at < self.ttl:
+            self._entries.move_to_end(project_id)
+            return entry
+        return None
+
+    def get(self, project_id: str) -> ProjectMembership:
+        """获取项目成员索引，过期或不存在时加载；加载失败返回空索引（不缓存）"""
+        with self._lock:
+            entry = self._fresh(project_id)
+            if entry is not None:
+                self._metrics['hits'] += 1
+                return entry
+            self._metrics['misses'] += 1
+            load_lock = self._load_locks.setdefault(project_id, threading.Lock())
+
+        with load_lock:
+            with self._lock:
+                # 等锁期间其他线程可能已经加载完成
+                entry = self._fresh(project_id)
+                if entry is not None:
+                    return entry
+                generation = self._generation
+
+            start = time.monotonic()
+            try:
+                entry = self._loader(project_id)
+            except Exception as e:
+                logger.warning(f"Could not load project membership for {project_id}: {e}")
+                with self._lock:
+                    self._metrics['load_errors'] += 1
+                return ProjectMembership(project_id)
+
+            with self._lock:
+                self._metrics['loads'] += 1
+                self._metrics['load_seconds'] += time.monotonic() - start
+                if generation == self._generation:
+                    self._entries[project_id] = entry
+                    self._entries.move_to_end(project_id)
+                    while len(self._entries) > self.max_projects:
+                        self._entries.popitem(last=False)
+                        self._metrics['evictions'] += 1
+            return entry
+
+    def invalidate(self, project_id: Optional[str] = None):
+        """使一个项目（或全部项目）的索引失效"""
+        with self._lock:
+            self._generation += 1
+            self._metrics['invalidations'] += 1
+            if project_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(project_id, None)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            metrics = dict(self._metrics)
+            lookups = metrics['hits'] + metrics['misses']
+            metrics['hit_rate'] = round(metrics['hits'] / lookups, 4) if lookups else None
+            metrics['load_seconds'] = round(metrics['load_seconds'], 3)
+            metrics['ttl'] = self.ttl
+            metrics['projects'] = {
+                project_id: {
+                    'users': len(entry),
+                    'roles': len(entry.role_users),
+                    'companies': len(entry.company_users),
+                    'age_seconds': round(time.monotonic() - entry.loaded_at, 1)
+                }
+                for project_id, entry in self._entries.items()
+            }
+            return metrics
+
+
+# ============================================================================
+# 进程级共享实例
+# ============================================================================
+
+_index: Optional[MembershipIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_membership_index() -> MembershipIndex:
+    """进程内共享的成员索引"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = MembershipIndex()
+    return _index
+
+
+def invalidate_membership(project_id: Optional[str] = None):
+    """项目成员数据变化后调用（AccountDataSyncManager 同步完成时）"""
+    if _index is not None:
+        _index.invalidate(project_id)
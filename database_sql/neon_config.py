@@ -53,39 +53,45 @@ class NeonPostgreSQLConfig:
     async def create_pool(self) -> asyncpg.Pool:
         """创建连接池"""
         if self._pool is None:
-            try:
-                logger.info(f"正在创建Neon PostgreSQL连接池: {self.connection_string_safe}")
-                
-                # 使用连接字符串创建连接池
-                self._pool = await asyncpg.create_pool(
-                    dsn=self.connection_url,
-                    min_size=self.min_connections,
-                    max_size=self.max_connections,
-                    command_timeout=self.connection_timeout,
-                    server_settings={
-                        'application_name': 'ACC_SYNC_NEON',
-                        'timezone': 'UTC'
-                    }
-                )
-                
-                logger.info("Neon PostgreSQL连接池创建成功")
-                
-                # 测试连接
-                async with self._pool.acquire() as conn:
-                    version = await conn.fetchval("SELECT version()")
-                    logger.info(f"Neon PostgreSQL版本: {version[:100]}...")
-                    
-                    # 测试数据库信息
-                    db_name = await conn.fetchval("SELECT current_database()")
-                    current_user = await conn.fetchval("SELECT current_user")
-                    logger.info(f"数据库: {db_name}, 用户: {current_user}")
-                
-            except Exception as e:
-                logger.error(f"创建Neon PostgreSQL连接池失败: {str(e)}")
-                raise
+            self._pool = await self.new_pool()
         
         return self._pool
     
+    async def new_pool(self) -> asyncpg.Pool:
+        """创建一个新的连接池（不缓存，绑定到当前事件循环）"""
+        try:
+            logger.info(f"正在创建Neon PostgreSQL连接池: {self.connection_string_safe}")
+            
+            # 使用连接字符串创建连接池
+            pool = await asyncpg.create_pool(
+                dsn=self.connection_url,
+                min_size=self.min_connections,
+                max_size=self.max_connections,
+                command_timeout=self.connection_timeout,
+                server_settings={
+                    'application_name': 'ACC_SYNC_NEON',
+                    'timezone': 'UTC'
+                }
+            )
+            
+            logger.info("Neon PostgreSQL连接池创建成功")
+            
+            # 测试连接
+            async with pool.acquire() as conn:
+                version = await conn.fetchval("SELECT version()")
+                logger.info(f"Neon PostgreSQL版本: {version[:100]}...")
+                
+                # 测试数据库信息
+                db_name = await conn.fetchval("SELECT current_database()")
+                current_user = await conn.fetchval("SELECT current_user")
+                logger.info(f"数据库: {db_name}, 用户: {current_user}")
+            
+        except Exception as e:
+            logger.error(f"创建Neon PostgreSQL连接池失败: {str(e)}")
+            raise
+        
+        return pool
+    
     async def close_pool(self):
         """关闭连接池"""
         if self._pool:
@@ -19,21 +19,180 @@ logger = logging.getLogger(__name__)
 class OptimizedPostgreSQLDataAccess:
     """优化的PostgreSQL数据访问层"""
     
+    # 批量写入引擎每个COPY分块的行数
+    BULK_UPSERT_CHUNK_SIZE = 5000
+    
+    FOLDER_COLUMNS = [
+        'id', 'project_id', 'name', 'display_name', 'parent_id', 'path', 'path_segments', 'depth',
+        'create_time', 'create_user_id', 'create_user_name',
+        'last_modified_time', 'last_modified_user_id', 'last_modified_user_name',
+        'last_modified_time_rollup', 'object_count', 'total_file_size', 'hidden',
+        'metadata', 'folder_permissions', 'folder_settings', 'sync_info', 'updated_at'
+    ]
+    FOLDER_UPDATE_CLAUSE = """
+        name = EXCLUDED.name,
+        display_name = EXCLUDED.display_name,
+        parent_id = EXCLUDED.parent_id,
+        path = EXCLUDED.path,
+        path_segments = EXCLUDED.path_segments,
+        depth = EXCLUDED.depth,
+        last_modified_time = EXCLUDED.last_modified_time,
+        last_modified_user_id = EXCLUDED.last_modified_user_id,
+        last_modified_user_name = EXCLUDED.last_modified_user_name,
+        last_modified_time_rollup = EXCLUDED.last_modified_time_rollup,
+        object_count = EXCLUDED.object_count,
+        total_file_size = EXCLUDED.total_file_size,
+        hidden = EXCLUDED.hidden,
+        metadata = EXCLUDED.metadata,
+        folder_permissions = EXCLUDED.folder_permissions,
+        folder_settings = EXCLUDED.folder_settings,
+        sync_info = EXCLUDED.sync_info,
+        updated_at = EXCLUDED.updated_at,
+        deleted_at = NULL
+    WHERE folders.last_modified_time < EXCLUDED.last_modified_time
+       OR folders.last_modified_time_rollup < EXCLUDED.last_modified_time_rollup
+       OR folders.parent_id IS DISTINCT FROM EXCLUDED.parent_id
+       OR folders.deleted_at IS NOT NULL
+    """
+    
+    FILE_COLUMNS = [
+        'id', 'project_id', 'name', 'display_name', 'parent_folder_id', 'folder_path', 'full_path',
+        'path_segments', 'depth', 'create_time', 'create_user_id', 'create_user_name',
+        'last_modified_time', 'last_modified_user_id', 'last_modified_user_name',
+        'file_type', 'mime_type', 'reserved', 'hidden', 'metadata',
+        'file_permissions', 'file_settings', 'review_info', 'sync_info', 'updated_at'
+    ]
+    FILE_UPDATE_CLAUSE = """
+        name = EXCLUDED.name,
+        display_name = EXCLUDED.display_name,
+        parent_folder_id = EXCLUDED.parent_folder_id,
+        folder_path = EXCLUDED.folder_path,
+        full_path = EXCLUDED.full_path,
+        path_segments = EXCLUDED.path_segments,
+        depth = EXCLUDED.depth,
+        last_modified_time = EXCLUDED.last_modified_time,
+        last_modified_user_id = EXCLUDED.last_modified_user_id,
+        last_modified_user_name = EXCLUDED.last_modified_user_name,
+        file_type = EXCLUDED.file_type,
+        mime_type = EXCLUDED.mime_type,
+        reserved = EXCLUDED.reserved,
+        hidden = EXCLUDED.hidden,
+        metadata = EXCLUDED.metadata,
+        file_permissions = EXCLUDED.file_permissions,
+        file_settings = EXCLUDED.file_settings,
+        review_info = EXCLUDED.review_info,
+        sync_info = EXCLUDED.sync_info,
+        updated_at = EXCLUDED.updated_at,
+        deleted_at = NULL
+    WHERE files.last_modified_time IS NULL OR files.last_modified_time < EXCLUDED.last_modified_time
+       OR files.parent_folder_id IS DISTINCT FROM EXCLUDED.parent_folder_id
+       OR files.deleted_at IS NOT NULL
+    """
+    
+    FILE_VERSION_COLUMNS = [
+        'id', 'file_id', 'project_id', 'version_number', 'urn', 'item_urn', 'storage_urn', 'lineage_urn',
+        'create_time', 'create_user_id', 'create_user_name',
+        'last_modified_time', 'last_modified_user_id', 'last_modified_user_name',
+        'file_size', 'storage_size', 'mime_type', 'process_state', 'is_current_version', 'version_status',
+        'metadata', 'review_info', 'extension', 'download_info', 'download_url', 'sync_info'
+    ]
+    FILE_VERSION_UPDATE_CLAUSE = """
+        version_number = EXCLUDED.version_number,
+        urn = EXCLUDED.urn,
+        item_urn = EXCLUDED.item_urn,
+        storage_urn = EXCLUDED.storage_urn,
+        lineage_urn = EXCLUDED.lineage_urn,
+        last_modified_time = EXCLUDED.last_modified_time,
+        last_modified_user_id = EXCLUDED.last_modified_user_id,
+        last_modified_user_name = EXCLUDED.last_modified_user_name,
+        file_size = EXCLUDED.file_size,
+        storage_size = EXCLUDED.storage_size,
+        mime_type = EXCLUDED.mime_type,
+        process_state = EXCLUDED.process_state,
+        is_current_version = EXCLUDED.is_current_version,
+        version_status = EXCLUDED.version_status,
+        metadata = EXCLUDED.metadata,
+        review_info = EXCLUDED.review_info,
+        extension = EXCLUDED.extension,
+        download_info = EXCLUDED.download_info,
+        download_url = EXCLUDED.download_url,
+        sync_info = EXCLUDED.sync_info,
+        updated_at = CURRENT_TIMESTAMP
+    """
+    
+    CUSTOM_ATTR_DEFINITION_COLUMNS = [
+        'attr_id', 'project_id', 'scope_type', 'scope_folder_id', 'inherit_to_subfolders',
+        'name', 'type', 'array_values', 'description', 'is_required', 'default_value',
+        'validation_rules', 'sync_info', 'updated_at'
+    ]
+    CUSTOM_ATTR_DEFINITION_UPDATE_CLAUSE = """
+        scope_type = EXCLUDED.scope_type,
+        inherit_to_subfolders = EXCLUDED.inherit_to_subfolders,
+        name = EXCLUDED.name,
+        type = EXCLUDED.type,
+        array_values = EXCLUDED.array_values,
+        description = EXCLUDED.description,
+        is_required = EXCLUDED.is_required,
+        default_value = EXCLUDED.default_value,
+        validation_rules = EXCLUDED.validation_rules,
+        sync_info = EXCLUDED.sync_info,
+        updated_at = EXCLUDED.updated_at
+    """
+    
+    CUSTOM_ATTR_VALUE_COLUMNS = [
+        'file_id', 'attr_definition_id', 'project_id', 'value', 'value_date', 'value_number',
+        'value_boolean', 'value_array', 'updated_at', 'updated_by_user_id', 'updated_by_user_name',
+        'validation_status', 'validation_errors', 'sync_info'
+    ]
+    CUSTOM_ATTR_VALUE_UPDATE_CLAUSE = """
+        value = EXCLUDED.value,
+        value_date = EXCLUDED.value_date,
+        value_number = EXCLUDED.value_number,
+        value_boolean = EXCLUDED.value_boolean,
+        value_array = EXCLUDED.value_array,
+        updated_at = EXCLUDED.updated_at,
+        updated_by_user_id = EXCLUDED.updated_by_user_id,
+        updated_by_user_name = EXCLUDED.updated_by_user_name,
+        validation_status = EXCLUDED.validation_status,
+        validation_errors = EXCLUDED.validation_errors,
+        sync_info = EXCLUDED.sync_info
+    """
+    
     def __init__(self):
         self.config = neon_postgresql_config
-        self._pool: Optional[asyncpg.Pool] = None
+        # asyncpg 连接池只能在创建它的事件循环中使用：每个事件循环一个连接池。
+        # Flask 请求经 async_bridge 共用同一个长期事件循环，因此复用同一个热连接池
+        self._pools: Dict[asyncio.AbstractEventLoop, asyncpg.Pool] = {}
+    
+    @property
+    def _pool(self) -> Optional[asyncpg.Pool]:
+        """当前事件循环的连接池"""
+        try:
+            return self._pools.get(asyncio.get_running_loop())
+        except RuntimeError:
+            return None
     
     async def connect(self):
         """连接数据库"""
-        if self._pool is None:
-            self._pool = await self.config.create_pool()
+        loop = asyncio.get_running_loop()
+        if loop not in self._pools:
+            self._discard_closed_loop_pools()
+            pool = await self.config.new_pool()
+            if self._pools.setdefault(loop, pool) is not pool:
+                # 并发的 connect 已经创建了连接池
+                await pool.close()
         return self
     
+    def _discard_closed_loop_pools(self):
+        """丢弃已关闭事件循环（如 asyncio.run 结束后）遗留的连接池"""
+        for loop in [loop for loop in self._pools if loop.is_closed()]:
+            self._pools.pop(loop).terminate()
+    
     async def close(self):
-        """关闭数据库连接"""
-        if self._pool:
-            await self._pool.close()
-            self._pool = None
+        """关闭当前事件循环的数据库连接池"""
+        pool = self._pools.pop(asyncio.get_running_loop(), None)
+        if pool:
+            await pool.close()
     
     @asynccontextmanager
     async def get_connection(self):
@@ -66,13 +225,14 @@ class OptimizedPostgreSQLDataAccess:
                         f.object_count
                     FROM folders f
                     WHERE f.project_id = $1
+                      AND f.deleted_at IS NULL
                       AND (f.last_modified_time_rollup > $2 OR f.last_modified_time_rollup IS NULL)
                 )
                 SELECT 
                     cf.*,
                     COUNT(sub.id) as subfolder_count
                 FROM changed_folders cf
-                LEFT JOIN folders sub ON sub.parent_id = cf.id
+                LEFT JOIN folders sub ON sub.parent_id = cf.id AND sub.deleted_at IS NULL
                 GROUP BY cf.id, cf.name, cf.path, cf.depth, cf.last_modified_time, 
                          cf.last_modified_time_rollup, cf.parent_id, cf.object_count
                 ORDER BY cf.depth, cf.path;
@@ -125,125 +285,117 @@ class OptimizedPostgreSQLDataAccess:
             logger.error(f"获取变化文件失败: {e}")
             return []
     
+    async def get_folder_fingerprints(self, project_id: str, folder_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        获取文件夹上次同步记录的内容指纹（rollup时间、对象数、子项哈希），不含已删除的文件夹
+
+        查询失败（如指纹列尚未迁移）时直接抛出：返回空结果会让指纹爬取把整个项目当作变化重新列出，
+        调用方捕获后回退到 rollup 分支过滤
+        """
+        if not folder_ids:
+            return {}
+        async with self.get_connection() as conn:
+            rows = await conn.fetch("""
+            SELECT id, fingerprint_rollup, fingerprint_object_count, fingerprint_child_hash
+            FROM folders
+            WHERE project_id = $1 AND id = ANY($2::text[]) AND deleted_at IS NULL;
+            """, project_id, list(folder_ids))
+            return {
+                row['id']: {
+                    'rollup': row['fingerprint_rollup'],
+                    'object_count': row['fingerprint_object_count'],
+                    'child_hash': row['fingerprint_child_hash']
+                }
+                for row in rows
+            }
+    
+    async def save_folder_fingerprints(self, project_id: str, fingerprints: List[Dict[str, Any]]) -> int:
+        """批量保存文件夹内容指纹，失败时抛出（由调用方记录到同步报告）"""
+        if not fingerprints:
+            return 0
+        async with self.get_connection() as conn:
+            result = await conn.execute("""
+            UPDATE folders
+            SET fingerprint_rollup = fp.rollup,
+                fingerprint_object_count = fp.object_count,
+                fingerprint_child_hash = fp.child_hash,
+                fingerprint_at = CURRENT_TIMESTAMP
+            FROM unnest($2::text[], $3::timestamptz[], $4::int[], $5::text[])
+                 AS fp(id, rollup, object_count, child_hash)
+            WHERE folders.project_id = $1 AND folders.id = fp.id;
+            """,
+                project_id,
+                [fp['id'] for fp in fingerprints],
+                [self._parse_datetime(fp.get('rollup')) for fp in fingerprints],
+                [fp.get('object_count') for fp in fingerprints],
+                [fp.get('child_hash') for fp in fingerprints]
+            )
+            return int(result.split()[-1]) if result else 0
+    
+    async def get_file_modified_times(self, project_id: str, file_ids: List[str]) -> Dict[str, Optional[datetime]]:
+        """获取文件在数据库中的最后修改时间，不含已删除的文件"""
+        if not file_ids:
+            return {}
+        try:
+            async with self.get_connection() as conn:
+                rows = await conn.fetch("""
+                SELECT id, last_modified_time
+                FROM files
+                WHERE project_id = $1 AND id = ANY($2::text[]) AND deleted_at IS NULL;
+                """, project_id, list(file_ids))
+                return {row['id']: row['last_modified_time'] for row in rows}
+                
+        except Exception as e:
+            logger.error(f"获取文件修改时间失败: {e}")
+            return {}
+    
     # ============================================================================
     # 🚀 Layer 2: 批量操作优化
     # ============================================================================
     
     async def batch_upsert_folders(self, folders_data: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """批量插入/更新文件夹"""
+        """批量插入/更新文件夹（COPY暂存 + 单条合并）"""
         if not folders_data:
             return {'upserted': 0, 'errors': []}
         
         try:
+            records, labels, errors = self._prepare_records(
+                folders_data, self._prepare_folder_record, lambda d: f"Folder {d.get('id')}"
+            )
+            
             async with self.get_connection() as conn:
                 async with conn.transaction():
-                    upsert_query = """
-                    INSERT INTO folders (
-                        id, project_id, name, display_name, parent_id, path, path_segments, depth,
-                        create_time, create_user_id, create_user_name,
-                        last_modified_time, last_modified_user_id, last_modified_user_name,
-                        last_modified_time_rollup, object_count, total_file_size, hidden,
-                        metadata, folder_permissions, folder_settings, sync_info, updated_at
-                    ) VALUES (
-                        $1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, $15, $16, $17, $18, $19, $20, $21, $22, $23
+                    result = await self._bulk_upsert(
+                        conn, 'folders', self.FOLDER_COLUMNS, 'id',
+                        self.FOLDER_UPDATE_CLAUSE, records, labels
                     )
-                    ON CONFLICT (id) 
-                    DO UPDATE SET
-                        name = EXCLUDED.name,
-                        display_name = EXCLUDED.display_name,
-                        parent_id = EXCLUDED.parent_id,
-                        path = EXCLUDED.path,
-                        path_segments = EXCLUDED.path_segments,
-                        depth = EXCLUDED.depth,
-                        last_modified_time = EXCLUDED.last_modified_time,
-                        last_modified_user_id = EXCLUDED.last_modified_user_id,
-                        last_modified_user_name = EXCLUDED.last_modified_user_name,
-                        last_modified_time_rollup = EXCLUDED.last_modified_time_rollup,
-                        object_count = EXCLUDED.object_count,
-                        total_file_size = EXCLUDED.total_file_size,
-                        hidden = EXCLUDED.hidden,
-                        metadata = EXCLUDED.metadata,
-                        folder_permissions = EXCLUDED.folder_permissions,
-                        folder_settings = EXCLUDED.folder_settings,
-                        sync_info = EXCLUDED.sync_info,
-                        updated_at = EXCLUDED.updated_at
-                    WHERE folders.last_modified_time < EXCLUDED.last_modified_time
-                       OR folders.last_modified_time_rollup < EXCLUDED.last_modified_time_rollup;
-                    """
-                    
-                    upsert_count = 0
-                    errors = []
-                    
-                    for folder_data in folders_data:
-                        try:
-                            folder_record = self._prepare_folder_record(folder_data)
-                            await conn.execute(upsert_query, *folder_record)
-                            upsert_count += 1
-                        except Exception as e:
-                            errors.append(f"Folder {folder_data.get('id')}: {str(e)}")
-                    
-                    return {'upserted': upsert_count, 'errors': errors}
+            
+            result['errors'] = errors + result['errors']
+            return result
                     
         except Exception as e:
             logger.error(f"批量文件夹操作失败: {e}")
             return {'upserted': 0, 'errors': [str(e)]}
     
     async def batch_upsert_files(self, files_data: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """批量插入/更新文件"""
+        """批量插入/更新文件（COPY暂存 + 单条合并）"""
         if not files_data:
             return {'upserted': 0, 'errors': []}
         
         try:
+            records, labels, errors = self._prepare_records(
+                files_data, self._prepare_file_record, lambda d: f"File {d.get('id')}"
+            )
+            
             async with self.get_connection() as conn:
                 async with conn.transaction():
-                    upsert_query = """
-                    INSERT INTO files (
-                        id, project_id, name, display_name, parent_folder_id, folder_path, full_path,
-                        path_segments, depth, create_time, create_user_id, create_user_name,
-                        last_modified_time, last_modified_user_id, last_modified_user_name,
-                        file_type, mime_type, reserved, hidden, metadata, 
-                        file_permissions, file_settings, review_info, sync_info, updated_at
-                    ) VALUES (
-                        $1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, $15, $16, $17, $18, $19, $20,
-                        $21, $22, $23, $24, $25
+                    result = await self._bulk_upsert(
+                        conn, 'files', self.FILE_COLUMNS, 'id',
+                        self.FILE_UPDATE_CLAUSE, records, labels
                     )
-                    ON CONFLICT (id) 
-                    DO UPDATE SET
-                        name = EXCLUDED.name,
-                        display_name = EXCLUDED.display_name,
-                        parent_folder_id = EXCLUDED.parent_folder_id,
-                        folder_path = EXCLUDED.folder_path,
-                        full_path = EXCLUDED.full_path,
-                        path_segments = EXCLUDED.path_segments,
-                        depth = EXCLUDED.depth,
-                        last_modified_time = EXCLUDED.last_modified_time,
-                        last_modified_user_id = EXCLUDED.last_modified_user_id,
-                        last_modified_user_name = EXCLUDED.last_modified_user_name,
-                        file_type = EXCLUDED.file_type,
-                        mime_type = EXCLUDED.mime_type,
-                        reserved = EXCLUDED.reserved,
-                        hidden = EXCLUDED.hidden,
-                        metadata = EXCLUDED.metadata,
-                        file_permissions = EXCLUDED.file_permissions,
-                        file_settings = EXCLUDED.file_settings,
-                        review_info = EXCLUDED.review_info,
-                        sync_info = EXCLUDED.sync_info,
-                        updated_at = EXCLUDED.updated_at
-                    WHERE files.last_modified_time IS NULL OR files.last_modified_time < EXCLUDED.last_modified_time;
-                    """
-                    
-                    upsert_count = 0
-                    errors = []
-                    
-                    for file_data in files_data:
-                        try:
-                            file_record = self._prepare_file_record(file_data)
-                            await conn.execute(upsert_query, *file_record)
-                            upsert_count += 1
-                        except Exception as e:
-                            errors.append(f"File {file_data.get('id')}: {str(e)}")
-                    
-                    return {'upserted': upsert_count, 'errors': errors}
+            
+            result['errors'] = errors + result['errors']
+            return result
                     
         except Exception as e:
             logger.error(f"批量文件操作失败: {e}")
@@ -254,92 +406,52 @@ class OptimizedPostgreSQLDataAccess:
     # ============================================================================
     
     async def batch_upsert_custom_attribute_definitions(self, definitions_data: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """批量插入/更新自定义属性定义"""
+        """批量插入/更新自定义属性定义（COPY暂存 + 单条合并）"""
         if not definitions_data:
             return {'upserted': 0, 'errors': []}
         
         try:
+            records, labels, errors = self._prepare_records(
+                definitions_data, self._prepare_custom_attr_definition_record,
+                lambda d: f"Definition {d.get('attr_id')}"
+            )
+            
             async with self.get_connection() as conn:
                 async with conn.transaction():
-                    upsert_query = """
-                    INSERT INTO custom_attribute_definitions (
-                        attr_id, project_id, scope_type, scope_folder_id, inherit_to_subfolders,
-                        name, type, array_values, description, is_required, default_value,
-                        validation_rules, sync_info, updated_at
-                    ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14)
-                    ON CONFLICT (attr_id, project_id, COALESCE(scope_folder_id, ''))
-                    DO UPDATE SET
-                        scope_type = EXCLUDED.scope_type,
-                        inherit_to_subfolders = EXCLUDED.inherit_to_subfolders,
-                        name = EXCLUDED.name,
-                        type = EXCLUDED.type,
-                        array_values = EXCLUDED.array_values,
-                        description = EXCLUDED.description,
-                        is_required = EXCLUDED.is_required,
-                        default_value = EXCLUDED.default_value,
-                        validation_rules = EXCLUDED.validation_rules,
-                        sync_info = EXCLUDED.sync_info,
-                        updated_at = EXCLUDED.updated_at;
-                    """
-                    
-                    upsert_count = 0
-                    errors = []
-                    
-                    for def_data in definitions_data:
-                        try:
-                            def_record = self._prepare_custom_attr_definition_record(def_data)
-                            await conn.execute(upsert_query, *def_record)
-                            upsert_count += 1
-                        except Exception as e:
-                            errors.append(f"Definition {def_data.get('attr_id')}: {str(e)}")
-                    
-                    return {'upserted': upsert_count, 'errors': errors}
+                    result = await self._bulk_upsert(
+                        conn, 'custom_attribute_definitions', self.CUSTOM_ATTR_DEFINITION_COLUMNS,
+                        "attr_id, project_id, COALESCE(scope_folder_id, '')",
+                        self.CUSTOM_ATTR_DEFINITION_UPDATE_CLAUSE, records, labels
+                    )
+            
+            result['errors'] = errors + result['errors']
+            return result
                     
         except Exception as e:
             logger.error(f"批量属性定义操作失败: {e}")
             return {'upserted': 0, 'errors': [str(e)]}
     
     async def batch_upsert_custom_attribute_values(self, values_data: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """批量插入/更新自定义属性值"""
+        """批量插入/更新自定义属性值（COPY暂存 + 单条合并）"""
         if not values_data:
             return {'upserted': 0, 'errors': []}
         
         try:
+            records, labels, errors = self._prepare_records(
+                values_data, self._prepare_custom_attr_value_record,
+                lambda d: f"Value {d.get('file_id')}-{d.get('attr_id')}"
+            )
+            
             async with self.get_connection() as conn:
                 async with conn.transaction():
-                    upsert_query = """
-                    INSERT INTO custom_attribute_values (
-                        file_id, attr_definition_id, project_id, value, value_date, value_number, 
-                        value_boolean, value_array, updated_at, updated_by_user_id, updated_by_user_name,
-                        validation_status, validation_errors, sync_info
-                    ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14)
-                    ON CONFLICT (file_id, attr_definition_id)
-                    DO UPDATE SET
-                        value = EXCLUDED.value,
-                        value_date = EXCLUDED.value_date,
-                        value_number = EXCLUDED.value_number,
-                        value_boolean = EXCLUDED.value_boolean,
-                        value_array = EXCLUDED.value_array,
-                        updated_at = EXCLUDED.updated_at,
-                        updated_by_user_id = EXCLUDED.updated_by_user_id,
-                        updated_by_user_name = EXCLUDED.updated_by_user_name,
-                        validation_status = EXCLUDED.validation_status,
-                        validation_errors = EXCLUDED.validation_errors,
-                        sync_info = EXCLUDED.sync_info;
-                    """
-                    
-                    upsert_count = 0
-                    errors = []
-                    
-                    for value_data in values_data:
-                        try:
-                            value_record = self._prepare_custom_attr_value_record(value_data)
-                            await conn.execute(upsert_query, *value_record)
-                            upsert_count += 1
-                        except Exception as e:
-                            errors.append(f"Value {value_data.get('file_id')}-{value_data.get('attr_id')}: {str(e)}")
-                    
-                    return {'upserted': upsert_count, 'errors': errors}
+                    result = await self._bulk_upsert(
+                        conn, 'custom_attribute_values', self.CUSTOM_ATTR_VALUE_COLUMNS,
+                        'file_id, attr_definition_id',
+                        self.CUSTOM_ATTR_VALUE_UPDATE_CLAUSE, records, labels
+                    )
+            
+            result['errors'] = errors + result['errors']
+            return result
                     
         except Exception as e:
             logger.error(f"批量属性值操作失败: {e}")
@@ -537,86 +649,25 @@ class OptimizedPostgreSQLDataAccess:
     
 
     async def batch_upsert_file_versions(self, versions_data: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """批量插入或更新文件版本"""
+        """批量插入或更新文件版本（COPY暂存 + 单条合并）"""
         try:
+            if not versions_data:
+                return {'upserted': 0, 'errors': []}
+            
+            records, labels, errors = self._prepare_records(
+                versions_data, self._prepare_file_version_record,
+                lambda d: f"Version {d.get('id', 'unknown')}"
+            )
+            
             async with self.get_connection() as conn:
-                if not versions_data:
-                    return {'upserted': 0, 'errors': []}
-                
-                # 准备插入数据 - V2架构
-                insert_query = """
-                INSERT INTO file_versions (
-                    id, file_id, project_id, version_number, urn, item_urn, storage_urn, lineage_urn,
-                    create_time, create_user_id, create_user_name, last_modified_time, last_modified_user_id, last_modified_user_name,
-                    file_size, storage_size, mime_type, process_state, is_current_version, version_status,
-                    metadata, review_info, extension, download_info, download_url, sync_info
-                ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, $15, $16, $17, $18, $19, $20, $21, $22, $23, $24, $25, $26)
-                ON CONFLICT (id) DO UPDATE SET
-                    version_number = EXCLUDED.version_number,
-                    urn = EXCLUDED.urn,
-                    item_urn = EXCLUDED.item_urn,
-                    storage_urn = EXCLUDED.storage_urn,
-                    lineage_urn = EXCLUDED.lineage_urn,
-                    last_modified_time = EXCLUDED.last_modified_time,
-                    last_modified_user_id = EXCLUDED.last_modified_user_id,
-                    last_modified_user_name = EXCLUDED.last_modified_user_name,
-                    file_size = EXCLUDED.file_size,
-                    storage_size = EXCLUDED.storage_size,
-                    mime_type = EXCLUDED.mime_type,
-                    process_state = EXCLUDED.process_state,
-                    is_current_version = EXCLUDED.is_current_version,
-                    version_status = EXCLUDED.version_status,
-                    metadata = EXCLUDED.metadata,
-                    review_info = EXCLUDED.review_info,
-                    extension = EXCLUDED.extension,
-                    download_info = EXCLUDED.download_info,
-                    download_url = EXCLUDED.download_url,
-                    sync_info = EXCLUDED.sync_info,
-                    updated_at = CURRENT_TIMESTAMP;
-                """
-                
-                upserted_count = 0
-                errors = []
-                
-                for version_data in versions_data:
-                    try:
-                        await conn.execute(
-                            insert_query,
-                            version_data.get('id'),
-                            version_data.get('file_id'),
-                            version_data.get('project_id'),
-                            version_data.get('version_number', 1),
-                            version_data.get('urn', version_data.get('id')),  # Use id as urn if not provided
-                            version_data.get('item_urn'),
-                            version_data.get('storage_urn'),
-                            version_data.get('lineage_urn'),
-                            self._parse_datetime(version_data.get('create_time')),
-                            version_data.get('create_user_id'),
-                            version_data.get('create_user_name'),
-                            self._parse_datetime(version_data.get('last_modified_time')),
-                            version_data.get('last_modified_user_id'),
-                            version_data.get('last_modified_user_name'),
-                            version_data.get('file_size', 0),
-                            version_data.get('storage_size', 0),
-                            version_data.get('mime_type'),
-                            version_data.get('process_state'),
-                            version_data.get('is_current_version', False),
-                            version_data.get('version_status', 'active'),
-                            json.dumps(version_data.get('metadata', {})),
-                            json.dumps(version_data.get('review_info', {})),
-                            json.dumps(version_data.get('extension', {})),
-                            json.dumps(version_data.get('download_info', {})),
-                            version_data.get('download_url'),
-                            json.dumps(version_data.get('sync_info', {}))
-                        )
-                        upserted_count += 1
-                    except Exception as e:
-                        errors.append(f"Version {version_data.get('id', 'unknown')}: {str(e)}")
-                
-                return {
-                    'upserted': upserted_count,
-                    'errors': errors
-                }
+                async with conn.transaction():
+                    result = await self._bulk_upsert(
+                        conn, 'file_versions', self.FILE_VERSION_COLUMNS, 'id',
+                        self.FILE_VERSION_UPDATE_CLAUSE, records, labels
+                    )
+            
+            result['errors'] = errors + result['errors']
+            return result
                 
         except Exception as e:
             logger.error(f"批量文件版本操作失败: {e}")
@@ -654,6 +705,99 @@ class OptimizedPostgreSQLDataAccess:
     # 辅助方法
     # ============================================================================
     
+    def _prepare_records(self, data: List[Dict[str, Any]], prepare_fn,
+                         label_fn) -> Tuple[List[Tuple], List[str], List[str]]:
+        """批量准备记录元组，准备失败的行直接记入错误"""
+        records = []
+        labels = []
+        errors = []
+        
+        for item in data:
+            try:
+                records.append(prepare_fn(item))
+                labels.append(label_fn(item))
+            except Exception as e:
+                errors.append(f"{label_fn(item)}: {str(e)}")
+        
+        return records, labels, errors
+    
+    async def _bulk_upsert(self, conn, table: str, columns: List[str], conflict_target: str,
+                           update_clause: str, records: List[Tuple],
+                           labels: List[str]) -> Dict[str, Any]:
+        """
+        批量写入引擎：COPY 到临时暂存表，再用单条 INSERT ... SELECT ... ON CONFLICT 合并
+        
+        必须在事务内调用。每个分块在独立的保存点中合并；分块失败时仅对该分块
+        回退到逐行写入，以保留逐行错误信息。
+        
+        Args:
+            conn: 处于事务中的连接
+            table: 目标表
+            columns: 写入列（与记录元组顺序一致）
+            conflict_target: ON CONFLICT 目标（列或表达式）
+            update_clause: DO UPDATE SET 之后的部分（可含 WHERE）
+            records: 记录元组
+            labels: 每条记录的错误标签
+        
+        Returns:
+            {'upserted': 成功处理行数, 'errors': [...], 'fallback_chunks': 回退分块数}
+        """
+        result = {'upserted': 0, 'errors': [], 'fallback_chunks': 0}
+        if not records:
+            return result
+        
+        column_list = ', '.join(columns)
+        stage_table = f"_stage_{table}"
+        
+        # 暂存表仅复制列类型（不带约束），事务提交时自动删除
+        await conn.execute(f"""
+            CREATE TEMP TABLE {stage_table} ON COMMIT DROP AS
+            SELECT {column_list}, 0::bigint AS _stage_seq FROM {table} WITH NO DATA
+        """)
+        
+        # 同一分块内重复键只保留最后一条，避免 "cannot affect row a second time"
+        merge_query = f"""
+            INSERT INTO {table} ({column_list})
+            SELECT DISTINCT ON ({conflict_target}) {column_list}
+            FROM {stage_table}
+            ORDER BY {conflict_target}, _stage_seq DESC
+            ON CONFLICT ({conflict_target}) DO UPDATE SET {update_clause}
+        """
+        placeholders = ', '.join(f"${i}" for i in range(1, len(columns) + 1))
+        row_query = f"""
+            INSERT INTO {table} ({column_list}) VALUES ({placeholders})
+            ON CONFLICT ({conflict_target}) DO UPDATE SET {update_clause}
+        """
+        
+        chunk_size = self.BULK_UPSERT_CHUNK_SIZE
+        for start in range(0, len(records), chunk_size):
+            chunk = records[start:start + chunk_size]
+            
+            try:
+                async with conn.transaction():
+                    await conn.execute(f"TRUNCATE {stage_table}")
+                    await conn.copy_records_to_table(
+                        stage_table,
+                        records=[record + (seq,) for seq, record in enumerate(chunk)],
+                        columns=list(columns) + ['_stage_seq']
+                    )
+                    await conn.execute(merge_query)
+                result['upserted'] += len(chunk)
+                
+            except Exception as e:
+                logger.warning(f"{table} 批量合并失败，回退逐行写入 ({len(chunk)} 行): {e}")
+                result['fallback_chunks'] += 1
+                
+                for offset, record in enumerate(chunk):
+                    try:
+                        async with conn.transaction():
+                            await conn.execute(row_query, *record)
+                        result['upserted'] += 1
+                    except Exception as row_error:
+                        result['errors'].append(f"{labels[start + offset]}: {str(row_error)}")
+        
+        return result
+    
     def _prepare_folder_record(self, folder_data: Dict[str, Any]) -> Tuple:
         """准备文件夹记录 - V2架构"""
         return (
@@ -750,6 +894,37 @@ class OptimizedPostgreSQLDataAccess:
             json.dumps(value_data.get('sync_info', {}))
         )
     
+    def _prepare_file_version_record(self, version_data: Dict[str, Any]) -> Tuple:
+        """准备文件版本记录 - V2架构"""
+        return (
+            version_data.get('id'),
+            version_data.get('file_id'),
+            version_data.get('project_id'),
+            version_data.get('version_number', 1),
+            version_data.get('urn', version_data.get('id')),  # Use id as urn if not provided
+            version_data.get('item_urn'),
+            version_data.get('storage_urn'),
+            version_data.get('lineage_urn'),
+            self._parse_datetime(version_data.get('create_time')),
+            version_data.get('create_user_id'),
+            version_data.get('create_user_name'),
+            self._parse_datetime(version_data.get('last_modified_time')),
+            version_data.get('last_modified_user_id'),
+            version_data.get('last_modified_user_name'),
+            version_data.get('file_size', 0),
+            version_data.get('storage_size', 0),
+            version_data.get('mime_type'),
+            version_data.get('process_state'),
+            version_data.get('is_current_version', False),
+            version_data.get('version_status', 'active'),
+            json.dumps(version_data.get('metadata', {})),
+            json.dumps(version_data.get('review_info', {})),
+            json.dumps(version_data.get('extension', {})),
+            json.dumps(version_data.get('download_info', {})),
+            version_data.get('download_url'),
+            json.dumps(version_data.get('sync_info', {}))
+        )
+    
     def _parse_datetime(self, datetime_str) -> Optional[datetime]:
         """Parse datetime string or datetime object - preserves timezone info"""
         if not datetime_str:
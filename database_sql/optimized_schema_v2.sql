@@ -85,6 +85,15 @@ CREATE TABLE IF NOT EXISTS folders (
     permissions JSONB DEFAULT '{}'::jsonb,  -- 存储文件夹权限数据
     permissions_sync_time TIMESTAMP WITH TIME ZONE,  -- 权限同步时间
 
+    -- 删除墓碑：增量同步发现ACC中已删除时设置，重新出现时清空
+    deleted_at TIMESTAMP WITH TIME ZONE,
+
+    -- 🔑 内容指纹：子树完整同步时的rollup时间、对象数、子项ID哈希，一致时增量同步跳过该子树
+    fingerprint_rollup TIMESTAMP WITH TIME ZONE,
+    fingerprint_object_count INTEGER,
+    fingerprint_child_hash CHAR(32),
+    fingerprint_at TIMESTAMP WITH TIME ZONE,
+
     -- 索引优化字段（生成列）
     project_path TEXT GENERATED ALWAYS AS (project_id || '::' || path) STORED,
     parent_path TEXT GENERATED ALWAYS AS (
@@ -151,6 +160,9 @@ CREATE TABLE IF NOT EXISTS files (
     -- 同步信息
     sync_info JSONB DEFAULT '{}'::jsonb,
     
+    -- 删除墓碑：增量同步发现ACC中已删除时设置，重新出现时清空
+    deleted_at TIMESTAMP WITH TIME ZONE,
+    
     -- 索引优化字段（生成列）
     project_folder TEXT GENERATED ALWAYS AS (project_id || '::' || COALESCE(folder_path, '')) STORED,
     project_type TEXT GENERATED ALWAYS AS (project_id || '::' || COALESCE(file_type, 'unknown')) STORED,
@@ -639,6 +651,15 @@ ON files (project_id, full_path);
 CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_files_folder_path 
 ON files (project_id, folder_path);
 
+-- 🔑 删除对账：按父文件夹查找未删除的子项
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_folders_live_children 
+ON folders (project_id, parent_id) 
+WHERE deleted_at IS NULL;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_files_live_children 
+ON files (project_id, parent_folder_id) 
+WHERE deleted_at IS NULL;
+
 -- 🚀 自定义属性优化索引
 CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_custom_attr_definitions_project_scope 
 ON custom_attribute_definitions (project_id, scope_type, scope_folder_id);
@@ -0,0 +1,405 @@
+# -*- coding: utf-8 -*-
+"""
+进程级 psycopg2 连接池
+
+Flask CDE 蓝图的各个 Manager 之前每个请求都 psycopg2.connect()，
+对 Neon（TLS）每次要多花 100-300ms 握手。这里提供一个共享的
+ThreadedConnectionPool 封装：
+
+- 借出时按需健康检查（空闲超过阈值才 SELECT 1）
+- 连接存活超过 max_lifetime 自动回收重建
+- statement_timeout 默认不限制，请求路径的调用方借出时按需设置（归还时恢复）
+- 空闲连接最多保留 maxconn 个，避免并发时反复新建 TLS 连接
+- 记录等待时间、借出次数、占用时长等指标
+
+调用方式保持不变：get_connection() 返回的对象与 psycopg2 连接用法一致，
+conn.close() 会把连接归还连接池而不是断开。
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import deque
+from typing import Any, Dict, Optional
+
+import psycopg2
+import psycopg2.extensions
+from psycopg2.pool import ThreadedConnectionPool
+
+logger = logging.getLogger(__name__)
+
+# 交互请求（Flask API）借出连接时使用的 statement_timeout，同步等长任务不设置
+REQUEST_STATEMENT_TIMEOUT_MS = int(os.getenv('DB_REQUEST_STATEMENT_TIMEOUT_MS', 30000))
+
+
+class PoolTimeoutError(psycopg2.OperationalError):
+    """等待空闲连接超时"""
+
+
+class PooledConnection:
+    """
+    连接池中借出的连接代理
+
+    - close() 归还连接池
+    - with conn: 与 psycopg2 一致，只提交/回滚事务，不归还
+    - 代理对象被回收时若仍未归还，自动归还（兼容只用 with 不 close 的旧代码）
+    """
+
+    def __init__(self, provider: 'PooledConnectionProvider', conn, wait_ms: float,
+                 statement_timeout_set: bool = False):
+        self._provider = provider
+        self._conn = conn
+        self._released = False
+        self._checked_out_at = time.monotonic()
+        self._statement_timeout_set = statement_timeout_set
+        self.wait_ms = wait_ms
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    @property
+    def closed(self) -> int:
+        return 1 if self._released else self._conn.closed
+
+    @property
+    def raw_connection(self):
+        """底层 psycopg2 连接"""
+        return self._conn
+
+    def close(self):
+        """归还连接池"""
+        if not self._released:
+            self._released = True
+            self._provider._release(self._conn, time.monotonic() - self._checked_out_at,
+                                    self._statement_timeout_set)
+
+    def __enter__(self):
+        self._conn.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return self._conn.__exit__(exc_type, exc, tb)
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class PooledConnectionProvider:
+    """ThreadedConnectionPool 封装：阻塞等待、健康检查、寿命回收与指标"""
+
+    def __init__(self, db_params: Dict[str, Any], minconn: int = None, maxconn: int = None,
+                 max_lifetime: float = None, health_check_idle: float = None,
+                 statement_timeout_ms: int = None, acquire_timeout: float = None):
+        self.db_params = dict(db_params)
+        self.minconn = minconn if minconn is not None else int(os.getenv('DB_POOL_MIN', 1))
+        self.maxconn = maxconn if maxconn is not None else int(os.getenv('DB_POOL_MAX', 10))
+        # 连接最长存活时间（秒），超过后归还时关闭
+        self.max_lifetime = max_lifetime if max_lifetime is not None else float(os.getenv('DB_POOL_MAX_LIFETIME', 1800))
+        # 空闲超过该时间（秒）的连接借出前先 SELECT 1
+        self.health_check_idle = health_check_idle if health_check_idle is not None else float(os.getenv('DB_POOL_HEALTH_CHECK_IDLE', 30))
+        # 连接级默认 statement_timeout（毫秒），0 表示不限制；需要限制的调用方借出时单独设置
+        self.statement_timeout_ms = statement_timeout_ms if statement_timeout_ms is not None else int(os.getenv('DB_STATEMENT_TIMEOUT_MS', 0))
+        self.acquire_timeout = acquire_timeout if acquire_timeout is not None else float(os.getenv('DB_POOL_ACQUIRE_TIMEOUT', 10))
+
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.maxconn)
+        self._pool: Optional[ThreadedConnectionPool] = None
+        self._pid = None
+        # id(conn) -> {'created_at', 'last_used'}
+        self._conn_meta: Dict[int, Dict[str, float]] = {}
+
+        self._waits_ms = deque(maxlen=1000)
+        self.stats = {
+            'checkouts': 0,
+            'timeouts': 0,
+            'connections_created': 0,
+            'connections_recycled': 0,
+            'health_check_failures': 0,
+            'in_use': 0,
+            'total_wait_ms': 0.0,
+            'max_wait_ms': 0.0,
+            'total_hold_ms': 0.0
+        }
+
+    # ------------------------------------------------------------------
+    # 连接池生命周期
+    # ------------------------------------------------------------------
+
+    def _ensure_pool(self) -> ThreadedConnectionPool:
+        """首次使用或 fork 后（子进程不能复用父进程的 socket）创建连接池"""
+        pid = os.getpid()
+        if self._pool is not None and self._pid == pid:
+            return self._pool
+
+        with self._lock:
+            if self._pool is None or self._pid != pid:
+                if self._pool is not None:
+                    logger.info("检测到进程 fork，重建 psycopg2 连接池")
+                self._conn_meta.clear()
+                self._slots = threading.BoundedSemaphore(self.maxconn)
+                self._pool = ThreadedConnectionPool(self.minconn, self.maxconn, **self.db_params)
+                # psycopg2 归还时只保留 minconn 个空闲连接，其余直接关闭；
+                # 启动时仍只建 minconn 个，之后空闲连接保留到 maxconn，寿命和健康检查由本类负责
+                self._pool.minconn = self.maxconn
+                self._pid = pid
+                for conn in list(self._pool._pool):
+                    self._prepare_new(conn)
+                logger.info(f"psycopg2 连接池已创建 (min={self.minconn}, max={self.maxconn}, "
+                            f"host={self.db_params.get('host')})")
+        return self._pool
+
+    def _prepare_new(self, conn):
+        """新连接：设置 statement_timeout 并登记创建时间"""
+        now = time.monotonic()
+        self._conn_meta[id(conn)] = {'created_at': now, 'last_used': now}
+        self.stats['connections_created'] += 1
+
+        if self.statement_timeout_ms:
+            with conn.cursor() as cur:
+                cur.execute("SET statement_timeout = %s", (self.statement_timeout_ms,))
+            conn.commit()
+
+    def close_all(self):
+        """关闭所有连接"""
+        with self._lock:
+            if self._pool is not None:
+                self._pool.closeall()
+                self._pool = None
+                self._conn_meta.clear()
+
+    # ------------------------------------------------------------------
+    # 借出 / 归还
+    # ------------------------------------------------------------------
+
+    def _is_healthy(self, conn) -> bool:
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, pool: ThreadedConnectionPool, conn) -> bool:
+        """关闭连接并从连接池移除，返回连接是否已离开 psycopg2 的已借出列表"""
+        self._conn_meta.pop(id(conn), None)
+        try:
+            pool.putconn(conn, close=True)
+            return True
+        except Exception as e:
+            logger.warning(f"关闭连接失败: {e}")
+            try:
+                conn.close()
+            except Exception:
+                pass
+            return id(conn) not in getattr(pool, '_rused', {})
+
+    def _set_statement_timeout(self, conn, timeout_ms: int):
+        with conn.cursor() as cur:
+            cur.execute("SET statement_timeout = %s", (timeout_ms,))
+        conn.commit()
+
+    def get_connection(self, statement_timeout_ms: int = None) -> PooledConnection:
+        """
+        借出一个连接（连接池满时最多等待 acquire_timeout 秒）
+
+        Args:
+            statement_timeout_ms: 本次借出期间的 statement_timeout，归还时恢复连接池默认值
+
+        Raises:
+            PoolTimeoutError: 等待超时
+        """
+        pool = self._ensure_pool()
+        slots = self._slots
+
+        start = time.monotonic()
+        if not slots.acquire(timeout=self.acquire_timeout):
+            with self._lock:
+                self.stats['timeouts'] += 1
+            raise PoolTimeoutError(f"Timed out after {self.acquire_timeout}s waiting for a database connection")
+
+        try:
+            conn = None
+            for _ in range(3):
+                conn = pool.getconn()
+                meta = self._conn_meta.get(id(conn))
+                now = time.monotonic()
+
+                if meta is None:
+                    self._prepare_new(conn)
+                elif conn.closed or now - meta['created_at'] > self.max_lifetime:
+                    self.stats['connections_recycled'] += 1
+                    self._discard(pool, conn)
+                    conn = None
+                    continue
+                elif now - meta['last_used'] > self.health_check_idle and not self._is_healthy(conn):
+                    self.stats['health_check_failures'] += 1
+                    logger.warning("连接池健康检查失败，丢弃连接")
+                    self._discard(pool, conn)
+                    conn = None
+                    continue
+                break
+
+            if conn is None:
+                conn = pool.getconn()
+                self._prepare_new(conn)
+
+            if statement_timeout_ms is not None:
+                try:
+                    self._set_statement_timeout(conn, statement_timeout_ms)
+                except Exception:
+                    self._discard(pool, conn)
+                    raise
+        except BaseException:
+            slots.release()
+            raise
+
+        wait_ms = (time.monotonic() - start) * 1000
+        with self._lock:
+            self.stats['checkouts'] += 1
+            self.stats['in_use'] += 1
+            self.stats['total_wait_ms'] += wait_ms
+            self.stats['max_wait_ms'] = max(self.stats['max_wait_ms'], wait_ms)
+            self._waits_ms.append(wait_ms)
+
+        return PooledConnection(self, conn, wait_ms, statement_timeout_ms is not None)
+
+    def _release(self, conn, held_seconds: float, reset_statement_timeout: bool = False):
+        """归还连接：回滚未完成事务，坏连接或超龄连接直接关闭"""
+        pool = self._pool
+        slots = self._slots
+        returned = True
+        try:
+            if pool is None or self._pid != os.getpid():
+                conn.close()
+                return
+
+            meta = self._conn_meta.get(id(conn))
+            close = bool(conn.closed)
+            if not close:
+                try:
+                    if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                        conn.rollback()
+                    if conn.autocommit:
+                        conn.autocommit = False
+                    if reset_statement_timeout:
+                        self._set_statement_timeout(conn, self.statement_timeout_ms)
+                except Exception:
+                    close = True
+
+            if meta and time.monotonic() - meta['created_at'] > self.max_lifetime:
+                self.stats['connections_recycled'] += 1
+                close = True
+
+            if close:
+                returned = self._discard(pool, conn)
+                return
+
+            if meta:
+                meta['last_used'] = time.monotonic()
+            try:
+                pool.putconn(conn)
+            except Exception as e:
+                logger.warning(f"归还连接失败，关闭该连接: {e}")
+                returned = self._discard(pool, conn)
+                return
+
+            # psycopg2 可能在归还时关闭连接（断线、超过保留数量），同步清理登记信息
+            if conn.closed:
+                self._conn_meta.pop(id(conn), None)
+        finally:
+            with self._lock:
+                self.stats['in_use'] -= 1
+                self.stats['total_hold_ms'] += held_seconds * 1000
+            # 连接仍留在 psycopg2 的已借出列表时不释放名额，否则后续借出会直接报 pool exhausted
+            if returned:
+                slots.release()
+
+    # ------------------------------------------------------------------
+    # 指标
+    # ------------------------------------------------------------------
+
+    def get_stats(self) -> Dict[str, Any]:
+        """等待时间分位数、借出次数、平均占用时长等"""
+        with self._lock:
+            stats = dict(self.stats)
+            waits = sorted(self._waits_ms)
+
+        def percentile(p: float) -> float:
+            if not waits:
+                return 0.0
+            return round(waits[min(len(waits) - 1, int(len(waits) * p))], 2)
+
+        checkouts = stats['checkouts']
+        return {
+            **stats,
+            'total_wait_ms': round(stats['total_wait_ms'], 2),
+            'max_wait_ms': round(stats['max_wait_ms'], 2),
+            'avg_wait_ms': round(stats['total_wait_ms'] / checkouts, 2) if checkouts else 0.0,
+            'p50_wait_ms': percentile(0.50),
+            'p95_wait_ms': percentile(0.95),
+            'avg_hold_ms': round(stats['total_hold_ms'] / checkouts, 2) if checkouts else 0.0,
+            'open_connections': len(self._conn_meta),
+            'minconn': self.minconn,
+            'maxconn': self.maxconn
+        }
+
+
+# ============================================================================
+# 进程级共享实例
+# ============================================================================
+
+_providers: Dict[tuple, PooledConnectionProvider] = {}
+_providers_lock = threading.Lock()
+
+
+def _default_db_params() -> Dict[str, Any]:
+    from database_sql.neon_config import NeonConfig
+    return NeonConfig().get_db_params()
+
+
+def get_pool_provider(db_params: Optional[Dict[str, Any]] = None) -> PooledConnectionProvider:
+    """按连接参数获取共享的连接池（相同参数共用一个池）"""
+    params = db_params or _default_db_params()
+    key = tuple(sorted((k, str(v)) for k, v in params.items()))
+
+    provider = _providers.get(key)
+    if provider is None:
+        with _providers_lock:
+            provider = _providers.get(key)
+            if provider is None:
+                provider = PooledConnectionProvider(params)
+                _providers[key] = provider
+    return provider
+
+
+def get_pooled_connection(db_params: Optional[Dict[str, Any]] = None,
+                          statement_timeout_ms: int = None) -> PooledConnection:
+    """
+    从共享连接池借出连接，用完调用 close() 归还
+
+    Args:
+        db_params: 连接参数（None 使用 NeonConfig）
+        statement_timeout_ms: 本次借出期间的 statement_timeout（交互请求传 REQUEST_STATEMENT_TIMEOUT_MS）
+    """
+    return get_pool_provider(db_params).get_connection(statement_timeout_ms)
+
+
+def get_pool_stats() -> Dict[str, Any]:
+    """所有连接池的指标，key 为 host/database"""
+    return {
+        f"{provider.db_params.get('host')}/{provider.db_params.get('database')}": provider.get_stats()
+        for provider in list(_providers.values())
+    }
+
+
+def close_all_pools():
+    """进程退出时关闭所有连接池"""
+    with _providers_lock:
+        for provider in _providers.values():
+            provider.close_all()
+        _providers.clear()
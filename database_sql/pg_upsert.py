@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""
+集合式 UPSERT 辅助函数
+
+账户同步和评审增量同步共用：execute_values 把多行合并成一条
+INSERT ... VALUES ... ON CONFLICT 语句，RETURNING (xmax = 0) 区分新增与更新。
+"""
+
+from typing import Any, Dict, List, Tuple
+
+import psycopg2.extras
+
+# execute_values 每条语句的行数
+UPSERT_PAGE_SIZE = 1000
+
+
+def execute_upsert(cursor, sql: str, template: str, rows: List[Dict[str, Any]],
+                   key_fields: Tuple[str, ...]) -> Tuple[int, int]:
+    """
+    集合式 UPSERT：execute_values 按 UPSERT_PAGE_SIZE 行一条语句写入
+
+    sql 形如 "INSERT ... VALUES %s ON CONFLICT ... RETURNING (xmax = 0) AS inserted"，
+    DO UPDATE 带 WHERE 条件时未变化的行不返回、不计入。
+    同一条语句中冲突键重复会报错，因此先按 key_fields 去重（保留最后一条）。
+    普通游标和 RealDictCursor 均可使用（取返回行的第一列）。
+
+    Returns:
+        (新增数, 更新数)
+    """
+    unique_rows = list({tuple(row[field] for field in key_fields): row for row in rows}.values())
+    if not unique_rows:
+        return 0, 0
+
+    results = psycopg2.extras.execute_values(
+        cursor, sql, unique_rows, template=template, page_size=UPSERT_PAGE_SIZE, fetch=True
+    )
+    inserted = sum(1 for result in results if _first_column(result))
+    return inserted, len(results) - inserted
+
+
+def _first_column(row):
+    if isinstance(row, dict):
+        return next(iter(row.values()))
+    return row[0]
@@ -5,6 +5,7 @@
 """
 
 import psycopg2
+import psycopg2.extras
 from psycopg2.extras import RealDictCursor, Json
 from typing import List, Dict, Optional, Any, Tuple
 from datetime import datetime, timezone
@@ -12,6 +13,13 @@ import uuid
 import json
 from contextlib import contextmanager
 
+try:
+    from database_sql.pg_pool import get_pooled_connection
+    from database_sql.pg_upsert import execute_upsert
+except ImportError:
+    from pg_pool import get_pooled_connection
+    from pg_upsert import execute_upsert
+
 # Database connection configuration
 def get_connection(connection_params: Optional[Dict] = None):
     """
@@ -21,10 +29,10 @@ def get_connection(connection_params: Optional[Dict] = None):
         connection_params: Optional connection parameters
         
     Returns:
-        psycopg2 connection object
+        Pooled psycopg2 connection (close() returns it to the shared pool)
     """
     if connection_params:
-        return psycopg2.connect(**connection_params)
+        return get_pooled_connection(connection_params)
     
     # Default connection using neon_config settings
     try:
@@ -39,18 +47,18 @@ def get_connection(connection_params: Optional[Dict] = None):
             'password': config.password,
             'sslmode': config.ssl
         }
-        return psycopg2.connect(**conn_params)
+        return get_pooled_connection(conn_params)
     except Exception as e:
         # Fallback to environment variables or default
         import os
-        return psycopg2.connect(
-            host=os.getenv('DB_HOST', 'localhost'),
-            port=os.getenv('DB_PORT', 5432),
-            database=os.getenv('DB_NAME', 'neondb'),
-            user=os.getenv('DB_USER', 'neondb_owner'),
-            password=os.getenv('DB_PASSWORD', ''),
-            sslmode=os.getenv('DB_SSL', 'require')
-        )
+        return get_pooled_connection({
+            'host': os.getenv('DB_HOST', 'localhost'),
+            'port': os.getenv('DB_PORT', 5432),
+            'database': os.getenv('DB_NAME', 'neondb'),
+            'user': os.getenv('DB_USER', 'neondb_owner'),
+            'password': os.getenv('DB_PASSWORD', ''),
+            'sslmode': os.getenv('DB_SSL', 'require')
+        })
 
 
 class ReviewDataAccess:
@@ -314,7 +322,17 @@ class ReviewDataAccess:
                 SELECT * FROM reviews WHERE acc_review_id = %s
             """, (acc_review_id,))
             return dict(cursor.fetchone()) if cursor.rowcount > 0 else None
-    
+
+    def get_review_ids_by_acc_ids(self, acc_review_ids: List[str]) -> Dict[str, int]:
+        """批量查询 ACC 评审ID 对应的本地评审ID（acc_review_id -> id）"""
+        if not acc_review_ids:
+            return {}
+        with self.get_cursor() as cursor:
+            cursor.execute("""
+                SELECT acc_review_id, id FROM reviews WHERE acc_review_id = ANY(%s)
+            """, (list(acc_review_ids),))
+            return {row['acc_review_id']: row['id'] for row in cursor.fetchall()}
+
     def update_review(self, review_id: int, update_data: Dict[str, Any]) -> bool:
         """更新评审"""
         with self.get_cursor() as cursor:
@@ -671,7 +689,189 @@ class ReviewDataAccess:
             
             cursor.execute(query, all_values)
             return cursor.rowcount
-    
+
+    # ========================================================================
+    # 增量同步（差异写入与水位线）
+    # ========================================================================
+
+    def upsert_changed_review_files(self, files_data: List[Dict[str, Any]]) -> Tuple[int, int]:
+        """
+        差异写入评审文件审批状态：新文件插入，审批字段有变化的才更新
+
+        Args:
+            files_data: 文件数据列表（同 batch_insert_review_files）
+
+        Returns:
+            (插入数量, 更新数量)，未变化的行不计入
+        """
+        if not files_data:
+            return 0, 0
+
+        sql = """
+            INSERT INTO review_file_versions (
+                review_id, file_version_urn, approval_status, approval_status_id,
+                approval_status_value, approval_label, approval_comments,
+                review_content, custom_attributes, copied_file_version_urn
+            )
+            VALUES %s
+            ON CONFLICT (review_id, file_version_urn)
+            DO UPDATE SET
+                approval_status = EXCLUDED.approval_status,
+                approval_status_id = EXCLUDED.approval_status_id,
+                approval_status_value = EXCLUDED.approval_status_value,
+                approval_label = EXCLUDED.approval_label,
+                approval_comments = EXCLUDED.approval_comments,
+                review_content = EXCLUDED.review_content,
+                custom_attributes = EXCLUDED.custom_attributes,
+                copied_file_version_urn = EXCLUDED.copied_file_version_urn
+            WHERE (
+                review_file_versions.approval_status, review_file_versions.approval_status_id,
+                review_file_versions.approval_status_value, review_file_versions.approval_label,
+                review_file_versions.approval_comments, review_file_versions.review_content,
+                review_file_versions.custom_attributes, review_file_versions.copied_file_version_urn
+            ) IS DISTINCT FROM (
+                EXCLUDED.approval_status, EXCLUDED.approval_status_id,
+                EXCLUDED.approval_status_value, EXCLUDED.approval_label,
+                EXCLUDED.approval_comments, EXCLUDED.review_content,
+                EXCLUDED.custom_attributes, EXCLUDED.copied_file_version_urn
+            )
+            RETURNING (xmax = 0) AS inserted
+        """
+        template = """(
+            %(review_id)s, %(file_version_urn)s, %(approval_status)s, %(approval_status_id)s,
+            %(approval_status_value)s, %(approval_label)s, %(approval_comments)s,
+            %(review_content)s, %(custom_attributes)s, %(copied_file_version_urn)s
+        )"""
+
+        rows = []
+        for file_data in files_data:
+            rows.append({
+                'approval_status': 'PENDING',
+                'approval_status_id': None,
+                'approval_status_value': None,
+                'approval_label': None,
+                'approval_comments': None,
+                'copied_file_version_urn': None,
+                **file_data,
+                'review_content': Json(file_data.get('review_content') or {}),
+                'custom_attributes': Json(file_data.get('custom_attributes') or []),
+            })
+
+        with self.get_cursor() as cursor:
+            return execute_upsert(cursor, sql, template, rows, ('review_id', 'file_version_urn'))
+
+    def upsert_changed_review_steps(self, steps_data: List[Dict[str, Any]]) -> Tuple[int, int]:
+        """
+        差异写入评审进度：新步骤插入，状态/参与者/时间有变化的才更新
+
+        与 batch_insert_review_steps 使用相同的条件唯一索引（SENT_BACK/COMPLETED 的历史记录不参与冲突）
+
+        Returns:
+            (插入数量, 更新数量)，未变化的行不计入
+        """
+        if not steps_data:
+            return 0, 0
+
+        tracked = [
+            'template_step_id', 'step_name', 'step_type', 'step_order', 'status',
+            'assigned_to', 'claimed_by', 'completed_by', 'action_by', 'candidates',
+            'decision', 'comments', 'notes', 'due_date', 'started_at', 'completed_at', 'end_time'
+        ]
+        json_fields = {'assigned_to', 'claimed_by', 'completed_by', 'action_by', 'candidates'}
+
+        sql = f"""
+            INSERT INTO review_progress (review_id, step_id, {', '.join(tracked)})
+            VALUES %s
+            ON CONFLICT (review_id, step_id)
+            WHERE status NOT IN ('SENT_BACK', 'COMPLETED')
+            DO UPDATE SET
+                {', '.join(f'{col} = EXCLUDED.{col}' for col in tracked)}
+            WHERE ({', '.join(f'review_progress.{col}' for col in tracked)})
+                IS DISTINCT FROM ({', '.join(f'EXCLUDED.{col}' for col in tracked)})
+            RETURNING (xmax = 0) AS inserted
+        """
+
+        template = f"(%(review_id)s, %(step_id)s, {', '.join(f'%({col})s' for col in tracked)})"
+
+        rows = []
+        for step_data in steps_data:
+            params = {col: step_data.get(col) for col in tracked}
+            params['review_id'] = step_data['review_id']
+            params['step_id'] = step_data['step_id']
+            params['status'] = params['status'] or 'PENDING'
+            for col in json_fields:
+                default = [] if col == 'assigned_to' else {}
+                params[col] = Json(params[col] if params[col] is not None else default)
+            rows.append(params)
+
+        with self.get_cursor() as cursor:
+            return execute_upsert(cursor, sql, template, rows, ('review_id', 'step_id'))
+
+    def get_review_sync_watermark(self, project_id: str) -> Optional[datetime]:
+        """获取项目的评审增量同步水位线（已完整同步的最大 ACC updatedAt）"""
+        with self.get_cursor() as cursor:
+            cursor.execute("""
+                SELECT watermark FROM review_sync_state WHERE project_id = %s
+            """, (project_id,))
+            row = cursor.fetchone()
+            return row['watermark'] if row else None
+
+    def save_review_sync_state(
+        self,
+        project_id: str,
+        watermark: Optional[datetime],
+        reviews_listed: int = 0,
+        reviews_changed: int = 0,
+        reviews_failed: int = 0
+    ) -> None:
+        """
+        记录本次增量同步结果
+
+        watermark 只会前进：传入 None 或更早的时间时保留原值
+        """
+        with self.get_cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO review_sync_state (
+                    project_id, watermark, last_run_at, reviews_listed, reviews_changed, reviews_failed
+                )
+                VALUES (%s, %s, CURRENT_TIMESTAMP, %s, %s, %s)
+                ON CONFLICT (project_id) DO UPDATE SET
+                    watermark = GREATEST(review_sync_state.watermark, EXCLUDED.watermark),
+                    last_run_at = EXCLUDED.last_run_at,
+                    reviews_listed = EXCLUDED.reviews_listed,
+                    reviews_changed = EXCLUDED.reviews_changed,
+                    reviews_failed = EXCLUDED.reviews_failed
+            """, (project_id, watermark, reviews_listed, reviews_changed, reviews_failed))
+
+    def get_review_sync_stamps(self, project_id: str) -> Dict[str, Optional[datetime]]:
+        """获取项目内每个 ACC 评审已同步的 updatedAt（acc_review_id -> acc_updated_at）"""
+        with self.get_cursor() as cursor:
+            cursor.execute("""
+                SELECT acc_review_id, acc_updated_at
+                FROM reviews
+                WHERE project_id = %s AND acc_review_id IS NOT NULL
+            """, (project_id,))
+            return {row['acc_review_id']: row['acc_updated_at'] for row in cursor.fetchall()}
+
+    def mark_reviews_synced(self, stamps: Dict[str, datetime]) -> int:
+        """
+        记录评审已完整同步（文件和步骤均已写入）时的 ACC updatedAt
+
+        Args:
+            stamps: acc_review_id -> ACC updatedAt
+        """
+        if not stamps:
+            return 0
+
+        with self.get_cursor() as cursor:
+            psycopg2.extras.execute_values(cursor, """
+                UPDATE reviews AS r
+                SET acc_updated_at = v.acc_updated_at::timestamptz
+                FROM (VALUES %s) AS v(acc_review_id, acc_updated_at)
+                WHERE r.acc_review_id = v.acc_review_id
+            """, list(stamps.items()))
+            return cursor.rowcount
+
     def get_user_pending_tasks(self, user_id: str) -> List[Dict[str, Any]]:
         """获取用户待处理任务"""
         with self.get_cursor() as cursor:
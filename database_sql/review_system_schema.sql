@@ -207,6 +207,7 @@ CREATE TABLE reviews (
     
     -- 同步信息
     last_synced_at TIMESTAMP WITH TIME ZONE,
+    acc_updated_at TIMESTAMP WITH TIME ZONE,  -- 已完整同步（含文件和步骤）的 ACC updatedAt，增量同步据此跳过未变化的评审
     sync_status VARCHAR(20) DEFAULT 'pending'
 );
 
@@ -613,6 +614,18 @@ CREATE TABLE file_approval_history (
     CONSTRAINT unique_file_review_approval UNIQUE (file_version_urn, review_acc_id, approval_status_id)
 );
 
+-- ============================================================================
+-- 13. 评审增量同步状态表（每个项目一个 updatedAt 水位线）
+-- ============================================================================
+CREATE TABLE review_sync_state (
+    project_id VARCHAR(255) PRIMARY KEY,
+    watermark TIMESTAMP WITH TIME ZONE,  -- 已完整同步的评审中最大的 ACC updatedAt
+    last_run_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    reviews_listed INTEGER DEFAULT 0,
+    reviews_changed INTEGER DEFAULT 0,
+    reviews_failed INTEGER DEFAULT 0
+);
+
 -- ============================================================================
 -- 扩展sync_tasks表（如果存在）
 -- ============================================================================
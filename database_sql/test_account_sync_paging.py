@@ -0,0 +1,131 @@
+"""
+测试账户同步的并发分页（不访问 ACC 和数据库）
+"""
+
+import sys
+import os
+import asyncio
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from database_sql.account_sync import AccountDataSyncManager
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.status = 200
+        self._data = data
+
+    async def json(self):
+        return self._data
+
+    async def text(self):
+        return ''
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakeSession:
+    """按 offset 切分 records；with_total 时按 Admin API 格式返回 results + pagination"""
+
+    def __init__(self, records, with_total=False):
+        self.records = records
+        self.with_total = with_total
+        self.offsets = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def get(self, url, headers=None, params=None):
+        session = self
+        offset, limit = params['offset'], params['limit']
+        session.offsets.append(offset)
+
+        class Context:
+            async def __aenter__(self):
+                session.in_flight += 1
+                session.max_in_flight = max(session.max_in_flight, session.in_flight)
+                await asyncio.sleep(0.005)
+                session.in_flight -= 1
+                items = session.records[offset:offset + limit]
+                if session.with_total:
+                    return FakeResponse({'results': items, 'pagination': {'totalResults': len(session.records)}})
+                return FakeResponse(items)
+
+            async def __aexit__(self, *exc):
+                return False
+
+        return Context()
+
+
+def test_fan_out_with_total_results():
+    """测试带 totalResults 时第一页之后并发获取其余页，结果按顺序合并"""
+    records = [{'id': f'u{i}'} for i in range(1050)]
+    session = FakeSession(records, with_total=True)
+    manager = AccountDataSyncManager(page_concurrency=4)
+
+    users = asyncio.run(manager._fetch_all_project_users(session, 'b.p', {}, show_progress=False))
+
+    assert [u['id'] for u in users] == [r['id'] for r in records]
+    assert session.offsets[0] == 0 and sorted(session.offsets) == list(range(0, 1050, 200))
+    assert 1 < session.max_in_flight <= 4
+
+
+def test_fan_out_without_total_stops_at_short_page():
+    """测试 HQ 接口（无总数）按轮并发请求，遇到不满一页时停止"""
+    records = [{'id': f'u{i}'} for i in range(730)]
+    session = FakeSession(records)
+    manager = AccountDataSyncManager(page_concurrency=3)
+
+    users = asyncio.run(manager._fetch_all_account_users(session, 'acc', {}, show_progress=False))
+
+    assert [u['id'] for u in users] == [r['id'] for r in records]
+    # 第一页 + 3 轮 x 3 页，最后一轮包含不满一页的 offset=700
+    assert len(session.offsets) == 1 + 3 * 3 and max(session.offsets) == 900
+
+    # 恰好整页时，下一轮返回空页后停止
+    session = FakeSession(records[:300])
+    users = asyncio.run(manager._fetch_all_account_users(session, 'acc', {}, show_progress=False))
+    assert len(users) == 300
+
+
+def test_page_cache_reused_within_full_sync():
+    """测试 full_account_sync 期间同一列表只获取一次"""
+    records = [{'id': f'u{i}'} for i in range(150)]
+    session = FakeSession(records)
+    manager = AccountDataSyncManager()
+
+    manager._page_cache = {}
+    asyncio.run(manager._fetch_all_account_users(session, 'acc', {}, show_progress=False))
+    calls = len(session.offsets)
+    users = asyncio.run(manager._fetch_all_account_users(session, 'acc', {}, show_progress=False))
+    assert len(users) == 150 and len(session.offsets) == calls
+
+
+def run_all_tests():
+    """运行所有测试"""
+    tests = [
+        test_fan_out_with_total_results,
+        test_fan_out_without_total_stops_at_short_page,
+        test_page_cache_reused_within_full_sync,
+    ]
+
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
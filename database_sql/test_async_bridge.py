@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+测试后台事件循环桥（不访问数据库和ACC）
+"""
+
+import sys
+import os
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from database_sql.async_bridge import AsyncLoopBridge, AsyncBridgeTimeout
+
+
+def test_calls_share_one_long_lived_loop():
+    """测试多次调用、多个线程的调用都在同一个事件循环中执行，循环级资源只创建一次"""
+    bridge = AsyncLoopBridge(name='test-bridge', default_timeout=5)
+    created = []
+
+    @asynccontextmanager
+    async def scope():
+        created.append(asyncio.get_running_loop())
+        yield
+
+    bridge.add_scope(scope)
+
+    async def current_loop():
+        return asyncio.get_running_loop()
+
+    try:
+        loops = {bridge.run(current_loop()) for _ in range(5)}
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(bridge.run(current_loop()))) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(loops) == 1 and set(results) == loops
+        assert created == list(loops)
+        metrics = bridge.get_metrics()
+        assert metrics['calls'] == 9 and metrics['completed'] == 9 and metrics['in_flight'] == 0
+        assert metrics['running']
+    finally:
+        bridge.stop()
+    assert not bridge.is_running()
+
+
+def test_timeout_cancels_coroutine_and_errors_propagate():
+    """测试超时取消协程并抛出 AsyncBridgeTimeout，协程异常原样抛出"""
+    bridge = AsyncLoopBridge(name='test-bridge', default_timeout=5)
+    cancelled = threading.Event()
+
+    async def slow():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    async def failing():
+        raise ValueError('boom')
+
+    async def own_timeout():
+        raise asyncio.TimeoutError()
+
+    try:
+        try:
+            bridge.run(slow(), timeout=0.05)
+            assert False, "应当超时"
+        except AsyncBridgeTimeout:
+            pass
+        assert cancelled.wait(1), "超时后协程未被取消"
+
+        try:
+            bridge.run(failing())
+            assert False, "应当抛出协程异常"
+        except ValueError as e:
+            assert str(e) == 'boom'
+
+        try:
+            bridge.run(own_timeout())
+            assert False, "应当抛出协程自身的超时"
+        except AsyncBridgeTimeout:
+            assert False, "协程自身的超时不应视为桥接超时"
+        except asyncio.TimeoutError:
+            pass
+
+        metrics = bridge.get_metrics()
+        assert metrics['timeouts'] == 1 and metrics['cancelled'] == 1 and metrics['errors'] == 2
+    finally:
+        bridge.stop()
+
+
+def test_stop_cancels_pending_and_runs_shutdown_hooks():
+    """测试停止时取消未完成的调用、执行清理协程并关闭循环级资源"""
+    bridge = AsyncLoopBridge(name='test-bridge', default_timeout=5)
+    events = []
+
+    @asynccontextmanager
+    async def scope():
+        yield
+        events.append('scope_closed')
+
+    async def hook():
+        events.append('hook')
+
+    bridge.add_scope(scope)
+    bridge.add_shutdown_hook(hook)
+
+    future = bridge.submit(asyncio.sleep(10))
+    bridge.stop()
+
+    assert future.cancelled()
+    assert events == ['hook', 'scope_closed']
+
+
+def run_all_tests():
+    """运行所有测试"""
+    tests = [
+        test_calls_share_one_long_lived_loop,
+        test_timeout_cancels_coroutine_and_errors_propagate,
+        test_stop_cancels_pending_and_runs_shutdown_hooks,
+    ]
+
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
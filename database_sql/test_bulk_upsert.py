@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+测试批量写入引擎 _bulk_upsert（模拟的 asyncpg 连接，不访问数据库）
+"""
+
+import sys
+import os
+import asyncio
+from contextlib import asynccontextmanager
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from database_sql.optimized_data_access import OptimizedPostgreSQLDataAccess
+
+
+COLUMNS = ['id', 'name']
+UPDATE_CLAUSE = "name = EXCLUDED.name WHERE items.name IS DISTINCT FROM EXCLUDED.name"
+
+
+class FakeConnection:
+    """
+    记录执行的SQL，并在内存表上模拟暂存表合并：
+
+    - 合并语句按冲突键保留 _stage_seq 最大的一行（等价于 DISTINCT ON ... ORDER BY _stage_seq DESC）
+    - name 为 None 的行模拟违反约束：合并整块失败，逐行写入时只有该行失败
+    """
+
+    def __init__(self):
+        self.statements = []
+        self.staged = []
+        self.table = {}
+        self.copies = []
+        self.savepoints = 0
+
+    @asynccontextmanager
+    async def transaction(self):
+        self.savepoints += 1
+        snapshot = dict(self.table)
+        try:
+            yield
+        except Exception:
+            self.table = snapshot
+            raise
+
+    async def execute(self, sql, *args):
+        sql = ' '.join(sql.split())
+        self.statements.append(sql)
+        if sql.startswith('TRUNCATE'):
+            self.staged = []
+        elif sql.startswith('INSERT INTO items (id, name) SELECT DISTINCT ON'):
+            latest = {}
+            for row in sorted(self.staged, key=lambda r: r[-1]):
+                latest[row[0]] = row
+            for row in latest.values():
+                self._write(row[:-1])
+        elif sql.startswith('INSERT INTO items (id, name) VALUES'):
+            self._write(args)
+
+    def _write(self, row):
+        if row[1] is None:
+            raise ValueError(f'null value in column "name" for {row[0]}')
+        self.table[row[0]] = row[1]
+
+    async def copy_records_to_table(self, table, records, columns):
+        self.copies.append((table, list(records), columns))
+        self.staged.extend(records)
+
+
+def _dal(chunk_size=5000):
+    dal = OptimizedPostgreSQLDataAccess.__new__(OptimizedPostgreSQLDataAccess)
+    dal.BULK_UPSERT_CHUNK_SIZE = chunk_size
+    return dal
+
+
+def _upsert(dal, conn, records):
+    labels = [f"Item {record[0]}" for record in records]
+    return asyncio.run(dal._bulk_upsert(conn, 'items', COLUMNS, 'id', UPDATE_CLAUSE, records, labels))
+
+
+def test_generated_statements():
+    """测试暂存表、COPY 列和 INSERT ... SELECT DISTINCT ON ... ON CONFLICT 合并语句"""
+    conn = FakeConnection()
+    result = _upsert(_dal(), conn, [('a', 'A'), ('b', 'B')])
+
+    assert result == {'upserted': 2, 'errors': [], 'fallback_chunks': 0}
+    create, truncate, merge = conn.statements
+    assert create == ('CREATE TEMP TABLE _stage_items ON COMMIT DROP AS '
+                      'SELECT id, name, 0::bigint AS _stage_seq FROM items WITH NO DATA')
+    assert truncate == 'TRUNCATE _stage_items'
+    assert merge == ('INSERT INTO items (id, name) SELECT DISTINCT ON (id) id, name FROM _stage_items '
+                     'ORDER BY id, _stage_seq DESC '
+                     f'ON CONFLICT (id) DO UPDATE SET {UPDATE_CLAUSE}')
+    [(table, records, columns)] = conn.copies
+    assert table == '_stage_items' and columns == ['id', 'name', '_stage_seq']
+    assert records == [('a', 'A', 0), ('b', 'B', 1)]
+
+
+def test_duplicate_keys_keep_last_record():
+    """测试同一分块内重复的冲突键只保留最后一条"""
+    conn = FakeConnection()
+    result = _upsert(_dal(), conn, [('a', 'old'), ('b', 'B'), ('a', 'new')])
+
+    assert result['upserted'] == 3 and result['errors'] == []
+    assert conn.table == {'a': 'new', 'b': 'B'}
+
+
+def test_failed_chunk_falls_back_to_rows():
+    """测试分块合并失败时只对该分块逐行写入，逐行错误带标签，其他分块照常合并"""
+    conn = FakeConnection()
+    records = [('a', 'A'), ('b', None), ('c', 'C'), ('d', 'D')]
+    result = _upsert(_dal(chunk_size=2), conn, records)
+
+    assert result['fallback_chunks'] == 1
+    assert result['upserted'] == 3
+    assert len(result['errors']) == 1 and result['errors'][0].startswith('Item b: null value')
+    assert conn.table == {'a': 'A', 'c': 'C', 'd': 'D'}
+    assert len(conn.copies) == 2
+    assert sum(sql.startswith('INSERT INTO items (id, name) VALUES ($1, $2)') for sql in conn.statements) == 2
+
+
+def test_empty_records_skip_database():
+    """测试没有记录时不执行任何语句"""
+    conn = FakeConnection()
+    assert _upsert(_dal(), conn, []) == {'upserted': 0, 'errors': [], 'fallback_chunks': 0}
+    assert conn.statements == []
+
+
+def run_all_tests():
+    """运行所有测试"""
+    tests = [
+        test_generated_statements,
+        test_duplicate_keys_keep_last_record,
+        test_failed_chunk_falls_back_to_rows,
+        test_empty_records_skip_database,
+    ]
+
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""
+测试项目成员索引（使用模拟连接，不访问数据库）
+"""
+
+import sys
+import os
+import time
+import threading
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from database_sql.membership_index import MembershipIndex, ProjectMembership, load_project_membership
+
+
+ROWS = [
+    ('u1', ['r-arch', 'r-pm'], 'c-a'),
+    ('u2', ['r-arch'], 'c-b'),
+    ('u3', [], 'c-a'),
+    (None, ['r-x'], 'c-x'),
+]
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.params = None
+
+    def execute(self, sql, params=None):
+        self.params = params
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, rows):
+        self.cursor_obj = FakeCursor(rows)
+        self.closed = False
+
+    def cursor(self):
+        return self.cursor_obj
+
+    def close(self):
+        self.closed = True
+
+
+def test_project_membership_lookups():
+    """测试四个方向的映射"""
+    membership = ProjectMembership('p', ROWS)
+
+    assert membership.roles_of('u1') == {'r-arch', 'r-pm'}
+    assert membership.roles_of('nobody') == frozenset()
+    assert membership.company_of('u3') == 'c-a' and membership.company_of('nobody') is None
+    assert membership.users_with_role('r-arch') == {'u1', 'u2'}
+    assert membership.users_in_company('c-a') == {'u1', 'u3'}
+    assert len(membership) == 3
+
+
+def test_load_merges_role_ids_and_roles():
+    """测试从 project_users 加载时合并 role_ids 与 roles，并归还连接"""
+    conn = FakeConnection([
+        ('adsk-1', ['r1'], [{'id': 'r2', 'name': 'PM'}], 'c1'),
+        ('adsk-2', None, None, None),
+    ])
+    membership = load_project_membership('b.p', connection_factory=lambda: conn)
+
+    assert conn.cursor_obj.params == ['b.p'] and conn.closed
+    assert membership.roles_of('adsk-1') == {'r1', 'r2'}
+    assert membership.company_of('adsk-1') == 'c1'
+    assert membership.roles_of('adsk-2') == frozenset()
+
+
+def test_index_caches_until_ttl_or_invalidate():
+    """测试命中缓存、TTL 过期与失效后重新加载，并记录指标"""
+    loads = []
+
+    def loader(project_id):
+        loads.append(project_id)
+        return ProjectMembership(project_id, ROWS)
+
+    index = MembershipIndex(ttl=0.05, loader=loader)
+    index.get('p')
+    index.get('p')
+    assert loads == ['p']
+
+    index.invalidate('p')
+    index.get('p')
+    assert loads == ['p', 'p']
+
+    time.sleep(0.06)
+    index.get('p')
+    assert len(loads) == 3
+
+    metrics = index.get_metrics()
+    assert metrics['hits'] == 1 and metrics['misses'] == 3 and metrics['loads'] == 3
+    assert metrics['invalidations'] == 1 and metrics['projects']['p']['users'] == 3
+
+
+def test_index_lru_and_load_errors():
+    """测试超过项目上限时淘汰最久未用的项目，加载失败返回空索引且不缓存"""
+    def loader(project_id):
+        if project_id == 'bad':
+            raise RuntimeError('connection refused')
+        return ProjectMembership(project_id, ROWS)
+
+    index = MembershipIndex(max_projects=2, loader=loader)
+    index.get('a')
+    index.get('b')
+    index.get('a')
+    index.get('c')
+    assert set(index.get_metrics()['projects']) == {'a', 'c'}
+
+    assert len(index.get('bad')) == 0
+    assert 'bad' not in index.get_metrics()['projects']
+    assert index.get_metrics()['load_errors'] == 1
+
+
+def test_concurrent_misses_load_once():
+    """测试多个线程同时未命中时只加载一次"""
+    loads = []
+
+    def loader(project_id):
+        loads.append(project_id)
+        time.sleep(0.05)
+        return ProjectMembership(project_id, ROWS)
+
+    index = MembershipIndex(loader=loader)
+    threads = [threading.Thread(target=index.get, args=('p',)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert loads == ['p']
+
+
+def test_invalidate_during_load_not_cached():
+    """测试加载期间发生失效时，加载结果不进入缓存"""
+    index = MembershipIndex()
+
+    def loader(project_id):
+        index.invalidate(project_id)
+        return ProjectMembership(project_id, ROWS)
+
+    index._loader = loader
+    index.get('p')
+    assert 'p' not in index.get_metrics()['projects']
+
+
+def run_all_tests():
+    """运行所有测试"""
+    tests = [
+        test_project_membership_lookups,
+        test_load_merges_role_ids_and_roles,
+        test_index_caches_until_ttl_or_invalidate,
+        test_index_lru_and_load_errors,
+        test_concurrent_misses_load_once,
+        test_invalidate_during_load_not_cached,
+    ]
+
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+"""
+测试共享 psycopg2 连接池（使用模拟连接，不访问数据库）
+"""
+
+import sys
+import os
+import time
+import threading
+from unittest import mock
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import psycopg2
+from database_sql import pg_pool
+from database_sql.pg_pool import PooledConnectionProvider, PoolTimeoutError
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, sql, params=None):
+        if self.conn.broken:
+            raise psycopg2.OperationalError('server closed the connection unexpectedly')
+        self.conn.executed.append(sql)
+        if not sql.startswith('SET'):
+            self.conn.in_transaction = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakeInfo:
+    def __init__(self, conn):
+        self.conn = conn
+
+    @property
+    def transaction_status(self):
+        return self.conn.get_transaction_status()
+
+
+class FakeConnection:
+    created = []
+
+    def __init__(self, **params):
+        self.info = FakeInfo(self)
+        self.closed = 0
+        self.broken = False
+        self.autocommit = False
+        self.in_transaction = False
+        self.executed = []
+        self.rollbacks = 0
+        FakeConnection.created.append(self)
+
+    def cursor(self, *args, **kwargs):
+        return FakeCursor(self)
+
+    def get_transaction_status(self):
+        if self.broken:
+            return 4
+        return 2 if self.in_transaction else 0
+
+    def commit(self):
+        self.in_transaction = False
+
+    def rollback(self):
+        if self.broken:
+            raise psycopg2.InterfaceError('connection already closed')
+        self.rollbacks += 1
+        self.in_transaction = False
+
+    def close(self):
+        self.closed = 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.commit() if exc_type is None else self.rollback()
+
+
+# psycopg2.pool 通过 psycopg2.connect 建立连接，只在测试期间替换
+fake_connect = mock.patch.object(psycopg2, 'connect', FakeConnection)
+
+
+def _provider(**kwargs):
+    FakeConnection.created = []
+    options = dict(minconn=1, maxconn=2, max_lifetime=60, health_check_idle=60,
+                   statement_timeout_ms=5000, acquire_timeout=0.2)
+    options.update(kwargs)
+    return PooledConnectionProvider({'host': 'test', 'database': 'db'}, **options)
+
+
+@fake_connect
+def test_connection_reused():
+    """测试 close() 归还后复用同一连接，新连接设置 statement_timeout"""
+    provider = _provider()
+
+    conn = provider.get_connection()
+    raw = conn.raw_connection
+    with conn.cursor() as cur:
+        cur.execute("SELECT 1")
+    conn.close()
+    assert conn.closed and not raw.closed
+    assert raw.rollbacks == 1, "归还时应回滚未提交的事务"
+
+    again = provider.get_connection()
+    assert again.raw_connection is raw
+    again.close()
+
+    assert len(FakeConnection.created) == 1
+    assert any(sql.startswith('SET statement_timeout') for sql in raw.executed)
+    stats = provider.get_stats()
+    assert stats['checkouts'] == 2 and stats['in_use'] == 0
+
+
+@fake_connect
+def test_with_block_commits_without_release():
+    """测试 with conn: 只结束事务，未 close 的代理被回收时自动归还"""
+    provider = _provider()
+
+    conn = provider.get_connection()
+    raw = conn.raw_connection
+    with conn:
+        with conn.cursor() as cur:
+            cur.execute("UPDATE t SET x = 1")
+    assert not raw.in_transaction and raw.rollbacks == 0
+    assert provider.get_stats()['in_use'] == 1
+
+    del conn
+    assert provider.get_stats()['in_use'] == 0
+    assert provider.get_connection().raw_connection is raw
+
+
+@fake_connect
+def test_acquire_timeout():
+    """测试连接池满时等待超时"""
+    provider = _provider(maxconn=1, acquire_timeout=0.05)
+    held = provider.get_connection()
+
+    try:
+        provider.get_connection()
+        assert False, "应抛出 PoolTimeoutError"
+    except PoolTimeoutError:
+        pass
+
+    # 另一个线程归还后可以借到
+    threading.Timer(0.02, held.close).start()
+    provider.acquire_timeout = 1
+    conn = provider.get_connection()
+    assert conn.wait_ms > 0
+    conn.close()
+    assert provider.get_stats()['timeouts'] == 1
+
+
+@fake_connect
+def test_broken_and_expired_connections_replaced():
+    """测试失效连接丢弃、超龄连接回收"""
+    provider = _provider(health_check_idle=0)
+
+    conn = provider.get_connection()
+    first = conn.raw_connection
+    conn.close()
+
+    first.broken = True
+    time.sleep(0.01)
+    conn = provider.get_connection()
+    assert conn.raw_connection is not first and first.closed
+    conn.close()
+    assert provider.get_stats()['health_check_failures'] == 1
+
+    provider.max_lifetime = 0
+    second = conn.raw_connection
+    conn = provider.get_connection()
+    assert conn.raw_connection is not second and second.closed
+    conn.close()
+    assert provider.get_stats()['connections_recycled'] >= 1
+
+
+@fake_connect
+def test_idle_connections_kept_up_to_maxconn():
+    """测试并发借出的连接归还后都保留为空闲连接，再次并发借出不新建连接"""
+    provider = _provider(maxconn=3)
+
+    conns = [provider.get_connection() for _ in range(3)]
+    for conn in conns:
+        conn.close()
+    assert len(FakeConnection.created) == 3
+    assert not any(raw.closed for raw in FakeConnection.created)
+
+    again = [provider.get_connection() for _ in range(3)]
+    assert len(FakeConnection.created) == 3
+    for conn in again:
+        conn.close()
+    assert provider.get_stats()['open_connections'] == 3
+
+
+@fake_connect
+def test_closed_on_return_and_failed_putconn():
+    """测试归还时被关闭的连接清除登记信息；putconn 失败时关闭连接并释放名额"""
+    provider = _provider(maxconn=1)
+
+    conn = provider.get_connection()
+    conn.raw_connection.broken = True
+    conn.close()
+    assert conn.raw_connection.closed
+    assert provider.get_stats()['open_connections'] == 0
+
+    conn = provider.get_connection()
+    raw = conn.raw_connection
+    pool = provider._pool
+    original = pool.putconn
+
+    def failing_putconn(c, key=None, close=False):
+        if not close:
+            raise psycopg2.pool.PoolError('boom')
+        return original(c, key=key, close=close)
+
+    with mock.patch.object(pool, 'putconn', failing_putconn):
+        conn.close()
+    assert raw.closed and provider.get_stats()['open_connections'] == 0
+
+    # 名额和 psycopg2 的已借出列表都已释放，可以立即借到新连接
+    conn = provider.get_connection()
+    assert conn.raw_connection is not raw
+    conn.close()
+
+
+@fake_connect
+def test_statement_timeout_opt_in():
+    """测试默认不设置 statement_timeout；调用方借出时设置，归还时恢复"""
+    provider = _provider(statement_timeout_ms=0)
+
+    conn = provider.get_connection()
+    raw = conn.raw_connection
+    conn.close()
+    assert not any(sql.startswith('SET statement_timeout') for sql in raw.executed)
+
+    conn = provider.get_connection(statement_timeout_ms=30000)
+    assert conn.raw_connection is raw
+    conn.close()
+    timeouts = [sql for sql in raw.executed if sql.startswith('SET statement_timeout')]
+    assert len(timeouts) == 2, "借出时设置、归还时恢复"
+
+
+def test_shared_provider_per_params():
+    """测试相同连接参数共用一个连接池"""
+    pg_pool._providers.clear()
+    a = pg_pool.get_pool_provider({'host': 'h', 'database': 'd'})
+    b = pg_pool.get_pool_provider({'database': 'd', 'host': 'h'})
+    c = pg_pool.get_pool_provider({'host': 'other', 'database': 'd'})
+    assert a is b and a is not c
+    assert set(pg_pool.get_pool_stats()) == {'h/d', 'other/d'}
+    pg_pool.close_all_pools()
+
+
+def run_all_tests():
+    """运行所有测试"""
+    tests = [
+        test_connection_reused,
+        test_with_block_commits_without_release,
+        test_acquire_timeout,
+        test_broken_and_expired_connections_replaced,
+        test_idle_connections_kept_up_to_maxconn,
+        test_closed_on_return_and_failed_putconn,
+        test_statement_timeout_opt_in,
+        test_shared_provider_per_params,
+    ]
+
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+测试集合式 UPSERT 辅助函数 execute_upsert（模拟 execute_values，不访问数据库）
+"""
+
+import sys
+import os
+from unittest import mock
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import psycopg2.extras
+
+from database_sql.pg_upsert import execute_upsert, UPSERT_PAGE_SIZE
+
+ROWS = [{'user_id': 'u1', 'name': 'old'}, {'user_id': 'u2', 'name': 'b'}, {'user_id': 'u1', 'name': 'new'}]
+
+
+def _upsert(make_result):
+    captured = {}
+
+    def fake_execute_values(cursor, sql, rows, template=None, page_size=100, fetch=False):
+        captured.update(rows=rows, page_size=page_size, fetch=fetch)
+        return [make_result(row['user_id'] != 'u1') for row in rows]
+
+    with mock.patch.object(psycopg2.extras, 'execute_values', fake_execute_values):
+        result = execute_upsert(object(), 'INSERT ... VALUES %s', '(%(user_id)s)', ROWS, ('user_id',))
+    return result, captured
+
+
+def test_dedupes_and_counts_tuple_rows():
+    """测试按冲突键去重（保留最后一条），普通游标按第一列统计新增与更新"""
+    (inserted, updated), captured = _upsert(lambda inserted: (inserted,))
+
+    assert captured['fetch'] is True and captured['page_size'] == UPSERT_PAGE_SIZE
+    assert [row['name'] for row in captured['rows']] == ['new', 'b']
+    assert inserted == 1 and updated == 1
+
+
+def test_counts_dict_rows():
+    """测试 RealDictCursor 返回的字典行同样按 inserted 列统计"""
+    (inserted, updated), _ = _upsert(lambda inserted: {'inserted': inserted})
+    assert inserted == 1 and updated == 1
+
+
+def test_empty_rows_skip_statement():
+    """测试没有行时不执行语句"""
+    with mock.patch.object(psycopg2.extras, 'execute_values', side_effect=AssertionError('unexpected call')):
+        assert execute_upsert(object(), 'INSERT ... VALUES %s', '(%(user_id)s)', [], ('user_id',)) == (0, 0)
+
+
+def run_all_tests():
+    """运行所有测试"""
+    tests = [
+        test_dedupes_and_counts_tuple_rows,
+        test_counts_dict_rows,
+        test_empty_rows_skip_statement,
+    ]
+
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+测试评审增量同步的集合式差异写入（模拟 execute_values，不访问数据库）
+"""
+
+import sys
+import os
+from contextlib import contextmanager
+from unittest import mock
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import psycopg2.extras
+
+from database_sql.pg_upsert import UPSERT_PAGE_SIZE
+from database_sql.review_data_access import ReviewDataAccess
+
+
+class FakeDataAccess(ReviewDataAccess):
+    """get_cursor 返回占位游标，不建立连接"""
+
+    def __init__(self):
+        self.cursors = 0
+
+    @contextmanager
+    def get_cursor(self):
+        self.cursors += 1
+        yield object()
+
+
+def _capture(inserted_keys):
+    """模拟 execute_values：记录调用，对 inserted_keys 中的行返回 inserted=True"""
+    calls = []
+
+    def fake_execute_values(cursor, sql, rows, template=None, page_size=100, fetch=False):
+        calls.append({'sql': sql, 'rows': rows, 'template': template, 'page_size': page_size, 'fetch': fetch})
+        return [{'inserted': (row['review_id'], row.get('step_id') or row.get('file_version_urn')) in inserted_keys}
+                for row in rows]
+
+    return calls, fake_execute_values
+
+
+def test_review_files_single_statement():
+    """测试文件差异写入一条 execute_values 语句完成，按冲突键去重并统计插入/更新"""
+    calls, fake = _capture({(1, 'urn:a')})
+    da = FakeDataAccess()
+    files = [
+        {'review_id': 1, 'file_version_urn': 'urn:a', 'approval_status': 'PENDING'},
+        {'review_id': 1, 'file_version_urn': 'urn:b', 'approval_label': 'old'},
+        {'review_id': 1, 'file_version_urn': 'urn:b', 'approval_label': 'new'},
+    ]
+
+    with mock.patch.object(psycopg2.extras, 'execute_values', fake):
+        inserted, updated = da.upsert_changed_review_files(files)
+
+    assert (inserted, updated) == (1, 1)
+    [call] = calls
+    assert da.cursors == 1 and call['fetch'] is True and call['page_size'] == UPSERT_PAGE_SIZE
+    assert 'VALUES %s' in call['sql'] and 'RETURNING (xmax = 0) AS inserted' in call['sql']
+    assert '%(file_version_urn)s' in call['template']
+    assert [row['file_version_urn'] for row in call['rows']] == ['urn:a', 'urn:b']
+    assert call['rows'][1]['approval_label'] == 'new'
+    assert call['rows'][1]['approval_status'] == 'PENDING'
+
+
+def test_review_steps_single_statement():
+    """测试步骤差异写入：默认状态和 JSON 字段，未变化的行（不返回）不计入"""
+    calls, fake = _capture({(1, 's1')})
+    da = FakeDataAccess()
+    steps = [
+        {'review_id': 1, 'step_id': 's1', 'status': None},
+        {'review_id': 1, 'step_id': 's2', 'status': 'CLAIMED', 'candidates': {'users': []}},
+    ]
+
+    def returning_changed_only(cursor, sql, rows, **kwargs):
+        return fake(cursor, sql, rows, **kwargs)[:1]
+
+    with mock.patch.object(psycopg2.extras, 'execute_values', returning_changed_only):
+        inserted, updated = da.upsert_changed_review_steps(steps)
+
+    assert (inserted, updated) == (1, 0)
+    [call] = calls
+    assert 'ON CONFLICT (review_id, step_id)' in call['sql'] and 'IS DISTINCT FROM' in call['sql']
+    assert call['template'].startswith('(%(review_id)s, %(step_id)s, %(template_step_id)s')
+    first, second = call['rows']
+    assert first['status'] == 'PENDING' and second['status'] == 'CLAIMED'
+    assert isinstance(first['assigned_to'], psycopg2.extras.Json) and first['assigned_to'].adapted == []
+    assert second['candidates'].adapted == {'users': []}
+
+
+def test_empty_input_skips_database():
+    """测试空列表不获取游标"""
+    da = FakeDataAccess()
+    assert da.upsert_changed_review_files([]) == (0, 0)
+    assert da.upsert_changed_review_steps([]) == (0, 0)
+    assert da.cursors == 0
+
+
+def run_all_tests():
+    """运行所有测试"""
+    tests = [
+        test_review_files_single_statement,
+        test_review_steps_single_statement,
+        test_empty_input_skips_database,
+    ]
+
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -12,13 +12,17 @@ Features:
     - Query helpers for common use cases
 """
 
-import psycopg2
-from psycopg2.extras import RealDictCursor, execute_batch
+from psycopg2.extras import RealDictCursor, execute_batch, execute_values
 from typing import List, Dict, Optional, Tuple
 from datetime import datetime
 from uuid import UUID
 from contextlib import contextmanager
 
+try:
+    from database_sql.pg_pool import get_pooled_connection
+except ImportError:
+    from pg_pool import get_pooled_connection
+
 
 def get_connection(connection_params: Optional[Dict] = None):
     """
@@ -28,10 +32,10 @@ def get_connection(connection_params: Optional[Dict] = None):
         connection_params: Optional connection parameters
 
     Returns:
-        psycopg2 connection object
+        Pooled psycopg2 connection (close() returns it to the shared pool)
     """
     if connection_params:
-        return psycopg2.connect(**connection_params)
+        return get_pooled_connection(connection_params)
 
     # Default connection using neon_config settings
     try:
@@ -39,18 +43,18 @@ def get_connection(connection_params: Optional[Dict] = None):
         config = NeonConfig()
 
         conn_params = config.get_db_params()
-        return psycopg2.connect(**conn_params)
+        return get_pooled_connection(conn_params)
     except ImportError:
         # Fallback
         import os
-        return psycopg2.connect(
-            host=os.getenv('DB_HOST', 'ep-soft-mountain-a4jqpy5e-pooler.us-east-1.aws.neon.tech'),
-            port=os.getenv('DB_PORT', 5432),
-            database=os.getenv('DB_NAME', 'neondb'),
-            user=os.getenv('DB_USER', 'neondb_owner'),
-            password=os.getenv('DB_PASSWORD', 'npg_a2nxljG8LOSP'),
-            sslmode='require'
-        )
+        return get_pooled_connection({
+            'host': os.getenv('DB_HOST', 'ep-soft-mountain-a4jqpy5e-pooler.us-east-1.aws.neon.tech'),
+            'port': os.getenv('DB_PORT', 5432),
+            'database': os.getenv('DB_NAME', 'neondb'),
+            'user': os.getenv('DB_USER', 'neondb_owner'),
+            'password': os.getenv('DB_PASSWORD', 'npg_a2nxljG8LOSP'),
+            'sslmode': 'require'
+        })
 
 
 class TransmittalDataAccess:
@@ -346,6 +350,8 @@ class TransmittalDataAccess:
         """
         Truncate all transmittal tables (delete all data).
         Use with caution! This is for full sync operations.
+        Also clears the incremental sync checksums, so the next
+        incremental sync re-reads every CSV file.
 
         Returns:
             Dict mapping table names to success status
@@ -354,7 +360,8 @@ class TransmittalDataAccess:
             'transmittals_transmittal_non_members',
             'transmittals_transmittal_recipients',
             'transmittals_transmittal_documents',
-            'transmittals_workflow_transmittals'
+            'transmittals_workflow_transmittals',
+            'transmittals_sync_state'
         ]
 
         result = {}
@@ -371,6 +378,140 @@ class TransmittalDataAccess:
 
         return result
 
+    # ================================================================
+    # Incremental Sync
+    # ================================================================
+
+    # Merge order: parent first for upserts, reversed for deletes
+    INCREMENTAL_TABLES = [
+        ('transmittals_workflow_transmittals', [
+            'id', 'bim360_account_id', 'bim360_project_id', 'sequence_id',
+            'title', 'status', 'create_user_id', 'create_user_name',
+            'docs_count', 'created_at', 'updated_at',
+            'create_user_company_id', 'create_user_company_name'
+        ]),
+        ('transmittals_transmittal_documents', [
+            'id', 'workflow_transmittal_id', 'bim360_account_id', 'bim360_project_id',
+            'urn', 'file_name', 'version_number', 'revision_number',
+            'parent_folder_urn', 'last_modified_time',
+            'last_modified_user_id', 'last_modified_user_name',
+            'created_at', 'updated_at'
+        ]),
+        ('transmittals_transmittal_recipients', [
+            'id', 'workflow_transmittal_id', 'bim360_account_id', 'bim360_project_id',
+            'user_id', 'user_name', 'email', 'company_name',
+            'viewed_at', 'downloaded_at', 'created_at', 'updated_at'
+        ]),
+        ('transmittals_transmittal_non_members', [
+            'id', 'bim360_account_id', 'bim360_project_id',
+            'email', 'first_name', 'last_name', 'company_name', 'role',
+            'workflow_transmittal_id', 'viewed_at', 'downloaded_at',
+            'created_at', 'updated_at'
+        ])
+    ]
+
+    def get_file_checksums(self) -> Dict[str, str]:
+        """
+        Get the checksum of each CSV file at its last successful incremental sync.
+
+        Returns:
+            Dict mapping CSV filename to SHA-256 checksum
+        """
+        with self.get_cursor() as (conn, cursor):
+            cursor.execute("SELECT file_name, checksum FROM transmittals_sync_state")
+            return {row['file_name']: row['checksum'].strip() for row in cursor.fetchall()}
+
+    def merge_incremental(self, changes: Dict[str, List[Dict]], file_states: List[Dict]) -> Dict[str, Dict[str, int]]:
+        """
+        Apply a full snapshot of the changed tables in a single transaction.
+
+        Each changed table is loaded into a temporary staging table, then:
+            1. Rows missing from the snapshot are deleted (child tables first)
+            2. New rows are inserted and rows whose row_hash changed are updated
+               with one INSERT ... ON CONFLICT per table (parent table first)
+            3. File checksums are recorded
+        Tables not in `changes` are left untouched. On any error the whole
+        transaction is rolled back and the checksums are not updated.
+
+        Args:
+            changes: Dict mapping table name to its converted rows (each with a row_hash)
+            file_states: List of {'file_name', 'checksum', 'row_count'} to record
+
+        Returns:
+            Dict mapping table name to {'inserted', 'updated', 'deleted', 'unchanged'}
+        """
+        tables = [(table, columns) for table, columns in self.INCREMENTAL_TABLES if table in changes]
+        stats = {}
+
+        with self.get_cursor() as (conn, cursor):
+            try:
+                for table, columns in tables:
+                    load_columns = columns + ['row_hash']
+                    cursor.execute(
+                        f"CREATE TEMP TABLE stage_{table} (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP"
+                    )
+                    execute_values(
+                        cursor,
+                        f"INSERT INTO stage_{table} ({', '.join(load_columns)}) VALUES %s",
+                        [tuple(row.get(column) for column in load_columns) for row in changes[table]],
+                        page_size=1000
+                    )
+                    stats[table] = {'inserted': 0, 'updated': 0, 'deleted': 0, 'unchanged': 0}
+
+                for table, _ in reversed(tables):
+                    cursor.execute(f"""
+                        DELETE FROM {table} t
+                        WHERE NOT EXISTS (SELECT 1 FROM stage_{table} s WHERE s.id = t.id)
+                    """)
+                    stats[table]['deleted'] = cursor.rowcount
+
+                for table, columns in tables:
+                    load_columns = columns + ['row_hash']
+                    column_list = ', '.join(load_columns)
+                    updates = ',\n                            '.join(
+                        f"{column} = EXCLUDED.{column}" for column in load_columns if column != 'id'
+                    )
+                    cursor.execute(f"""
+                        WITH merged AS (
+                            INSERT INTO {table} ({column_list})
+                            SELECT DISTINCT ON (id) {column_list} FROM stage_{table} ORDER BY id
+                            ON CONFLICT (id) DO UPDATE SET
+                            {updates}
+                            WHERE {table}.row_hash IS DISTINCT FROM EXCLUDED.row_hash
+                            RETURNING (xmax = 0) AS is_insert
+                        )
+                        SELECT
+                            COUNT(*) FILTER (WHERE is_insert) AS inserted,
+                            COUNT(*) FILTER (WHERE NOT is_insert) AS updated
+                        FROM merged
+                    """)
+                    merged = cursor.fetchone()
+                    stats[table]['inserted'] = merged['inserted']
+                    stats[table]['updated'] = merged['updated']
+                    stats[table]['unchanged'] = len(changes[table]) - merged['inserted'] - merged['updated']
+
+                if file_states:
+                    execute_values(
+                        cursor,
+                        """
+                        INSERT INTO transmittals_sync_state (file_name, checksum, row_count, synced_at)
+                        VALUES %s
+                        ON CONFLICT (file_name) DO UPDATE SET
+                            checksum = EXCLUDED.checksum,
+                            row_count = EXCLUDED.row_count,
+                            synced_at = EXCLUDED.synced_at
+                        """,
+                        [(state['file_name'], state['checksum'], state['row_count']) for state in file_states],
+                        template="(%s, %s, %s, NOW())"
+                    )
+
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+        return stats
+
     def get_table_counts(self) -> Dict[str, int]:
         """
         Get row counts for all transmittal tables.
@@ -260,6 +260,29 @@ COMMENT ON COLUMN transmittals_transmittal_non_members.email IS 'Email address f
 COMMENT ON COLUMN transmittals_transmittal_non_members.role IS 'Business role/title of external recipient';
 
 
+-- ================================================================
+-- Incremental Sync State
+-- ================================================================
+-- row_hash: MD5 of the source CSV row, used to update only changed rows
+-- transmittals_sync_state: checksum of each CSV file at its last
+-- successful sync, unchanged files are skipped entirely
+-- ================================================================
+
+ALTER TABLE transmittals_workflow_transmittals ADD COLUMN IF NOT EXISTS row_hash CHAR(32);
+ALTER TABLE transmittals_transmittal_documents ADD COLUMN IF NOT EXISTS row_hash CHAR(32);
+ALTER TABLE transmittals_transmittal_recipients ADD COLUMN IF NOT EXISTS row_hash CHAR(32);
+ALTER TABLE transmittals_transmittal_non_members ADD COLUMN IF NOT EXISTS row_hash CHAR(32);
+
+CREATE TABLE IF NOT EXISTS transmittals_sync_state (
+    file_name VARCHAR(255) PRIMARY KEY,
+    checksum CHAR(64) NOT NULL,
+    row_count INTEGER NOT NULL DEFAULT 0,
+    synced_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+COMMENT ON TABLE transmittals_sync_state IS 'SHA-256 checksum of each transmittal CSV file at its last incremental sync';
+
+
 -- ================================================================
 -- Helper Functions and Views (Optional)
 -- ================================================================
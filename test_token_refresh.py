@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""
+测试 token 刷新合并（single-flight）：模拟刷新请求，不访问网络
+"""
+
+import sys
+import os
+import time
+import asyncio
+import threading
+from contextlib import contextmanager
+from unittest import mock
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import utils
+
+
+class RecordingLock:
+    """替换模块锁，记录是否被获取"""
+
+    def __init__(self):
+        self.acquired = 0
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        self.acquired += 1
+        return self._lock.__enter__()
+
+    def __exit__(self, *exc):
+        return self._lock.__exit__(*exc)
+
+
+@contextmanager
+def _token_state(expires_in, refresh):
+    """设置内存中的token状态，并用 refresh 替换实际的HTTP刷新"""
+    storage = {'access_token': 'old', 'refresh_token': 'r1',
+               'expires_at': time.time() + expires_in if expires_in is not None else None}
+    stats = {'refreshes': 0, 'coalesced': 0, 'background': 0}
+    with mock.patch.dict(utils._token_storage, storage), \
+            mock.patch.dict(utils._refresh_stats, stats), \
+            mock.patch.object(utils, '_refresh_flight', None), \
+            mock.patch.object(utils, '_refresh_token_unlocked', refresh):
+        yield
+
+
+def _wait_until(predicate, timeout=5):
+    deadline = time.time() + timeout
+    while not predicate():
+        assert time.time() < deadline, 'timed out waiting for condition'
+        time.sleep(0.01)
+
+
+def _run_threads(target, count):
+    results = [None] * count
+
+    def call(i):
+        results[i] = target()
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+
+def test_concurrent_callers_refresh_once():
+    """测试token过期时 N 个并发调用方只触发一次刷新，且都拿到新token"""
+    release = threading.Event()
+    calls = []
+
+    def refresh(**kwargs):
+        calls.append(kwargs)
+        release.wait(5)
+        return 'new'
+
+    with _token_state(-10, refresh):
+        threads, results = _run_threads(utils.get_access_token, 8)
+        _wait_until(lambda: utils._refresh_stats['coalesced'] == 7)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        assert len(calls) == 1 and calls[0]['bypass_frequency'] is True
+        assert results == ['new'] * 8
+        assert utils._refresh_stats['refreshes'] == 1
+        assert utils._refresh_flight is None
+
+
+def test_fresh_token_skips_locks():
+    """测试token有效期充足时直接返回，不获取任何锁，也不刷新"""
+    def refresh(**kwargs):
+        raise AssertionError('fresh token must not be refreshed')
+
+    token_lock, flight_lock = RecordingLock(), RecordingLock()
+    with _token_state(3600, refresh), \
+            mock.patch.object(utils, '_token_lock', token_lock), \
+            mock.patch.object(utils, '_refresh_flight_lock', flight_lock):
+        assert utils.get_access_token() == 'old'
+        assert asyncio.run(utils.get_token()) == 'old'
+
+    assert token_lock.acquired == 0 and flight_lock.acquired == 0
+
+
+def test_refresh_window_refreshes_in_background():
+    """测试进入提前刷新窗口时立即返回当前token，刷新在后台线程进行且只触发一次"""
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def refresh(**kwargs):
+        calls.append(threading.current_thread().name)
+        started.set()
+        release.wait(5)
+        return 'new'
+
+    with _token_state(utils.TOKEN_REFRESH_THRESHOLD / 2, refresh):
+        assert utils.get_access_token() == 'old'
+        assert started.wait(5)
+        assert utils.get_access_token() == 'old'
+        assert asyncio.run(utils.get_token()) == 'old'
+
+        flight = utils._refresh_flight
+        release.set()
+        assert flight.done.wait(5)
+
+        assert calls == ['token-refresh']
+        assert utils._refresh_stats['background'] == 1
+        assert utils._refresh_flight is None
+
+
+def test_failed_refresh_releases_waiters():
+    """测试刷新失败（返回 None 或抛出异常）时等待方拿到 None，不会挂起"""
+    for outcome in (None, ConnectionError('token endpoint unreachable')):
+        release = threading.Event()
+
+        def refresh(**kwargs):
+            release.wait(5)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        with _token_state(None, refresh):
+            leader_error = []
+
+            def leader():
+                try:
+                    utils._refresh_single_flight(source='test')
+                except ConnectionError as e:
+                    leader_error.append(e)
+
+            leader_thread = threading.Thread(target=leader)
+            leader_thread.start()
+            _wait_until(lambda: utils._refresh_flight is not None)
+            waiters, results = _run_threads(lambda: utils._refresh_single_flight(source='test'), 3)
+            _wait_until(lambda: utils._refresh_stats['coalesced'] == 3)
+            release.set()
+            for thread in [leader_thread] + waiters:
+                thread.join(5)
+                assert not thread.is_alive()
+
+            assert results == [None] * 3
+            assert bool(leader_error) == isinstance(outcome, Exception)
+            assert utils._refresh_flight is None
+
+
+def test_waiter_times_out_on_stuck_refresh():
+    """测试刷新卡住时等待方在 REFRESH_WAIT_TIMEOUT 后返回 None"""
+    release = threading.Event()
+
+    def refresh(**kwargs):
+        release.wait(5)
+        return 'late'
+
+    with _token_state(None, refresh), mock.patch.object(utils, 'REFRESH_WAIT_TIMEOUT', 0.2):
+        leader_thread = threading.Thread(target=lambda: utils._refresh_single_flight(source='test'))
+        leader_thread.start()
+        _wait_until(lambda: utils._refresh_flight is not None)
+
+        started = time.time()
+        assert utils._refresh_single_flight(source='test') is None
+        assert time.time() - started < 2
+
+        release.set()
+        leader_thread.join(5)
+        assert utils._refresh_flight is None
+
+
+def run_all_tests():
+    """运行所有测试"""
+    tests = [
+        test_concurrent_callers_refresh_once,
+        test_fresh_token_skips_locks,
+        test_refresh_window_refreshes_in_background,
+        test_failed_refresh_releases_waiters,
+        test_waiter_times_out_on_stuck_refresh,
+    ]
+
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
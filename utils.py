@@ -7,6 +7,7 @@
 import json
 import os
 import time
+import asyncio
 import threading
 import requests
 from datetime import datetime, timedelta
@@ -29,7 +30,7 @@ _token_storage = {
     'next_auto_refresh_at': None  # 下次自动刷新的预计时间
 }
 
-# 线程锁，确保token操作的线程安全
+# 线程锁，确保token写入的线程安全（读取热路径不加锁，HTTP刷新期间也不持有）
 _token_lock = threading.Lock()
 
 # 持久化存储文件路径
@@ -37,8 +38,28 @@ PERSISTENT_TOKEN_FILE = os.path.join(os.path.dirname(__file__), '.token_cache.js
 
 # Token配置
 TOKEN_REFRESH_THRESHOLD = 600  # 提前10分钟刷新
+TOKEN_EXPIRY_GRACE = 60  # 剩余不足1分钟时视为过期，调用方需等待刷新结果
 MAX_REFRESH_ATTEMPTS = 3
 REFRESH_RETRY_DELAY = 5  # 刷新失败后等待5秒重试
+REFRESH_WAIT_TIMEOUT = 15  # 等待进行中的刷新的最长时间（刷新请求本身超时10秒）
+
+
+class _RefreshFlight:
+    """一次进行中的token刷新，并发调用方等待同一个结果"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.token = None
+
+
+# 当前进行中的刷新（single-flight）
+_refresh_flight = None
+_refresh_flight_lock = threading.Lock()
+_refresh_stats = {
+    'refreshes': 0,        # 实际发出的刷新请求
+    'coalesced': 0,        # 合并到进行中刷新的调用
+    'background': 0        # 提前在后台触发的刷新
+}
 
 # 2-legged token存储
 _two_legged_token_storage = {
@@ -46,80 +67,151 @@ _two_legged_token_storage = {
     'expires_at': None,
     'updated_at': None
 }
+# 2-legged token使用独立的锁，获取时不阻塞3-legged token的读写
+_two_legged_lock = threading.Lock()
 
 
 def get_access_token():
-    """获取有效的access token，支持智能自动刷新"""
-    with _token_lock:
-        current_time = time.time()
-        
-        # 1. 检查内存中的token
-        if _token_storage['access_token']:
-            expires_at = _token_storage['expires_at']
-            
-            # 如果token有充足的有效期（超过5分钟），直接返回
-            if expires_at and current_time < (expires_at - 300):
-                return _token_storage['access_token']
-            
-            # 如果token即将过期或已过期，但有refresh_token，尝试刷新
+    """获取有效的access token，支持智能自动刷新
+
+    内存中的token有效期充足时不加锁直接返回；进入提前刷新窗口时返回当前token，
+    同时在后台触发刷新；只有token缺失或即将过期时才等待刷新结果。
+    并发的刷新请求合并为一次HTTP调用。
+    """
+    current_time = time.time()
+    access_token = _token_storage['access_token']
+    expires_at = _token_storage['expires_at']
+
+    # 1. 检查内存中的token
+    if access_token and expires_at:
+        if current_time < expires_at - TOKEN_REFRESH_THRESHOLD:
+            return access_token
+
+        if current_time < expires_at - TOKEN_EXPIRY_GRACE:
+            # 仍然可用：后台提前刷新，不阻塞当前请求
             if _token_storage['refresh_token']:
-                should_refresh = False
-                
-                if not expires_at:
-                    should_refresh = True
-                    print("[Token] No expiry info, refreshing token...")
-                elif current_time >= expires_at:
-                    should_refresh = True 
-                    print("[Token] Token expired, refreshing...")
-                elif current_time > (expires_at - TOKEN_REFRESH_THRESHOLD):
-                    should_refresh = True
-                    print(f"[Token] Token expires in {int((expires_at - current_time)/60)} min, refreshing...")
-                
-                if should_refresh:
-                    # 临时绕过频率限制，允许即时刷新
-                    original_last_attempt = _token_storage.get('last_refresh_attempt')
-                    if (original_last_attempt and 
-                        current_time - original_last_attempt < REFRESH_RETRY_DELAY):
-                        print("[Token] Bypassing refresh frequency limit for immediate request")
-                        _token_storage['last_refresh_attempt'] = None
-                    
-                    # 直接调用内部刷新逻辑，避免重复获取锁
-                    refreshed_token = _refresh_token_unlocked(source="auto")
-                    if refreshed_token:
-                        return refreshed_token
-                    
-                    # 如果刷新失败，恢复原始的last_attempt时间
-                    if original_last_attempt:
-                        _token_storage['last_refresh_attempt'] = original_last_attempt
-            
-            # 如果token还没完全过期，临时返回原token
-            if expires_at and current_time < expires_at:
-                print("[Token] Using potentially expired token temporarily")
-                return _token_storage['access_token']
-        
-        # 2. 尝试从持久化存储加载
-        if _load_from_persistent_storage():
-            return _token_storage['access_token']
-        
-        # 3. 尝试从会话获取
-        if _load_from_session():
+                _refresh_single_flight(source="auto", wait=False)
+            return access_token
+
+    refresh_tried = False
+    if _token_storage['refresh_token']:
+        if not expires_at:
+            print("[Token] No expiry info, refreshing token...")
+        elif current_time >= expires_at:
+            print("[Token] Token expired, refreshing...")
+        else:
+            print(f"[Token] Token expires in {int(expires_at - current_time)}s, refreshing...")
+
+        refresh_tried = True
+        # 调用方必须拿到可用token，允许绕过刷新频率限制
+        refreshed_token = _refresh_single_flight(source="auto", bypass_frequency=True)
+        if refreshed_token:
+            return refreshed_token
+
+        # 如果token还没完全过期，临时返回原token
+        access_token = _token_storage['access_token']
+        expires_at = _token_storage['expires_at']
+        if access_token and expires_at and time.time() < expires_at:
+            print("[Token] Using potentially expired token temporarily")
+            return access_token
+
+    # 2. 尝试从持久化存储 / 会话加载（只读本地数据，持锁时间很短）
+    with _token_lock:
+        if _load_from_persistent_storage() or _load_from_session():
             return _token_storage['access_token']
-        
-        # 4. 兼容旧版本文件存储
-        return _get_token_from_file()
 
+    # 持久化存储中的token已过期但带有refresh_token
+    if not refresh_tried and _token_storage['refresh_token']:
+        print("[Token] Attempting to refresh expired token from persistent storage")
+        refreshed_token = _refresh_single_flight(source="persistent_storage", bypass_frequency=True)
+        if refreshed_token:
+            return refreshed_token
+
+    # 3. 兼容旧版本文件存储
+    return _get_token_from_file()
+
+
+async def get_token():
+    """get_access_token 的 asyncio 版本
+
+    token有效时直接返回；需要等待刷新或读取存储时放到线程池执行，不阻塞事件循环。
+    """
+    access_token = _token_storage['access_token']
+    expires_at = _token_storage['expires_at']
+    if access_token and expires_at and time.time() < expires_at - TOKEN_EXPIRY_GRACE:
+        if time.time() >= expires_at - TOKEN_REFRESH_THRESHOLD and _token_storage['refresh_token']:
+            _refresh_single_flight(source="auto", wait=False)
+        return access_token
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, get_access_token)
+
+
+def _refresh_single_flight(force=False, source="unknown", wait=True, bypass_frequency=False):
+    """合并并发的token刷新：同一时间只有一个HTTP刷新请求
+
+    Args:
+        force (bool): 是否强制刷新，忽略频率限制和重试次数
+        source (str): 调用来源，用于日志记录
+        wait (bool): 是否等待刷新结果；False 时在后台线程刷新并立即返回 None
+        bypass_frequency (bool): 是否忽略刷新频率限制
 
-def _refresh_token_unlocked(force=False, source="unknown"):
-    """内部token刷新函数 - 不使用锁，假设调用者已经获取了锁
+    Returns:
+        str|None: 刷新后的access_token
+    """
+    global _refresh_flight
+
+    with _refresh_flight_lock:
+        flight = _refresh_flight
+        leader = flight is None
+        if leader:
+            flight = _refresh_flight = _RefreshFlight()
+            _refresh_stats['refreshes'] += 1
+            if not wait:
+                _refresh_stats['background'] += 1
+        elif wait:
+            _refresh_stats['coalesced'] += 1
+
+    if not leader:
+        if not wait:
+            return None
+        flight.done.wait(REFRESH_WAIT_TIMEOUT)
+        return flight.token
+
+    def run():
+        global _refresh_flight
+        try:
+            flight.token = _refresh_token_unlocked(force=force, source=source,
+                                                   bypass_frequency=bypass_frequency)
+        finally:
+            with _refresh_flight_lock:
+                _refresh_flight = None
+            flight.done.set()
+
+    if wait:
+        run()
+        return flight.token
+
+    threading.Thread(target=run, name='token-refresh', daemon=True).start()
+    return None
+
+
+def _refresh_token_unlocked(force=False, source="unknown", bypass_frequency=False):
+    """内部token刷新函数 - 调用者不能持有 _token_lock
+    
+    HTTP请求期间不持锁，只在更新存储时短暂加锁。应通过 _refresh_single_flight 调用，
+    以保证同一时间只有一个刷新请求。
     
     Args:
         force (bool): 是否强制刷新，忽略频率限制
         source (str): 调用来源，用于日志记录
+        bypass_frequency (bool): 是否忽略刷新频率限制（仍受最大重试次数限制）
     
     Returns:
         str|None: 成功时返回access_token，失败时返回None
     """
-    if not _token_storage['refresh_token']:
+    refresh_token = _token_storage['refresh_token']
+    if not refresh_token:
         print(f"[Token] [{source}] No refresh token available")
         return None
     
@@ -131,11 +223,11 @@ def _refresh_token_unlocked(force=False, source="unknown"):
     current_time = time.time()
     
     # 检查刷新频率限制（除非强制刷新）
-    if not force and _token_storage.get('last_refresh_attempt'):
+    if not force and not bypass_frequency and _token_storage.get('last_refresh_attempt'):
         time_since_last = current_time - _token_storage['last_refresh_attempt']
         if time_since_last < REFRESH_RETRY_DELAY:
             print(f"[Token] [{source}] Refresh too frequent, skipping")
-        return None
+            return None
     
     # 检查最大重试次数（除非强制刷新）
     if not force and _token_storage['refresh_attempts'] >= config.MAX_TOKEN_REFRESH_ATTEMPTS:
@@ -146,14 +238,15 @@ def _refresh_token_unlocked(force=False, source="unknown"):
         print(f"[Token] [{source}] 开始刷新token (尝试 {_token_storage['refresh_attempts'] + 1})...")
         
         # 更新尝试记录
-        _token_storage['last_refresh_attempt'] = current_time
-        if not force:
-            _token_storage['refresh_attempts'] += 1
+        with _token_lock:
+            _token_storage['last_refresh_attempt'] = current_time
+            if not force:
+                _token_storage['refresh_attempts'] += 1
         
         # 构建刷新请求
         refresh_data = {
             'grant_type': 'refresh_token',
-            'refresh_token': _token_storage['refresh_token'],
+            'refresh_token': refresh_token,
             'client_id': config.CLIENT_ID,
             'client_secret': config.CLIENT_SECRET,
         }
@@ -167,17 +260,20 @@ def _refresh_token_unlocked(force=False, source="unknown"):
         if response.status_code == 200:
             token_data = response.json()
             
-            # 保存新的token（不使用锁，因为我们已经在锁内）
-            success = _save_tokens_unlocked(
-                access_token=token_data.get('access_token'),
-                refresh_token=token_data.get('refresh_token', _token_storage['refresh_token']),
-                expires_in=token_data.get('expires_in', 3600)
-            )
+            # 保存新的token
+            with _token_lock:
+                success = _save_tokens_unlocked(
+                    access_token=token_data.get('access_token'),
+                    refresh_token=token_data.get('refresh_token', refresh_token),
+                    expires_in=token_data.get('expires_in', 3600)
+                )
+                
+                if success:
+                    # 重置刷新计数器
+                    _token_storage['refresh_attempts'] = 0
+                    _token_storage['last_refresh_attempt'] = None
             
             if success:
-                # 重置刷新计数器
-                _token_storage['refresh_attempts'] = 0
-                _token_storage['last_refresh_attempt'] = None
                 print(f"[Token] [{source}] Token刷新成功")
                 return token_data.get('access_token')
             else:
@@ -195,7 +291,10 @@ def _refresh_token_unlocked(force=False, source="unknown"):
             if error_type == 'invalid_grant' or response.status_code == 401:
                 # refresh_token过期，清除所有token
                 print(f"[Token] [{source}] 清除过期的tokens，需要重新认证")
-                _clear_expired_tokens()
+                with _token_lock:
+                    # 刷新期间用户可能已重新登录，只清除本次使用的refresh_token
+                    if _token_storage['refresh_token'] == refresh_token:
+                        _clear_expired_tokens()
                 return None
             else:
                 print(f"[Token] [{source}] 刷新失败: {error_desc}")
@@ -247,22 +346,22 @@ def refresh_access_token(force=False, source="unknown"):
         # 检查最大重试次数（除非强制刷新）
         if not force and _token_storage['refresh_attempts'] >= config.MAX_TOKEN_REFRESH_ATTEMPTS:
             return False, f"已达到最大重试次数({config.MAX_TOKEN_REFRESH_ATTEMPTS})", "max_attempts_exceeded"
-        
-        # 调用内部无锁刷新函数
-        access_token = _refresh_token_unlocked(force=force, source=source)
-        if access_token:
-            # 构造token_data用于返回
-            token_data = {
-                'access_token': access_token,
-                'expires_in': 3600  # 默认值，实际值已经在_save_tokens_unlocked中处理
-            }
-            return True, token_data, None
+    
+    # 在锁外刷新，并与进行中的刷新合并
+    access_token = _refresh_single_flight(force=force, source=source)
+    if access_token:
+        # 构造token_data用于返回
+        token_data = {
+            'access_token': access_token,
+            'expires_in': 3600  # 默认值，实际值已经在_save_tokens_unlocked中处理
+        }
+        return True, token_data, None
+    else:
+        # 根据当前状态确定错误类型
+        if not _token_storage.get('refresh_token'):
+            return False, "Refresh token已过期，需要重新登录", "refresh_token_expired"
         else:
-            # 根据当前状态确定错误类型
-            if not _token_storage.get('refresh_token'):
-                return False, "Refresh token已过期，需要重新登录", "refresh_token_expired"
-            else:
-                return False, "Token刷新失败", "refresh_failed"
+            return False, "Token刷新失败", "refresh_failed"
 
 
 def _clear_expired_tokens():
@@ -413,9 +512,9 @@ def _load_from_persistent_storage():
             return True
         else:
             print(f"[Token] Persistent token expired (expired {int((current_time - expires_at)/60) if expires_at else 'unknown'} minutes ago)")
-            # 如果token过期但有refresh_token，尝试刷新
+            # 如果token过期但有refresh_token，载入refresh_token，由调用方在锁外刷新
             if token_data.get('refresh_token'):
-                print("[Token] Attempting to refresh expired token from persistent storage")
+                print("[Token] Loaded refresh token from persistent storage")
                 _token_storage.update({
                     'access_token': None,  # 清除过期的access_token
                     'refresh_token': token_data.get('refresh_token'),
@@ -424,13 +523,6 @@ def _load_from_persistent_storage():
                     'refresh_attempts': 0,
                     'last_refresh_attempt': None
                 })
-                # 直接调用内部刷新函数，因为调用者已经持有锁
-                refreshed_token = _refresh_token_unlocked(source="persistent_storage")
-                if refreshed_token:
-                    print("[Token] Token refreshed successfully from persistent storage")
-                    return True
-                else:
-                    print("[Token] Failed to refresh token from persistent storage")
             else:
                 print("[Token] No refresh token available in persistent storage")
             
@@ -563,7 +655,9 @@ def get_token_info():
             # 新增的下次自动刷新时间信息
             'next_auto_refresh_at': datetime.fromtimestamp(next_auto_refresh_at).isoformat() if next_auto_refresh_at else None,
             'next_auto_refresh_in_minutes': next_auto_refresh_in_minutes,
-            'next_auto_refresh_in_seconds': next_auto_refresh_in_seconds
+            'next_auto_refresh_in_seconds': next_auto_refresh_in_seconds,
+            'refresh_in_flight': _refresh_flight is not None,
+            'refresh_stats': dict(_refresh_stats)
         }
         
         return info
@@ -827,35 +921,35 @@ def _background_token_monitor():
         return
     
     try:
-        with _token_lock:
-            # 检查是否需要刷新token
-            if (_token_storage.get('access_token') and 
-                _token_storage.get('refresh_token') and 
-                _token_storage.get('expires_at')):
-                
-                current_time = time.time()
-                expires_at = _token_storage['expires_at']
-                
-                # 检查token是否即将过期或已过期
-                needs_refresh = (
-                    current_time > (expires_at - TOKEN_REFRESH_THRESHOLD) or
-                    current_time >= expires_at
-                )
+        # 检查是否需要刷新token
+        if (_token_storage.get('access_token') and 
+            _token_storage.get('refresh_token') and 
+            _token_storage.get('expires_at')):
+            
+            current_time = time.time()
+            expires_at = _token_storage['expires_at']
+            
+            # 检查token是否即将过期或已过期
+            needs_refresh = (
+                current_time > (expires_at - TOKEN_REFRESH_THRESHOLD) or
+                current_time >= expires_at
+            )
+            
+            if needs_refresh:
+                print("[Monitor] Token需要刷新，调用内部刷新函数")
+                # 不持有 _token_lock，请求线程在刷新期间仍可读取当前token
+                refreshed_token = _refresh_single_flight(source="background_monitor")
                 
-                if needs_refresh:
-                    print("[Monitor] Token需要刷新，调用内部刷新函数")
-                    refreshed_token = _refresh_token_unlocked(source="background_monitor")
+                if refreshed_token:
+                    print("[Monitor] 后台token刷新成功")
+                else:
+                    print("[Monitor] 后台token刷新失败")
                     
-                    if refreshed_token:
-                        print("[Monitor] 后台token刷新成功")
-                    else:
-                        print("[Monitor] 后台token刷新失败")
-                        
-                        # 如果refresh_token已被清除，说明过期了，停止监控器
-                        if not _token_storage.get('refresh_token'):
-                            print("[Monitor] Refresh token已过期，停止后台监控")
-                            stop_background_token_monitor()
-                            return
+                    # 如果refresh_token已被清除，说明过期了，停止监控器
+                    if not _token_storage.get('refresh_token'):
+                        print("[Monitor] Refresh token已过期，停止后台监控")
+                        stop_background_token_monitor()
+                        return
     
     except Exception as e:
         print(f"[Monitor] 后台token监控异常: {str(e)}")
@@ -941,7 +1035,7 @@ def get_two_legged_token():
     获取2-legged OAuth token (Client Credentials)
     用于访问账户级别的API
     """
-    with _token_lock:
+    with _two_legged_lock:
         current_time = time.time()
         
         # 检查现有token是否有效